@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# bench_concurrency.py
+"""
+Last auf die SQLite-Datei wie im Deployment: mehrere geforkte Prozesse
+(uWSGI-Worker) mit je mehreren Threads legen im Wechsel Rezepte an
+(create-recipe), erzeugen die Einkaufsliste neu (select_recipes) und
+lesen Seiten. Einmal ohne und einmal mit dem Tuning aus database.py.
+
+"ohne Tuning" sind die Verbindungen wie vor database.py: Journal-Modus
+DELETE, deferred BEGIN und kein busy_timeout (pysqlite wartet sonst von
+sich aus 5 s auf Sperren). Dort muss es "database is locked" geben, sonst
+misst der Vergleich nichts; mit Tuning darf es keine geben.
+
+Ausgegeben werden Durchsatz und die Zahl der "database is locked"-Fehler.
+Beendet sich mit Exit-Code 1, wenn eine der beiden Bedingungen nicht hält.
+
+Aufruf:  python benchmarks/bench_concurrency.py [--processes 4] [--threads 4] [--seconds 10]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from common import load_app, seed_user
+
+MODES = [
+    ('ohne Tuning', {'sqlite_tuning': False, 'db_read_routing': False}),
+    ('mit Tuning', {}),
+]
+
+
+def baseline_connections(server):
+    """ Ohne Wartezeit auf Sperren, wie sqlite3 mit timeout=0. """
+    with server.app.app_context():
+        for engine in server.db.engines.values():
+            event.listen(engine, 'connect', lambda dbapi_connection, record:
+                         dbapi_connection.execute("PRAGMA busy_timeout = 0"))
+
+
+def login(server, user_id):
+    client = server.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def operations(client, rnd, recipe_ids):
+    names = [f'Zutat {rnd.randint(0, 400)}' for _ in range(8)]
+    yield 'create-recipe', lambda: client.post('/create-recipe', data={
+        'title': f'Last {rnd.randint(0, 10 ** 6)}',
+        'instructions': 'Kochen.',
+        'ingredient_name[]': names,
+        'ingredient_amount[]': [str(rnd.randint(1, 500)) for _ in names],
+        'ingredient_unit[]': [rnd.choice(['g', 'ml', 'Stk']) for _ in names],
+    })
+    yield 'select_recipes', lambda: client.post('/select_recipes', data={
+        'recipe_ids[]': [str(r) for r in rnd.sample(recipe_ids, 5)],
+    })
+    yield 'GET shopping-list', lambda: client.get('/shopping-list')
+    yield 'GET my-recipes', lambda: client.get('/my-recipes')
+
+
+def hammer(server, user_id, recipe_ids, deadline, stats, lock):
+    client = login(server, user_id)
+    rnd = random.Random(user_id)
+    local = Counter()
+    while time.monotonic() < deadline:
+        for name, call in operations(client, rnd, recipe_ids):
+            try:
+                response = call()
+                local['ok' if response.status_code < 400 else 'fehler'] += 1
+            except OperationalError as error:
+                local['locked' if 'locked' in str(error) else 'fehler'] += 1
+                with server.app.app_context():
+                    server.db.session.rollback()
+            except Exception:
+                local['fehler'] += 1
+            local[name] += 1
+    with lock:
+        stats.update(local)
+
+
+def worker_process(server, users, seconds):
+    # Wie uWSGI nach dem Fork: geerbte Verbindungen verwerfen
+    with server.app.app_context():
+        for engine in server.db.engines.values():
+            engine.dispose(close=False)
+    stats = Counter()
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+    threads = [threading.Thread(target=hammer, args=(server, user_id, recipe_ids, deadline,
+                                                     stats, lock))
+               for user_id, recipe_ids in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+def run_mode(extra_config, processes, threads, seconds):
+    server = load_app(extra_config=extra_config)
+    server.app.testing = True
+    if extra_config.get('sqlite_tuning') is False:
+        baseline_connections(server)
+    users = [seed_user(server, f'last{i}', n_recipes=20, n_household=10, seed=i)
+             for i in range(processes * threads)]
+    with server.app.app_context():
+        server.db.session.remove()
+        for engine in server.db.engines.values():
+            engine.dispose()
+
+    children = []
+    for p in range(processes):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            stats = worker_process(server, users[p * threads:(p + 1) * threads], seconds)
+            with os.fdopen(write_fd, 'w') as pipe:
+                json.dump(stats, pipe)
+            os._exit(0)
+        os.close(write_fd)
+        children.append((pid, read_fd))
+
+    total = Counter()
+    for pid, read_fd in children:
+        with os.fdopen(read_fd) as pipe:
+            data = pipe.read()
+        os.waitpid(pid, 0)
+        if data:
+            total.update(json.loads(data))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+    if not hasattr(os, 'fork'):
+        raise SystemExit("Benötigt os.fork (Linux/macOS)")
+
+    print(f"{args.processes} Prozesse x {args.threads} Threads, je {args.seconds:.0f} s\n")
+    print(f"{'Modus':<12} {'Ops/s':>8} {'Rezepte':>8} {'Listen':>8} {'Lesen':>8} "
+          f"{'locked':>8} {'Fehler':>8}")
+    locked = {}
+    for label, extra_config in MODES:
+        stats = run_mode(extra_config, args.processes, args.threads, args.seconds)
+        reads = stats['GET shopping-list'] + stats['GET my-recipes']
+        print(f"{label:<12} {stats['ok'] / args.seconds:>8.1f} {stats['create-recipe']:>8} "
+              f"{stats['select_recipes']:>8} {reads:>8} {stats['locked']:>8} {stats['fehler']:>8}")
+        locked[label] = stats['locked']
+
+    failures = []
+    if not locked['ohne Tuning']:
+        failures.append("ohne Tuning keine locked-Fehler, zu wenig Schreiblast?")
+    if locked['mit Tuning']:
+        failures.append(f"mit Tuning {locked['mit Tuning']} locked-Fehler")
+    for failure in failures:
+        print(f"FEHLER: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
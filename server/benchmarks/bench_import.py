@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# bench_import.py
+"""
+Massenimport und -export (recipe_transfer.py): erzeugt eine JSON-Lines-
+Datei mit --recipes Rezepten (je --ingredients Zutaten aus --names
+verschiedenen Namen), importiert sie mit "flask recipes import" in einem
+eigenen Prozess und exportiert sie danach wieder als CSV.
+
+Ausgegeben werden Rezepte und Zutatenzeilen pro Sekunde und der maximale
+Speicher (Peak RSS) des Import- bzw. Exportprozesses. Zum Vergleich läuft
+vorher ein Import mit 1 % der Rezepte: wächst der Peak kaum mit, liest der
+Import wirklich als Stream. Memory-Mapped I/O ist dafür abgeschaltet, sonst
+zählen die gelesenen Seiten der Datenbankdatei mit; was dann noch wächst,
+sind SQLite-Page-Cache und WAL, nicht die Python-Objekte.
+
+Beendet sich mit Exit-Code 1, wenn Rezepte, Zutaten oder Exportzeilen fehlen.
+
+Aufruf:  python benchmarks/bench_import.py [--recipes 100000] [--chunk-size 500]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from common import PROJECT_DIR, load_app
+from ingredient_resolver import name_key
+
+
+def write_file(path, n, per_recipe, names, seed=7):
+    """ Schreibt die Datei, gibt die Schlüssel (name_key) der verwendeten Zutaten zurück. """
+    rnd = random.Random(seed)
+    keys = set()
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(n):
+            ingredients = [
+                {'name': f'Zutat {k}', 'amount': rnd.randint(1, 500),
+                 'unit': rnd.choice(['g', 'ml', 'Stk'])}
+                for k in rnd.sample(range(names), per_recipe)
+            ]
+            keys.update(name_key(entry['name']) for entry in ingredients)
+            f.write(json.dumps({
+                'title': f'Import {i}',
+                'instructions': 'Alles verrühren und 20 Minuten backen.',
+                'ingredients': ingredients,
+            }, ensure_ascii=False) + '\n')
+    return keys
+
+
+def run_cli(workdir, *args):
+    """ Führt "flask --app server:create_app ..." aus, gibt (Sekunden, Peak-RSS MiB) zurück. """
+    env = dict(os.environ, PYTHONPATH=PROJECT_DIR)
+    command = [sys.executable, '-c',
+               'import resource, sys\n'
+               'from flask.cli import main\n'
+               'try:\n'
+               '    main()\n'
+               'finally:\n'
+               '    print("PEAK_KB", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,'
+               ' file=sys.stderr)\n',
+               '--app', 'server:create_app', *args]
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise SystemExit(f"flask {' '.join(args)} fehlgeschlagen:\n{result.stderr}")
+    peak_kb = int(result.stderr.rsplit('PEAK_KB', 1)[1].split()[0])
+    return elapsed, peak_kb / 1024
+
+
+def count(server, user_id):
+    with server.app.app_context():
+        recipes = server.Recipe.query.filter_by(user_id=user_id).count()
+        rows = (server.RecipeIngredient.query.join(server.Recipe)
+                .filter(server.Recipe.user_id == user_id).count())
+    return recipes, rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recipes', type=int, default=100000)
+    parser.add_argument('--ingredients', type=int, default=8)
+    parser.add_argument('--names', type=int, default=5000)
+    parser.add_argument('--chunk-size', type=int, default=500)
+    args = parser.parse_args()
+
+    # Ohne mmap, sonst misst Peak RSS auch die Datenbankdatei
+    server = load_app(extra_config={'sqlite_mmap_size': 0})
+    workdir = os.getcwd()
+    with server.app.app_context():
+        for name in ('klein', 'gross'):
+            server.db.session.add(server.User(username=name, password='x'))
+        server.db.session.commit()
+        users = {u.username: u.id for u in server.User.query}
+
+    failures = []
+    written = set()
+    print(f"{'Lauf':<22} {'Rezepte':>9} {'Sekunden':>9} {'Rezepte/s':>10} "
+          f"{'Zeilen/s':>10} {'Peak RSS':>10}")
+    for name, n in (('klein', max(1, args.recipes // 100)), ('gross', args.recipes)):
+        path = os.path.join(workdir, f'{name}.jsonl')
+        written |= write_file(path, n, args.ingredients, args.names)
+        seconds, peak = run_cli(workdir, 'recipes', 'import', path, '--user', name,
+                                '--chunk-size', str(args.chunk_size))
+        recipes, rows = count(server, users[name])
+        print(f"{'Import ' + name:<22} {recipes:>9} {seconds:>9.1f} {recipes / seconds:>10.0f} "
+              f"{rows / seconds:>10.0f} {peak:>7.0f} MiB")
+        if (recipes, rows) != (n, n * args.ingredients):
+            failures.append(f"Import {name}: {recipes} Rezepte / {rows} Zeilen "
+                            f"statt {n} / {n * args.ingredients}")
+        os.remove(path)
+
+    export_path = os.path.join(workdir, 'export.csv')
+    seconds, peak = run_cli(workdir, 'recipes', 'export', '--user', 'gross', '--format', 'csv',
+                            '-o', export_path)
+    with open(export_path, encoding='utf-8') as f:
+        lines = sum(1 for _ in f) - 1
+    print(f"{'Export gross (CSV)':<22} {args.recipes:>9} {seconds:>9.1f} "
+          f"{args.recipes / seconds:>10.0f} {lines / seconds:>10.0f} {peak:>7.0f} MiB")
+    if lines != args.recipes * args.ingredients:
+        failures.append(f"Export: {lines} Zeilen statt {args.recipes * args.ingredients}")
+
+    with server.app.app_context():
+        ingredients = server.Ingredient.query.count()
+    # Bei wenigen Rezepten kommen nicht alle --names vor
+    if ingredients != len(written):
+        failures.append(f"{ingredients} Zutaten angelegt statt {len(written)} (Duplikate?)")
+    for failure in failures:
+        print(f"FEHLER: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# bench_incremental_list.py
+"""
+Inkrementelle Pflege der Einkaufsliste: baut für Listen mit 10, 100 und
+1000 Rezepten einmal die Liste und misst dann, was eine Rezeptänderung
+und ein neuer Bestandseintrag kosten (SQL-Statements und Laufzeit).
+Beides sollte unabhängig von der Listengröße sein.
+
+Danach wird geprüft, dass die nachgeführte Liste mit einem kompletten
+Neuaufbau übereinstimmt und dass eigene Artikel und Haken erhalten
+bleiben. Beendet sich mit Exit-Code 1 bei Abweichung.
+
+Aufruf:  python benchmarks/bench_incremental_list.py [--sizes 10 100 1000]
+"""
+import argparse
+import sys
+import time
+
+from common import load_app, seed_user
+from models import POSITION_STEP
+from shopping_list_builder import recipe_rows
+
+
+def generated_items(server, list_id):
+    items = server.ShoppingListItem.query.filter_by(shopping_list_id=list_id).all()
+    return sorted(
+        (i.ingredient_id, i.unit or '', None if i.amount is None else round(i.amount, 4))
+        for i in items if i.custom_name is None
+    )
+
+
+def expected_items(server, user_id, recipe_ids):
+    lines = server.shopping_list_builder.aggregate(user_id, recipe_ids)
+    return sorted(
+        (l['ingredient_id'], l['unit'] or '', None if l['amount'] is None else round(l['amount'], 4))
+        for l in lines
+    )
+
+
+def edit_recipe(server, user_id, recipe):
+    """ Wie die Route edit_recipe: eine Menge ändern, eine Zutat tauschen. """
+    old_rows = recipe_rows(recipe)
+    rows = [(ri.ingredient_id, ri.amount, ri.unit) for ri in recipe.recipe_ingredients]
+    rows[0] = (rows[0][0], (rows[0][1] or 0) + 250, 'g')
+    rows[-1] = (rows[1][0], 3, 'Stk')
+    recipe.recipe_ingredients.clear()
+    server.db.session.flush()
+    for position, (ingredient_id, amount, unit) in enumerate(rows):
+        server.db.session.add(server.RecipeIngredient(
+            recipe=recipe, ingredient_id=ingredient_id, amount=amount, unit=unit,
+            position=position * POSITION_STEP
+        ))
+    server.db.session.flush()
+    server.shopping_list_builder.recipe_changed(
+        user_id, recipe.id, old_rows, recipe_rows(recipe)
+    )
+    server.db.session.commit()
+
+
+def add_stock(server, user_id, ingredient_id):
+    """ Wie die Route add_inventory. """
+    name = server.db.session.get(server.Ingredient, ingredient_id).name
+    server.inventory.purchase(user_id, [{'name': name, 'amount': 100.0, 'unit': 'g'}])
+    server.db.session.commit()
+
+
+def run(server, n_recipes):
+    db = server.db
+    failures = []
+    user_id, recipe_ids = seed_user(server, f'inc{n_recipes}', n_recipes=n_recipes,
+                                    n_household=30)
+    with server.app.test_request_context():
+        list_id, _ = server.shopping_list_builder.build(user_id, recipe_ids)
+
+        # Eigener Artikel und ein Haken, die erhalten bleiben müssen
+        db.session.add(server.ShoppingListItem(shopping_list_id=list_id,
+                                               custom_name='Spülmittel', purchased=False))
+        ticked = server.ShoppingListItem.query.filter(
+            server.ShoppingListItem.shopping_list_id == list_id,
+            server.ShoppingListItem.custom_name.is_(None),
+        ).order_by(server.ShoppingListItem.id.desc()).first()
+        ticked.purchased = True
+        db.session.commit()
+        ticked_id = ticked.id
+
+        recipe = db.session.get(server.Recipe, recipe_ids[len(recipe_ids) // 2])
+        with server.query_counter.count() as edit_statements:
+            start = time.perf_counter()
+            edit_recipe(server, user_id, recipe)
+            edit_ms = (time.perf_counter() - start) * 1000
+
+        ingredient_id = recipe.recipe_ingredients[0].ingredient_id
+        with server.query_counter.count() as stock_statements:
+            start = time.perf_counter()
+            add_stock(server, user_id, ingredient_id)
+            stock_ms = (time.perf_counter() - start) * 1000
+
+        delete_id = recipe_ids[0]
+        with server.query_counter.count() as delete_statements:
+            start = time.perf_counter()
+            doomed = db.session.get(server.Recipe, delete_id)
+            server.shopping_list_builder.recipe_changed(user_id, delete_id,
+                                                        recipe_rows(doomed))
+            db.session.delete(doomed)
+            db.session.commit()
+            delete_ms = (time.perf_counter() - start) * 1000
+
+        if generated_items(server, list_id) != expected_items(server, user_id, recipe_ids[1:]):
+            failures.append('Liste weicht vom Neuaufbau ab')
+        if not server.ShoppingListItem.query.filter_by(shopping_list_id=list_id,
+                                                       custom_name='Spülmittel').count():
+            failures.append('eigener Artikel fehlt')
+        ticked = db.session.get(server.ShoppingListItem, ticked_id)
+        if ticked is not None and not ticked.purchased:
+            failures.append('Haken verloren')
+
+    return {
+        'edit': (len(edit_statements), edit_ms),
+        'stock': (len(stock_statements), stock_ms),
+        'delete': (len(delete_statements), delete_ms),
+        'failures': failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    server = load_app()
+    failed = False
+    print(f"{'Rezepte':>8} {'Rezept ändern':>18} {'Bestand +1':>18} {'Rezept löschen':>18}")
+    for n in args.sizes:
+        result = run(server, n)
+        cells = [f"{result[k][0]:>3} St. {result[k][1]:>7.2f} ms" for k in ('edit', 'stock', 'delete')]
+        print(f"{n:>8} " + ' '.join(f"{c:>18}" for c in cells))
+        for failure in result['failures']:
+            failed = True
+            print(f"         FEHLER: {failure}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
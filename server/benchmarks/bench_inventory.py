@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# bench_inventory.py
+"""
+Bestand mit Bewegungsbuch (inventory.py) bei wachsender Historie.
+
+Je Größe kauft ein neuer User --ingredients Zutaten --history mal über die
+API (gemischte Einheiten g/kg) und verbraucht jedes zweite Mal einen Teil.
+Danach werden /inventory und /api/v1/inventory ungecacht abgerufen
+(Statements aus X-Query-Count und Zeit) und die Zeilen im Bestand gezählt.
+Zum Schluss übernimmt "Gekauftes in den Bestand" alle abgehakten Artikel
+einer Einkaufsliste aus wenigen bzw. vielen Rezepten.
+
+Beendet sich mit Exit-Code 1, wenn der Bestand mehr als eine Zeile je
+Zutat hat, die Mengen nicht zum Buch passen oder die Zahl der Statements
+mit der Historie bzw. der Liste wächst.
+
+Aufruf:  python benchmarks/bench_inventory.py [--ingredients 50] [--history 1 10 100]
+"""
+import argparse
+import sys
+import time
+
+from sqlalchemy import func, select
+
+from common import load_app, seed_user
+
+
+def login(server, user_id):
+    client = server.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def timed_get(client, url):
+    start = time.perf_counter()
+    response = client.get(url)
+    elapsed = (time.perf_counter() - start) * 1000
+    if response.status_code != 200:
+        raise SystemExit(f"{url} lieferte Status {response.status_code}")
+    return int(response.headers['X-Query-Count']), elapsed
+
+
+def fill(client, names, rounds):
+    """ rounds Käufe je Zutat, jeder zweite Durchgang verbraucht 100 g. """
+    for i in range(rounds):
+        response = client.post('/api/v1/inventory/batch', json={'operations': [
+            {'op': 'add', 'name': name, 'amount': 1 if i % 3 else 500,
+             'unit': 'kg' if i % 3 else 'g'}
+            for name in names
+        ]})
+        if response.status_code != 200:
+            raise SystemExit(f"Kauf lieferte Status {response.status_code}")
+        if i % 2:
+            items = client.get('/api/v1/inventory').get_json()['items']
+            response = client.post('/api/v1/inventory/batch', json={'operations': [
+                {'op': 'consume', 'id': item['id'], 'amount': 100, 'unit': 'g'}
+                for item in items
+            ]})
+            if response.status_code != 200:
+                raise SystemExit(f"Verbrauch lieferte Status {response.status_code}")
+
+
+def check_ledger(server, user_id):
+    """ Bestand je Zutat und Dimension muss der Summe des Buchs entsprechen. """
+    with server.app.app_context():
+        session = server.db.session
+        Item, Movement = server.HouseholdItem, server.HouseholdMovement
+        stock = {(r.ingredient_id, r.dimension): r.amount for r in session.execute(
+            select(Item.ingredient_id, Item.dimension, Item.amount).where(Item.user_id == user_id))}
+        ledger = {(r.ingredient_id, r.dimension): r.total for r in session.execute(
+            select(Movement.ingredient_id, Movement.dimension,
+                   func.sum(Movement.amount).label('total'))
+            .where(Movement.user_id == user_id)
+            .group_by(Movement.ingredient_id, Movement.dimension))}
+        movements = session.scalar(select(func.count()).where(Movement.user_id == user_id))
+    wrong = [key for key in set(stock) | set(ledger)
+             if abs((stock.get(key) or 0.0) - (ledger.get(key) or 0.0)) > 1e-6]
+    return len(stock), movements, wrong
+
+
+def stock_purchased(server, n_recipes):
+    """ Statements und Zeit für "Gekauftes in den Bestand" mit allen Artikeln abgehakt. """
+    user_id, recipe_ids = seed_user(server, f'liste{n_recipes}', n_recipes=n_recipes,
+                                    n_household=0)
+    with server.app.app_context():
+        list_id, _ = server.shopping_list_builder.build(user_id, recipe_ids)
+        server.db.session.execute(server.db.update(server.ShoppingListItem)
+                                  .where(server.ShoppingListItem.shopping_list_id == list_id)
+                                  .values(purchased=True))
+        server.db.session.commit()
+    client = login(server, user_id)
+    start = time.perf_counter()
+    response = client.post('/api/v1/shopping-list/stock-purchased')
+    elapsed = (time.perf_counter() - start) * 1000
+    with server.app.app_context():
+        left = server.db.session.scalar(
+            select(func.count()).where(server.ShoppingListItem.shopping_list_id == list_id,
+                                       server.ShoppingListItem.ingredient_id.isnot(None)))
+    return (response.get_json()['stocked'], int(response.headers['X-Query-Count']),
+            elapsed, left)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ingredients', type=int, default=50)
+    parser.add_argument('--history', type=int, nargs='+', default=[1, 10, 100])
+    args = parser.parse_args()
+
+    server = load_app()
+    server.app.testing = True
+    names = [f'Vorrat {i}' for i in range(args.ingredients)]
+
+    failures = []
+    counts = {'/inventory': set(), '/api/v1/inventory': set()}
+    print(f"{'Käufe':>6} {'Buch':>7} {'Zeilen':>7} {'/inventory':>20} {'/api/v1/inventory':>20}")
+    for rounds in args.history:
+        user_id, _ = seed_user(server, f'vorrat{rounds}', n_recipes=1, n_household=0)
+        client = login(server, user_id)
+        fill(client, names, rounds)
+        page = timed_get(client, '/inventory')
+        api = timed_get(client, '/api/v1/inventory')
+        counts['/inventory'].add(page[0])
+        counts['/api/v1/inventory'].add(api[0])
+        rows, movements, wrong = check_ledger(server, user_id)
+        print(f"{rounds:>6} {movements:>7} {rows:>7} {page[0]:>7} St. {page[1]:>7.1f} ms "
+              f"{api[0]:>7} St. {api[1]:>7.1f} ms")
+        if rows != args.ingredients:
+            failures.append(f"{rounds} Käufe: {rows} Zeilen statt {args.ingredients}")
+        if wrong:
+            failures.append(f"{rounds} Käufe: {len(wrong)} Zutaten passen nicht zum Buch")
+
+    print(f"\n{'Rezepte':>7} {'Artikel':>8} {'Statements':>11} {'Zeit':>10}")
+    restock = set()
+    for n_recipes in (5, 100):
+        stocked, statements, elapsed, left = stock_purchased(server, n_recipes)
+        restock.add(statements)
+        print(f"{n_recipes:>7} {stocked:>8} {statements:>11} {elapsed:>7.1f} ms")
+        if left:
+            failures.append(f"{n_recipes} Rezepte: {left} gekaufte Artikel noch auf der Liste")
+
+    for name, values in dict(counts, **{'stock-purchased': restock}).items():
+        if len(values) > 1:
+            failures.append(f"{name}: Statements wachsen ({sorted(values)})")
+    for failure in failures:
+        print(f"FEHLER: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
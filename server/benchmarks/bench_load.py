@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+# bench_load.py
+"""
+Lasttest über den vollen Request-Pfad, mit Vergleich gegen eine Baseline.
+
+Legt eine frische SQLite-Datenbank an (--users User mit je --recipes
+Rezepten aus --ingredients Zutaten und --inventory Bestandsartikeln) und
+ruft die echten Routen auf: login, create_recipe, select_recipes,
+shopping_list, inventory und my_recipes, jede --requests mal verteilt
+auf --concurrency Threads. Die User melden sich vorher über /login an
+(mit CSRF-Token, wo das Formular eines verlangt).
+
+Zwei Modi, jeweils mit eigener, gleich gefüllter Datenbank:
+  client  Flask-Test-Client im Benchmark-Prozess (ohne HTTP)
+  uwsgi   lokaler uWSGI (--workers x --threads, vorgeladen wie im
+          Deployment, siehe docker-compose.yml), angesprochen über HTTP
+
+Je Modus und Route: Durchsatz, Latenz (p50/p95/p99/max), SQL-Statements je
+Request (Header X-Query-Count), Anteil Render-Cache-Treffer und Fehler.
+Dazu der Spitzenwert des Speichers: im Modus client der des Prozesses
+während der Läufe, bei uWSGI die Summe von Master und Workern.
+
+Login-Limits und bcrypt-Work-Faktor werden für den Lauf gelockert, damit
+der Durchsatz der Routen gemessen wird und nicht die Drosselung.
+
+Ausgabe als Tabelle und mit --output als JSON ("-" für stdout, die Tabelle
+geht dann nach stderr). Mit einer Baseline (Standard: baseline.json neben
+diesem Skript, gleiche Größen vorausgesetzt) endet der Lauf mit Exit-Code 1,
+wenn eine Route mehr SQL-Statements braucht, Fehler liefert, ihr p50, p95
+bzw. Durchsatz um mehr als --tolerance (p95: --tail-tolerance) schlechter
+ist oder der Speicher um mehr als --memory-tolerance wächst. Zeiten hängen
+an der Maschine: die Baseline auf der eigenen Maschine mit --save-baseline
+neu schreiben.
+
+Aufruf:  python benchmarks/bench_load.py [--mode client|uwsgi|both] [--requests 200]
+         [--output ergebnis.json] [--baseline PFAD | --no-baseline] [--save-baseline]
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+import bcrypt as bcrypt_lib
+
+from common import PROJECT_DIR, load_app, seed_user
+
+PASSWORD = 'geheim123'
+ROUTES = ('login', 'create_recipe', 'select_recipes', 'shopping_list', 'inventory',
+          'my_recipes')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Für den Lauf gelockert: gemessen werden die Routen, nicht die Drosselung
+LOAD_CONFIG = {
+    'bcrypt_rounds': 4,
+    'login_rate_ip_per_minute': 10 ** 6,
+    'login_rate_ip_burst': 10 ** 6,
+    'login_rate_user_per_minute': 10 ** 6,
+    'login_rate_user_burst': 10 ** 6,
+}
+
+_CSRF_PATTERN = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+
+Response = namedtuple('Response', ['status', 'headers', 'body'])
+VirtualUser = namedtuple('VirtualUser', ['name', 'user_id', 'recipe_ids'])
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+# --------------------------------
+# Sessions: Test-Client und HTTP
+# --------------------------------
+class ClientSession:
+    """ Ein Browser über den Flask-Test-Client. """
+    def __init__(self, app):
+        self.client = app.test_client()
+        self.csrf_token = None
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        return Response(response.status_code, response.headers, response.get_data())
+
+
+class HttpSession:
+    """ Ein Browser über HTTP, mit eigenen Cookies und ohne Weiterleitungen zu folgen. """
+    def __init__(self, port):
+        self.port = port
+        self.cookies = {}
+        self.csrf_token = None
+
+    def request(self, method, path, data=None):
+        headers = {'Connection': 'close'}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        body = None
+        if data is not None:
+            body = urlencode(data, doseq=True)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            payload = response.read()
+        finally:
+            connection.close()
+        for header in response.headers.get_all('Set-Cookie') or ():
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        return Response(response.status, response.headers, payload)
+
+
+def log_in(session, user):
+    """ Meldet den User an wie ein Browser: Formular holen, dann absenden. """
+    session.csrf_token = csrf_token(session)
+    response = session.request('POST', '/login', login_form(session, user))
+    if response.status != 302:
+        raise SystemExit(f"Login von {user.name} lieferte Status {response.status}")
+
+
+def csrf_token(session):
+    match = _CSRF_PATTERN.search(session.request('GET', '/login').body.decode('utf-8'))
+    return match.group(1) if match else None
+
+
+def login_form(session, user):
+    data = {'username': user.name, 'password': PASSWORD}
+    if session.csrf_token:
+        data['csrf_token'] = session.csrf_token
+    return data
+
+
+# --------------------------------
+# Seeding
+# --------------------------------
+def seed(args):
+    """ Frische Datenbank mit args.users Usern; gibt (server, users) zurück. """
+    server = load_app(extra_config=dict(LOAD_CONFIG, bcrypt_max_pending=args.concurrency))
+    server.app.testing = True
+    users = []
+    for i in range(args.users):
+        name = f'last{i}'
+        user_id, recipe_ids = seed_user(server, name, n_recipes=args.recipes,
+                                        n_ingredients=args.ingredients,
+                                        n_household=args.inventory, seed=i)
+        users.append(VirtualUser(name, user_id, recipe_ids))
+    hashed = bcrypt_lib.hashpw(PASSWORD.encode(),
+                               bcrypt_lib.gensalt(LOAD_CONFIG['bcrypt_rounds'])).decode()
+    with server.app.app_context():
+        server.db.session.execute(server.db.update(server.User).values(password=hashed))
+        server.db.session.commit()
+        server.db.session.remove()
+        for engine in server.db.engines.values():
+            engine.dispose()
+    return server, users
+
+
+# --------------------------------
+# Last
+# --------------------------------
+def make_request(route, session, user, rnd, n_ingredients):
+    """ (Methode, Pfad, Formular, erwarteter Status) für einen Aufruf der Route. """
+    if route == 'login':
+        return 'POST', '/login', login_form(session, user), 302
+    if route == 'create_recipe':
+        names = [f'Zutat {rnd.randrange(n_ingredients)}' for _ in range(8)]
+        return 'POST', '/create-recipe', {
+            'title': f'Last {rnd.randrange(10 ** 6)}',
+            'instructions': 'Kochen.',
+            'ingredient_name[]': names,
+            'ingredient_amount[]': [str(rnd.randint(1, 500)) for _ in names],
+            'ingredient_unit[]': [rnd.choice(['g', 'ml', 'Stk']) for _ in names],
+        }, 302
+    if route == 'select_recipes':
+        picked = rnd.sample(user.recipe_ids, min(10, len(user.recipe_ids)))
+        return 'POST', '/select_recipes', {'recipe_ids[]': [str(r) for r in picked]}, 302
+    path = {'shopping_list': '/shopping-list', 'inventory': '/inventory',
+            'my_recipes': '/my-recipes'}[route]
+    return 'GET', path, None, 200
+
+
+def run_route(route, lanes, requests, n_ingredients):
+    """
+    requests Aufrufe der Route, verteilt auf die Lanes (je Thread eine Liste
+    von (Session, User)). Gibt die Messwerte als Dict zurück.
+    """
+    samples, lock = [], threading.Lock()
+    barrier = threading.Barrier(len(lanes) + 1)
+
+    def lane(index, sessions):
+        rnd = random.Random(f'{route}-{index}')
+        local = []
+        barrier.wait()
+        for i in range(index, requests, len(lanes)):
+            session, user = sessions[i // len(lanes) % len(sessions)]
+            method, path, data, expected = make_request(route, session, user, rnd,
+                                                        n_ingredients)
+            start = time.perf_counter()
+            try:
+                response = session.request(method, path, data)
+            except Exception:  # Verbindungsfehler zählen wie Fehlerstatus
+                local.append(((time.perf_counter() - start) * 1000, False, None, None))
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+            count = response.headers.get('X-Query-Count')
+            local.append((elapsed, response.status == expected,
+                          int(count) if count is not None else None,
+                          response.headers.get('X-Render-Cache')))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=lane, args=(i, sessions))
+               for i, sessions in enumerate(lanes)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies = [s[0] for s in samples]
+    counts = [s[2] for s in samples if s[2] is not None]
+    cached = [s[3] for s in samples if s[3] is not None]
+    ok = sum(1 for s in samples if s[1])
+    return {
+        'requests': len(samples),
+        'errors': len(samples) - ok,
+        'throughput_rps': round(ok / wall, 1) if wall else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'max': round(max(latencies), 2),
+        },
+        'sql': {
+            'median': percentile(counts, 50) if counts else None,
+            'max': max(counts) if counts else None,
+        },
+        'render_cache_hits': (round(sum(c != 'miss' for c in cached) / len(cached), 3)
+                              if cached else None),
+    }
+
+
+def lanes_for(users, concurrency, new_session, anonymous=False):
+    """
+    Je Thread eine Liste von (Session, User), angemeldet außer bei anonymous
+    (für die Login-Route: nur das CSRF-Token wird geholt).
+    """
+    lanes = []
+    for index in range(concurrency):
+        assigned = users[index::concurrency] or [users[index % len(users)]]
+        sessions = []
+        for user in assigned:
+            session = new_session()
+            if anonymous:
+                session.csrf_token = csrf_token(session)
+            else:
+                log_in(session, user)
+            sessions.append((session, user))
+        lanes.append(sessions)
+    return lanes
+
+
+def run_routes(args, users, new_session):
+    logged_in = lanes_for(users, args.concurrency, new_session)
+    anonymous = lanes_for(users, args.concurrency, new_session, anonymous=True)
+    return {
+        route: run_route(route, anonymous if route == 'login' else logged_in,
+                         args.requests, args.ingredients)
+        for route in ROUTES
+    }
+
+
+# --------------------------------
+# Speicher
+# --------------------------------
+def peak_rss_mb(pid='self'):
+    """ Höchster RSS des Prozesses (VmHWM) in MiB oder None. """
+    try:
+        with open(f'/proc/{pid}/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if pid == 'self':
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return None
+
+
+def reset_peak_rss():
+    """ Setzt VmHWM zurück (Linux), damit das Seeding nicht mitzählt. """
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', encoding='ascii') as f:
+                # Feld 4 ist die Eltern-PID, der Name in Feld 2 kann Leerzeichen enthalten
+                if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                    children.append(int(entry))
+        except (OSError, ValueError, IndexError):
+            continue
+    return children
+
+
+# --------------------------------
+# Modi
+# --------------------------------
+def run_client(args):
+    server, users = seed(args)
+    reset_peak_rss()
+    routes = run_routes(args, users, lambda: ClientSession(server.app))
+    return {'routes': routes, 'peak_rss_mb': round(peak_rss_mb(), 1)}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_uwsgi(binary, workdir, port, workers, threads, options=()):
+    command = [
+        binary, '--master', '--http-socket', f'127.0.0.1:{port}', '--enable-threads',
+        '--pythonpath', PROJECT_DIR, '-w', 'wsgi:app', '--need-app',
+        '--workers', str(workers), '--threads', str(threads),
+        '--die-on-term', '--disable-logging', '--logto', os.path.join(workdir, 'uwsgi.log'),
+        *options,
+    ]
+    process = subprocess.Popen(command, cwd=workdir)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"uWSGI beendet mit Code {process.returncode}, "
+                             f"siehe {os.path.join(workdir, 'uwsgi.log')}")
+        try:
+            if HttpSession(port).request('GET', '/login').status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise SystemExit("uWSGI antwortet nicht")
+
+
+def run_uwsgi(args, binary):
+    server, users = seed(args)
+    workdir = os.getcwd()  # load_app wechselt in das Verzeichnis mit config/
+    port = free_port()
+    process = start_uwsgi(binary, workdir, port, args.workers, args.threads)
+    try:
+        routes = run_routes(args, users, lambda: HttpSession(port))
+        pids = [process.pid] + child_pids(process.pid)
+        peaks = [peak_rss_mb(pid) for pid in pids]
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return {
+        'routes': routes,
+        'peak_rss_mb': round(sum(p for p in peaks if p is not None), 1),
+        'processes': len(pids),
+    }
+
+
+# --------------------------------
+# Baseline
+# --------------------------------
+def compare(report, baseline, tolerance, tail_tolerance, memory_tolerance, slack_ms):
+    """ Gibt die Regressionen gegenüber der Baseline als Textzeilen zurück. """
+    problems = []
+    for mode, run in report['runs'].items():
+        for route, current in run['routes'].items():
+            if current['errors']:
+                problems.append(f"{mode}/{route}: {current['errors']} fehlerhafte Requests")
+        before_run = baseline['runs'].get(mode)
+        if before_run is None:
+            continue
+        for route, current in run['routes'].items():
+            before = before_run['routes'].get(route)
+            if before is None:
+                continue
+            sql, sql_before = current['sql']['max'], before['sql']['max']
+            if sql is not None and sql_before is not None and sql > sql_before:
+                problems.append(f"{mode}/{route}: bis zu {sql} SQL-Statements statt "
+                                f"{sql_before}")
+            for key, allowed in (('p50', tolerance), ('p95', tail_tolerance)):
+                now, then = current['latency_ms'][key], before['latency_ms'][key]
+                if now > then * (1 + allowed) + slack_ms:
+                    problems.append(f"{mode}/{route}: {key} {now:.1f} ms statt {then:.1f} ms")
+            rps, rps_before = current['throughput_rps'], before['throughput_rps']
+            if rps < rps_before * (1 - tolerance):
+                problems.append(f"{mode}/{route}: {rps:.1f} Requests/s statt {rps_before:.1f}")
+        peak, peak_before = run['peak_rss_mb'], before_run['peak_rss_mb']
+        if peak and peak_before and peak > peak_before * (1 + memory_tolerance):
+            problems.append(f"{mode}: Speicher {peak:.0f} MiB statt {peak_before:.0f} MiB")
+    return problems
+
+
+def print_report(report, out):
+    for mode, run in report['runs'].items():
+        print(f"\n[{mode}] Spitze {run['peak_rss_mb']:.0f} MiB", file=out)
+        print(f"{'Route':<16} {'Req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'SQL':>7} "
+              f"{'Cache':>6} {'Fehler':>7}", file=out)
+        for route, r in run['routes'].items():
+            latency = r['latency_ms']
+            sql = f"{r['sql']['median']}/{r['sql']['max']}" if r['sql']['max'] is not None \
+                else '-'
+            cache = f"{r['render_cache_hits']:.0%}" if r['render_cache_hits'] is not None \
+                else '-'
+            print(f"{route:<16} {r['throughput_rps']:>8.1f} {latency['p50']:>8.2f} "
+                  f"{latency['p95']:>8.2f} {latency['p99']:>8.2f} {sql:>7} {cache:>6} "
+                  f"{r['errors']:>7}", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', choices=('client', 'uwsgi', 'both'), default='both')
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--recipes', type=int, default=200, help="je User")
+    parser.add_argument('--ingredients', type=int, default=500)
+    parser.add_argument('--inventory', type=int, default=30, help="Bestandsartikel je User")
+    parser.add_argument('--requests', type=int, default=200, help="je Route")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=2, help="uWSGI-Worker")
+    parser.add_argument('--threads', type=int, default=2, help="Threads je uWSGI-Worker")
+    parser.add_argument('--uwsgi', default=shutil.which('uwsgi'), help="Pfad zu uwsgi")
+    parser.add_argument('-o', '--output', help="JSON-Datei, '-' für stdout")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--no-baseline', action='store_true')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Ergebnis als neue Baseline speichern statt zu vergleichen")
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="erlaubte Verschlechterung von p50 und Durchsatz (0.5 = 50%%)")
+    parser.add_argument('--tail-tolerance', type=float, default=1.5,
+                        help="erlaubte Verschlechterung von p95 (streut stärker)")
+    parser.add_argument('--memory-tolerance', type=float, default=0.25)
+    parser.add_argument('--slack-ms', type=float, default=5.0,
+                        help="zusätzlich erlaubte ms auf p95 (Rauschen bei kurzen Requests)")
+    args = parser.parse_args()
+    out = sys.stderr if args.output == '-' else sys.stdout
+
+    config = {k: getattr(args, k) for k in ('users', 'recipes', 'ingredients', 'inventory',
+                                            'requests', 'concurrency', 'workers', 'threads')}
+    report = {
+        'config': config,
+        'environment': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'runs': {},
+    }
+    skipped = []
+    if args.mode in ('client', 'both'):
+        report['runs']['client'] = run_client(args)
+    if args.mode in ('uwsgi', 'both'):
+        if args.uwsgi:
+            report['runs']['uwsgi'] = run_uwsgi(args, args.uwsgi)
+        else:
+            skipped.append("uwsgi (nicht installiert)")
+    print_report(report, out)
+    for mode in skipped:
+        print(f"\nÜbersprungen: {mode}", file=out)
+
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"\nBaseline gespeichert: {args.baseline}", file=out)
+        return
+    baseline = {'runs': {}}
+    if not args.no_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['config'] != config:
+            print(f"\nBaseline {args.baseline} hat andere Größen, Vergleich übersprungen.",
+                  file=out)
+            baseline = {'runs': {}}
+    problems = compare(report, baseline, args.tolerance, args.tail_tolerance,
+                       args.memory_tolerance, args.slack_ms)
+    for problem in problems:
+        print(f"FEHLER: {problem}", file=out)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# bench_login_latency.py
+"""
+Login-Latenz mit dem asynchronen Audit-Log (audit_log.py): misst POST /login
+einmal ohne und einmal mit einem zweiten Schreiber, der die SQLite-Datei
+immer wieder für --hold-ms sperrt. Zum Vergleich läuft unter derselben Last
+der frühere synchrone Schritt (last_login setzen und committen).
+
+Unter Last liegt zwischen zwei Messungen eine zufällige Pause, damit die
+Requests gleichmäßig über gesperrte und freie Phasen verteilt sind. Die
+Passwort-Hashes haben nur 4 bcrypt-Runden, damit bcrypt die Messung nicht
+überdeckt. Am Ende wird geprüft, dass jedes Login im Log steht und
+last_login/ip_address gespeichert sind. Exit-Code 1 bei fehlenden Daten.
+
+Aufruf:  python benchmarks/bench_login_latency.py [--logins 100] [--hold-ms 200]
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+import bcrypt as bcrypt_lib
+from sqlalchemy import text
+
+from common import load_app
+
+PASSWORD = 'geheim123'
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+class LockHolder(threading.Thread):
+    """ Zweiter Schreiber: hält immer wieder eine Schreibtransaktion offen. """
+    def __init__(self, path, hold_ms):
+        super().__init__(daemon=True)
+        self.path = path
+        self.hold = hold_ms / 1000
+        self.stop = threading.Event()
+
+    def run(self):
+        connection = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+        while not self.stop.is_set():
+            connection.execute("BEGIN IMMEDIATE")
+            time.sleep(self.hold)
+            connection.execute("COMMIT")
+            time.sleep(self.hold / 4)
+        connection.close()
+
+
+def seed_users(server, n):
+    hashed = bcrypt_lib.hashpw(PASSWORD.encode(), bcrypt_lib.gensalt(4)).decode()
+    with server.app.app_context():
+        server.db.session.execute(server.db.insert(server.User), [
+            {'username': f'login{i}', 'password': hashed} for i in range(n)
+        ])
+        server.db.session.commit()
+        return [u.id for u in server.User.query.filter(server.User.username.like('login%'))]
+
+
+def measure_logins(server, n, users, pause=0):
+    samples = []
+    for i in range(n):
+        time.sleep(random.uniform(0, pause))
+        client = server.app.test_client()
+        start = time.perf_counter()
+        response = client.post('/login', data={'username': f'login{i % users}',
+                                               'password': PASSWORD},
+                               environ_base={'REMOTE_ADDR': f'10.0.0.{i % users}'})
+        samples.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 302:
+            raise SystemExit(f"Login fehlgeschlagen: {response.status_code}")
+    return samples
+
+
+def measure_sync_update(server, n, user_ids, pause=0):
+    """ Der alte Weg: last_login im Request setzen und committen. """
+    samples = []
+    with server.app.app_context():
+        engine = server.db.engine
+        for i in range(n):
+            time.sleep(random.uniform(0, pause))
+            start = time.perf_counter()
+            with engine.begin() as connection:
+                connection.execute(text('UPDATE "user" SET last_login = :now WHERE id = :id'), {
+                    'now': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'id': user_ids[i % len(user_ids)],
+                })
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    print(f"{label:<34} {percentile(samples, 50):>8.2f} {percentile(samples, 99):>8.2f} "
+          f"{max(samples):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--hold-ms', type=float, default=200)
+    args = parser.parse_args()
+
+    server = load_app(extra_config={
+        'audit_flush_interval': 0.2,
+        'bcrypt_rounds': 4,
+        'login_rate_ip_per_minute': 0,
+        'login_rate_user_per_minute': 0,
+    })
+    user_ids = seed_users(server, args.users)
+    with server.app.app_context():
+        db_path = server.db.engine.url.database
+
+    print(f"{'Messung':<34} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    report('Login', measure_logins(server, args.logins, args.users))
+    pause = args.hold_ms / 1000 * 1.25
+    holder = LockHolder(db_path, args.hold_ms)
+    holder.start()
+    try:
+        report(f'Login, DB {args.hold_ms:.0f} ms gesperrt',
+               measure_logins(server, args.logins, args.users, pause))
+        report('alter Weg: UPDATE+Commit, gesperrt',
+               measure_sync_update(server, args.logins, user_ids, pause))
+    finally:
+        holder.stop.set()
+        holder.join()
+
+    server.audit_log.flush(timeout=30)
+    failures = []
+    logins = 0
+    for path in glob.glob(os.path.join('logs', 'audit-*.jsonl')):
+        with open(path, encoding='utf-8') as f:
+            logins += sum(1 for line in f if json.loads(line)['kind'] == 'login')
+    if logins != 2 * args.logins:
+        failures.append(f"{logins} von {2 * args.logins} Logins im Audit-Log")
+    with server.app.app_context():
+        missing = server.User.query.filter(server.User.id.in_(user_ids),
+                                           server.User.ip_address.is_(None)).count()
+    if missing:
+        failures.append(f"{missing} User ohne ip_address")
+    print(f"\nAudit-Log: {server.audit_log.stats()}")
+    for failure in failures:
+        print(f"FEHLER: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# bench_login_throughput.py
+"""
+Logins unter Last mit dem bcrypt-Pool (password_hasher.py).
+
+Simuliert einen uWSGI-Worker mit --threads 2: ein Pool aus zwei Threads
+arbeitet Requests in Ankunftsreihenfolge ab. Eine Welle von Logins mit
+falschem Passwort (Credential Stuffing, viele IPs) trifft auf normalen
+Verkehr (GET /my-recipes). Gemessen werden Logins pro Sekunde, abgewiesene
+Logins (503) und die Latenz der Rezeptseite ab Ankunft, einmal ohne
+Obergrenze (wie früher, bcrypt direkt im Request-Thread) und einmal mit
+bcrypt_max_pending = 1.
+
+Danach wird geprüft, dass die Rate-Begrenzung je IP greift (429) und dass
+ein Login mit altem Work-Faktor den Hash neu speichert. Exit-Code 1, wenn
+eine Prüfung fehlschlägt oder die Rezeptseite mit Obergrenze nicht
+schneller ist.
+
+Aufruf:  python benchmarks/bench_login_throughput.py [--seconds 5] [--rounds 10]
+"""
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt as bcrypt_lib
+
+from common import load_app, seed_user
+from rate_limit import TokenBuckets
+
+PASSWORD = 'geheim123'
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def seed_login_users(server, n, rounds):
+    hashed = bcrypt_lib.hashpw(PASSWORD.encode(), bcrypt_lib.gensalt(rounds)).decode()
+    with server.app.app_context():
+        server.db.session.execute(server.db.insert(server.User), [
+            {'username': f'opfer{i}', 'password': hashed} for i in range(n)
+        ])
+        server.db.session.commit()
+
+
+def recipe_client(server, user_id):
+    client = server.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def run_load(server, user_id, seconds, login_rate, page_rate, users):
+    """ Gibt (Logins/s, abgewiesen, Rezept-Latenzen in ms) zurück. """
+    worker = ThreadPoolExecutor(max_workers=2)
+    local = threading.local()
+    statuses = []
+    page_samples = []
+    lock = threading.Lock()
+
+    def do_login(i):
+        client = server.app.test_client()
+        response = client.post('/login', data={'username': f'opfer{i % users}',
+                                               'password': 'falsch123'},
+                               environ_base={'REMOTE_ADDR': f'10.1.{i // 250}.{i % 250}'})
+        with lock:
+            statuses.append(response.status_code)
+
+    def do_page(arrived):
+        if not hasattr(local, 'client'):
+            local.client = recipe_client(server, user_id)
+        local.client.get('/my-recipes')
+        with lock:
+            page_samples.append((time.perf_counter() - arrived) * 1000)
+
+    start = time.perf_counter()
+    next_login = next_page = start
+    i = 0
+    while time.perf_counter() - start < seconds:
+        now = time.perf_counter()
+        if now >= next_login:
+            worker.submit(do_login, i)
+            i += 1
+            next_login += 1 / login_rate
+        if now >= next_page:
+            worker.submit(do_page, now)
+            next_page += 1 / page_rate
+        time.sleep(0.001)
+    worker.shutdown(wait=True)
+    elapsed = time.perf_counter() - start
+    handled = sum(1 for status in statuses if status == 200)
+    rejected = sum(1 for status in statuses if status == 503)
+    return handled / elapsed, rejected, page_samples
+
+
+def check_throttle(server):
+    # Eigene Buckets mit den Standardwerten, die Lastmessung lief ohne Begrenzung
+    server.login_throttle.by_ip = TokenBuckets(30, 10)
+    client = server.app.test_client()
+    statuses = [client.post('/login', data={'username': 'opfer0', 'password': 'falsch123'},
+                            environ_base={'REMOTE_ADDR': '10.9.9.9'}).status_code
+                for _ in range(12)]
+    if statuses[:10] != [200] * 10 or statuses[10:] != [429, 429]:
+        return [f"Rate-Begrenzung je IP: {statuses}"]
+    return []
+
+
+def check_rehash(server, rounds):
+    failures = []
+    hasher = server.password_hasher
+    hasher.max_pending = 1
+    old_rounds, hasher.rounds = hasher.rounds, rounds + 1
+    try:
+        client = server.app.test_client()
+        response = client.post('/login', data={'username': 'opfer1', 'password': PASSWORD},
+                               environ_base={'REMOTE_ADDR': '10.9.9.10'})
+        if response.status_code != 302:
+            failures.append(f"Login mit altem Hash: Status {response.status_code}")
+        with server.app.app_context():
+            stored = server.User.query.filter_by(username='opfer1').one().password
+        if stored.split('$')[2] != f"{rounds + 1:02d}":
+            failures.append(f"Hash nicht neu gespeichert: {stored[:7]}")
+        elif not bcrypt_lib.checkpw(PASSWORD.encode(), stored.encode()):
+            failures.append("neuer Hash passt nicht zum Passwort")
+    finally:
+        hasher.rounds = old_rounds
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--login-rate', type=float, default=20, help="Logins pro Sekunde")
+    parser.add_argument('--page-rate', type=float, default=20, help="Rezeptseiten pro Sekunde")
+    parser.add_argument('--users', type=int, default=50)
+    args = parser.parse_args()
+
+    server = load_app(extra_config={
+        'bcrypt_rounds': args.rounds,
+        'login_rate_ip_per_minute': 0,
+        'login_rate_user_per_minute': 0,
+        'render_cache_size': 0,
+    })
+    user_id, _ = seed_user(server, 'kochen', n_recipes=50, n_household=0)
+    seed_login_users(server, args.users, args.rounds)
+    hasher = server.password_hasher
+
+    print(f"{'Variante':<28} {'Logins/s':>9} {'503':>6} {'Seite p50':>10} {'p99 ms':>9}")
+    results = {}
+    for label, max_pending, workers in (('ohne Obergrenze', 10 ** 6, 2),
+                                        ('bcrypt_max_pending = 1', 1, 1)):
+        hasher.max_pending, hasher.workers, hasher._pool_pid = max_pending, workers, None
+        rate, rejected, pages = run_load(server, user_id, args.seconds, args.login_rate,
+                                         args.page_rate, args.users)
+        results[label] = percentile(pages, 99)
+        print(f"{label:<28} {rate:>9.1f} {rejected:>6} {percentile(pages, 50):>10.1f} "
+              f"{percentile(pages, 99):>9.1f}")
+
+    failures = check_throttle(server) + check_rehash(server, args.rounds)
+    if results['bcrypt_max_pending = 1'] >= results['ohne Obergrenze']:
+        failures.append("Rezeptseite mit Obergrenze nicht schneller")
+    print(f"\nbcrypt-Pool: {hasher.stats()}")
+    for failure in failures:
+        print(f"FEHLER: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# bench_meal_plan.py
+"""
+Einkaufsliste aus dem Essensplan (meal_planner.py, build_plan im
+ShoppingListBuilder) für Pläne von einer Woche bis zu einem Jahr.
+
+Je Größe wird eine Woche mit --meals Mahlzeiten pro Tag und zufälligen
+Portionen geplant, per repeat() auf die übrigen Wochen kopiert und dann die
+Einkaufsliste für den ganzen Zeitraum erzeugt. Gemessen werden SQL-Statements
+und Zeit von repeat() und build_plan(), zum Vergleich auch eine Schleife,
+die wie früher die Zutaten jeder geplanten Mahlzeit einzeln lädt und in
+Python skaliert.
+
+Beendet sich mit Exit-Code 1, wenn die Zahl der Statements mit dem Plan
+wächst oder der gespeicherte Bedarf nicht zur Schleife passt.
+
+Aufruf:  python benchmarks/bench_meal_plan.py [--recipes 300] [--meals 3]
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import select, text
+
+from common import load_app, seed_user
+import quantity
+from meal_planner import SLOTS
+
+_NEEDS_SQL = text("""
+    SELECT ingredient_id, dimension, required FROM shopping_list_needs
+    WHERE shopping_list_id = :list_id AND required IS NOT NULL
+""")
+
+
+def plan_week(server, user_id, recipe_ids, monday, meals, rnd):
+    entries = [
+        {'recipe_id': rnd.choice(recipe_ids), 'date': monday + timedelta(days=day),
+         'slot': SLOTS[meal % len(SLOTS)], 'servings': rnd.choice([None, 1, 2, 4, 6])}
+        for day in range(7) for meal in range(meals)
+    ]
+    server.meal_planner.add_many(user_id, entries)
+
+
+def loop_needs(server, user_id, start, end):
+    """ Wie vor dem Essensplan: jede Mahlzeit einzeln laden und skalieren. """
+    session = server.db.session
+    Entry, Recipe, RI = server.MealPlanEntry, server.Recipe, server.RecipeIngredient
+    needs = {}
+    entries = session.execute(
+        select(Entry.recipe_id, Entry.servings)
+        .where(Entry.user_id == user_id, Entry.plan_date.between(start, end))
+    ).all()
+    for entry in entries:
+        base = session.execute(
+            select(Recipe.servings).where(Recipe.id == entry.recipe_id)
+        ).scalar()
+        factor = (entry.servings or base) / base
+        for row in session.execute(select(RI.ingredient_id, RI.amount, RI.unit)
+                                   .where(RI.recipe_id == entry.recipe_id)):
+            if row.amount is None:
+                continue
+            dim, value = quantity.to_base(row.amount, quantity.unit_key(row.unit))
+            key = (row.ingredient_id, dim)
+            needs[key] = needs.get(key, 0.0) + value * factor
+    return needs, len(entries)
+
+
+def counted(server, function):
+    """ Gibt (Ergebnis, Statements, Millisekunden) zurück. """
+    with server.app.test_request_context(method='POST'), \
+            server.query_counter.count() as statements:
+        start = time.perf_counter()
+        result = function()
+        elapsed = (time.perf_counter() - start) * 1000
+    return result, len(statements), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recipes', type=int, default=300)
+    parser.add_argument('--meals', type=int, default=3, help="Mahlzeiten pro Tag")
+    parser.add_argument('--weeks', type=int, nargs='+', default=[1, 4, 13, 52])
+    args = parser.parse_args()
+
+    server = load_app(extra_config={'meal_plan_max_days': 7 * max(args.weeks) + 7})
+    user_id, recipe_ids = seed_user(server, 'planer', n_recipes=args.recipes, n_household=0)
+    rnd = random.Random(3)
+    with server.app.app_context():
+        # Unterschiedliche Grundportionen, damit wirklich skaliert wird
+        server.db.session.execute(server.db.update(server.Recipe), [
+            {'id': recipe_id, 'servings': rnd.choice([1, 2, 4])} for recipe_id in recipe_ids
+        ])
+        server.db.session.commit()
+
+    failures = []
+    counts = {'repeat': set(), 'build_plan': set()}
+    monday = date(2026, 1, 5)
+    print(f"{'Wochen':>6} {'Einträge':>9} {'repeat':>14} {'build_plan':>16} {'Schleife':>18}")
+    for weeks in args.weeks:
+        end = monday + timedelta(days=7 * weeks - 1)
+        with server.app.app_context():
+            # Jede Größe mit neuer Liste, sonst hängen die Statements vom Stand davor ab
+            for slist in server.ShoppingList.query.filter_by(user_id=user_id):
+                server.db.session.delete(slist)
+            server.db.session.execute(server.db.delete(server.MealPlanEntry))
+            plan_week(server, user_id, recipe_ids, monday, args.meals, rnd)
+            server.db.session.commit()
+
+        def repeat():
+            added = (server.meal_planner.repeat(user_id, monday, 7, weeks - 1)
+                     if weeks > 1 else 0)
+            server.db.session.commit()
+            return added
+        _, repeat_statements, repeat_ms = counted(server, repeat)
+        (list_id, _), build_statements, build_ms = counted(
+            server, lambda: server.meal_planner.build_shopping_list(user_id, monday, end))
+        (expected, entries), loop_statements, loop_ms = counted(
+            server, lambda: loop_needs(server, user_id, monday, end))
+        if weeks > 1:
+            counts['repeat'].add(repeat_statements)
+        counts['build_plan'].add(build_statements)
+        print(f"{weeks:>6} {entries:>9} {repeat_statements:>4} St. {repeat_ms:>6.1f} ms "
+              f"{build_statements:>4} St. {build_ms:>8.1f} ms "
+              f"{loop_statements:>6} St. {loop_ms:>8.1f} ms")
+
+        with server.app.app_context():
+            stored = {(r.ingredient_id, r.dimension): r.required
+                      for r in server.db.session.execute(_NEEDS_SQL, {'list_id': list_id})}
+        wrong = [key for key in set(stored) | set(expected)
+                 if abs(stored.get(key, 0.0) - expected.get(key, 0.0)) > 1e-6]
+        if wrong or entries != 7 * weeks * args.meals:
+            failures.append(f"{weeks} Wochen: {len(wrong)} abweichende Zutaten, "
+                            f"{entries} Einträge")
+
+    for name, values in counts.items():
+        if len(values) > 1:
+            failures.append(f"{name}: Statements wachsen mit dem Plan ({sorted(values)})")
+    for failure in failures:
+        print(f"FEHLER: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
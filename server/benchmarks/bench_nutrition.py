@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# bench_nutrition.py
+"""
+Nährwerte (nutrition.py): volle Neuberechnung vieler Rezepte und das
+Nachführen einzelner Rezepte.
+
+Legt --recipes Rezepte an, lädt Nährwerte für die meisten Zutaten über die
+CSV-Schnittstelle und misst recompute_all mit NumPy (Matrix und bincount)
+und mit der Schleife, gesamt und nur das Rechnen ohne SQL. Beide Ergebnisse müssen (bis auf die Rundung)
+übereinstimmen.
+
+Danach über die API:
+- ein Rezept mit bekannten Werten wird angelegt und geändert, die Summen
+  müssen stimmen (Anlegen und Ändern führen sie nach);
+- Ändern eines Rezepts mit wenigen bzw. vielen Zutaten braucht gleich
+  viele Statements;
+- /my-recipes und /api/v1/recipes lesen nur die Summen, nie nutrition_facts;
+- /api/v1/meal-plan/nutrition braucht für eine Woche so viele Statements
+  wie für acht.
+
+Beendet sich mit Exit-Code 1, wenn eine der Prüfungen fehlschlägt.
+
+Aufruf:  python benchmarks/bench_nutrition.py [--recipes 10000] [--repeat 3]
+"""
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import event, select
+
+from common import load_app, median, seed_nutrition, seed_user
+
+import nutrition  # noqa: E402  (nach common, das den Projektpfad setzt)
+
+
+class Statements:
+    """ Sammelt die SQL-Statements auf allen Engines (Lese- und Schreibverbindung). """
+    def __init__(self, engines):
+        self.sql = []
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.sql.append(statement)
+
+    def during(self, func):
+        self.sql = []
+        func()
+        return list(self.sql)
+
+
+def login(server, user_id):
+    client = server.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def stored_totals(server):
+    with server.app.app_context():
+        table = server.RecipeNutrition.__table__
+        return {row.recipe_id: tuple(row[1:]) for row in server.db.session.execute(
+            select(table.c.recipe_id, *(table.c[n] for n in nutrition.NUTRIENTS),
+                   table.c.missing))}
+
+
+def full_recompute(server, repeat, vectorized):
+    saved = nutrition.np
+    if not vectorized:
+        nutrition.np = None
+    try:
+        samples = []
+        for _ in range(repeat):
+            with server.app.app_context():
+                start = time.perf_counter()
+                count = server.nutrition.recompute_all()
+                samples.append((time.perf_counter() - start) * 1000)
+    finally:
+        nutrition.np = saved
+    return count, median(samples), stored_totals(server)
+
+
+def compute_only(server, repeat, vectorized):
+    """ Nur compute_totals über alle Rezepte, ohne Lesen und Schreiben. """
+    with server.app.app_context():
+        session = server.db.session
+        facts = server.nutrition.facts()
+        recipe_ids = session.scalars(select(server.Recipe.id).order_by(server.Recipe.id)).all()
+        rows = session.execute(nutrition._RANGE_ROWS_SQL, {'first': recipe_ids[0],
+                                                           'last': recipe_ids[-1]}).all()
+    saved = nutrition.np
+    if not vectorized:
+        nutrition.np = None
+    try:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            nutrition.compute_totals(recipe_ids, rows, facts)
+            samples.append((time.perf_counter() - start) * 1000)
+    finally:
+        nutrition.np = saved
+    return len(rows), median(samples)
+
+
+def differences(left, right):
+    """ Rezepte mit abweichenden Summen; gespeichert wird auf 3 Stellen gerundet. """
+    wrong = []
+    for recipe_id in set(left) | set(right):
+        a, b = left.get(recipe_id), right.get(recipe_id)
+        if a is None or b is None or any(abs(x - y) > 1.5e-3 for x, y in zip(a, b)):
+            wrong.append(recipe_id)
+    return wrong
+
+
+def check_known_recipe(server, client, failures):
+    """ Rezept aus Lebensmitteln mit bekannten Werten, Summen nach Anlegen und Ändern. """
+    with server.app.app_context():
+        server.nutrition.load_facts([
+            'name;kcal;protein;fat;carbs;density;piece_grams',
+            'Haferflocken;370;13,5;7;58;;',
+            'Milch;64;3,4;3,5;4,8;1,03;',
+            'Banane;93;1,2;0,2;20;;120',
+        ], delimiter=';')
+    response = client.post('/api/v1/recipes/batch', json={'operations': [{
+        'op': 'create', 'title': 'Porridge', 'servings': 2, 'ingredients': [
+            {'name': 'Haferflocken', 'amount': 100, 'unit': 'g'},
+            {'name': 'Milch', 'amount': 0.3, 'unit': 'l'},
+            {'name': 'Banane', 'amount': 1, 'unit': 'Stk'},
+            {'name': 'Zimt', 'amount': 1, 'unit': 'Prise'},
+        ]}]})
+    recipe_id = response.get_json()['results'][0]['id']
+    # 370 + 3 * 1.03 * 64 + 1.2 * 93
+    expected = 370 + 309 * 0.64 + 111.6
+    data = client.get(f'/api/v1/recipes/{recipe_id}').get_json()['nutrition']
+    if abs(data['total']['kcal'] - expected) > 1e-6 or data['missing'] != 1:
+        failures.append(f"Porridge: {data['total']['kcal']} kcal statt {expected}, "
+                        f"{data['missing']} fehlend statt 1")
+    if abs(data['per_serving']['kcal'] - expected / 2) > 1e-3:
+        failures.append(f"Porridge: {data['per_serving']['kcal']} kcal je Portion")
+
+    client.post('/api/v1/recipes/batch', json={'operations': [{
+        'op': 'update', 'id': recipe_id, 'ingredients': [
+            {'name': 'Haferflocken', 'amount': 50, 'unit': 'g'},
+            {'name': 'Milch', 'amount': 0.3, 'unit': 'l'},
+            {'name': 'Banane', 'amount': 1, 'unit': 'Stk'},
+            {'name': 'Zimt', 'amount': 1, 'unit': 'Prise'},
+        ]}]})
+    data = client.get(f'/api/v1/recipes/{recipe_id}').get_json()['nutrition']
+    if abs(data['total']['kcal'] - (expected - 185)) > 1e-6:
+        failures.append(f"Porridge nach Ändern: {data['total']['kcal']} kcal "
+                        f"statt {expected - 185}")
+    return recipe_id
+
+
+def edit_statements(server, client, statements, n_ingredients):
+    """ Statements, um die erste Menge eines Rezepts mit n_ingredients Zutaten zu ändern. """
+    ingredients = [{'name': f'Zutat {i}', 'amount': 10 + i, 'unit': 'g'}
+                   for i in range(n_ingredients)]
+    response = client.post('/api/v1/recipes/batch', json={'operations': [{
+        'op': 'create', 'title': f'Groß {n_ingredients}', 'ingredients': ingredients}]})
+    recipe_id = response.get_json()['results'][0]['id']
+    ingredients[0]['amount'] += 1
+    sql = statements.during(lambda: client.post('/api/v1/recipes/batch', json={
+        'operations': [{'op': 'update', 'id': recipe_id, 'ingredients': ingredients}]}))
+    return recipe_id, len(sql), sum('recipe_nutrition' in s for s in sql)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recipes', type=int, default=10000)
+    parser.add_argument('--ingredients', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    server = load_app()
+    server.app.testing = True
+    user_id, recipe_ids = seed_user(server, 'naehrwerte', n_recipes=args.recipes,
+                                    n_ingredients=args.ingredients, n_household=0)
+    start = time.perf_counter()
+    foods = seed_nutrition(server)
+    print(f"{foods} Lebensmittel geladen und {args.recipes} Rezepte berechnet "
+          f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    failures = []
+
+    print(f"\n{'Pfad':<8} {'Rezepte':>8} {'Zeilen':>8} {'gesamt':>10} {'nur Rechnen':>12}")
+    results = {}
+    for name, vectorized in (('numpy', True), ('schleife', False)):
+        if vectorized and nutrition.np is None:
+            print(f"{name:<8} {'(nicht installiert)':>19}")
+            continue
+        count, elapsed, results[name] = full_recompute(server, args.repeat, vectorized)
+        n_rows, computing = compute_only(server, args.repeat, vectorized)
+        print(f"{name:<8} {count:>8} {n_rows:>8} {elapsed:>7.1f} ms {computing:>9.1f} ms")
+        if count < args.recipes:
+            failures.append(f"{name}: nur {count} Rezepte berechnet")
+    if len(results) == 2:
+        wrong = differences(results['numpy'], results['schleife'])
+        if wrong:
+            failures.append(f"{len(wrong)} Rezepte weichen zwischen NumPy und Schleife ab")
+
+    with server.app.app_context():
+        engines = list(server.db.engines.values())
+    statements = Statements(engines)
+    client = login(server, user_id)
+
+    check_known_recipe(server, client, failures)
+
+    print(f"\n{'Zutaten':>7} {'Statements':>11} {'davon Nährwerte':>16}")
+    edits = set()
+    for n_ingredients in (5, 60):
+        recipe_id, total, upserts = edit_statements(server, client, statements, n_ingredients)
+        edits.add(total)
+        print(f"{n_ingredients:>7} {total:>11} {upserts:>16}")
+        if upserts != 1:
+            failures.append(f"{n_ingredients} Zutaten: {upserts} Upserts der Summe statt 1")
+        fresh = stored_totals(server)[recipe_id]
+        with server.app.app_context():
+            server.nutrition.recompute([recipe_id])
+            server.db.session.commit()
+        if differences({recipe_id: fresh}, {recipe_id: stored_totals(server)[recipe_id]}):
+            failures.append(f"{n_ingredients} Zutaten: Summe nach Ändern veraltet")
+    if len(edits) > 1:
+        failures.append(f"Ändern: Statements wachsen mit den Zutaten ({sorted(edits)})")
+
+    print()
+    for url in ('/my-recipes', '/api/v1/recipes?limit=200'):
+        sql = statements.during(lambda: client.get(url))
+        facts = sum('nutrition_facts' in s for s in sql)
+        print(f"{url:<28} {len(sql):>3} Statements, {facts} auf nutrition_facts")
+        if facts:
+            failures.append(f"{url} rechnet Nährwerte neu")
+
+    monday = date.today() - timedelta(days=date.today().weekday())
+    with server.app.app_context():
+        server.meal_planner.add_many(user_id, [
+            {'recipe_id': recipe_ids[i], 'date': monday + timedelta(days=i % 56),
+             'slot': 'lunch', 'servings': 1 + i % 4}
+            for i in range(200)
+        ])
+        server.db.session.commit()
+    plan = set()
+    for days in (7, 56):
+        url = (f'/api/v1/meal-plan/nutrition?start={monday}'
+               f'&end={monday + timedelta(days=days - 1)}')
+        sql = statements.during(lambda: client.get(url))
+        plan.add(len(sql))
+        print(f"Nährwerte für {days:>2} Tage: {len(sql)} Statements")
+    if len(plan) > 1:
+        failures.append(f"Essensplan: Statements wachsen mit dem Zeitraum ({sorted(plan)})")
+
+    for failure in failures:
+        print(f"FEHLER: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
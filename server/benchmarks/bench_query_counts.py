@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# bench_query_counts.py
+"""
+Regressionstest für N+1-Abfragen: legt einen kleinen und einen großen User
+an und prüft, dass my_recipes, inventory, shopping_list und
+edit_shopping_list für beide gleich viele SQL-Statements ausführen und
+unter dem Budget bleiben. Beendet sich mit Exit-Code 1 bei Abweichung.
+
+Aufruf:  python benchmarks/bench_query_counts.py [--recipes 200] [--budget 6]
+"""
+import argparse
+import sys
+
+from common import load_app, seed_user
+
+PAGES = ['/my-recipes', '/inventory', '/shopping-list', '/edit-shopping-list']
+
+
+def page_counts(server, user_id):
+    client = server.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    counts = {}
+    for page in PAGES:
+        response = client.get(page)
+        if response.status_code != 200:
+            raise SystemExit(f"{page} lieferte Status {response.status_code}")
+        counts[page] = int(response.headers['X-Query-Count'])
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recipes', type=int, default=200)
+    parser.add_argument('--budget', type=int, default=6)
+    args = parser.parse_args()
+
+    server = load_app(extra_config={'query_budget': args.budget})
+    server.app.testing = True
+
+    users = {
+        'klein': seed_user(server, 'klein', n_recipes=2, n_household=2),
+        'gross': seed_user(server, 'gross', n_recipes=args.recipes, n_household=100),
+    }
+    counts = {}
+    for label, (user_id, recipe_ids) in users.items():
+        with server.app.test_request_context():
+            server.shopping_list_builder.build(user_id, recipe_ids)
+        counts[label] = page_counts(server, user_id)
+
+    failed = False
+    print(f"{'Seite':<22} {'klein':>6} {'gross':>6}")
+    for page in PAGES:
+        small, large = counts['klein'][page], counts['gross'][page]
+        marker = '' if small == large else '  <-- wächst mit den Daten!'
+        failed = failed or small != large
+        print(f"{page:<22} {small:>6} {large:>6}{marker}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# bench_recipe_edit.py
+"""
+Rezept bearbeiten (recipe_store.py) gegen das frühere Löschen und
+Neuanlegen aller Zutatenzeilen, für ein Rezept mit --ingredients Zutaten.
+
+Je Fall (eine Menge geändert, nur Titel geändert, eine Zeile entfernt, eine
+Zeile angehängt, eine Zeile in der Mitte eingefügt) werden SQL-Statements
+und geschriebene Zeilen (rowcount von INSERT/UPDATE/DELETE) gezählt, für
+recipe_ingredients auch einzeln. Danach wird geprüft, dass unveränderte
+Zeilen ihre ID behalten, die Zutaten in der Reihenfolge des Formulars
+gespeichert sind (auch über /api/v1/recipes/<id>) und ein Fehler mitten im
+Ändern nach dem Rollback nichts hinterlässt.
+
+Beendet sich mit Exit-Code 1, wenn mehr Zutatenzeilen geschrieben werden als
+nötig, IDs sich ändern, die Reihenfolge nicht stimmt oder ein halb
+geändertes Rezept übrig bleibt.
+
+Aufruf:  python benchmarks/bench_recipe_edit.py [--ingredients 40]
+"""
+import argparse
+import re
+import sys
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from common import load_app, seed_user
+from models import POSITION_STEP
+from recipe_store import RecipeError, recipe_data
+from shopping_list_builder import recipe_rows
+
+_WRITE = re.compile(r'^\s*(INSERT|UPDATE|DELETE)\b(?:.*?\b(?:INTO|FROM)\b)?\s*"?(\w+)',
+                    re.IGNORECASE | re.DOTALL)
+
+
+class RowWrites:
+    """ Zählt geschriebene Zeilen je Tabelle über alle Engines. """
+    def __init__(self):
+        self.tables = {}
+        event.listen(Engine, 'after_cursor_execute', self._on_executed)
+
+    def _on_executed(self, conn, cursor, statement, parameters, context, executemany):
+        match = _WRITE.match(statement)
+        if match and cursor.rowcount > 0:
+            table = match.group(2)
+            self.tables[table] = self.tables.get(table, 0) + cursor.rowcount
+
+    def take(self):
+        tables, self.tables = self.tables, {}
+        return tables
+
+
+def form_rows(recipe):
+    """ Zutaten wie im Bearbeiten-Formular: (Name, Menge, Einheit) in Rezeptreihenfolge. """
+    return [(ri.ingredient.name, ri.amount, ri.unit) for ri in recipe.recipe_ingredients]
+
+
+def edit_store(server, recipe, data):
+    server.recipe_store.update(recipe, data)
+
+
+def edit_reinsert(server, recipe, data):
+    """ Wie vor recipe_store.py: alle Zeilen löschen und neu anlegen. """
+    session = server.db.session
+    old_rows = recipe_rows(recipe)
+    recipe.title = data['title']
+    recipe.instructions = data['instructions']
+    recipe.recipe_ingredients.clear()
+    ingredient_ids = server.ingredient_resolver.resolve(
+        name for name, _, _ in data['ingredients'])
+    for position, (name, amount, unit) in enumerate(data['ingredients']):
+        session.add(server.RecipeIngredient(recipe=recipe, ingredient_id=ingredient_ids[name],
+                                            amount=amount, unit=unit,
+                                            position=position * POSITION_STEP))
+    session.flush()
+    server.recipe_search.index_recipe(recipe.id)
+    server.shopping_list_builder.recipe_changed(recipe.user_id, recipe.id, old_rows,
+                                                recipe_rows(recipe))
+
+
+def scenarios(recipe):
+    rows = form_rows(recipe)
+    name, amount, unit = rows[len(rows) // 2]
+    changed = list(rows)
+    changed[len(rows) // 2] = (name, (amount or 0) + 1, unit or 'g')
+    base = {'title': recipe.title, 'instructions': recipe.instructions}
+    return {
+        'Menge geändert': dict(base, ingredients=changed),
+        'nur Titel': dict(base, title=recipe.title + ' (neu)', ingredients=rows),
+        'Zeile entfernt': dict(base, ingredients=rows[:5] + rows[6:]),
+        'Zeile angehängt': dict(base, ingredients=rows + [('zutat extra', 1.0, 'Stk')]),
+        'Zeile eingefügt': dict(base, ingredients=rows[:5] + [('zutat extra', 1.0, 'Stk')]
+                                + rows[5:]),
+    }
+
+
+# Höchstens so viele Zeilen in recipe_ingredients darf jeder Fall schreiben
+EXPECTED = {'Menge geändert': 1, 'nur Titel': 0, 'Zeile entfernt': 1, 'Zeile angehängt': 1,
+            'Zeile eingefügt': 1}
+
+
+def run(server, writes, user_id, edit):
+    """ Gibt je Fall (Statements, Zeilen gesamt, Zeilen in recipe_ingredients, IDs) zurück. """
+    results = {}
+    for case in EXPECTED:
+        # Jeder Fall auf einer frischen Kopie des Ausgangsrezepts
+        with server.app.app_context():
+            source = server.db.session.get(server.Recipe, server.source_id)
+            data = scenarios(source)[case]
+            recipe = server.recipe_store.create(
+                user_id, recipe_data(source.title, source.instructions,
+                                     ingredients=form_rows(source)))
+            server.db.session.commit()
+            recipe_id = recipe.id
+            # Die Einkaufsliste enthält das Rezept, recipe_changed hat also zu tun
+            server.shopping_list_builder.build(user_id, [recipe_id])
+            recipe = server.db.session.get(server.Recipe, recipe_id)
+            before = {ri.id for ri in recipe.recipe_ingredients}
+
+        with server.app.test_request_context(method='POST'):
+            recipe = server.db.session.get(server.Recipe, recipe_id)
+            recipe.recipe_ingredients  # wie die Seite: Zeilen schon geladen
+            writes.take()
+            with server.query_counter.count() as statements:
+                edit(server, recipe, recipe_data(**data))
+                server.db.session.commit()
+            tables = writes.take()
+            after = {ri.id for ri in recipe.recipe_ingredients}
+            expected_rows = recipe_data(**data)['ingredients']
+        # Frisch geladen, wie die Seiten sie anzeigen
+        with server.app.app_context():
+            stored = form_rows(server.db.session.get(server.Recipe, recipe_id))
+        results[case] = (len(statements), sum(tables.values()),
+                         tables.get('recipe_ingredients', 0), len(before & after),
+                         stored == expected_rows)
+    return results
+
+
+def check_api_order(server, user_id):
+    """ Zutat mitten eingefügt: Reihenfolge in /api/v1/recipes/<id>.
+
+    Danach wird so oft an derselben Stelle eingefügt, bis die Lücke zwischen
+    den Positionen aufgebraucht ist und neu nummeriert werden muss.
+    """
+    client = server.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    def row(name):
+        return {'name': name, 'amount': 100, 'unit': 'g'}
+    response = client.post('/api/v1/recipes/batch', json={'operations': [{
+        'op': 'create', 'title': 'Kuchen',
+        'ingredients': [row('Mehl'), row('Zucker'), row('Butter')]}]})
+    recipe_id = response.get_json()['results'][0]['id']
+    client.post('/api/v1/recipes/batch', json={'operations': [{
+        'op': 'update', 'id': recipe_id,
+        'ingredients': [row('Mehl'), row('Eier'), row('Zucker'), row('Butter')]}]})
+    data = client.get(f'/api/v1/recipes/{recipe_id}').get_json()
+    orders = [[i['name'] for i in data['ingredients']]]
+
+    names = ['Mehl', 'Eier', 'Zucker', 'Butter']
+    for number in range(12):
+        names.insert(1, f'Gewürz {number}')
+        client.post('/api/v1/recipes/batch', json={'operations': [{
+            'op': 'update', 'id': recipe_id,
+            'ingredients': [row(name) for name in names]}]})
+    data = client.get(f'/api/v1/recipes/{recipe_id}').get_json()
+    orders.append(([i['name'] for i in data['ingredients']], names))
+    return orders
+
+
+def check_atomic(server, user_id):
+    """ Fehler nach dem Schreiben der Zeilen: nach dem Rollback alles wie vorher. """
+    with server.app.test_request_context(method='POST'):
+        recipe = server.db.session.get(server.Recipe, server.source_id)
+        before = (recipe.title, form_rows(recipe), sorted(ri.id for ri in recipe.recipe_ingredients))
+        data = scenarios(recipe)['Menge geändert']
+        data['title'] = 'Halb geändert'
+
+        original = server.recipe_search.index_recipe
+
+        def fail(recipe_id):
+            raise RecipeError("abgebrochen")
+        server.recipe_search.index_recipe = fail
+        try:
+            server.recipe_store.update(recipe, recipe_data(**data))
+        except RecipeError:
+            server.db.session.rollback()
+        finally:
+            server.recipe_search.index_recipe = original
+
+    with server.app.app_context():
+        recipe = server.db.session.get(server.Recipe, server.source_id)
+        after = (recipe.title, form_rows(recipe), sorted(ri.id for ri in recipe.recipe_ingredients))
+    return before == after
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ingredients', type=int, default=40)
+    args = parser.parse_args()
+
+    server = load_app()
+    user_id, recipe_ids = seed_user(server, 'koch', n_recipes=1,
+                                    ingredients_per_recipe=args.ingredients, n_household=0)
+    server.source_id = recipe_ids[0]
+    writes = RowWrites()
+
+    results = {'recipe_store': run(server, writes, user_id, edit_store),
+               'neu anlegen': run(server, writes, user_id, edit_reinsert)}
+
+    failures = []
+    print(f"{'Fall':<16} {'Variante':<13} {'Statements':>10} {'Zeilen':>7} "
+          f"{'Zutatenzeilen':>14} {'IDs erhalten':>13}")
+    for case, limit in EXPECTED.items():
+        for variant, by_case in results.items():
+            statements, rows, ingredient_rows, kept, correct = by_case[case]
+            print(f"{case:<16} {variant:<13} {statements:>10} {rows:>7} "
+                  f"{ingredient_rows:>14} {kept:>13}")
+            if not correct:
+                failures.append(f"{case} ({variant}): gespeicherte Zutaten falsch")
+        statements, rows, ingredient_rows, kept, _ = results['recipe_store'][case]
+        if ingredient_rows > limit:
+            failures.append(f"{case}: {ingredient_rows} Zutatenzeilen geschrieben, "
+                            f"erwartet höchstens {limit}")
+        unchanged = args.ingredients - (1 if case == 'Zeile entfernt' else 0)
+        if kept < unchanged:
+            failures.append(f"{case}: nur {kept} von {unchanged} Zeilen behalten ihre ID")
+
+    order, (refilled, expected) = check_api_order(server, user_id)
+    if order != ['Mehl', 'Eier', 'Zucker', 'Butter']:
+        failures.append(f"API liefert nach Einfügen in der Mitte {order}")
+    if refilled != expected:
+        failures.append(f"API liefert nach aufgebrauchter Lücke {refilled}")
+
+    if not check_atomic(server, user_id):
+        failures.append("Nach einem Fehler ist das Rezept halb geändert")
+
+    for failure in failures:
+        print(f"FEHLER: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# bench_render_cache.py
+"""
+Seiten-Cache (render_cache.py): misst p50/p99 für my_recipes, inventory
+und shopping_list, jeweils ohne Cache, mit Treffer im Worker-LRU und mit
+Treffer aus der gemeinsamen SQLite-Stufe (LRU vor jedem Request geleert,
+wie ein anderer Worker).
+
+Danach wird geprüft, dass schreibende Requests die Seiten invalidieren
+(neuer Bestand, Haken, neues Rezept sind sofort sichtbar). Beendet sich
+mit Exit-Code 1 bei veralteten Seiten.
+
+Aufruf:  python benchmarks/bench_render_cache.py [--requests 300] [--recipes 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from common import load_app, seed_user
+
+PAGES = ['/my-recipes', '/inventory', '/shopping-list']
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def login(server, user_id):
+    client = server.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def measure(client, page, n, before=None, expect=None):
+    samples = []
+    for _ in range(n):
+        if before:
+            before()
+        start = time.perf_counter()
+        response = client.get(page)
+        samples.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise SystemExit(f"{page} lieferte Status {response.status_code}")
+        if expect and response.headers.get('X-Render-Cache') != expect:
+            raise SystemExit(f"{page}: erwartet {expect}, "
+                             f"bekommen {response.headers.get('X-Render-Cache')}")
+    return percentile(samples, 50), percentile(samples, 99)
+
+
+def check_invalidation(server, client):
+    failures = []
+    before = client.get('/inventory')
+    client.post('/add-inventory', data={'ingredient_name': 'Safran', 'amount': '1', 'unit': 'g'})
+    after = client.get('/inventory')
+    if after.headers.get('X-Render-Cache') != 'miss' or 'Safran' not in after.get_data(True):
+        failures.append('inventory nach add-inventory veraltet')
+    if before.get_data() == after.get_data():
+        failures.append('inventory unverändert')
+
+    client.get('/shopping-list')
+    with server.app.app_context():
+        item = server.ShoppingListItem.query.filter_by(purchased=False).first()
+        item_id, version = item.id, item.version
+    client.post(f'/shopping-list/items/{item_id}/purchased',
+                json={'purchased': True, 'version': version})
+    page = client.get('/shopping-list').get_data(True)
+    if f'name="version_{item_id}" value="{version + 1}"' not in page:
+        failures.append('shopping-list nach Haken veraltet')
+
+    client.get('/my-recipes')
+    client.post('/api/v1/recipes/batch', json={'operations': [
+        {'op': 'create', 'title': 'Cache-Test', 'ingredients': [{'name': 'Safran'}]},
+    ]})
+    if client.get('/my-recipes').headers.get('X-Render-Cache') != 'miss':
+        failures.append('my-recipes nach API-Änderung aus dem Cache')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--recipes', type=int, default=200)
+    args = parser.parse_args()
+
+    shared_path = os.path.join(tempfile.mkdtemp(prefix='mealmaster-cache-'), 'render_cache.db')
+    server = load_app(extra_config={'render_cache_shared_path': shared_path})
+    cache = server.render_cache
+    size = cache.max_entries
+    user_id, recipe_ids = seed_user(server, 'cache', n_recipes=args.recipes, n_household=100)
+    with server.app.test_request_context():
+        server.shopping_list_builder.build(user_id, recipe_ids[:50])
+    client = login(server, user_id)
+
+    print(f"{'Seite':<16} {'ohne p50':>9} {'p99':>7} {'LRU p50':>9} {'p99':>7} "
+          f"{'geteilt p50':>12} {'p99':>7}")
+    for page in PAGES:
+        cache.max_entries = 0
+        uncached = measure(client, page, args.requests)
+        cache.max_entries = size
+        client.get(page)
+        cached = measure(client, page, args.requests, expect='hit')
+        shared = measure(client, page, args.requests, before=cache.clear, expect='shared')
+        print(f"{page:<16} {uncached[0]:>9.2f} {uncached[1]:>7.2f} {cached[0]:>9.2f} "
+              f"{cached[1]:>7.2f} {shared[0]:>12.2f} {shared[1]:>7.2f}")
+
+    failures = check_invalidation(server, client)
+    stats = cache.stats()
+    print(f"\nTreffer {stats['hits']}, geteilt {stats['shared_hits']}, "
+          f"Misses {stats['misses']}, Trefferquote {stats['hit_rate']:.1%}")
+    for failure in failures:
+        print(f"FEHLER: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
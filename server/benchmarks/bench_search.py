@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# bench_search.py
+"""
+Misst die Latenz der Rezeptsuche bei vielen Rezepten (Standard: 100k):
+Volltext, Präfix/Typeahead und "mit meinem Bestand kochbar",
+jeweils für FTS5 und den invertierten Index im Speicher.
+
+Aufruf:  python benchmarks/bench_search.py [--recipes 100000]
+"""
+import argparse
+import random
+import time
+
+from common import load_app, median, seed_user, timed
+from recipe_search import RecipeSearch
+
+WORDS = ['nudel', 'tomate', 'suppe', 'salat', 'curry', 'reis', 'ofen', 'gemüse',
+         'hähnchen', 'linsen', 'quark', 'pfanne', 'auflauf', 'bowl', 'wrap', 'chili',
+         'kartoffel', 'lachs', 'tofu', 'spinat', 'kürbis', 'paprika', 'brot', 'ei']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recipes', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    server = load_app()
+    print(f"Lege {args.recipes} Rezepte an ...")
+    user_id, recipe_ids = seed_user(server, n_recipes=args.recipes,
+                                    ingredients_per_recipe=5, n_household=150)
+    rnd = random.Random(1)
+    db = server.db
+    with server.app.app_context():
+        db.session.execute(db.text("UPDATE recipes SET title = :title, instructions = :text "
+                                   "WHERE id = :id"), [
+            {'id': rid,
+             'title': ' '.join(rnd.sample(WORDS, 3))[:30],
+             'text': ' '.join(rnd.choices(WORDS, k=20))}
+            for rid in recipe_ids
+        ])
+        db.session.commit()
+
+    for label, use_fts in (('FTS5', True), ('Speicher', False)):
+        search = RecipeSearch(db, use_fts=use_fts)
+        with server.app.app_context():
+            start = time.perf_counter()
+            search.rebuild()
+            db.session.commit()
+            build_ms = (time.perf_counter() - start) * 1000
+
+            queries = {
+                'volltext "tomate curry"': lambda: search.search(user_id, 'tomate curry'),
+                'zutat "zutat 17"': lambda: search.search(user_id, 'zutat 17'),
+                'typeahead "ku"': lambda: search.suggest(user_id, 'ku'),
+                'typeahead "kür pf"': lambda: search.suggest(user_id, 'kür pf'),
+                'kochbar mit Bestand': lambda: search.cookable(user_id),
+            }
+            print(f"\n{label}: Index aufgebaut in {build_ms:.0f} ms")
+            print(f"{'Abfrage':<28} {'p50 ms':>8} {'max ms':>8}")
+            for name, query in queries.items():
+                samples = timed(query, args.repeat)
+                print(f"{name:<28} {median(samples):>8.2f} {max(samples):>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
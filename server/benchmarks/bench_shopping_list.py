@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# bench_shopping_list.py
+"""
+Vergleicht die Erzeugung der Einkaufsliste per SQL-Aggregat
+(ShoppingListBuilder) mit der bisherigen Python-Schleife aus select_recipes.
+Der Modus "exclude" muss dabei exakt dieselbe Liste liefern wie die Schleife,
+"subtract" rechnet zusätzlich Einheiten um und zieht den Bestand ab.
+
+Aufruf:  python benchmarks/bench_shopping_list.py [--repeat 5]
+"""
+import argparse
+from collections import defaultdict
+
+from common import load_app, median, seed_user, timed
+from shopping_list_builder import MODE_EXCLUDE, MODE_SUBTRACT
+
+
+def legacy_build(server, user_id, recipe_ids):
+    """ Die alte Implementierung aus select_recipes, unverändert übernommen. """
+    db = server.db
+    ShoppingList = server.ShoppingList
+    ShoppingListItem = server.ShoppingListItem
+
+    existing_list = ShoppingList.query.filter_by(user_id=user_id).first()
+    if existing_list:
+        db.session.delete(existing_list)
+        db.session.commit()
+
+    new_list = ShoppingList(user_id=user_id)
+    db.session.add(new_list)
+    db.session.commit()
+
+    household_items = server.HouseholdItem.query.filter_by(user_id=user_id).all()
+    household_ingredient_ids = {hi.ingredient_id for hi in household_items}
+
+    recipe_ids = [int(x) for x in recipe_ids if x.isdigit()]
+    recipe_ings = server.RecipeIngredient.query.filter(
+        server.RecipeIngredient.recipe_id.in_(recipe_ids)
+    ).all()
+
+    sums_dict = defaultdict(float)
+    no_unit_entries = []
+    for ri in recipe_ings:
+        if ri.ingredient_id in household_ingredient_ids:
+            continue
+        if ri.amount is not None and ri.unit:
+            sums_dict[(ri.ingredient_id, ri.unit.lower())] += ri.amount
+        else:
+            no_unit_entries.append(ri)
+
+    for (ing_id, unit_str), total_amt in sums_dict.items():
+        db.session.add(ShoppingListItem(shopping_list_id=new_list.id,
+                                        ingredient_id=ing_id,
+                                        amount=total_amt, unit=unit_str))
+    for ri in no_unit_entries:
+        db.session.add(ShoppingListItem(shopping_list_id=new_list.id,
+                                        ingredient_id=ri.ingredient_id,
+                                        amount=ri.amount, unit=ri.unit))
+    db.session.commit()
+
+
+def current_items(server, user_id):
+    slist = server.ShoppingList.query.filter_by(user_id=user_id).first()
+    return [(i.ingredient_id, i.amount, i.unit) for i in
+            server.ShoppingListItem.query.filter_by(shopping_list_id=slist.id)
+            .order_by(server.ShoppingListItem.id)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    server = load_app()
+    sizes = (10, 100, 1000)
+    user_id, recipe_ids = seed_user(server, n_recipes=max(sizes))
+
+    print(f"{'Rezepte':>8} {'Schleife ms':>12} {'exclude ms':>11} {'subtract ms':>12} {'Faktor':>7}")
+    with server.app.test_request_context():
+        for n in sizes:
+            selected = [str(r) for r in recipe_ids[:n]]
+
+            legacy = timed(lambda: legacy_build(server, user_id, selected), args.repeat)
+            legacy_items = current_items(server, user_id)
+
+            builder = server.shopping_list_builder
+            exclude = timed(lambda: builder.build(user_id, selected, MODE_EXCLUDE), args.repeat)
+            if legacy_items != current_items(server, user_id):
+                raise SystemExit(f"Ergebnis weicht bei {n} Rezepten ab!")
+            subtract = timed(lambda: builder.build(user_id, selected, MODE_SUBTRACT), args.repeat)
+
+            ms_legacy, ms_exclude = median(legacy), median(exclude)
+            print(f"{n:>8} {ms_legacy:>12.2f} {ms_exclude:>11.2f} {median(subtract):>12.2f} "
+                  f"{ms_legacy / ms_exclude:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
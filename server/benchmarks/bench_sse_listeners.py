@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# bench_sse_listeners.py
+"""
+Lasttest für den Live-Sync der Einkaufsliste: startet die App in einem
+Threaded-Werkzeug-Server, öffnet N gleichzeitige SSE-Verbindungen und
+veröffentlicht ein Event. Gemessen wird, wie lange es dauert, bis alle
+Listener das Event haben, und wie viel Speicher der Prozess belegt.
+
+In Produktion belegt jede Verbindung einen uWSGI-Thread; die Zahlen hier
+zeigen, was ein Worker an Listenern verkraftet (sse_max_listeners).
+
+Aufruf:  python benchmarks/bench_sse_listeners.py [--listeners 10 50 100 200 500]
+"""
+import argparse
+import http.client
+import logging
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+from common import load_app, median, seed_user
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def session_cookie(server, user_id):
+    client = server.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client.get_cookie('session').value
+
+
+class Listener(threading.Thread):
+    """ Eine SSE-Verbindung; merkt sich, wann das erste echte Event ankam. """
+    def __init__(self, port, cookie):
+        super().__init__(daemon=True)
+        self.port = port
+        self.cookie = cookie
+        self.connected = threading.Event()
+        self.received = threading.Event()
+        self.received_at = None
+        self.status = None
+
+    def run(self):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+        connection.request('GET', '/shopping-list/events',
+                           headers={'Cookie': f'session={self.cookie}'})
+        response = connection.getresponse()
+        self.status = response.status
+        self.connected.set()
+        if response.status != 200:
+            return
+        while True:
+            line = response.readline()
+            if not line:
+                return
+            if line.startswith(b'event: '):
+                self.received_at = time.perf_counter()
+                self.received.set()
+                connection.close()
+                return
+
+
+def run_round(server, port, user_id, cookie, n):
+    events = server.shopping_list_events
+    # Geschlossene Verbindungen der Vorrunde melden sich erst beim nächsten
+    # Heartbeat ab und zählen bis dahin noch mit
+    baseline = events._count
+    listeners = [Listener(port, cookie) for _ in range(n)]
+    for listener in listeners:
+        listener.start()
+    for listener in listeners:
+        listener.connected.wait(30)
+    rejected = sum(1 for listener in listeners if listener.status != 200)
+
+    # Warten, bis der Server alle Abonnements registriert hat
+    deadline = time.monotonic() + 30
+    while events._count < baseline + n - rejected and time.monotonic() < deadline:
+        time.sleep(0.01)
+    memory = rss_mb()
+
+    with server.app.app_context():
+        events.publish(user_id, 'check', {'id': 0, 'purchased': True, 'version': 1})
+        server.db.session.commit()
+    published_at = time.perf_counter()
+
+    accepted = [listener for listener in listeners if listener.status == 200]
+    for listener in accepted:
+        listener.received.wait(30)
+    latencies = [(listener.received_at - published_at) * 1000
+                 for listener in accepted if listener.received_at]
+    for listener in listeners:
+        listener.join(5)
+    return {
+        'rejected': rejected,
+        'missed': len(accepted) - len(latencies),
+        'median_ms': median(latencies) if latencies else 0.0,
+        'max_ms': max(latencies) if latencies else 0.0,
+        'rss_mb': memory,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--listeners', type=int, nargs='+', default=[10, 50, 100, 200, 500])
+    parser.add_argument('--poll-interval', type=float, default=0.5)
+    args = parser.parse_args()
+
+    server = load_app(extra_config={
+        'sse_max_listeners': sum(args.listeners),
+        'sse_poll_interval': args.poll_interval,
+        'sse_stream_timeout': 120,
+    })
+    user_id, _ = seed_user(server, 'sse', n_recipes=1, n_household=0)
+    cookie = session_cookie(server, user_id)
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    http_server = make_server('127.0.0.1', 0, server.app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    port = http_server.server_port
+
+    print(f"Leerlauf: {rss_mb():.1f} MB RSS, Poll-Intervall {args.poll_interval}s")
+    print(f"{'Listener':>8} {'Median ms':>10} {'Max ms':>8} {'RSS MB':>8} {'abgelehnt':>10} {'verpasst':>9}")
+    for n in args.listeners:
+        result = run_round(server, port, user_id, cookie, n)
+        print(f"{n:>8} {result['median_ms']:>10.1f} {result['max_ms']:>8.1f} "
+              f"{result['rss_mb']:>8.1f} {result['rejected']:>10} {result['missed']:>9}")
+    http_server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# bench_startup.py
+"""
+Startzeit der Worker: misst vom Import bis zur ersten Antwort (GET /login),
+einmal wie uWSGI mit --lazy-apps (jeder Worker lädt die App selbst) und
+einmal vorgeladen (Master lädt wsgi.py, die Worker werden geforkt).
+Zusätzlich wird der private (nicht geteilte) Speicher je Worker nach der
+ersten Antwort ausgegeben.
+
+Das Schema legt vorher einmal der Migrationsschritt an, wie im Deployment.
+
+Aufruf:  python benchmarks/bench_startup.py [--workers 4]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from common import PROJECT_DIR, median, write_config
+
+
+def private_dirty_mb():
+    try:
+        with open('/proc/self/smaps_rollup', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('Private_Dirty:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def first_response(start):
+    """ Läuft im Worker: lädt bei Bedarf die App und beantwortet einen Request. """
+    from wsgi import app
+    response = app.test_client().get('/login')
+    if response.status_code != 200:
+        raise SystemExit(f"/login lieferte Status {response.status_code}")
+    return (time.perf_counter() - start) * 1000
+
+
+def spawn_workers(n):
+    """ Forkt n Worker, die gleichzeitig ihre erste Antwort liefern. """
+    children = []
+    for _ in range(n):
+        read_fd, write_fd = os.pipe()
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            elapsed = first_response(start)
+            with os.fdopen(write_fd, 'w') as pipe:
+                json.dump({'ms': elapsed, 'private_mb': private_dirty_mb()}, pipe)
+            os._exit(0)
+        os.close(write_fd)
+        children.append((pid, read_fd))
+
+    results = []
+    for pid, read_fd in children:
+        with os.fdopen(read_fd) as pipe:
+            data = pipe.read()
+        os.waitpid(pid, 0)
+        if data:
+            results.append(json.loads(data))
+    return results
+
+
+def report(label, master_ms, results):
+    times = [r['ms'] for r in results]
+    memory = [r['private_mb'] for r in results if r['private_mb'] is not None]
+    memory_text = f"{median(memory):>10.1f}" if memory else f"{'-':>10}"
+    print(f"{label:<16} {master_ms:>10.0f} {median(times):>12.0f} {max(times):>10.0f} "
+          f"{master_ms + max(times):>10.0f} {memory_text}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    if not hasattr(os, 'fork'):
+        raise SystemExit("Benötigt os.fork (Linux/macOS)")
+
+    workdir = write_config()
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'migrations'], cwd=workdir, check=True,
+                   env=dict(os.environ, PYTHONPATH=PROJECT_DIR), stdout=subprocess.DEVNULL)
+    print(f"Migrationsschritt (einmalig): {(time.perf_counter() - start) * 1000:.0f} ms\n")
+
+    print(f"{'Modus':<16} {'Master ms':>10} {'Worker p50':>12} {'Worker max':>10} "
+          f"{'gesamt ms':>10} {'privat MB':>10}")
+
+    # --lazy-apps: hier darf der Elternprozess die App noch nicht importiert haben
+    report('lazy-apps', 0, spawn_workers(args.workers))
+
+    start = time.perf_counter()
+    import wsgi  # noqa: F401  (lädt die App wie der uWSGI-Master)
+    master_ms = (time.perf_counter() - start) * 1000
+    report('vorgeladen', master_ms, spawn_workers(args.workers))
+
+
+if __name__ == '__main__':
+    main()
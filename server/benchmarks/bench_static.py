@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# bench_static.py
+"""
+Statische Dateien (assets.py): Fingerprint, Header und wer sie ausliefert.
+
+Baut static/dist wie das Dockerfile (python -m assets) und prüft:
+- die Seiten verweisen auf die Dateien mit Hash, nicht auf die Originale;
+- Flask liefert sie, falls eine Anfrage doch durchfällt, mit
+  Cache-Control immutable aus, die Originale nicht;
+- ein neuer Build ändert die Asset-Version und damit den Schlüssel des
+  Render-Caches.
+
+Danach startet uWSGI mit den Static-Optionen aus docker-compose.yml und
+misst --requests Abrufe des Stylesheets mit Hash (uWSGI, --static-map) und
+des Originals (Flask) über --concurrency Threads. Die Datei mit Hash muss
+gzip-komprimiert, mit Expires und ohne X-Query-Count kommen, also ohne
+dass ein Python-Worker sie gesehen hat.
+
+Beendet sich mit Exit-Code 1, wenn eine der Prüfungen fehlschlägt.
+
+Aufruf:  python benchmarks/bench_static.py [--requests 2000] [--concurrency 4]
+"""
+import argparse
+import http.client
+import os
+import shutil
+import sys
+import threading
+import time
+
+from flask import Flask
+
+from bench_load import free_port, percentile, start_uwsgi
+from common import PROJECT_DIR, load_app
+
+import assets  # noqa: E402  (nach common, das den Projektpfad setzt)
+
+# Wie in docker-compose.yml, nur mit absolutem Pfad
+STATIC_OPTIONS = (
+    '--offload-threads', '1',
+    '--static-map', f"/static/dist={os.path.join(PROJECT_DIR, 'static', 'dist')}",
+    '--static-gzip-all',
+    '--static-expires-type', 'text/css=31536000',
+    '--static-expires-type', 'text/javascript=31536000',
+    '--static-expires-type', 'application/javascript=31536000',
+)
+
+
+def fetch(port, path, headers=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request('GET', path, headers=dict(headers or {}, Connection='close'))
+        response = connection.getresponse()
+        body = response.read()
+    finally:
+        connection.close()
+    return response.status, response.headers, body
+
+
+def hammer(port, path, requests, concurrency):
+    """ requests Abrufe über concurrency Threads; (Requests/s, p50 in ms, Fehler). """
+    samples, errors, lock = [], [], threading.Lock()
+
+    def lane(index):
+        local, failed = [], 0
+        for _ in range(index, requests, concurrency):
+            start = time.perf_counter()
+            status, _, _ = fetch(port, path, {'Accept-Encoding': 'gzip'})
+            local.append((time.perf_counter() - start) * 1000)
+            failed += status != 200
+        with lock:
+            samples.extend(local)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=lane, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    return len(samples) / wall, percentile(samples, 50), sum(errors)
+
+
+def check_flask(server, manifest, failures):
+    client = server.app.test_client()
+    page = client.get('/login').get_data(as_text=True)
+    hashed = '/static/' + manifest['css/styles.css']
+    if hashed not in page or '/static/css/styles.css' in page:
+        failures.append("/login verweist nicht auf das Stylesheet mit Hash")
+
+    cache_control = client.get(hashed).headers.get('Cache-Control', '')
+    print(f"Flask {hashed}: Cache-Control: {cache_control}")
+    if ('immutable' not in cache_control or 'max-age=31536000' not in cache_control
+            or 'no-cache' in cache_control):
+        failures.append(f"Flask liefert {hashed} ohne immutable aus")
+    cache_control = client.get('/static/css/styles.css').headers.get('Cache-Control', '')
+    if 'immutable' in cache_control:
+        failures.append("Flask liefert das Original mit immutable aus")
+
+
+def check_new_build(server, static_dir, failures):
+    """ Ein geänderter Build ergibt eine neue Asset-Version (Render-Cache-Schlüssel). """
+    copy = os.path.join(os.getcwd(), 'static-copy')
+    shutil.copytree(static_dir, copy, ignore=shutil.ignore_patterns(assets.DIST_DIR))
+    with open(os.path.join(copy, 'css', 'styles.css'), 'a', encoding='utf-8') as f:
+        f.write('\n/* neu */\n')
+    assets.build(copy)
+    changed = assets.Assets(Flask(__name__, static_folder=copy)).version
+    if not server.render_cache.namespace or changed == server.render_cache.namespace:
+        failures.append("Neuer Build ändert die Asset-Version nicht")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=2)
+    parser.add_argument('--uwsgi', default=shutil.which('uwsgi'))
+    args = parser.parse_args()
+
+    static_dir = os.path.join(PROJECT_DIR, 'static')
+    manifest = assets.build(static_dir)
+    for filename, hashed in sorted(manifest.items()):
+        print(f"{filename} -> {hashed}")
+    server = load_app()
+    failures = []
+    check_flask(server, manifest, failures)
+    check_new_build(server, static_dir, failures)
+
+    if args.uwsgi is None:
+        print("uWSGI nicht installiert, Auslieferung über --static-map nicht gemessen")
+    else:
+        port = free_port()
+        process = start_uwsgi(args.uwsgi, os.getcwd(), port, args.workers, args.threads,
+                              STATIC_OPTIONS)
+        try:
+            hashed = '/static/' + manifest['css/styles.css']
+            status, headers, body = fetch(port, hashed, {'Accept-Encoding': 'gzip'})
+            print(f"uWSGI {hashed}: {status}, {len(body)} Bytes, "
+                  f"Content-Encoding: {headers.get('Content-Encoding')}, "
+                  f"Expires: {headers.get('Expires')}")
+            if status != 200 or headers.get('Content-Encoding') != 'gzip':
+                failures.append("uWSGI liefert das Stylesheet nicht vorkomprimiert aus")
+            if not headers.get('Expires'):
+                failures.append("uWSGI liefert das Stylesheet ohne Expires aus")
+            if headers.get('X-Query-Count') is not None:
+                failures.append("Stylesheet mit Hash geht durch einen Python-Worker")
+
+            print(f"\n{'Weg':<22} {'Req/s':>8} {'p50':>8} {'Fehler':>7}")
+            for label, path in (('uWSGI --static-map', hashed),
+                                ('Flask (Original)', '/static/css/styles.css')):
+                rps, p50, errors = hammer(port, path, args.requests, args.concurrency)
+                print(f"{label:<22} {rps:>8.0f} {p50:>6.2f} ms {errors:>7}")
+                if errors:
+                    failures.append(f"{label}: {errors} fehlerhafte Requests")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    for failure in failures:
+        print(f"FEHLER: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
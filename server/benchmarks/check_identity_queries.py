@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# check_identity_queries.py
+"""
+Prüft, dass eingeloggte Seiten den User nicht aus der Datenbank laden
+(user_cache.py): ruft jede Route wie check_query_plans.py auf und meldet
+jedes SELECT auf die Tabelle "user" aus eingeloggten Requests. Erlaubt
+ist nur die Datenversion des Seiten-Caches (render_cache.py),
+die gehört zu den Daten der Seite, nicht zur Identität.
+
+Außerdem wird geprüft, dass
+  - ein leerer Cache genau eine Abfrage auslöst (sonst misst der Check nichts),
+  - Logout und eine Änderung am User den Eintrag entfernen,
+  - ein gelöschter User beim nächsten Request abgemeldet ist.
+
+Beendet sich mit Exit-Code 1 bei einem Fehler.
+
+Aufruf:  python benchmarks/check_identity_queries.py [--recipes 50] [-v]
+"""
+import argparse
+import re
+import sys
+
+from check_query_plans import Recorder, exercise_routes, login
+from common import load_app, seed_user
+from render_cache import _VERSION_SQL
+
+# Diese Routen laufen ohne Login (oder melden sich erst an)
+ANONYMOUS = {'home', 'register', 'login', 'logout', 'prometheus_metrics'}
+
+_USER_TABLE = re.compile(r'\b(?:FROM|JOIN)\s+"?user"?(?:\s|$)', re.IGNORECASE)
+
+
+def identity_queries(statements):
+    allowed = str(_VERSION_SQL).replace(':user_id', '?')
+    return [(route, sql) for route, sql, _ in statements
+            if route not in ANONYMOUS
+            and sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+            and _USER_TABLE.search(sql)
+            and sql != allowed]
+
+
+def check_cold_cache(server, recorder, user_id):
+    server.user_cache.clear()
+    client = login(server, user_id)
+    recorder.statements.clear()
+    with recorder.at('dashboard'):
+        client.get('/dashboard')
+    with recorder.at('dashboard'):
+        client.get('/dashboard')
+    found = identity_queries(recorder.statements)
+    if len(found) != 1:
+        return [f"leerer Cache: {len(found)} statt 1 Abfrage für den User"]
+    return []
+
+
+def check_invalidation(server, user_id):
+    failures = []
+    cache = server.user_cache
+    client = login(server, user_id)
+    client.get('/dashboard')
+    client.get('/logout')
+    if user_id in cache:
+        failures.append("Logout entfernt den User nicht aus dem Cache")
+
+    client = login(server, user_id)
+    client.get('/dashboard')
+    with server.app.app_context():
+        user = server.db.session.get(server.User, user_id)
+        user.username = 'umbenannt'
+        server.db.session.commit()
+    if user_id in cache:
+        failures.append("Änderung am User entfernt ihn nicht aus dem Cache")
+
+    client.get('/dashboard')
+    with server.app.app_context():
+        server.db.session.delete(server.db.session.get(server.User, user_id))
+        server.db.session.commit()
+    response = client.get('/dashboard')
+    if response.status_code != 302 or '/login' not in response.headers.get('Location', ''):
+        failures.append(f"gelöschter User noch angemeldet (Status {response.status_code})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recipes', type=int, default=50)
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = load_app()
+    user_id, recipe_ids = seed_user(server, 'identity', n_recipes=args.recipes, n_household=20)
+    with server.app.test_request_context():
+        server.shopping_list_builder.build(user_id, recipe_ids[:20])
+    with server.app.app_context():
+        recorder = Recorder(server.db.engines.values())
+        # Warmer Cache wie nach dem Login
+        server.user_cache.load(user_id)
+
+    covered = exercise_routes(server, recorder, user_id, recipe_ids)
+    found = identity_queries(recorder.statements)
+    routes = sorted(covered - ANONYMOUS)
+    print(f"{len(routes)} eingeloggte Endpoints, {len(found)} Abfragen für den User.")
+    if args.verbose:
+        for route in routes:
+            print(f"  {route}")
+    failures = [f"{route}: {' '.join(sql.split())[:120]}" for route, sql in found]
+
+    with server.app.app_context():
+        # Ohne Rezepte, damit er sich löschen lässt
+        second = server.User(username='identity2', password='x')
+        server.db.session.add(second)
+        server.db.session.commit()
+        second_id = second.id
+    failures += check_cold_cache(server, recorder, second_id)
+    failures += check_invalidation(server, second_id)
+    print(f"User-Cache: {server.user_cache.stats()}")
+    for failure in failures:
+        print(f"FEHLER: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
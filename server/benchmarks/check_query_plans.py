@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# check_query_plans.py
+"""
+Prüft, dass die Routen ihre Tabellen über Indizes lesen: ruft jede Route
+(HTML und API) mit einem gefüllten User auf, sammelt alle SQL-Statements
+und lässt SQLite für jedes SELECT/UPDATE/DELETE den Plan ausgeben
+(EXPLAIN QUERY PLAN). Ein "SCAN <tabelle>" ohne Index ist ein Fehler.
+
+Erlaubt sind Scans über materialisierte Unterabfragen, die FTS-Tabelle
+und die Tabellen in ALLOWED_SCANS (mit Begründung).
+
+Der SSE-Stream wird nicht per Request aufgerufen (er blockiert), seine
+Abfragen werden direkt geprüft.
+
+Beendet sich mit Exit-Code 1, wenn eine Abfrage ohne Index liest.
+
+Aufruf:  python benchmarks/check_query_plans.py [--recipes 200] [-v]
+"""
+import argparse
+import json
+import re
+import sys
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from common import load_app, seed_nutrition, seed_user
+
+# Tabelle -> Grund, warum ein voller Scan dort in Ordnung ist
+ALLOWED_SCANS = {
+    'sqlite_master': 'Schema-Katalog, wenige Zeilen (Prüfung auf die FTS-Tabelle)',
+}
+
+_SCAN_PATTERN = re.compile(r'^SCAN (\S+)')
+_NAMED_SUBQUERY_PATTERN = re.compile(r'^(?:MATERIALIZE|CO-ROUTINE) (\S+)')
+_CHECKED_PREFIXES = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+
+class Recorder:
+    """ Sammelt (Route, SQL, Parameter) aller Statements auf allen Engines. """
+    def __init__(self, engines):
+        self.statements = []
+        self.route = None
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.route and not executemany \
+                and statement.lstrip().upper().startswith(_CHECKED_PREFIXES):
+            self.statements.append((self.route, statement, parameters))
+
+    @contextmanager
+    def at(self, route):
+        self.route = route
+        try:
+            yield
+        finally:
+            self.route = None
+
+
+def full_scans(plan):
+    """ Gibt die Zeilen des Plans zurück, die eine Tabelle ohne Index lesen. """
+    named = set()
+    bad = []
+    for detail in plan:
+        match = _NAMED_SUBQUERY_PATTERN.match(detail)
+        if match:
+            named.add(match.group(1))
+            continue
+        match = _SCAN_PATTERN.match(detail)
+        if not match or 'INDEX' in detail:
+            continue
+        table = match.group(1)
+        if table.startswith('(') or table in named or table in ALLOWED_SCANS:
+            continue
+        bad.append(detail)
+    return bad
+
+
+def explain(engine, statement, parameters):
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters or ())
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+def login(server, user_id):
+    client = server.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def exercise_routes(server, recorder, user_id, recipe_ids):
+    """ Ruft jede Route auf; gibt die Endpoints zurück, die abgedeckt wurden. """
+    app = server.app
+    client = login(server, user_id)
+    anonymous = app.test_client()
+    recipe_id = recipe_ids[len(recipe_ids) // 2]
+    with app.app_context():
+        ingredient = server.Ingredient.query.first().name
+        ingredient_id = server.Ingredient.query.first().id
+
+    def item_ids():
+        with app.app_context():
+            items = (server.ShoppingListItem.query
+                     .join(server.ShoppingList)
+                     .filter(server.ShoppingList.user_id == user_id)
+                     .order_by(server.ShoppingListItem.id).all())
+            return [(item.id, item.version) for item in items]
+
+    def stock_ids():
+        with app.app_context():
+            return [i for (i,) in server.db.session.query(server.HouseholdItem.id)
+                    .filter_by(user_id=user_id).order_by(server.HouseholdItem.id)]
+
+    def plan_entry_id():
+        with app.app_context():
+            return server.db.session.query(server.MealPlanEntry.id).filter_by(
+                user_id=user_id).order_by(server.MealPlanEntry.id).first()[0]
+
+    monday = date.today() - timedelta(days=date.today().weekday())
+    week = {'start': monday.isoformat(), 'weeks': '1'}
+    ingredients = {'ingredient_name[]': [ingredient, 'Neue Zutat'],
+                   'ingredient_amount[]': ['200', '1'],
+                   'ingredient_unit[]': ['g', 'Stk']}
+    calls = [
+        ('home', lambda: anonymous.get('/')),
+        ('register', lambda: anonymous.post('/register', data={
+            'username': 'plancheck', 'password': 'geheim123', 'confirm_password': 'geheim123'})),
+        ('login', lambda: anonymous.post('/login', data={
+            'username': 'plancheck', 'password': 'geheim123'})),
+        ('logout', lambda: anonymous.get('/logout')),
+        ('prometheus_metrics', lambda: anonymous.get('/metrics')),
+        ('dashboard', lambda: client.get('/dashboard')),
+        ('create_recipe', lambda: client.post('/create-recipe', data=dict(
+            ingredients, title='Plan-Check', instructions='Kochen.'))),
+        ('edit_recipe', lambda: client.get(f'/edit-recipe/{recipe_id}')),
+        ('edit_recipe', lambda: client.post(f'/edit-recipe/{recipe_id}', data=dict(
+            ingredients, title='Plan-Check 2', instructions='Kochen.'))),
+        ('my_recipes', lambda: client.get('/my-recipes')),
+        ('my_recipes', lambda: client.get(f'/my-recipes?after={recipe_id}&partial=1')),
+        ('search', lambda: client.get('/search?q=Rezept')),
+        ('search', lambda: client.get('/search?q=Zutat&cookable=1')),
+        ('search_suggest', lambda: client.get('/search/suggest?q=Zu')),
+        ('select_recipes', lambda: client.get('/select_recipes')),
+        ('select_recipes', lambda: client.post('/select_recipes', data={
+            'recipe_ids[]': [str(r) for r in recipe_ids[:20]]})),
+        ('shopping_list', lambda: client.get('/shopping-list')),
+        ('shopping_list', lambda: client.post('/shopping-list', data={
+            'new_item_name': 'Spülmittel', f'purchased_{item_ids()[0][0]}': 'on'})),
+        ('toggle_shopping_item', lambda: client.post(
+            f'/shopping-list/items/{item_ids()[1][0]}/purchased',
+            json={'purchased': True, 'version': item_ids()[1][1]})),
+        ('edit_shopping_list', lambda: client.get('/edit-shopping-list')),
+        ('edit_shopping_list', lambda: client.post('/edit-shopping-list', data={
+            f'purchased_{item_ids()[2][0]}': 'on'})),
+        ('shopping_list', lambda: client.post('/shopping-list', data={
+            f'purchased_{item_ids()[3][0]}': 'on', 'stock_purchased': '1'})),
+        ('inventory', lambda: client.get('/inventory')),
+        ('add_inventory', lambda: client.post('/add-inventory', data={
+            'ingredient_name': ingredient, 'amount': '2', 'unit': 'Stk',
+            'expires_on': date.today().isoformat()})),
+        ('consume_inventory', lambda: client.post(f'/consume-inventory/{stock_ids()[-1]}',
+                                                  data={'amount': '1', 'kind': 'consume'})),
+        ('delete_inventory', lambda: client.post(f'/delete-inventory/{stock_ids()[0]}')),
+        ('meal_plan', lambda: client.get(f'/meal-plan?start={monday}&weeks=2')),
+        ('add_meal_plan_entry', lambda: client.post('/meal-plan/entries', data=dict(
+            week, date=monday.isoformat(), slot='lunch', recipe_id=str(recipe_ids[0]),
+            servings='4'))),
+        ('api_v1.batch_meal_plan', lambda: client.post('/api/v1/meal-plan/batch', json={
+            'operations': [
+                {'op': 'add', 'date': (monday + timedelta(days=i)).isoformat(),
+                 'slot': 'dinner', 'recipe_id': recipe_ids[3 + i]} for i in range(7)
+            ] + [{'op': 'remove', 'id': plan_entry_id()}]})),
+        ('api_v1.get_meal_plan', lambda: client.get(f'/api/v1/meal-plan?start={monday}')),
+        ('api_v1.get_meal_plan_nutrition', lambda: client.get(
+            f'/api/v1/meal-plan/nutrition?start={monday}')),
+        ('repeat_meal_plan', lambda: client.post('/meal-plan/repeat', data=dict(
+            week, times='3'))),
+        ('delete_meal_plan_entry', lambda: client.post(
+            f'/meal-plan/entries/{plan_entry_id()}/delete', data=week)),
+        ('add_meal_plan_entry', lambda: client.post('/meal-plan/entries', data=dict(
+            week, date=monday.isoformat(), slot='lunch', recipe_id=str(recipe_ids[0])))),
+        ('meal_plan_shopping_list', lambda: client.post('/meal-plan/shopping-list', data=dict(
+            week, **{'from': monday.isoformat(),
+                     'to': (monday + timedelta(days=27)).isoformat()}))),
+        ('api_v1.meal_plan_shopping_list', lambda: client.post(
+            '/api/v1/meal-plan/shopping-list',
+            json={'start': monday.isoformat(),
+                  'end': (monday + timedelta(days=13)).isoformat()})),
+        ('delete_recipe', lambda: client.post(f'/delete-recipe/{recipe_ids[0]}')),
+        ('api_v1.list_recipes', lambda: client.get(f'/api/v1/recipes?after={recipe_id}')),
+        ('api_v1.get_recipe', lambda: client.get(f'/api/v1/recipes/{recipe_id}')),
+        ('api_v1.batch_recipes', lambda: client.post('/api/v1/recipes/batch', json={
+            'operations': [
+                {'op': 'create', 'title': 'API', 'ingredients': [{'name': ingredient}]},
+                {'op': 'update', 'id': recipe_ids[1], 'title': 'API 2',
+                 'ingredients': [{'name': ingredient, 'amount': 3, 'unit': 'Stk'}]},
+                {'op': 'delete', 'id': recipe_ids[2]},
+            ]})),
+        ('api_v1.import_recipes', lambda: client.post(
+            '/api/v1/recipes/import?chunk_size=2', content_type='application/x-ndjson',
+            data='\n'.join(json.dumps({'title': f'Import {i}', 'ingredients': [
+                {'name': ingredient, 'amount': 1, 'unit': 'Stk'}, {'name': 'Import-Zutat'}]})
+                for i in range(3)))),
+        ('api_v1.export_recipes', lambda: client.get('/api/v1/recipes/export?format=csv')),
+        ('api_v1.list_inventory', lambda: client.get('/api/v1/inventory')),
+        ('api_v1.batch_inventory', lambda: client.post('/api/v1/inventory/batch', json={
+            'operations': [{'op': 'add', 'name': 'Mehl', 'amount': 1, 'unit': 'kg',
+                            'expires_on': date.today().isoformat()},
+                           {'op': 'consume', 'id': stock_ids()[0], 'amount': 1},
+                           {'op': 'discard', 'id': stock_ids()[1]},
+                           {'op': 'expiry', 'id': stock_ids()[2], 'expires_on': None},
+                           {'op': 'delete', 'id': stock_ids()[3]}]})),
+        ('api_v1.expiring_inventory', lambda: client.get('/api/v1/inventory/expiring?days=7')),
+        ('api_v1.list_inventory_movements', lambda: client.get('/api/v1/inventory/movements')),
+        ('api_v1.list_inventory_movements', lambda: client.get(
+            f'/api/v1/inventory/movements?ingredient_id={ingredient_id}&before=1000')),
+        ('api_v1.get_shopping_list', lambda: client.get('/api/v1/shopping-list')),
+        ('api_v1.generate_shopping_list', lambda: client.post(
+            '/api/v1/shopping-list/generate', json={'recipe_ids': recipe_ids[3:10]})),
+        ('api_v1.batch_shopping_list', lambda: client.post('/api/v1/shopping-list/batch', json={
+            'operations': [
+                {'op': 'set_purchased', 'id': item_ids()[0][0], 'purchased': True},
+                {'op': 'set_purchased', 'id': item_ids()[1][0], 'purchased': False,
+                 'version': item_ids()[1][1]},
+                {'op': 'remove', 'id': item_ids()[2][0]},
+                {'op': 'add', 'name': 'Kerzen'},
+            ]})),
+        ('api_v1.stock_purchased', lambda: client.post('/api/v1/shopping-list/stock-purchased')),
+        ('delete_shopping_list', lambda: client.post('/delete-shopping-list')),
+    ]
+
+    covered = set()
+    for endpoint, call in calls:
+        with recorder.at(endpoint):
+            response = call()
+        if response.status_code >= 400:
+            raise SystemExit(f"{endpoint} lieferte Status {response.status_code}")
+        covered.add(endpoint)
+    return covered
+
+
+def check_event_queries(server, recorder, user_id):
+    """ Abfragen des SSE-Streams, ohne den blockierenden Request. """
+    import shopping_list_events as module
+    with server.app.app_context():
+        engine = server.db.engine
+        with recorder.at('shopping_list_stream'), engine.connect() as connection:
+            connection.execute(module._SINCE_SQL, {'last_id': 0}).all()
+            connection.execute(module._REPLAY_SQL, {'user_id': user_id, 'last_id': 0,
+                                                    'until_id': 10}).all()
+    return {'shopping_list_stream'}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recipes', type=int, default=200)
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = load_app()
+    server.app.testing = True
+    user_id, recipe_ids = seed_user(server, 'plaene', n_recipes=args.recipes, n_household=50)
+    seed_user(server, 'andere', n_recipes=args.recipes, n_household=50, seed=7)
+    seed_nutrition(server)
+    with server.app.test_request_context():
+        server.shopping_list_builder.build(user_id, recipe_ids[:30])
+
+    with server.app.app_context():
+        engines = list(server.db.engines.values())
+        engine = server.db.engine
+    recorder = Recorder(engines)
+    covered = exercise_routes(server, recorder, user_id, recipe_ids)
+    covered |= check_event_queries(server, recorder, user_id)
+
+    endpoints = {rule.endpoint for rule in server.app.url_map.iter_rules()} - {'static'}
+    missing = sorted(endpoints - covered)
+
+    failures = 0
+    seen = set()
+    for route, statement, parameters in recorder.statements:
+        if (route, statement) in seen:
+            continue
+        seen.add((route, statement))
+        plan = explain(engine, statement, parameters)
+        bad = full_scans(plan)
+        if bad or args.verbose:
+            print(f"[{'FEHLER' if bad else 'ok'}] {route}: {' '.join(statement.split())[:160]}")
+            for detail in plan:
+                print(f"         {detail}")
+        failures += bool(bad)
+
+    print(f"\n{len(seen)} Abfragen aus {len(covered)} Endpoints geprüft, "
+          f"{failures} ohne Index.")
+    if missing:
+        print(f"Nicht abgedeckt: {', '.join(missing)}")
+    sys.exit(1 if failures or missing else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+# common.py
+"""
+Gemeinsame Hilfsfunktionen für die Benchmarks.
+Startet die App gegen eine frische SQLite-Datei in einem Temp-Verzeichnis,
+damit keine echte Datenbank angefasst wird.
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+PROJECT_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'project')
+)
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+
+def write_config(workdir=None, extra_config=None):
+    """
+    Legt config/settings.json in workdir an und wechselt dorthin.
+    Gibt workdir zurück.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix='mealmaster-bench-')
+    os.makedirs(os.path.join(workdir, 'config'), exist_ok=True)
+    config = {
+        'database_uri': 'sqlite:///' + os.path.join(workdir, 'bench.db'),
+        'encryption_secret_key': 'bench',
+    }
+    config.update(extra_config or {})
+    with open(os.path.join(workdir, 'config', 'settings.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+
+    os.chdir(workdir)
+    return workdir
+
+
+def migrate(app):
+    """ Führt den Migrationsschritt aus (legt das Schema an). """
+    import migrations
+    from extensions import db
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        migrations.run_all(db.engine)
+
+
+def load_app(workdir=None, extra_config=None):
+    """
+    Schreibt die Konfiguration, legt das Schema an und erzeugt die App.
+    Gibt einen Namespace mit app, db, den Models und den Services zurück
+    (wie app.extensions['mealmaster']).
+    """
+    write_config(workdir, extra_config)
+    import models
+    import server
+
+    app = server.create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    migrate(app)
+    model_classes = {
+        name: value for name, value in vars(models).items()
+        if isinstance(value, type) and issubclass(value, models.db.Model)
+    }
+    return SimpleNamespace(app=app, **model_classes, **vars(app.extensions['mealmaster']))
+
+
+def seed_user(server, username='bench', n_recipes=100, ingredients_per_recipe=8,
+              n_ingredients=300, n_household=30, seed=42):
+    """
+    Legt einen User mit n_recipes Rezepten und n_household Bestands-Items an.
+    Schreibt per Bulk-Insert, damit das Seeding selbst nicht dominiert.
+    Gibt (user_id, recipe_ids) zurück.
+    """
+    rnd = random.Random(seed)
+    db = server.db
+    units = ['g', 'G', 'ml', 'Stk', None]
+    from models import POSITION_STEP
+
+    with server.app.app_context():
+        user = server.User(username=username, password='x')
+        db.session.add(user)
+        db.session.flush()
+
+        existing = db.session.query(server.Ingredient.id).count()
+        if existing < n_ingredients:
+            db.session.execute(db.insert(server.Ingredient), [
+                {'name': f'Zutat {i}'} for i in range(existing, n_ingredients)
+            ])
+        ingredient_ids = [i for (i,) in db.session.query(server.Ingredient.id)]
+
+        db.session.execute(db.insert(server.Recipe), [
+            {'title': f'Rezept {i}', 'instructions': 'Kochen.', 'user_id': user.id}
+            for i in range(n_recipes)
+        ])
+        recipe_ids = [r for (r,) in db.session.query(server.Recipe.id)
+                      .filter_by(user_id=user.id).order_by(server.Recipe.id)]
+
+        rows = []
+        for rid in recipe_ids:
+            for position, ing_id in enumerate(rnd.sample(ingredient_ids, ingredients_per_recipe)):
+                unit = rnd.choice(units)
+                rows.append({
+                    'recipe_id': rid,
+                    'ingredient_id': ing_id,
+                    'amount': None if unit is None else float(rnd.randint(1, 500)),
+                    'unit': unit,
+                    'position': position * POSITION_STEP,
+                })
+        db.session.execute(db.insert(server.RecipeIngredient), rows)
+
+        if n_household:
+            db.session.execute(db.insert(server.HouseholdItem), [
+                {'user_id': user.id, 'ingredient_id': ing_id, 'dimension': 'count',
+                 'amount': 1.0, 'unit': 'stk'}
+                for ing_id in rnd.sample(ingredient_ids, n_household)
+            ])
+        db.session.commit()
+        return user.id, recipe_ids
+
+
+def seed_nutrition(server, coverage=0.9, seed=42):
+    """
+    Lädt Nährwerte für den Anteil coverage aller Zutaten über die CSV-Schnittstelle
+    (NutritionEngine.load_facts) und berechnet alle Rezepte. Gibt die Anzahl
+    der Lebensmittel zurück.
+    """
+    rnd = random.Random(seed)
+    with server.app.app_context():
+        names = [n for (n,) in server.db.session.query(server.Ingredient.name)
+                 .order_by(server.Ingredient.id)]
+        lines = ['name,kcal,protein,fat,carbs,fiber,sugar,salt,density,piece_grams']
+        for name in names:
+            if rnd.random() >= coverage:
+                continue
+            protein, fat, carbs = rnd.uniform(0, 30), rnd.uniform(0, 40), rnd.uniform(0, 80)
+            lines.append(','.join([
+                f'"{name}"', f'{4 * protein + 9 * fat + 4 * carbs:.1f}', f'{protein:.1f}',
+                f'{fat:.1f}', f'{carbs:.1f}', f'{rnd.uniform(0, 10):.1f}',
+                f'{rnd.uniform(0, carbs):.1f}', f'{rnd.uniform(0, 2):.2f}',
+                f'{rnd.uniform(0.5, 1.5):.2f}' if rnd.random() < 0.5 else '',
+                f'{rnd.uniform(20, 200):.0f}' if rnd.random() < 0.7 else '',
+            ]))
+        count = server.nutrition.load_facts(io.StringIO('\n'.join(lines)))
+        server.nutrition.recompute_all()
+    return count
+
+
+def timed(func, repeat=5):
+    """ Führt func repeat-mal aus und gibt die Laufzeiten in ms zurück. """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2
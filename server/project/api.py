@@ -0,0 +1,589 @@
+# api.py
+"""
+Versionierte JSON-API (/api/v1) für Rezepte, Bestand und Einkaufsliste.
+
+Batch-Endpunkte nehmen eine Liste von Operationen entgegen und führen sie
+in einer Transaktion aus: entweder alle oder keine. GET-Antworten tragen
+einen ETag, Clients bekommen bei passendem If-None-Match ein 304.
+"""
+from datetime import timedelta
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from flask_login import current_user
+from sqlalchemy.orm import joinedload, selectinload
+
+import quantity
+import shopping_list_delta
+from inventory import CONSUME, DISCARD, InventoryError, UnknownItem, parse_expiry
+from meal_planner import PlanError, UnknownRecipe, parse_date
+from nutrition import NUTRIENTS
+from models import Recipe, RecipeIngredient, ShoppingList, ShoppingListItem
+from recipe_store import RecipeError, recipe_data
+from recipe_transfer import (
+    FORMATS, MIMETYPES, TransferError, detect_format, export_lines, parse, text_stream
+)
+
+bp = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+# Maximale Anzahl Operationen pro Batch-Request
+MAX_BATCH_SIZE = 500
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400, index=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.index = index
+
+
+def _mm():
+    """ Services der App, siehe app.extensions['mealmaster']. """
+    return current_app.extensions['mealmaster']
+
+
+@bp.before_request
+def _require_login():
+    # Kein Redirect auf die Login-Seite, sondern 401 als JSON
+    if not current_user.is_authenticated:
+        return jsonify(error="Nicht angemeldet"), 401
+
+
+@bp.errorhandler(ApiError)
+def _handle_api_error(error):
+    _mm().db.session.rollback()
+    body = {'error': error.message}
+    if error.index is not None:
+        body['index'] = error.index
+    return jsonify(body), error.status
+
+
+def _conditional(data):
+    """ JSON-Antwort mit ETag; bei passendem If-None-Match wird daraus ein 304. """
+    response = jsonify(data)
+    response.add_etag()
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
+def _operations():
+    payload = request.get_json(silent=True) or {}
+    operations = payload.get('operations') if isinstance(payload, dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise ApiError("'operations' muss eine nicht-leere Liste sein")
+    if len(operations) > MAX_BATCH_SIZE:
+        raise ApiError(f"Höchstens {MAX_BATCH_SIZE} Operationen pro Batch")
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict):
+            raise ApiError("Operation muss ein Objekt sein", index=index)
+    return operations
+
+
+def _text(data, field, index, default=None):
+    """ Textfeld einer Operation oder Zutat, fehlend oder null als default. """
+    value = data.get(field)
+    if value is None:
+        return default
+    if not isinstance(value, str):
+        raise ApiError(f"'{field}' muss Text sein", index=index)
+    return value
+
+
+def _parse_amount(value, index):
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ApiError(f"Ungültige Menge: {value!r}", index=index)
+
+
+def _unit(value):
+    value = (value or '').strip()
+    return value or None
+
+
+# --------------------------------
+# Serialisierung
+# --------------------------------
+def recipe_to_dict(recipe):
+    return {
+        'id': recipe.id,
+        'title': recipe.title,
+        'instructions': recipe.instructions,
+        'servings': recipe.servings,
+        'ingredients': [
+            {'id': ri.id, 'ingredient_id': ri.ingredient_id, 'name': ri.ingredient.name,
+             'amount': ri.amount, 'unit': ri.unit}
+            for ri in recipe.recipe_ingredients
+        ],
+        'nutrition': nutrition_to_dict(recipe.nutrition, recipe.servings),
+    }
+
+
+def nutrition_to_dict(totals, servings=1):
+    """ Nährwerte eines Rezepts, gesamt und je Portion; None, solange nichts berechnet ist. """
+    if totals is None:
+        return None
+    return {
+        'total': {n: getattr(totals, n) for n in NUTRIENTS},
+        'per_serving': {n: round(getattr(totals, n) / servings, 3) for n in NUTRIENTS},
+        'missing': totals.missing,
+    }
+
+
+def household_item_to_dict(item):
+    return {
+        'id': item.id,
+        'ingredient_id': item.ingredient_id,
+        'name': item.ingredient.name,
+        'amount': item.amount,
+        'unit': item.unit,
+        'expires_on': item.expires_on.isoformat() if item.expires_on else None,
+    }
+
+
+def movement_to_dict(movement):
+    return {
+        'id': movement.id,
+        'ingredient_id': movement.ingredient_id,
+        'name': movement.ingredient.name,
+        'kind': movement.kind,
+        'amount': movement.amount,
+        'unit': quantity.display_unit(movement.dimension) or None,
+        'created_at': movement.created_at.isoformat(timespec='seconds'),
+    }
+
+
+def shopping_item_to_dict(item):
+    return {
+        'id': item.id,
+        'ingredient_id': item.ingredient_id,
+        'name': item.ingredient.name if item.ingredient_id else item.custom_name,
+        'amount': item.amount,
+        'unit': item.unit,
+        'purchased': item.purchased,
+        'version': item.version,
+    }
+
+
+# --------------------------------
+# Rezepte
+# --------------------------------
+@bp.route('/recipes')
+def list_recipes():
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    after = request.args.get('after', type=int)
+    query = (Recipe.query
+             .options(selectinload(Recipe.recipe_ingredients)
+                      .joinedload(RecipeIngredient.ingredient),
+                      joinedload(Recipe.nutrition))
+             .filter(Recipe.user_id == current_user.id))
+    if after:
+        query = query.filter(Recipe.id > after)
+    recipes = query.order_by(Recipe.id).limit(limit + 1).all()
+    next_after = recipes[limit - 1].id if len(recipes) > limit else None
+    return _conditional({
+        'recipes': [recipe_to_dict(r) for r in recipes[:limit]],
+        'next_after': next_after,
+    })
+
+
+@bp.route('/recipes/<int:recipe_id>')
+def get_recipe(recipe_id):
+    recipe = _own_recipe(recipe_id)
+    return _conditional(recipe_to_dict(recipe))
+
+
+def _own_recipe(recipe_id, index=None):
+    mm = _mm()
+    recipe = mm.db.session.get(Recipe, recipe_id) if isinstance(recipe_id, int) else None
+    if recipe is None or recipe.user_id != current_user.id:
+        raise ApiError(f"Rezept {recipe_id} nicht gefunden", status=404, index=index)
+    return recipe
+
+
+def _recipe_data(op, index):
+    """ Felder einer create/update-Operation, nur die angegebenen (recipe_store.recipe_data). """
+    ingredients = None
+    if 'ingredients' in op or op.get('op') == 'create':
+        entries = op.get('ingredients') or []
+        if not isinstance(entries, list):
+            raise ApiError("'ingredients' muss eine Liste sein", index=index)
+        ingredients = []
+        for entry in entries:
+            if not isinstance(entry, dict):
+                raise ApiError("Zutat muss ein Objekt sein", index=index)
+            ingredients.append((_text(entry, 'name', index, ''),
+                                _parse_amount(entry.get('amount'), index),
+                                _unit(_text(entry, 'unit', index))))
+    try:
+        return recipe_data(
+            title=_text(op, 'title', index, '' if op.get('op') == 'create' else None),
+            instructions=_text(op, 'instructions', index),
+            servings=op.get('servings'),
+            ingredients=ingredients,
+        )
+    except RecipeError as error:
+        raise ApiError(error.message, index=index)
+
+
+@bp.route('/recipes/batch', methods=['POST'])
+def batch_recipes():
+    """
+    Operationen:
+      {"op": "create", "title": ..., "instructions": ..., "servings": n (optional),
+       "ingredients": [{name, amount, unit}]}
+      {"op": "update", "id": ..., "title": ..., "instructions": ..., "servings": n,
+       "ingredients": [...]}
+      {"op": "delete", "id": ...}
+    Bei update bleiben fehlende Felder unverändert, Zutaten werden mit den
+    gespeicherten abgeglichen (recipe_store.py).
+    """
+    mm = _mm()
+    store = mm.recipe_store
+    operations = _operations()
+
+    # Alle Zutatennamen des Batches mit einem Resolver-Aufruf auflösen
+    parsed = [_recipe_data(op, i) if op.get('op') in ('create', 'update') else {}
+              for i, op in enumerate(operations)]
+    ingredient_ids = store.resolve(parsed)
+
+    results = []
+    for index, (op, data) in enumerate(zip(operations, parsed)):
+        kind = op.get('op')
+        if kind == 'create':
+            recipe = store.create(current_user.id, data, ingredient_ids)
+        elif kind == 'update':
+            recipe = _own_recipe(op.get('id'), index)
+            store.update(recipe, data, ingredient_ids)
+        elif kind == 'delete':
+            recipe = _own_recipe(op.get('id'), index)
+            store.delete(recipe)
+        else:
+            raise ApiError(f"Unbekannte Operation: {kind!r}", index=index)
+        results.append({'op': kind, 'id': recipe.id})
+
+    mm.db.session.commit()
+    return jsonify(results=results)
+
+
+@bp.route('/recipes/import', methods=['POST'])
+def import_recipes():
+    """
+    Datei als multipart-Feld "file" oder direkt als Body (Content-Type
+    application/x-ndjson oder text/csv). ?format=jsonl|csv überschreibt die
+    Erkennung, ?chunk_size= die Rezepte pro Transaktion. Siehe recipe_transfer.py.
+    """
+    upload = request.files.get('file')
+    if upload is not None:
+        stream, fmt = upload.stream, detect_format(upload.filename, upload.mimetype)
+    else:
+        stream, fmt = request.stream, detect_format(mimetype=request.mimetype)
+    fmt = request.args.get('format', fmt)
+    if fmt not in FORMATS:
+        raise ApiError(f"Format muss eines von {', '.join(FORMATS)} sein")
+    try:
+        totals = _mm().recipe_importer.import_recipes(
+            current_user.id, parse(text_stream(stream), fmt),
+            chunk_size=request.args.get('chunk_size', type=int),
+        )
+    except TransferError as error:
+        # Vorherige Blöcke sind schon committet, daher die Zahlen mitschicken
+        return jsonify(error=str(error), line=error.line, imported=error.imported), 400
+    return jsonify(totals)
+
+
+@bp.route('/recipes/export')
+def export_recipes():
+    """ Alle Rezepte als JSON-Lines oder CSV (?format=), als Stream ausgeliefert. """
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in FORMATS:
+        raise ApiError(f"Format muss eines von {', '.join(FORMATS)} sein")
+    body = export_lines(_mm().db, current_user.id, fmt)
+    return Response(stream_with_context(body), mimetype=MIMETYPES[fmt], headers={
+        'Content-Disposition': f'attachment; filename="rezepte.{fmt}"',
+    })
+
+
+# --------------------------------
+# Bestand
+# --------------------------------
+@bp.route('/inventory')
+def list_inventory():
+    items = _mm().inventory.items(current_user.id)
+    return _conditional({'items': [household_item_to_dict(i) for i in items]})
+
+
+@bp.route('/inventory/expiring')
+def expiring_inventory():
+    """ ?days=n: läuft in höchstens n Tagen ab (Standard: inventory_expiry_days). """
+    items = _mm().inventory.expiring(current_user.id, request.args.get('days', type=int))
+    return _conditional({'items': [household_item_to_dict(i) for i in items]})
+
+
+@bp.route('/inventory/movements')
+def list_inventory_movements():
+    """ Bewegungsbuch, neueste zuerst: ?ingredient_id=&before=&limit= (höchstens 500). """
+    limit = min(max(request.args.get('limit', 100, type=int), 1), MAX_BATCH_SIZE)
+    movements = _mm().inventory.movements(
+        current_user.id, ingredient_id=request.args.get('ingredient_id', type=int),
+        before_id=request.args.get('before', type=int), limit=limit,
+    )
+    return jsonify(
+        movements=[movement_to_dict(m) for m in movements],
+        before=movements[-1].id if len(movements) == limit else None,
+    )
+
+
+@bp.route('/inventory/batch', methods=['POST'])
+def batch_inventory():
+    """
+    Operationen:
+      {"op": "add", "name": ..., "amount": ..., "unit": ..., "expires_on": "YYYY-MM-DD"}
+      {"op": "consume", "id": ..., "amount": ..., "unit": ...}   (ohne amount: alles)
+      {"op": "discard", "id": ..., "amount": ..., "unit": ...}   (ohne amount: alles)
+      {"op": "delete", "id": ...}                                 (wie discard ohne amount)
+      {"op": "expiry", "id": ..., "expires_on": "YYYY-MM-DD" | null}
+    Alle "add" werden zuerst und zusammen gebucht, siehe inventory.py.
+    """
+    mm = _mm()
+    inventory = mm.inventory
+    operations = _operations()
+    adds, add_indexes, others = [], [], []
+    for index, op in enumerate(operations):
+        kind = op.get('op')
+        if kind == 'add':
+            adds.append({'name': _text(op, 'name', index, ''),
+                         'amount': _parse_amount(op.get('amount'), index),
+                         'unit': _unit(_text(op, 'unit', index)),
+                         'expires_on': op.get('expires_on')})
+            add_indexes.append(index)
+        elif kind in ('consume', 'discard', 'delete', 'expiry'):
+            others.append((index, op))
+        else:
+            raise ApiError(f"Unbekannte Operation: {kind!r}", index=index)
+
+    deleted = []
+    try:
+        added = inventory.purchase(current_user.id, adds) if adds else []
+    except InventoryError as error:
+        index = add_indexes[error.index] if error.index is not None else None
+        raise ApiError(error.message, index=index)
+    for index, op in others:
+        kind = op.get('op')
+        try:
+            if kind == 'expiry':
+                inventory.set_expiry(current_user.id, op.get('id'),
+                                     parse_expiry(op.get('expires_on')))
+                continue
+            amount = None if kind == 'delete' else _parse_amount(op.get('amount'), index)
+            inventory.take(current_user.id, op.get('id'), amount, _unit(_text(op, 'unit', index)),
+                           kind=CONSUME if kind == 'consume' else DISCARD)
+        except InventoryError as error:
+            status = 404 if isinstance(error, UnknownItem) else 400
+            raise ApiError(error.message, status=status, index=index)
+        if kind == 'delete':
+            deleted.append(op.get('id'))
+    mm.db.session.commit()
+    return jsonify(added=added, deleted=deleted, applied=len(operations))
+
+
+# --------------------------------
+# Einkaufsliste
+# --------------------------------
+def _own_shopping_list():
+    slist = ShoppingList.query.filter_by(user_id=current_user.id).first()
+    if slist is None:
+        raise ApiError("Keine Einkaufsliste vorhanden", status=404)
+    return slist
+
+
+@bp.route('/shopping-list')
+def get_shopping_list():
+    slist = (ShoppingList.query
+             .options(selectinload(ShoppingList.items)
+                      .joinedload(ShoppingListItem.ingredient))
+             .filter_by(user_id=current_user.id)
+             .first())
+    if slist is None:
+        raise ApiError("Keine Einkaufsliste vorhanden", status=404)
+    return _conditional({
+        'id': slist.id,
+        'created_at': slist.created_at.isoformat() if slist.created_at else None,
+        'items': [shopping_item_to_dict(i) for i in sorted(slist.items, key=lambda i: i.id)],
+    })
+
+
+@bp.route('/shopping-list/generate', methods=['POST'])
+def generate_shopping_list():
+    """ Wie select_recipes: {"recipe_ids": [...]} ersetzt die aktuelle Liste. """
+    mm = _mm()
+    payload = request.get_json(silent=True) or {}
+    recipe_ids = payload.get('recipe_ids')
+    if not isinstance(recipe_ids, list):
+        raise ApiError("'recipe_ids' muss eine Liste sein")
+    list_id, lines = mm.shopping_list_builder.build(current_user.id, recipe_ids)
+    return jsonify(id=list_id, items=len(lines)), 201
+
+
+@bp.route('/shopping-list/batch', methods=['POST'])
+def batch_shopping_list():
+    """
+    Operationen:
+      {"op": "set_purchased", "id": ..., "purchased": true|false, "version": n (optional)}
+      {"op": "add", "name": ..., "amount": ..., "unit": ...}
+      {"op": "remove", "id": ...}
+    """
+    mm = _mm()
+    session = mm.db.session
+    operations = _operations()
+    slist = _own_shopping_list()
+    items = {item.id: item for item in slist.items}
+
+    added = []
+    events = []
+    for index, op in enumerate(operations):
+        kind = op.get('op')
+        if kind in ('set_purchased', 'remove'):
+            item = items.get(op.get('id'))
+            if item is None:
+                raise ApiError(f"Artikel {op.get('id')} nicht gefunden", status=404, index=index)
+            if kind == 'set_purchased' and 'version' in op:
+                # Mit Version: optimistische Prüfung wie beim Einzel-Toggle
+                result = shopping_list_delta.set_purchased(
+                    session, current_user.id, item.id, bool(op.get('purchased')), op['version']
+                )
+                if result.status == 'conflict':
+                    raise ApiError(f"Artikel {item.id} wurde inzwischen geändert",
+                                   status=409, index=index)
+                if result.status == 'updated':
+                    events.append(('check', {'id': item.id, 'purchased': result.purchased,
+                                             'version': result.version}))
+            elif kind == 'set_purchased':
+                item.purchased = bool(op.get('purchased'))
+                item.version += 1
+                events.append(('check', {'id': item.id, 'purchased': item.purchased,
+                                         'version': item.version}))
+            else:
+                session.delete(item)
+                del items[item.id]
+                events.append(('remove', {'id': item.id}))
+        elif kind == 'add':
+            name = _text(op, 'name', index, '').strip()
+            if not name:
+                raise ApiError("Name fehlt", index=index)
+            item = ShoppingListItem(shopping_list_id=slist.id, custom_name=name,
+                                       amount=_parse_amount(op.get('amount'), index),
+                                       unit=_unit(_text(op, 'unit', index)), purchased=False)
+            session.add(item)
+            added.append(item)
+        else:
+            raise ApiError(f"Unbekannte Operation: {kind!r}", index=index)
+
+    # Events gehen mit derselben Transaktion raus wie die Änderungen
+    session.flush()
+    for item in added:
+        events.append(('add', {'id': item.id, 'name': item.custom_name,
+                               'amount': item.amount, 'unit': item.unit}))
+    for kind, payload in events:
+        mm.shopping_list_events.publish(current_user.id, kind, payload, slist.id)
+    session.commit()
+    return jsonify(added=[i.id for i in added], applied=len(operations))
+
+
+@bp.route('/shopping-list/stock-purchased', methods=['POST'])
+def stock_purchased():
+    """ Abgehakte Artikel mit Zutat in den Bestand übernehmen und von der Liste nehmen. """
+    mm = _mm()
+    stocked = mm.inventory.stock_purchased(current_user.id)
+    mm.db.session.commit()
+    return jsonify(stocked=stocked)
+
+
+# --------------------------------
+# Essensplan
+# --------------------------------
+def _plan_range(values):
+    try:
+        start = parse_date(values.get('start'))
+        end = parse_date(values.get('end')) if values.get('end') else start + timedelta(days=6)
+        _mm().meal_planner.check_range(start, end)
+    except PlanError as error:
+        raise ApiError(error.message)
+    return start, end
+
+
+@bp.route('/meal-plan')
+def get_meal_plan():
+    """ ?start=YYYY-MM-DD&end=YYYY-MM-DD (ohne end: eine Woche). """
+    start, end = _plan_range(request.args)
+    entries = _mm().meal_planner.entries(current_user.id, start, end)
+    return _conditional({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'entries': [
+            {'id': e.id, 'date': e.plan_date.isoformat(), 'slot': e.slot,
+             'recipe_id': e.recipe_id, 'title': e.title, 'servings': e.servings,
+             'recipe_servings': e.recipe_servings}
+            for e in entries
+        ],
+    })
+
+
+@bp.route('/meal-plan/nutrition')
+def get_meal_plan_nutrition():
+    """ Nährwerte je geplantem Tag, ?start=&end= wie /meal-plan. """
+    start, end = _plan_range(request.args)
+    totals = _mm().nutrition.plan_totals(current_user.id, start, end)
+    return _conditional({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': [
+            dict({n: round(getattr(row, n), 3) for n in NUTRIENTS},
+                 date=day.isoformat(), meals=row.meals, incomplete=row.incomplete)
+            for day, row in totals.items()
+        ],
+    })
+
+
+@bp.route('/meal-plan/batch', methods=['POST'])
+def batch_meal_plan():
+    """
+    Operationen:
+      {"op": "add", "date": "YYYY-MM-DD", "slot": ..., "recipe_id": ..., "servings": n (optional)}
+      {"op": "remove", "id": ...}
+    """
+    mm = _mm()
+    operations = _operations()
+    adds, add_indexes, remove_ids = [], [], []
+    for index, op in enumerate(operations):
+        kind = op.get('op')
+        if kind == 'add':
+            adds.append(op)
+            add_indexes.append(index)
+        elif kind == 'remove':
+            remove_ids.append(op.get('id'))
+        else:
+            raise ApiError(f"Unbekannte Operation: {kind!r}", index=index)
+
+    try:
+        added = mm.meal_planner.add_many(current_user.id, adds)
+    except PlanError as error:
+        index = add_indexes[error.index] if error.index is not None else None
+        status = 404 if isinstance(error, UnknownRecipe) else 400
+        raise ApiError(error.message, status=status, index=index)
+    if remove_ids:
+        removed = mm.meal_planner.remove(current_user.id, remove_ids)
+        if removed != len(set(remove_ids)):
+            raise ApiError("Mindestens eine Mahlzeit wurde nicht gefunden", status=404)
+    mm.db.session.commit()
+    return jsonify(added=added, removed=sorted(set(remove_ids)))
+
+
+@bp.route('/meal-plan/shopping-list', methods=['POST'])
+def meal_plan_shopping_list():
+    """ {"start": ..., "end": ...} ersetzt die Einkaufsliste durch den Bedarf des Zeitraums. """
+    start, end = _plan_range(request.get_json(silent=True) or {})
+    list_id, lines = _mm().meal_planner.build_shopping_list(current_user.id, start, end)
+    return jsonify(id=list_id, items=len(lines)), 201
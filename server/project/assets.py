@@ -0,0 +1,145 @@
+# assets.py
+"""
+Statische Dateien mit Fingerprint und asset_url() für die Templates.
+
+Build-Schritt (python -m assets, im Dockerfile): jede Datei aus static/ wird
+unter einem Namen mit Inhalts-Hash nach static/dist/ kopiert
+(css/styles.css -> css/styles.3f2a9c1b0d4e.css), CSS und JS zusätzlich
+vorkomprimiert als .gz und, wenn das Paket brotli installiert ist, als .br.
+static/dist/manifest.json ordnet Originalnamen den Namen mit Hash zu.
+
+Zur Laufzeit liest Assets das Manifest einmal (im uWSGI-Master, vor dem
+fork) und stellt asset_url('css/styles.css') bereit. Eine Datei mit Hash
+ändert sich nie, sie darf also ein Jahr gecacht werden: uWSGI liefert
+/static/dist/ per --static-map ohne Python aus (docker-compose.yml), nginx
+direkt aus dem Dateisystem (nginy.conf). Fällt eine Anfrage doch bis zu
+Flask durch, setzt Assets dieselben Header.
+
+Ohne Manifest (Entwicklung ohne Build) zeigt asset_url() auf die Originale,
+die Flask wie bisher ohne langes Caching ausliefert.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+from flask import request, url_for
+
+try:
+    import brotli
+except ImportError:  # optional, dann nur gzip
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+# Nur Text lohnt das Komprimieren, Bilder und Schriften sind es schon
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt')
+MAX_AGE = 365 * 24 * 3600
+
+
+def fingerprinted_name(filename: str, data: bytes) -> str:
+    """ css/styles.css -> css/styles.<hash>.css """
+    root, ext = os.path.splitext(filename)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def build(static_dir: str) -> dict:
+    """
+    Baut static_dir/dist neu auf und gibt das Manifest zurück.
+    Komprimierte Varianten werden nur abgelegt, wenn sie kleiner sind.
+    """
+    out_dir = os.path.join(static_dir, DIST_DIR)
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        # dist/ entsteht beim Schreiben neu, nie die eigene Ausgabe einlesen
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != out_dir)
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            filename = os.path.relpath(path, static_dir).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                data = f.read()
+            hashed = fingerprinted_name(filename, data)
+            target = os.path.join(out_dir, hashed)
+            _write(target, data)
+            if os.path.splitext(name)[1] in COMPRESS_EXTENSIONS:
+                # mtime=0, damit gleiche Eingaben gleiche Dateien ergeben
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(compressed) < len(data):
+                    _write(target + '.gz', compressed)
+                if brotli is not None:
+                    compressed = brotli.compress(data, quality=11)
+                    if len(compressed) < len(data):
+                        _write(target + '.br', compressed)
+            manifest[filename] = f"{DIST_DIR}/{hashed}"
+
+    # Manifest zuletzt, erst dann gibt es die Dateien, auf die es zeigt
+    tmp = os.path.join(out_dir, MANIFEST + '.tmp')
+    _write(tmp, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    os.replace(tmp, os.path.join(out_dir, MANIFEST))
+    return manifest
+
+
+class Assets:
+    """
+    Liest static/dist/manifest.json und stellt asset_url() in den Templates
+    bereit. version ändert sich mit jedem Build (leer ohne Manifest); der
+    Render-Cache nimmt sie in den Schlüssel, damit keine gecachte Seite auf
+    Dateien eines alten Builds zeigt.
+    """
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.version = ''
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        path = os.path.join(app.static_folder, DIST_DIR, MANIFEST)
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            app.logger.info("assets: kein Manifest unter %s, Dateien ohne Fingerprint", path)
+        else:
+            self.manifest = json.loads(raw)
+            self.version = hashlib.sha256(raw).hexdigest()[:HASH_LENGTH]
+        app.add_template_global(self.url, 'asset_url')
+        app.after_request(self._cache_headers)
+
+    def url(self, filename: str) -> str:
+        return url_for('static', filename=self.manifest.get(filename, filename))
+
+    def _cache_headers(self, response):
+        if (request.endpoint == 'static' and response.status_code in (200, 304)
+                and request.view_args['filename'].startswith(DIST_DIR + '/')):
+            response.cache_control.no_cache = None  # Flask-Standard ohne max-age
+            response.cache_control.public = True
+            response.cache_control.max_age = MAX_AGE
+            response.cache_control.immutable = True
+        return response
+
+
+# --------------------------------
+# MAIN
+# --------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m assets")
+    parser.add_argument('--static-dir', default=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'static'))
+    args = parser.parse_args()
+
+    manifest = build(args.static_dir)
+    for filename, hashed in sorted(manifest.items()):
+        print(f"{filename} -> {hashed}")
+    if brotli is None:
+        print("brotli nicht installiert, nur gzip")
@@ -0,0 +1,243 @@
+# audit_log.py
+"""
+Asynchrones Ereignisprotokoll (Logins, Rezepte, Einkaufsliste).
+
+Requests legen Events nur in eine begrenzte Queue; ein Hintergrund-Thread
+pro Worker schreibt sie gesammelt als JSON-Zeilen nach
+<audit_log_dir>/audit-JJJJ-MM-TT.jsonl (eine Datei pro Tag, alte Dateien
+werden nach audit_retention_days gelöscht). Jeder Stapel ist ein einziger
+append-Schreibzugriff, so können alle Worker in dieselbe Datei schreiben.
+
+Logins aktualisieren außerdem user.last_login und user.ip_address, ebenfalls
+gesammelt in einer Transaktion pro Stapel. Der Login-Request selbst schreibt
+damit weder auf die Platte noch in die Datenbank.
+
+record() merkt Events bis zum Commit der laufenden Session vor und verwirft
+sie beim Rollback; emit() reiht sofort ein. Ist die Queue voll, wird das
+Event verworfen und gezählt, der Request wartet nie. Beim regulären
+Beenden (atexit) schreibt close() den Rest.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+
+log = logging.getLogger(__name__)
+
+_UPDATE_LOGIN_SQL = text(
+    'UPDATE "user" SET last_login = :last_login, ip_address = :ip_address WHERE id = :user_id'
+)
+
+_PENDING_KEY = 'audit_pending'
+
+
+class AuditLog:
+    def __init__(self, db, directory: str = 'logs', max_queue: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 1.0,
+                 retention_days: int = 30):
+        self.db = db
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.engine = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+        self._stop = threading.Event()
+        # Logins, deren DB-Update noch aussteht (user_id -> Parameter)
+        self._pending_logins = {}
+        self._current_day = None
+        self._stats = {'written': 0, 'dropped': 0, 'logins': 0}
+        _listen_once(db)
+        atexit.register(self.close)
+
+    # ----------------------------
+    # Erfassen (im Request)
+    # ----------------------------
+    def record(self, kind: str, user_id: int = None, **data):
+        """ Event zum Commit der laufenden Transaktion vormerken. """
+        pending = self.db.session.info.setdefault(_PENDING_KEY, [])
+        pending.append((self, self._event(kind, user_id, data)))
+
+    def emit(self, kind: str, user_id: int = None, **data):
+        """ Event sofort einreihen, ohne Transaktion. """
+        self._enqueue(self._event(kind, user_id, data))
+
+    def record_login(self, user_id: int, username: str, ip_address: str = None):
+        if self.engine is None:
+            # Im Request binden, der Schreib-Thread läuft ohne App-Kontext
+            self.engine = self.db.engine
+        # Ortszeit und Format wie bisher in user.last_login
+        login_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.emit('login', user_id, username=username, ip_address=ip_address,
+                  login_at=login_at)
+
+    def _event(self, kind, user_id, data):
+        return dict(data, ts=datetime.utcnow().isoformat(timespec='milliseconds'),
+                    kind=kind, user_id=user_id, pid=os.getpid())
+
+    def _enqueue(self, entry):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, queued=self._queue.qsize())
+
+    def metric_samples(self):
+        """ Zähler für metrics.Metrics.add_collector. """
+        stats = self.stats()
+        return [('mealmaster_audit_events_total', {'result': result}, stats[result])
+                for result in ('written', 'dropped')]
+
+    # ----------------------------
+    # Schreib-Thread
+    # ----------------------------
+    def _ensure_thread(self):
+        # Ein Thread pro Worker, erst nach dem fork gestartet
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-log', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch(timeout=self.flush_interval)
+            if batch or self._pending_logins:
+                self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _take_batch(self, timeout=None):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait())
+        except queue.Empty:
+            return batch
+        # Was sich inzwischen angesammelt hat, kommt in denselben Stapel
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        for entry in batch:
+            if entry['kind'] == 'login':
+                self._pending_logins[entry['user_id']] = {
+                    'user_id': entry['user_id'],
+                    'last_login': entry['login_at'],
+                    'ip_address': entry.get('ip_address'),
+                }
+        if batch:
+            self._append(batch)
+        if self._pending_logins and self.engine is not None:
+            self._update_logins()
+
+    def _append(self, batch):
+        day = datetime.utcnow().strftime('%Y-%m-%d')
+        path = os.path.join(self.directory, f"audit-{day}.jsonl")
+        data = ''.join(json.dumps(entry, ensure_ascii=False, default=str) + '\n'
+                       for entry in batch).encode('utf-8')
+        try:
+            if day != self._current_day:
+                os.makedirs(self.directory, exist_ok=True)
+                self._current_day = day
+                self._remove_old_files()
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+        except OSError as error:
+            log.warning("Audit-Log konnte nicht geschrieben werden: %s", error)
+            return
+        with self._lock:
+            self._stats['written'] += len(batch)
+
+    def _update_logins(self):
+        rows = list(self._pending_logins.values())
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(_UPDATE_LOGIN_SQL, rows)
+        except SQLAlchemyError as error:
+            # Bleibt vorgemerkt und wird mit dem nächsten Stapel versucht
+            log.warning("last_login konnte nicht gespeichert werden: %s", error)
+            return
+        for row in rows:
+            if self._pending_logins.get(row['user_id']) is row:
+                del self._pending_logins[row['user_id']]
+        with self._lock:
+            self._stats['logins'] += len(rows)
+
+    def _remove_old_files(self):
+        cutoff = (datetime.utcnow() - timedelta(days=self.retention_days)).strftime('%Y-%m-%d')
+        for path in glob.glob(os.path.join(self.directory, 'audit-*.jsonl')):
+            if os.path.basename(path)[6:16] < cutoff:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def flush(self, timeout: float = 5.0):
+        """ Wartet, bis die Queue leer ist (z.B. in Benchmarks). """
+        deadline = time.monotonic() + timeout
+        while (self._queue.unfinished_tasks or self._pending_logins) \
+                and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self):
+        """ Beendet den Thread dieses Prozesses und schreibt, was noch in der Queue liegt. """
+        if self._thread_pid != os.getpid():
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.flush_interval + 5)
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                break
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+        if self._pending_logins and self.engine is not None:
+            self._update_logins()
+        self._thread_pid = None
+
+
+def _after_commit(session):
+    for audit_log, entry in session.info.pop(_PENDING_KEY, ()):
+        audit_log._enqueue(entry)
+
+
+def _after_rollback(session, previous_transaction):
+    # Nur das Zurückrollen der äußeren Transaktion verwirft die Events
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
+
+
+def _listen_once(db):
+    # Die Listener hängen an der gemeinsamen Session, jedes Event kennt sein Log
+    if not event.contains(db.session, 'after_commit', _after_commit):
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_soft_rollback', _after_rollback)
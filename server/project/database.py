@@ -0,0 +1,171 @@
+# database.py
+"""
+Datenbank-Konfiguration: Pool-Größen, SQLite-PRAGMAs und Lese-Routing.
+
+Bei SQLite bekommt jede neue Verbindung beim Öffnen ihre PRAGMAs (WAL,
+synchronous=NORMAL, busy_timeout, mmap_size, cache_size). Schreibende
+Transaktionen starten mit BEGIN IMMEDIATE: sie holen sich die Schreibsperre
+gleich am Anfang und warten dabei busy_timeout lang. Eine Lese-Transaktion,
+die erst später zum Schreiben wechselt, bekäme sonst sofort "database is
+locked", ohne zu warten.
+
+Jede SQLite-Verbindung, auch ohne Tuning, kennt die SQL-Funktion
+unit_key(unit) (quantity.unit_key), damit Abfragen Einheiten genau wie der
+Python-Code normalisieren.
+
+Requests mit GET/HEAD/OPTIONS lesen über eine eigene Verbindung (Bind
+"read", deferred BEGIN, query_only). In WAL blockieren Leser weder
+Schreiber noch umgekehrt. Schreibt so ein Request doch, wechselt die
+Session für den Rest des Requests auf die Schreibverbindung. POST-Routen,
+die normalerweise nur lesen (z.B. login), markiert @read_mostly genauso.
+
+Konfiguration (config/settings.json, alle optional):
+  sqlite_tuning          PRAGMAs und BEGIN IMMEDIATE an/aus (true)
+  sqlite_busy_timeout_ms Wartezeit auf Sperren (5000)
+  sqlite_mmap_size       Bytes Memory-Mapped I/O (268435456)
+  sqlite_cache_size_kb   Page-Cache je Verbindung in KiB (8192)
+  db_pool_size           Schreibverbindungen je Worker (2, = uWSGI-Threads)
+  db_max_overflow        zusätzliche Schreibverbindungen (2)
+  db_pool_timeout        Sekunden Wartezeit auf eine freie Verbindung (10)
+  db_read_routing        Lese-Requests über eigene Verbindung (true)
+  db_read_pool_size      Leseverbindungen je Worker (4)
+  database_read_uri      eigene Lese-Datenbank (Replikat), nur ohne SQLite nötig
+"""
+import functools
+
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.elements import TextClause
+
+import quantity
+
+READ_BIND = 'read'
+
+_SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+_READ_PREFIXES = ('SELECT', 'WITH', 'PRAGMA')
+
+
+def _is_write(clause):
+    if clause is None:
+        return False
+    if isinstance(clause, TextClause):
+        return not clause.text.lstrip().upper().startswith(_READ_PREFIXES)
+    return bool(getattr(clause, 'is_dml', False) or getattr(clause, 'is_ddl', False))
+
+
+class RoutingSession(Session):
+    """
+    Session, die in lesenden Requests die Leseverbindung nimmt. Sobald
+    geschrieben wird (flush oder DML), bleibt sie bis zum Ende auf der
+    Schreibverbindung, damit sie ihre eigenen Änderungen sieht.
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None
+                and not self.info.get('writer')
+                and has_request_context()
+                and (request.method in _SAFE_METHODS or self.info.get('read_mostly'))):
+            if self._flushing or _is_write(clause):
+                self.info['writer'] = True
+            else:
+                engine = self._db.engines.get(READ_BIND)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_mostly(view):
+    """
+    Die Route liest über die Leseverbindung, auch bei POST. Sie wartet so
+    nicht per BEGIN IMMEDIATE auf fremde Schreiber, solange sie selbst
+    nichts schreibt.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        current_app.extensions['sqlalchemy'].session.info['read_mostly'] = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def read_engine(db):
+    """ Engine für reine Lesezugriffe außerhalb der Session (z.B. Poll-Threads). """
+    return db.engines.get(READ_BIND, db.engine)
+
+
+def _is_sqlite_file(url):
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def init_app(app, db, manager):
+    """
+    Setzt Engine-Optionen und Binds aus der Konfiguration und bindet db an
+    die App (ersetzt db.init_app). Danach werden die Connect-Hooks an die
+    Engines gehängt; geöffnet wird dabei noch keine Verbindung.
+    """
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    url = make_url(uri)
+    sqlite_file = _is_sqlite_file(url)
+    tuning = sqlite_file and manager.get_config("sqlite_tuning", True)
+
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': manager.get_config("db_pool_size", 2),
+        'max_overflow': manager.get_config("db_max_overflow", 2),
+        'pool_timeout': manager.get_config("db_pool_timeout", 10),
+    }
+
+    read_uri = manager.get_config("database_read_uri")
+    if read_uri is None and sqlite_file:
+        # Gleiche Datei, eigene Verbindungen
+        read_uri = uri
+    if read_uri and manager.get_config("db_read_routing", True):
+        app.config['SQLALCHEMY_BINDS'] = {READ_BIND: {
+            'url': read_uri,
+            'pool_size': manager.get_config("db_read_pool_size", 4),
+            'max_overflow': manager.get_config("db_max_overflow", 2),
+            'pool_timeout': manager.get_config("db_pool_timeout", 10),
+        }}
+
+    db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                _install_functions(engine)
+    if not tuning:
+        return
+
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(manager.get_config('sqlite_busy_timeout_ms', 5000))}",
+        "PRAGMA synchronous = NORMAL",
+        f"PRAGMA mmap_size = {int(manager.get_config('sqlite_mmap_size', 268435456))}",
+        f"PRAGMA cache_size = -{int(manager.get_config('sqlite_cache_size_kb', 8192))}",
+    ]
+    with app.app_context():
+        for key, engine in db.engines.items():
+            if key == READ_BIND:
+                _install_hooks(engine, pragmas + ["PRAGMA query_only = ON"], "BEGIN")
+            else:
+                # journal_mode wird in der Datei gespeichert, einmal schreibend reicht
+                _install_hooks(engine, ["PRAGMA journal_mode = WAL"] + pragmas,
+                               "BEGIN IMMEDIATE")
+
+
+def _install_functions(engine):
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function('unit_key', 1, quantity.unit_key, deterministic=True)
+
+
+def _install_hooks(engine, pragmas, begin):
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        # pysqlite soll keine eigenen Transaktionen öffnen, das übernimmt _on_begin
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def _on_begin(connection):
+        connection.exec_driver_sql(begin)
@@ -0,0 +1,18 @@
+# extensions.py
+"""
+Flask-Erweiterungen ohne gebundene App. create_app() (server.py) bindet sie
+per init_app, Models, Formulare und Routen können sie so direkt importieren.
+"""
+from flask_bcrypt import Bcrypt
+from flask_login import LoginManager
+from flask_sqlalchemy import SQLAlchemy
+
+from database import RoutingSession
+
+# Lesende Requests gehen über eine eigene Verbindung, siehe database.py
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+bcrypt = Bcrypt()
+
+# Flask-Login konfigurieren
+login_manager = LoginManager()
+login_manager.login_view = 'login'   # Route-Name deiner Login-Funktion
@@ -0,0 +1,31 @@
+# forms.py
+from flask_wtf import FlaskForm
+from wtforms import StringField, PasswordField, SubmitField
+from wtforms.validators import InputRequired, Length, EqualTo
+
+
+class RegisterForm(FlaskForm):
+    username = StringField(
+        validators=[InputRequired(), Length(min=3, max=20)],
+        render_kw={"placeholder": "Username"}
+    )
+    password = PasswordField(
+        validators=[InputRequired(), Length(min=8)],
+        render_kw={"placeholder": "Password"}
+    )
+    confirm_password = PasswordField(
+        validators=[InputRequired(), EqualTo('password', message='Passwords must match')],
+        render_kw={"placeholder": "Confirm Password"}
+    )
+    submit = SubmitField('Register')
+
+class LoginForm(FlaskForm):
+    username = StringField(
+        validators=[InputRequired(), Length(min=3, max=20)],
+        render_kw={"placeholder": "Username"}
+    )
+    password = PasswordField(
+        validators=[InputRequired(), Length(min=8)],
+        render_kw={"placeholder": "Password"}
+    )
+    submit = SubmitField('Login')
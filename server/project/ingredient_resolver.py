@@ -0,0 +1,150 @@
+# ingredient_resolver.py
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Maximale Länge von Ingredient.name
+NAME_MAX_LENGTH = 100
+
+
+def normalize_name(name: str) -> str:
+    """ Entfernt überflüssige Leerzeichen, damit "  Tomate " == "Tomate". """
+    return ' '.join((name or '').split())[:NAME_MAX_LENGTH]
+
+
+def name_key(name: str) -> str:
+    """
+    Vergleichsschlüssel (Ingredient.name_key): normalisiert und mit
+    casefold(), damit "Nudeln" == "nudeln" und "STRASSE" == "Straße".
+    """
+    return normalize_name(name).casefold()[:NAME_MAX_LENGTH]
+
+
+class IngredientResolver:
+    """
+    Übersetzt Zutatennamen in Ingredient-IDs.
+    Alle Namen eines Formulars werden mit einer IN-Abfrage aufgelöst,
+    fehlende Zutaten in einem Batch angelegt. Verglichen wird über
+    name_key, Groß-/Kleinschreibung zählt also nicht; eine neue Zutat
+    behält den Namen, wie er zuerst eingegeben wurde. Bekannte Schlüssel
+    landen in einem begrenzten LRU-Cache pro Worker-Prozess.
+
+    In den Cache kommen nur committete IDs. Was die laufende Transaktion
+    angelegt hat (auch ein früherer resolve() darin, den _lookup dann
+    mitsieht), wartet in session.info und wandert erst nach dem Commit in
+    den Cache; ein Rollback verwirft es. Sonst zeigte ein Name nach dem
+    Rollback auf eine ID, die SQLite der nächsten neuen Zutat gibt.
+    """
+    def __init__(self, db, model, cache_size: int = 1024):
+        self.db = db
+        self.model = model
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending_key = f"ingredient_resolver_pending_{id(self)}"
+        event.listen(db.session, 'after_commit', self._after_commit)
+        event.listen(db.session, 'after_soft_rollback', self._after_rollback)
+        event.listen(db.session, 'after_transaction_end', self._after_transaction_end)
+
+    def resolve(self, names):
+        """
+        Gibt ein Dict {normalisierter Name: ingredient_id} zurück, mit
+        jeder übergebenen Schreibweise als eigenem Schlüssel.
+        Neue Zutaten werden in der laufenden Transaktion eingefügt,
+        committen muss der Aufrufer.
+        """
+        # Schlüssel -> erste Schreibweise, die wird beim Anlegen der Name
+        keys = {}
+        spellings = {}
+        for name in names:
+            name = normalize_name(name)
+            if name and name not in spellings:
+                spellings[name] = key = name_key(name)
+                keys.setdefault(key, name)
+
+        ids = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                ingredient_id = self._cache.get(key)
+                if ingredient_id is None:
+                    missing.append(key)
+                else:
+                    self._cache.move_to_end(key)
+                    ids[key] = ingredient_id
+
+        # In dieser Transaktion schon angelegt: weder abfragen noch cachen
+        pending = self.db.session.info.get(self._pending_key)
+        if missing and pending:
+            ids.update((k, pending[k]) for k in missing if k in pending)
+            missing = [k for k in missing if k not in pending]
+
+        if missing:
+            found = self._lookup(missing)
+            self._remember(found)
+            ids.update(found)
+
+            new_keys = [k for k in missing if k not in found]
+            if new_keys:
+                self._insert_missing([(keys[k], k) for k in new_keys])
+                inserted = self._lookup(new_keys)
+                self.db.session.info.setdefault(self._pending_key, {}).update(inserted)
+                ids.update(inserted)
+        return {name: ids[key] for name, key in spellings.items()}
+
+    def resolve_one(self, name: str):
+        """ Bequemlichkeitsvariante für einzelne Namen (z.B. add_inventory). """
+        name = normalize_name(name)
+        if not name:
+            return None
+        return self.resolve([name])[name]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _lookup(self, keys):
+        table = self.model.__table__
+        rows = self.db.session.execute(
+            select(table.c.id, table.c.name_key).where(table.c.name_key.in_(keys))
+        ).all()
+        return {row.name_key: row.id for row in rows}
+
+    def _insert_missing(self, entries):
+        """
+        Legt alle fehlenden Zutaten (Name, Schlüssel) mit einem Statement an.
+        Hat ein anderer Worker denselben Schlüssel inzwischen angelegt, greift
+        der Unique-Index und die Zeile wird übersprungen.
+        """
+        table = self.model.__table__
+        dialect = self.db.session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            stmt = sqlite.insert(table).on_conflict_do_nothing(index_elements=['name_key'])
+        elif dialect == 'postgresql':
+            stmt = postgresql.insert(table).on_conflict_do_nothing(index_elements=['name_key'])
+        else:
+            stmt = table.insert()
+        self.db.session.execute(stmt, [{'name': n, 'name_key': k} for n, k in entries])
+
+    def _after_commit(self, session):
+        self._remember(session.info.pop(self._pending_key, {}))
+
+    def _after_rollback(self, session, previous_transaction):
+        # Auch beim Zurückrollen eines Savepoints verwerfen: ein fehlender
+        # Eintrag kostet nur eine Abfrage, ein falscher zeigt auf eine andere Zutat
+        session.info.pop(self._pending_key, None)
+
+    def _after_transaction_end(self, session, transaction):
+        # Auch ohne Commit/Rollback (session.close()) nichts in die nächste mitnehmen
+        if transaction.parent is None:
+            session.info.pop(self._pending_key, None)
+
+    def _remember(self, mapping):
+        with self._lock:
+            for key, ingredient_id in mapping.items():
+                self._cache[key] = ingredient_id
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
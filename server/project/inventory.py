@@ -0,0 +1,281 @@
+# inventory.py
+"""
+Haushaltsbestand mit Bewegungsbuch.
+
+Der Bestand steht in household_items als eine Zeile je (User, Zutat,
+Dimension) mit der Menge in der Basiseinheit (quantity.BASE_UNITS, bei
+unbekannten Einheiten in der Einheit selbst). Zutaten ohne Mengenangabe
+stehen unter der Dimension WITHOUT_AMOUNT mit Menge NULL und gelten als
+vorhanden. Jeder Kauf, Verbrauch und jedes Wegwerfen wird zusätzlich in
+household_movements angehängt (Menge mit Vorzeichen); gelesen wird für
+Seiten und Einkaufsliste aber nur der Bestand, egal wie lang das Buch ist.
+
+Das Ablaufdatum einer Zeile ist das früheste der gekauften Mengen. Welche
+Menge zuerst verbraucht wird, wissen wir nicht, es bleibt deshalb stehen,
+bis die Zeile ganz aufgebraucht ist.
+
+Nach jeder Änderung wird die Einkaufsliste für die betroffenen Zutaten
+nachgeführt (ShoppingListBuilder.stock_changed). Committen muss der Aufrufer.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import Date, DateTime, bindparam, text
+from sqlalchemy.orm import joinedload
+
+import quantity
+from ingredient_resolver import normalize_name
+from meal_planner import PlanError, parse_date
+from models import HouseholdItem, HouseholdMovement
+from shopping_list_builder import WITHOUT_AMOUNT
+
+PURCHASE = 'purchase'
+CONSUME = 'consume'
+DISCARD = 'discard'
+KINDS = (PURCHASE, CONSUME, DISCARD)
+
+# Kleinere Reste gelten als aufgebraucht
+_EPSILON = 1e-6
+
+# Ein Statement für alle Käufe, vorhandene Zeilen werden aufaddiert
+# (Unique-Index auf user_id, ingredient_id, dimension)
+_UPSERT_SQL = text("""
+    INSERT INTO household_items (user_id, ingredient_id, dimension, amount, unit, expires_on)
+    VALUES (:user_id, :ingredient_id, :dimension, :amount, :unit, :expires_on)
+    ON CONFLICT (user_id, ingredient_id, dimension) DO UPDATE SET
+        amount = household_items.amount + excluded.amount,
+        expires_on = CASE
+            WHEN household_items.expires_on IS NULL THEN excluded.expires_on
+            WHEN excluded.expires_on IS NULL THEN household_items.expires_on
+            ELSE min(household_items.expires_on, excluded.expires_on)
+        END
+""").bindparams(bindparam('expires_on', type_=Date))
+
+_INSERT_MOVEMENT_SQL = text("""
+    INSERT INTO household_movements (user_id, ingredient_id, dimension, kind, amount, created_at)
+    VALUES (:user_id, :ingredient_id, :dimension, :kind, :amount, :created_at)
+""").bindparams(bindparam('created_at', type_=DateTime))
+
+_ITEM_SQL = text("""
+    SELECT id, ingredient_id, dimension, amount, unit
+    FROM household_items WHERE id = :item_id AND user_id = :user_id
+""")
+
+_ITEM_IDS_SQL = text("""
+    SELECT id, ingredient_id, dimension FROM household_items
+    WHERE user_id = :user_id AND ingredient_id IN :ingredient_ids
+""").bindparams(bindparam('ingredient_ids', expanding=True))
+
+_TAKE_SQL = text("UPDATE household_items SET amount = amount - :taken WHERE id = :item_id")
+
+_DELETE_EMPTY_SQL = text(f"""
+    DELETE FROM household_items
+    WHERE id = :item_id AND (amount IS NULL OR amount <= {_EPSILON} OR :all)
+""")
+
+_SET_EXPIRY_SQL = text("""
+    UPDATE household_items SET expires_on = :expires_on WHERE id = :item_id AND user_id = :user_id
+""").bindparams(bindparam('expires_on', type_=Date))
+
+# Gekaufte Artikel der Liste, die zu einer Zutat gehören
+_PURCHASED_ITEMS_SQL = text("""
+    SELECT sli.id, sli.shopping_list_id, sli.ingredient_id, sli.amount, sli.unit
+    FROM shopping_list_items sli
+    JOIN shopping_lists sl ON sl.id = sli.shopping_list_id
+    WHERE sl.user_id = :user_id AND sli.purchased AND sli.ingredient_id IS NOT NULL
+    ORDER BY sli.id
+""")
+
+_DELETE_LIST_ITEMS_SQL = text(
+    "DELETE FROM shopping_list_items WHERE id IN :item_ids"
+).bindparams(bindparam('item_ids', expanding=True))
+
+
+class InventoryError(ValueError):
+    """ Ungültige Eingabe für den Bestand; index zeigt auf die Operation im Batch. """
+    def __init__(self, message, index=None):
+        super().__init__(message)
+        self.message = message
+        self.index = index
+
+
+class UnknownItem(InventoryError):
+    """ Die Bestandszeile gibt es nicht oder sie gehört einem anderen User. """
+
+
+def stock_key(amount, unit):
+    """
+    (Dimension, Menge in der Basiseinheit, angezeigte Einheit) für eine
+    Menge; ohne Menge (WITHOUT_AMOUNT, None, Original-Einheit).
+    """
+    if amount is None:
+        return WITHOUT_AMOUNT, None, (unit or '').strip() or None
+    dim, value = quantity.to_base(amount, quantity.unit_key(unit))
+    return dim, value, quantity.display_unit(dim)
+
+
+def parse_expiry(value, index=None):
+    """ Ablaufdatum aus Formular oder JSON, None wenn leer. """
+    if value in (None, ''):
+        return None
+    try:
+        return parse_date(value)
+    except PlanError as error:
+        raise InventoryError(error.message, index)
+
+
+class Inventory:
+    def __init__(self, db, ingredient_resolver, shopping_list_builder, events=None,
+                 expiry_days: int = 3):
+        self.db = db
+        self.ingredient_resolver = ingredient_resolver
+        self.shopping_list_builder = shopping_list_builder
+        self.events = events
+        # "Läuft bald ab": innerhalb so vieler Tage
+        self.expiry_days = expiry_days
+
+    def items(self, user_id: int):
+        return (HouseholdItem.query
+                .options(joinedload(HouseholdItem.ingredient))
+                .filter_by(user_id=user_id)
+                .order_by(HouseholdItem.id)
+                .all())
+
+    def expiring(self, user_id: int, within_days: int = None, today: date = None):
+        """ Zeilen, die bis today + within_days ablaufen (auch schon abgelaufene). """
+        days = self.expiry_days if within_days is None else within_days
+        until = (today or date.today()) + timedelta(days=days)
+        return (HouseholdItem.query
+                .options(joinedload(HouseholdItem.ingredient))
+                .filter(HouseholdItem.user_id == user_id,
+                        HouseholdItem.expires_on <= until)
+                .order_by(HouseholdItem.expires_on, HouseholdItem.id)
+                .all())
+
+    def movements(self, user_id: int, ingredient_id: int = None, before_id: int = None,
+                  limit: int = 100):
+        """ Bewegungen, neueste zuerst; weiter mit before_id = kleinste ID der Seite. """
+        query = (HouseholdMovement.query
+                 .options(joinedload(HouseholdMovement.ingredient))
+                 .filter(HouseholdMovement.user_id == user_id))
+        if ingredient_id is not None:
+            query = query.filter(HouseholdMovement.ingredient_id == ingredient_id)
+        if before_id is not None:
+            query = query.filter(HouseholdMovement.id < before_id)
+        return query.order_by(HouseholdMovement.id.desc()).limit(limit).all()
+
+    def purchase(self, user_id: int, entries):
+        """
+        Bucht Käufe ({'name', 'amount', 'unit', 'expires_on'}) in den Bestand,
+        mit einem Resolver-Aufruf und je einem Statement für Bestand und Buch.
+        Gibt die IDs der Bestandszeilen in der Reihenfolge von entries zurück.
+        """
+        names = []
+        for index, entry in enumerate(entries):
+            name = normalize_name(entry.get('name', ''))
+            if not name:
+                raise InventoryError("Name fehlt", index)
+            amount = entry.get('amount')
+            if amount is not None and amount <= 0:
+                raise InventoryError("Menge muss größer als 0 sein", index)
+            names.append(name)
+        ingredient_ids = self.ingredient_resolver.resolve(names)
+        rows = [self._row(user_id, ingredient_ids[name], entry.get('amount'), entry.get('unit'),
+                          parse_expiry(entry.get('expires_on'), index))
+                for index, (name, entry) in enumerate(zip(names, entries))]
+        self._add(user_id, rows)
+
+        ids = {(r.ingredient_id, r.dimension): r.id for r in self.db.session.execute(
+            _ITEM_IDS_SQL, {'user_id': user_id,
+                            'ingredient_ids': sorted({row['ingredient_id'] for row in rows})})}
+        return [ids[(row['ingredient_id'], row['dimension'])] for row in rows]
+
+    def take(self, user_id: int, item_id, amount=None, unit=None, kind: str = CONSUME):
+        """
+        Verbraucht (kind=CONSUME) oder entsorgt (DISCARD) amount in unit,
+        ohne Einheit in der des Bestands; amount=None nimmt die ganze Zeile.
+        Mehr als vorhanden wird nicht abgebucht. Gibt die abgebuchte Menge
+        in der Einheit des Bestands zurück (None ohne Mengenangabe).
+        """
+        if kind not in (CONSUME, DISCARD):
+            raise InventoryError(f"Unbekannte Bewegung: {kind!r}")
+        session = self.db.session
+        item = session.execute(_ITEM_SQL, {'item_id': item_id, 'user_id': user_id}).first()
+        if item is None:
+            raise UnknownItem(f"Bestands-Item {item_id} nicht gefunden")
+
+        take_all = amount is None or item.amount is None
+        if take_all:
+            taken = item.amount
+        else:
+            dim, value = quantity.to_base(amount, quantity.unit_key(unit or item.unit))
+            if value <= 0:
+                raise InventoryError("Menge muss größer als 0 sein")
+            if dim != item.dimension:
+                raise InventoryError(f"Einheit passt nicht zum Bestand ({item.unit})")
+            taken = min(value, item.amount)
+            session.execute(_TAKE_SQL, {'item_id': item.id, 'taken': taken})
+        session.execute(_DELETE_EMPTY_SQL, {'item_id': item.id, 'all': take_all})
+        self._record(user_id, kind, [dict(ingredient_id=item.ingredient_id,
+                                          dimension=item.dimension,
+                                          amount=None if taken is None else -taken)])
+        self.shopping_list_builder.stock_changed(user_id, [item.ingredient_id])
+        return taken
+
+    def set_expiry(self, user_id: int, item_id, expires_on):
+        """ Setzt das Ablaufdatum einer Zeile (None entfernt es). """
+        updated = self.db.session.execute(_SET_EXPIRY_SQL, {
+            'item_id': item_id, 'user_id': user_id, 'expires_on': expires_on,
+        }).rowcount
+        if not updated:
+            raise UnknownItem(f"Bestands-Item {item_id} nicht gefunden")
+
+    def stock_purchased(self, user_id: int):
+        """
+        Übernimmt die abgehakten Artikel der Einkaufsliste, die zu einer
+        Zutat gehören, in den Bestand und nimmt sie von der Liste. Fehlt
+        danach noch etwas, legt stock_changed dafür einen neuen Artikel an.
+        Gibt die Anzahl übernommener Artikel zurück.
+        """
+        session = self.db.session
+        items = session.execute(_PURCHASED_ITEMS_SQL, {'user_id': user_id}).all()
+        if not items:
+            return 0
+        session.execute(_DELETE_LIST_ITEMS_SQL, {'item_ids': [item.id for item in items]})
+        self._add(user_id, [self._row(user_id, item.ingredient_id, item.amount, item.unit)
+                            for item in items])
+        if self.events is not None:
+            self.events.publish_many(user_id, [('remove', {'id': item.id}) for item in items],
+                                     items[0].shopping_list_id)
+        return len(items)
+
+    def _row(self, user_id, ingredient_id, amount, unit, expires_on=None):
+        dimension, value, display = stock_key(amount, unit)
+        return {'user_id': user_id, 'ingredient_id': ingredient_id, 'dimension': dimension,
+                'amount': value, 'unit': display, 'expires_on': expires_on}
+
+    def _add(self, user_id, rows):
+        # Mehrfache Käufe derselben Zutat vorher zusammenfassen, ein Zeilen-Update je Zutat
+        merged = {}
+        for row in rows:
+            key = (row['ingredient_id'], row['dimension'])
+            if key not in merged:
+                merged[key] = dict(row)
+                continue
+            target = merged[key]
+            if row['amount'] is not None:
+                target['amount'] += row['amount']
+            if target['expires_on'] is None or (row['expires_on'] is not None
+                                                and row['expires_on'] < target['expires_on']):
+                target['expires_on'] = row['expires_on']
+        self.db.session.execute(_UPSERT_SQL, list(merged.values()))
+        self._record(user_id, PURCHASE, rows)
+        self.shopping_list_builder.stock_changed(user_id, [key[0] for key in merged])
+
+    def _record(self, user_id, kind, rows):
+        now = datetime.utcnow()
+        self.db.session.execute(_INSERT_MOVEMENT_SQL, [
+            {'user_id': user_id, 'ingredient_id': row['ingredient_id'],
+             'dimension': row['dimension'], 'kind': kind, 'amount': row['amount'],
+             'created_at': now}
+            for row in rows
+        ])
@@ -0,0 +1,190 @@
+# meal_planner.py
+"""
+Essensplan: Rezepte an Tagen und Mahlzeiten (SLOTS), optional mit eigener
+Portionenzahl. Ohne Angabe gilt die Portionenzahl des Rezepts.
+
+Die Einkaufsliste für einen Zeitraum berechnet der ShoppingListBuilder
+(build_plan): eine Abfrage fasst alle geplanten Mahlzeiten je Rezept
+zusammen und skaliert die Mengen mit geplanten / Rezept-Portionen. Auch
+Pläne über viele Wochen brauchen so gleich viele Abfragen wie ein Tag.
+
+Alle Methoden schreiben nur in die Session, committen muss der Aufrufer.
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import Date, bindparam, delete, insert, select, text
+
+from models import MealPlanEntry, Recipe
+
+# Mahlzeiten eines Tages, in dieser Reihenfolge angezeigt
+SLOTS = ('breakfast', 'lunch', 'dinner', 'snack')
+SLOT_LABELS = {'breakfast': 'Frühstück', 'lunch': 'Mittagessen',
+               'dinner': 'Abendessen', 'snack': 'Snack'}
+
+MAX_SERVINGS = 100
+
+# Einträge von :start bis :end (plus :days Tage je Wiederholung) werden
+# :times mal in die folgenden Zeiträume kopiert, in einem Statement.
+# Das WITH steht hinter INSERT, so erkennt das Lese-Routing (database.py)
+# das Statement als Schreibzugriff.
+_REPEAT_SQL = text("""
+    INSERT INTO meal_plan_entries (user_id, recipe_id, plan_date, slot, servings)
+    WITH RECURSIVE n(k) AS (
+        SELECT 1 UNION ALL SELECT k + 1 FROM n WHERE k < :times
+    )
+    SELECT mp.user_id, mp.recipe_id,
+           date(mp.plan_date, '+' || (n.k * :days) || ' days'), mp.slot, mp.servings
+    FROM meal_plan_entries mp CROSS JOIN n
+    WHERE mp.user_id = :user_id AND mp.plan_date BETWEEN :start AND :end
+    ORDER BY n.k, mp.plan_date, mp.id
+""").bindparams(bindparam('start', type_=Date), bindparam('end', type_=Date))
+
+
+class PlanError(ValueError):
+    """ Ungültige Eingabe für den Plan; index zeigt auf die Operation im Batch. """
+    def __init__(self, message, index=None):
+        super().__init__(message)
+        self.message = message
+        self.index = index
+
+
+class UnknownRecipe(PlanError):
+    """ Das Rezept gibt es nicht oder es gehört einem anderen User. """
+
+
+def parse_date(value, index=None):
+    """ Datum als date oder ISO-String (YYYY-MM-DD). """
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        raise PlanError(f"Ungültiges Datum: {value!r}", index)
+
+
+def parse_servings(value, index=None):
+    """ Portionen aus Formular oder JSON: None wenn leer, sonst 1 bis MAX_SERVINGS. """
+    if value in (None, ''):
+        return None
+    try:
+        servings = int(value)
+    except (TypeError, ValueError):
+        raise PlanError(f"Ungültige Portionen: {value!r}", index)
+    if not 1 <= servings <= MAX_SERVINGS:
+        raise PlanError(f"Portionen müssen zwischen 1 und {MAX_SERVINGS} liegen", index)
+    return servings
+
+
+def week_start(day: date) -> date:
+    """ Montag der Woche von day. """
+    return day - timedelta(days=day.weekday())
+
+
+class MealPlanner:
+    def __init__(self, db, shopping_list_builder, max_days: int = 366):
+        self.db = db
+        self.shopping_list_builder = shopping_list_builder
+        # Längster Zeitraum für Anzeige, Wiederholung und Einkaufsliste
+        self.max_days = max_days
+
+    def check_range(self, start: date, end: date):
+        if end < start:
+            raise PlanError("Das Ende liegt vor dem Anfang")
+        if (end - start).days >= self.max_days:
+            raise PlanError(f"Höchstens {self.max_days} Tage auf einmal")
+
+    def entries(self, user_id: int, start: date, end: date):
+        """
+        Geplante Mahlzeiten von start bis end mit Titel und Portionen des
+        Rezepts, nach Tag, Mahlzeit und Reihenfolge des Eintragens.
+        """
+        self.check_range(start, end)
+        rows = self.db.session.execute(
+            select(MealPlanEntry.id, MealPlanEntry.plan_date, MealPlanEntry.slot,
+                   MealPlanEntry.servings, MealPlanEntry.recipe_id, Recipe.title,
+                   Recipe.servings.label('recipe_servings'))
+            .join(Recipe, Recipe.id == MealPlanEntry.recipe_id)
+            .where(MealPlanEntry.user_id == user_id,
+                   MealPlanEntry.plan_date.between(start, end))
+            .order_by(MealPlanEntry.plan_date, MealPlanEntry.id)
+        ).all()
+        order = {slot: i for i, slot in enumerate(SLOTS)}
+        return sorted(rows, key=lambda r: (r.plan_date, order.get(r.slot, len(SLOTS))))
+
+    def add(self, user_id: int, recipe_id, plan_date, slot: str, servings=None):
+        """ Plant ein Rezept ein, gibt die ID des Eintrags zurück. """
+        return self.add_many(user_id, [{'recipe_id': recipe_id, 'date': plan_date,
+                                        'slot': slot, 'servings': servings}])[0]
+
+    def add_many(self, user_id: int, entries):
+        """
+        Legt Einträge ({'recipe_id', 'date', 'slot', 'servings'}) an, mit
+        einer Abfrage für die Rezepte und einem INSERT für alle. Fremde
+        oder unbekannte Rezepte lösen UnknownRecipe aus.
+        """
+        rows = []
+        for index, entry in enumerate(entries):
+            slot = entry.get('slot') or SLOTS[0]
+            if slot not in SLOTS:
+                raise PlanError(f"Unbekannte Mahlzeit: {slot!r}", index)
+            try:
+                recipe_id = int(entry.get('recipe_id'))
+            except (TypeError, ValueError):
+                raise PlanError(f"Ungültige Rezept-ID: {entry.get('recipe_id')!r}", index)
+            rows.append({'user_id': user_id, 'recipe_id': recipe_id,
+                         'plan_date': parse_date(entry.get('date'), index), 'slot': slot,
+                         'servings': parse_servings(entry.get('servings'), index)})
+        if not rows:
+            return []
+
+        session = self.db.session
+        wanted = {row['recipe_id'] for row in rows}
+        own = set(session.scalars(
+            select(Recipe.id).where(Recipe.user_id == user_id, Recipe.id.in_(wanted))
+        ))
+        for index, row in enumerate(rows):
+            if row['recipe_id'] not in own:
+                raise UnknownRecipe(f"Rezept {row['recipe_id']} nicht gefunden", index)
+        return session.scalars(
+            insert(MealPlanEntry.__table__).returning(MealPlanEntry.__table__.c.id,
+                                                      sort_by_parameter_order=True),
+            rows,
+        ).all()
+
+    def remove(self, user_id: int, entry_ids):
+        """ Löscht Einträge des Users, gibt die Anzahl gelöschter zurück. """
+        entry_ids = sorted({int(x) for x in entry_ids if str(x).isdigit()})
+        if not entry_ids:
+            return 0
+        return self.db.session.execute(
+            delete(MealPlanEntry)
+            .where(MealPlanEntry.user_id == user_id, MealPlanEntry.id.in_(entry_ids))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    def repeat(self, user_id: int, start: date, days: int = 7, times: int = 1):
+        """
+        Kopiert den Plan der days Tage ab start times mal in die folgenden
+        Zeiträume (z.B. eine Woche auf die nächsten vier). Was dort schon
+        geplant war, wird ersetzt. Gibt die Anzahl neuer Einträge zurück.
+        """
+        if days < 1 or times < 1:
+            raise PlanError("Zeitraum und Anzahl müssen mindestens 1 sein")
+        end = start + timedelta(days=days - 1)
+        self.check_range(start, start + timedelta(days=days * (times + 1) - 1))
+        session = self.db.session
+        session.execute(
+            delete(MealPlanEntry)
+            .where(MealPlanEntry.user_id == user_id,
+                   MealPlanEntry.plan_date.between(end + timedelta(days=1),
+                                                   end + timedelta(days=days * times)))
+            .execution_options(synchronize_session=False)
+        )
+        return session.execute(_REPEAT_SQL, {
+            'user_id': user_id, 'start': start, 'end': end, 'days': days, 'times': times,
+        }).rowcount
+
+    def build_shopping_list(self, user_id: int, start: date, end: date):
+        """ Einkaufsliste für den Zeitraum, siehe ShoppingListBuilder.build_plan. Committet. """
+        self.check_range(start, end)
+        return self.shopping_list_builder.build_plan(user_id, start, end)
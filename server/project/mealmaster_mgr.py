@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 import json
 import os
-from datetime import datetime
 
 # Wenn du eine eigene Config-Verwaltung hast, kannst du sie hier importieren
 # from .config_manager import ConfigManager
@@ -15,6 +14,8 @@ class Mealmaster_mgr:
     def __init__(self, config_file: str = "config/settings.json"):
         self.config_file = config_file
         self.config = {}
+        # Wird von create_app() gesetzt (metrics.Metrics)
+        self.metrics = None
         self.load_config()
 
     def load_config(self):
@@ -39,9 +40,9 @@ class Mealmaster_mgr:
 
     def log_login(self, username: str):
         """
-        Beispielmethode, um z.B. ein Login-Ereignis zu protokollieren.
-        Hier könntest du weitere Funktionen implementieren.
+        Zählt ein erfolgreiches Login in den Metriken (mealmaster_logins_total).
+        Protokolliert wird asynchron über audit_log.AuditLog, damit der
+        Login-Request nicht auf Platte oder Datenbank wartet.
         """
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] User {username} logged in.")
-        # Je nach Bedarf könntest du diese Info auch in eine Datei schreiben,
-        # an ein Logging-System senden oder in der Datenbank speichern.
+        if self.metrics is not None:
+            self.metrics.inc('mealmaster_logins_total')
@@ -0,0 +1,336 @@
+# metrics.py
+"""
+Metriken im Prometheus-Textformat (/metrics) und ein Profiler pro Request.
+
+Jeder Request liefert:
+  mealmaster_request_duration_seconds   Histogramm je Endpoint und Methode
+  mealmaster_requests_total             Zähler je Endpoint, Methode, Status
+  mealmaster_request_sql_statements     Histogramm der SQL-Statements
+  mealmaster_request_sql_seconds        Histogramm der SQL-Zeit
+Dazu kommen bcrypt-Zeiten (time_bcrypt), Logins (Mealmaster_mgr.log_login),
+abgewiesene Hash-Aufträge und Login-Versuche, die Trefferzahlen von
+Seiten- und User-Cache und die Events des Audit-Logs.
+
+Unter uWSGI hat jeder Worker eigene Zahlen. Ist ein Verzeichnis gesetzt
+(metrics_dir, wsgi.py nimmt sonst ein Temp-Verzeichnis), schreibt jeder
+Worker höchstens einmal pro Sekunde seinen Stand nach worker-<pid>.json.
+/metrics summiert alle Dateien, auch die von beendeten Workern, damit
+Zähler nicht zurückspringen. Ohne Verzeichnis zählt nur der eigene Prozess.
+
+Profiler (Config "profiling"):
+  "off"     aus (Standard)
+  "header"  nur Requests mit Header X-Profile: 1
+  "all"     jeder Request
+Die Ausgabe (cProfile .prof und Textauszug) landet in profile_dir
+(Standard logs/profiles, im Container das gemountete logs/).
+"""
+import cProfile
+import glob
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import Response, g, request
+
+log = logging.getLogger(__name__)
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_STATEMENT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+_BCRYPT_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0)
+
+# Name -> (Typ, Beschreibung, Buckets)
+METRICS = {
+    'mealmaster_request_duration_seconds':
+        ('histogram', "Dauer eines Requests", _LATENCY_BUCKETS),
+    'mealmaster_requests_total':
+        ('counter', "Anzahl Requests", None),
+    'mealmaster_request_sql_statements':
+        ('histogram', "SQL-Statements pro Request", _STATEMENT_BUCKETS),
+    'mealmaster_request_sql_seconds':
+        ('histogram', "Zeit in SQL-Statements pro Request", _LATENCY_BUCKETS),
+    'mealmaster_bcrypt_seconds':
+        ('histogram', "Dauer von bcrypt-Hash und -Prüfung", _BCRYPT_BUCKETS),
+    'mealmaster_logins_total':
+        ('counter', "Erfolgreiche Logins", None),
+    'mealmaster_password_hashes_total':
+        ('counter', "bcrypt-Aufträge im Pool (erledigt, abgewiesen)", None),
+    'mealmaster_login_throttled_total':
+        ('counter', "Von der Rate-Begrenzung abgewiesene Versuche", None),
+    'mealmaster_render_cache_lookups_total':
+        ('counter', "Zugriffe auf den Seiten-Cache", None),
+    'mealmaster_user_cache_lookups_total':
+        ('counter', "Zugriffe auf den User-Cache (user_loader)", None),
+    'mealmaster_audit_events_total':
+        ('counter', "Events im Audit-Log (geschrieben, verworfen)", None),
+}
+
+PROFILE_HEADER = 'X-Profile'
+
+_FLUSH_INTERVAL = 1.0
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Metrics:
+    def __init__(self, app=None, directory: str = None, profiling: str = 'off',
+                 profile_dir: str = 'logs/profiles'):
+        self.directory = directory
+        self.profiling = profiling
+        self.profile_dir = profile_dir
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        # Liefern zusätzliche Zähler erst beim Export (z.B. render_cache.stats)
+        self._collectors = []
+        self._dirty = False
+        self._pid = os.getpid()
+        self._flusher_pid = None
+        # cProfile kann pro Prozess nur einen Request gleichzeitig messen
+        self._profile_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._stop_profiler)
+
+    def enable_multiprocess(self, directory):
+        """
+        Schaltet die Aggregation über Worker ein und leert das Verzeichnis.
+        Einmal im Master aufrufen, bevor die Worker geforkt werden (wsgi.py).
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, 'worker-*.json')):
+            os.remove(path)
+
+    # ----------------------------
+    # Erfassen
+    # ----------------------------
+    def _check_fork(self):
+        # Nach einem fork() gehören die geerbten Zahlen dem Elternprozess
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._counters.clear()
+            self._histograms.clear()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._check_fork()
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._dirty = True
+        self._ensure_flusher()
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._check_fork()
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0.0,
+                                                 'count': 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state['buckets'][i] += 1
+            state['sum'] += value
+            state['count'] += 1
+            self._dirty = True
+        self._ensure_flusher()
+
+    @contextmanager
+    def time_bcrypt(self, op):
+        """ with metrics.time_bcrypt('check'): bcrypt.check_password_hash(...) """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('mealmaster_bcrypt_seconds', time.perf_counter() - start, op=op)
+
+    def add_collector(self, collector):
+        """ collector() gibt [(name, labels, wert), ...] für Zähler zurück. """
+        self._collectors.append(collector)
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        if self._should_profile() and self._profile_lock.acquire(blocking=False):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    def _after_request(self, response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        endpoint = request.endpoint or 'none'
+        method = request.method
+        self.observe('mealmaster_request_duration_seconds', time.perf_counter() - start,
+                     endpoint=endpoint, method=method)
+        self.inc('mealmaster_requests_total', endpoint=endpoint, method=method,
+                 status=str(response.status_code))
+        self.observe('mealmaster_request_sql_statements', g.get('query_count', 0),
+                     endpoint=endpoint, method=method)
+        self.observe('mealmaster_request_sql_seconds', g.get('query_seconds', 0.0),
+                     endpoint=endpoint, method=method)
+        return response
+
+    # ----------------------------
+    # Profiler
+    # ----------------------------
+    def _stop_profiler(self, exc=None):
+        # In teardown, damit die Sperre auch nach Fehlern frei wird
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return
+        profiler.disable()
+        self._profile_lock.release()
+        self._dump_profile(profiler)
+
+    def _should_profile(self):
+        if self.profiling == 'all':
+            return True
+        return self.profiling == 'header' and request.headers.get(PROFILE_HEADER) == '1'
+
+    def _dump_profile(self, profiler):
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        endpoint = (request.endpoint or 'none').replace('.', '_')
+        base = os.path.join(self.profile_dir, f"{stamp}-{endpoint}-{os.getpid()}")
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler.dump_stats(base + '.prof')
+            text = io.StringIO()
+            stats = pstats.Stats(profiler, stream=text)
+            stats.sort_stats('cumulative').print_stats(40)
+            with open(base + '.txt', 'w', encoding='utf-8') as f:
+                f.write(f"{request.method} {request.full_path}\n")
+                f.write(text.getvalue())
+        except OSError as error:
+            log.warning("Profil konnte nicht geschrieben werden: %s", error)
+
+    # ----------------------------
+    # Aggregation über Worker
+    # ----------------------------
+    def _snapshot(self):
+        with self._lock:
+            self._check_fork()
+            counters = dict(self._counters)
+            histograms = {key: {'buckets': list(state['buckets']), 'sum': state['sum'],
+                                'count': state['count']}
+                          for key, state in self._histograms.items()}
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                key = (name, _label_key(labels))
+                counters[key] = counters.get(key, 0) + value
+        return counters, histograms
+
+    def flush(self):
+        """ Schreibt den Stand dieses Workers (atomar per rename). """
+        if not self.directory:
+            return
+        counters, histograms = self._snapshot()
+        data = {
+            'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, list(labels), state]
+                           for (name, labels), state in histograms.items()],
+        }
+        path = os.path.join(self.directory, f"worker-{os.getpid()}.json")
+        try:
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(path + '.tmp', path)
+        except OSError as error:
+            log.warning("Metriken konnten nicht geschrieben werden: %s", error)
+
+    def _ensure_flusher(self):
+        # Ein Thread pro Worker, erst nach dem fork gestartet
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(_FLUSH_INTERVAL)
+            with self._lock:
+                dirty, self._dirty = self._dirty, False
+            if dirty:
+                self.flush()
+
+    def _collect_all(self):
+        if not self.directory:
+            return self._snapshot()
+        self.flush()
+        counters, histograms = {}, {}
+        for path in glob.glob(os.path.join(self.directory, 'worker-*.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in data['counters']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, state in data['histograms']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                total = histograms.setdefault(key, {'buckets': [0] * len(state['buckets']),
+                                                    'sum': 0.0, 'count': 0})
+                total['buckets'] = [a + b for a, b in zip(total['buckets'], state['buckets'])]
+                total['sum'] += state['sum']
+                total['count'] += state['count']
+        return counters, histograms
+
+    # ----------------------------
+    # Export
+    # ----------------------------
+    def render(self):
+        """ Alle Metriken im Prometheus-Textformat. """
+        counters, histograms = self._collect_all()
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            if kind == 'counter':
+                samples = sorted((k, v) for k, v in counters.items() if k[0] == name)
+            else:
+                samples = sorted((k, v) for k, v in histograms.items() if k[0] == name)
+            if not samples:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (_, labels), value in samples:
+                if kind == 'counter':
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+                    continue
+                for bound, count in zip(buckets, value['buckets']):
+                    lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, le='+Inf')} {value['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def response(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+def _format_labels(labels, le=None):
+    pairs = list(labels)
+    if le is not None:
+        pairs.append(('le', str(le)))
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
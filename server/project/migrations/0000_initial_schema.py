@@ -0,0 +1,12 @@
+# 0000_initial_schema.py
+"""
+Legt alle Tabellen der Models an, die noch fehlen (früher db.create_all()
+beim Import von server.py). Bestehende Tabellen bleiben unverändert,
+neue Spalten brauchen weiterhin eine eigene Migration.
+"""
+import models  # noqa: F401  (registriert die Tabellen in db.metadata)
+from extensions import db
+
+
+def upgrade(connection):
+    db.metadata.create_all(connection)
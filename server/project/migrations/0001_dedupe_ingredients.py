@@ -0,0 +1,57 @@
+# 0001_dedupe_ingredients.py
+"""
+Entfernt doppelte Zutaten und legt den Unique-Index auf ingredients.name an.
+
+Doppelt sind Namen mit gleichem ingredient_resolver.name_key, also auch
+"Nudeln" und " nudeln". Pro Schlüssel bleibt die Zeile mit der kleinsten ID
+erhalten, alle Verweise aus recipe_ingredients, household_items und
+shopping_list_items werden vorher auf diese Zeile umgebogen.
+"""
+from sqlalchemy import text
+
+from ingredient_resolver import name_key, normalize_name
+
+_REFERENCING_TABLES = ('recipe_ingredients', 'household_items', 'shopping_list_items')
+
+
+def upgrade(connection):
+    keep = {}
+    merged = []
+    renamed = []
+    for row in connection.execute(text("SELECT id, name FROM ingredients ORDER BY id")):
+        key = name_key(row.name)
+        if key in keep:
+            merged.append({'old_id': row.id, 'keep_id': keep[key]})
+            continue
+        keep[key] = row.id
+        if row.name != normalize_name(row.name):
+            renamed.append({'id': row.id, 'name': normalize_name(row.name)})
+
+    if merged:
+        connection.execute(text("DROP TABLE IF EXISTS temp.ingredient_map"))
+        connection.execute(text(
+            "CREATE TEMP TABLE ingredient_map (old_id INTEGER PRIMARY KEY, keep_id INTEGER)"
+        ))
+        connection.execute(text(
+            "INSERT INTO temp.ingredient_map (old_id, keep_id) VALUES (:old_id, :keep_id)"
+        ), merged)
+
+        for table in _REFERENCING_TABLES:
+            connection.execute(text(f"""
+                UPDATE {table}
+                SET ingredient_id = (
+                    SELECT keep_id FROM temp.ingredient_map WHERE old_id = {table}.ingredient_id
+                )
+                WHERE ingredient_id IN (SELECT old_id FROM temp.ingredient_map)
+            """))
+
+        connection.execute(text(
+            "DELETE FROM ingredients WHERE id IN (SELECT old_id FROM temp.ingredient_map)"
+        ))
+        connection.execute(text("DROP TABLE temp.ingredient_map"))
+    if renamed:
+        connection.execute(text("UPDATE ingredients SET name = :name WHERE id = :id"), renamed)
+
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_ingredients_name ON ingredients (name)"
+    ))
@@ -0,0 +1,11 @@
+# 0002_recipes_user_id_index.py
+"""
+Zusammengesetzter Index für die Keyset-Pagination der Rezepte je User.
+"""
+from sqlalchemy import text
+
+
+def upgrade(connection):
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_recipes_user_id_id ON recipes (user_id, id)"
+    ))
@@ -0,0 +1,13 @@
+# 0003_shopping_list_item_version.py
+"""
+Versionsspalte für Einkaufslisten-Artikel (optimistische Nebenläufigkeit).
+"""
+from sqlalchemy import text
+
+
+def upgrade(connection):
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(shopping_list_items)"))}
+    if 'version' not in columns:
+        connection.execute(text(
+            "ALTER TABLE shopping_list_items ADD COLUMN version INTEGER NOT NULL DEFAULT 0"
+        ))
@@ -0,0 +1,11 @@
+# 0004_recipe_search.py
+"""
+FTS5-Tabelle für die Rezeptsuche anlegen und befüllen (früher beim Start
+jedes Workers in RecipeSearch.init_app).
+"""
+import recipe_search
+
+
+def upgrade(connection):
+    if not recipe_search.create_index(connection):
+        print("FTS5 nicht verfügbar, die Suche nutzt den Index im Speicher.")
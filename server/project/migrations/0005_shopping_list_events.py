@@ -0,0 +1,10 @@
+# 0005_shopping_list_events.py
+"""
+Tabelle für die Live-Events der Einkaufsliste (früher beim Start jedes
+Workers in ShoppingListEvents.init_app).
+"""
+import shopping_list_events
+
+
+def upgrade(connection):
+    shopping_list_events.create_table(connection)
@@ -0,0 +1,46 @@
+# 0006_foreign_key_indexes.py
+"""
+Indizes auf die Fremdschlüssel, über die die Routen filtern und joinen,
+und eine Einkaufsliste je User (Unique-Index auf shopping_lists.user_id).
+
+Hat ein User noch mehrere Listen, bleibt wie bisher im ShoppingListBuilder
+die mit der kleinsten ID; die übrigen werden samt Artikeln und Herkunft
+gelöscht. recipes.user_id deckt schon ix_recipes_user_id_id (0002) ab.
+"""
+from sqlalchemy import text
+
+_LIST_CHILD_TABLES = ('shopping_list_items', 'shopping_list_recipes', 'shopping_list_needs')
+
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_recipe_ingredients_recipe_id "
+    "ON recipe_ingredients (recipe_id)",
+    "CREATE INDEX IF NOT EXISTS ix_recipe_ingredients_ingredient_id "
+    "ON recipe_ingredients (ingredient_id)",
+    "CREATE INDEX IF NOT EXISTS ix_shopping_list_items_shopping_list_id "
+    "ON shopping_list_items (shopping_list_id)",
+    "CREATE INDEX IF NOT EXISTS ix_household_items_user_id_ingredient_id "
+    "ON household_items (user_id, ingredient_id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_shopping_lists_user_id "
+    "ON shopping_lists (user_id)",
+)
+
+
+def upgrade(connection):
+    connection.execute(text("DROP TABLE IF EXISTS temp.extra_lists"))
+    connection.execute(text("""
+        CREATE TEMP TABLE extra_lists AS
+        SELECT id AS list_id
+        FROM shopping_lists
+        WHERE id NOT IN (SELECT MIN(id) FROM shopping_lists GROUP BY user_id)
+    """))
+    for table in _LIST_CHILD_TABLES:
+        connection.execute(text(
+            f"DELETE FROM {table} WHERE shopping_list_id IN (SELECT list_id FROM temp.extra_lists)"
+        ))
+    connection.execute(text(
+        "DELETE FROM shopping_lists WHERE id IN (SELECT list_id FROM temp.extra_lists)"
+    ))
+    connection.execute(text("DROP TABLE temp.extra_lists"))
+
+    for statement in _INDEXES:
+        connection.execute(text(statement))
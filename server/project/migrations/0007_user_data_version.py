@@ -0,0 +1,13 @@
+# 0007_user_data_version.py
+"""
+Datenversion je User, Teil des Schlüssels im Seiten-Cache (render_cache).
+"""
+from sqlalchemy import text
+
+
+def upgrade(connection):
+    columns = {row[1] for row in connection.execute(text('PRAGMA table_info("user")'))}
+    if 'data_version' not in columns:
+        connection.execute(text(
+            'ALTER TABLE "user" ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0'
+        ))
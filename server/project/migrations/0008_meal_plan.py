@@ -0,0 +1,24 @@
+# 0008_meal_plan.py
+"""
+Essensplan (meal_planner.py): Tabelle meal_plan_entries, Portionen je
+Rezept (recipes.servings) und der Mengenfaktor je Rezept einer
+Einkaufsliste (shopping_list_recipes.factor). Bestehende Rezepte gelten als
+eine Portion, bestehende Listen behalten ihre Mengen (Faktor 1).
+"""
+from sqlalchemy import text
+
+import models
+from extensions import db
+
+_COLUMNS = (
+    ('recipes', 'servings', 'INTEGER NOT NULL DEFAULT 1'),
+    ('shopping_list_recipes', 'factor', 'FLOAT NOT NULL DEFAULT 1'),
+)
+
+
+def upgrade(connection):
+    for table, column, definition in _COLUMNS:
+        columns = {row[1] for row in connection.execute(text(f'PRAGMA table_info("{table}")'))}
+        if column not in columns:
+            connection.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {definition}'))
+    db.metadata.create_all(connection, tables=[models.MealPlanEntry.__table__])
@@ -0,0 +1,22 @@
+# 0009_recipe_ingredient_position.py
+"""
+Spalte position für Rezeptzutaten (Reihenfolge im Rezept). Bestehende
+Zeilen werden je Rezept nach ID in Schritten von 1024 (models.POSITION_STEP)
+durchnummeriert, das war bisher ihre Reihenfolge.
+"""
+from sqlalchemy import text
+
+
+def upgrade(connection):
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(recipe_ingredients)"))}
+    if 'position' not in columns:
+        connection.execute(text(
+            "ALTER TABLE recipe_ingredients ADD COLUMN position INTEGER NOT NULL DEFAULT 0"
+        ))
+        connection.execute(text("""
+            UPDATE recipe_ingredients SET position = 1024 * (
+                SELECT COUNT(*) FROM recipe_ingredients AS earlier
+                WHERE earlier.recipe_id = recipe_ingredients.recipe_id
+                  AND earlier.id < recipe_ingredients.id
+            )
+        """))
@@ -0,0 +1,77 @@
+# 0010_inventory_ledger.py
+"""
+Bestand mit Bewegungsbuch (inventory.py): household_items bekommt Dimension
+und Ablaufdatum, dazu die Tabelle household_movements.
+
+Bisher legte jedes Hinzufügen eine eigene Zeile an. Die Zeilen werden je
+(User, Zutat, Dimension) in die Basiseinheit umgerechnet und zur ältesten
+zusammengefasst, die übrigen gelöscht. Für jede verbleibende Zeile steht
+danach ein Kauf über den Anfangsbestand im Buch. Erst dann kann der
+Unique-Index angelegt werden, er ersetzt ix_household_items_user_id_ingredient_id.
+"""
+from datetime import datetime
+
+from sqlalchemy import text
+
+import models
+from extensions import db
+from inventory import PURCHASE, stock_key
+
+_COLUMNS = (
+    ('dimension', "VARCHAR(20) NOT NULL DEFAULT ''"),
+    ('expires_on', 'DATE'),
+)
+
+_INDEXES = (
+    "DROP INDEX IF EXISTS ix_household_items_user_id_ingredient_id",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_household_items_user_id_ingredient_id_dimension "
+    "ON household_items (user_id, ingredient_id, dimension)",
+    "CREATE INDEX IF NOT EXISTS ix_household_items_user_id_expires_on "
+    "ON household_items (user_id, expires_on)",
+)
+
+
+def _consolidate(connection):
+    rows = connection.execute(text(
+        "SELECT id, user_id, ingredient_id, amount, unit FROM household_items ORDER BY id"
+    )).all()
+    stock = {}
+    duplicates = []
+    for row in rows:
+        dimension, value, unit = stock_key(row.amount, row.unit)
+        key = (row.user_id, row.ingredient_id, dimension)
+        if key not in stock:
+            stock[key] = {'id': row.id, 'dimension': dimension, 'amount': value, 'unit': unit}
+            continue
+        duplicates.append({'id': row.id})
+        if value is not None:
+            stock[key]['amount'] += value
+
+    if duplicates:
+        connection.execute(text("DELETE FROM household_items WHERE id = :id"), duplicates)
+    if not stock:
+        return
+    connection.execute(text("""
+        UPDATE household_items SET dimension = :dimension, amount = :amount, unit = :unit
+        WHERE id = :id
+    """), list(stock.values()))
+    now = datetime.utcnow().isoformat(sep=' ')
+    connection.execute(text("""
+        INSERT INTO household_movements (user_id, ingredient_id, dimension, kind, amount, created_at)
+        VALUES (:user_id, :ingredient_id, :dimension, :kind, :amount, :created_at)
+    """), [
+        {'user_id': user_id, 'ingredient_id': ingredient_id, 'dimension': dimension,
+         'kind': PURCHASE, 'amount': item['amount'], 'created_at': now}
+        for (user_id, ingredient_id, dimension), item in stock.items()
+    ])
+
+
+def upgrade(connection):
+    db.metadata.create_all(connection, tables=[models.HouseholdMovement.__table__])
+    columns = {row[1] for row in connection.execute(text('PRAGMA table_info("household_items")'))}
+    if 'dimension' not in columns:
+        for column, definition in _COLUMNS:
+            connection.execute(text(f'ALTER TABLE household_items ADD COLUMN {column} {definition}'))
+        _consolidate(connection)
+    for statement in _INDEXES:
+        connection.execute(text(statement))
@@ -0,0 +1,14 @@
+# 0011_nutrition.py
+"""
+Nährwerte (nutrition.py): Tabellen nutrition_facts (je Zutat und 100 g)
+und recipe_nutrition (Summen je Rezept). Beide bleiben leer, bis eine
+Lebensmitteldatenbank geladen wird ("flask nutrition import"); der Import
+berechnet dann alle Rezepte.
+"""
+import models
+from extensions import db
+
+
+def upgrade(connection):
+    db.metadata.create_all(connection, tables=[models.NutritionFacts.__table__,
+                                               models.RecipeNutrition.__table__])
@@ -0,0 +1,172 @@
+# 0012_ingredient_name_key.py
+"""
+Spalte ingredients.name_key (ingredient_resolver.name_key) mit Unique-Index:
+Zutaten werden ohne Groß-/Kleinschreibung verglichen, name bleibt wie
+eingegeben.
+
+Datenbanken, auf denen 0001 noch nach getrimmtem Namen zusammengefasst hat,
+können "Nudeln" und "nudeln" als zwei Zeilen haben. Pro Schlüssel bleibt die
+Zeile mit der kleinsten ID, alle Verweise werden auf sie umgebogen. Wo eine
+Tabelle je Zutat nur eine Zeile erlaubt, werden die Zeilen zusammengefasst:
+Bestand (household_items) und Bedarf (shopping_list_needs) addiert, von den
+Nährwerten bleiben die der behaltenen Zutat (sonst die der ältesten). Die
+Nährwertsummen der betroffenen Rezepte werden neu berechnet; doppelte
+Artikel auf der Einkaufsliste fasst die nächste Änderung der Liste zusammen.
+"""
+from sqlalchemy import bindparam, text
+
+import nutrition
+from ingredient_resolver import name_key
+
+_REPOINTED_TABLES = ('recipe_ingredients', 'shopping_list_items', 'household_movements')
+
+_RECIPE_ROWS_SQL = text("""
+    SELECT recipe_id, ingredient_id, amount, unit_key(unit) AS unit_key
+    FROM recipe_ingredients
+    WHERE recipe_id IN :recipe_ids
+""").bindparams(bindparam('recipe_ids', expanding=True))
+
+
+def _sum(values):
+    values = [v for v in values if v is not None]
+    return sum(values) if values else None
+
+
+def _fold(connection, table, group_columns, merge, merged_ids):
+    """
+    Fasst die Zeilen von table zusammen, die nach dem Umbiegen auf die
+    behaltene Zutat dieselben group_columns hätten. merge(rows) gibt die
+    neuen Werte der ersten Zeile zurück, die übrigen werden gelöscht.
+    """
+    rows = connection.execute(text(f"""
+        SELECT t.rowid AS row_id, t.*, coalesce(m.keep_id, t.ingredient_id) AS keep_id
+        FROM {table} t LEFT JOIN temp.ingredient_map m ON m.old_id = t.ingredient_id
+        WHERE coalesce(m.keep_id, t.ingredient_id) IN :keep_ids
+        ORDER BY t.rowid
+    """).bindparams(bindparam('keep_ids', expanding=True)),
+        {'keep_ids': sorted(set(merged_ids.values()))}).mappings().all()
+
+    groups = {}
+    for row in rows:
+        key = tuple(row[c] for c in group_columns if c != 'ingredient_id') + (row['keep_id'],)
+        groups.setdefault(key, []).append(row)
+    updates, deleted = [], []
+    for group in groups.values():
+        if len(group) > 1:
+            updates.append(dict(merge(group), row_id=group[0]['row_id']))
+            deleted.extend({'row_id': row['row_id']} for row in group[1:])
+    if deleted:
+        connection.execute(text(f"DELETE FROM {table} WHERE rowid = :row_id"), deleted)
+    if updates:
+        columns = ', '.join(f'{c} = :{c}' for c in updates[0] if c != 'row_id')
+        connection.execute(text(f"UPDATE {table} SET {columns} WHERE rowid = :row_id"), updates)
+    connection.execute(text(f"""
+        UPDATE {table}
+        SET ingredient_id = (
+            SELECT keep_id FROM temp.ingredient_map WHERE old_id = {table}.ingredient_id
+        )
+        WHERE ingredient_id IN (SELECT old_id FROM temp.ingredient_map)
+    """))
+
+
+def _merge_stock(rows):
+    expires = [row['expires_on'] for row in rows if row['expires_on'] is not None]
+    return {'amount': _sum(row['amount'] for row in rows),
+            'expires_on': min(expires) if expires else None}
+
+
+def _merge_need(rows):
+    return {'required': _sum(row['required'] for row in rows),
+            'row_count': sum(row['row_count'] for row in rows),
+            'first_id': min(row['first_id'] for row in rows)}
+
+
+def _merge(connection, merged_ids):
+    connection.execute(text("DROP TABLE IF EXISTS temp.ingredient_map"))
+    connection.execute(text(
+        "CREATE TEMP TABLE ingredient_map (old_id INTEGER PRIMARY KEY, keep_id INTEGER)"
+    ))
+    connection.execute(text(
+        "INSERT INTO temp.ingredient_map (old_id, keep_id) VALUES (:old_id, :keep_id)"
+    ), [{'old_id': old_id, 'keep_id': keep_id} for old_id, keep_id in merged_ids.items()])
+
+    recipe_ids = connection.execute(text("""
+        SELECT DISTINCT recipe_id FROM recipe_ingredients
+        WHERE ingredient_id IN (SELECT old_id FROM temp.ingredient_map)
+    """)).scalars().all()
+
+    _fold(connection, 'household_items', ('user_id', 'ingredient_id', 'dimension'),
+          _merge_stock, merged_ids)
+    _fold(connection, 'shopping_list_needs', ('shopping_list_id', 'ingredient_id', 'dimension'),
+          _merge_need, merged_ids)
+    # Nährwerte: die der behaltenen Zutat, sonst die der ältesten umgebogenen
+    with_facts = set(connection.execute(text("SELECT ingredient_id FROM nutrition_facts")).scalars())
+    moved, dropped = [], []
+    for old_id, keep_id in sorted(merged_ids.items()):
+        if old_id not in with_facts:
+            continue
+        if keep_id in with_facts:
+            dropped.append({'old_id': old_id})
+        else:
+            moved.append({'old_id': old_id, 'keep_id': keep_id})
+            with_facts.add(keep_id)
+    if dropped:
+        connection.execute(text("DELETE FROM nutrition_facts WHERE ingredient_id = :old_id"),
+                           dropped)
+    if moved:
+        connection.execute(text(
+            "UPDATE nutrition_facts SET ingredient_id = :keep_id WHERE ingredient_id = :old_id"
+        ), moved)
+    for table in _REPOINTED_TABLES:
+        connection.execute(text(f"""
+            UPDATE {table}
+            SET ingredient_id = (
+                SELECT keep_id FROM temp.ingredient_map WHERE old_id = {table}.ingredient_id
+            )
+            WHERE ingredient_id IN (SELECT old_id FROM temp.ingredient_map)
+        """))
+    connection.execute(text(
+        "DELETE FROM ingredients WHERE id IN (SELECT old_id FROM temp.ingredient_map)"
+    ))
+    connection.execute(text("DROP TABLE temp.ingredient_map"))
+
+    if recipe_ids and connection.execute(text("SELECT 1 FROM nutrition_facts LIMIT 1")).first():
+        recipe_ids = sorted(recipe_ids)
+        rows = connection.execute(_RECIPE_ROWS_SQL, {'recipe_ids': recipe_ids}).all()
+        facts = {row[0]: tuple(row[1:]) for row in connection.execute(text(
+            f"SELECT ingredient_id, {', '.join(nutrition.NUTRIENTS)}, density, piece_grams "
+            "FROM nutrition_facts"
+        ))}
+        connection.execute(text(f"""
+            INSERT INTO recipe_nutrition (recipe_id, {', '.join(nutrition.NUTRIENTS)}, missing)
+            VALUES (:recipe_id, {', '.join(f':{n}' for n in nutrition.NUTRIENTS)}, :missing)
+            ON CONFLICT (recipe_id) DO UPDATE SET
+                {', '.join(f'{n} = excluded.{n}' for n in nutrition.NUTRIENTS)},
+                missing = excluded.missing
+        """), nutrition.compute_totals(recipe_ids, rows, facts))
+
+
+def upgrade(connection):
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(ingredients)"))}
+    if 'name_key' not in columns:
+        connection.execute(text(
+            "ALTER TABLE ingredients ADD COLUMN name_key VARCHAR(100) NOT NULL DEFAULT ''"
+        ))
+        keep = {}
+        keys = []
+        merged_ids = {}
+        for row in connection.execute(text("SELECT id, name FROM ingredients ORDER BY id")):
+            key = name_key(row.name)
+            if key in keep:
+                merged_ids[row.id] = keep[key]
+            else:
+                keep[key] = row.id
+                keys.append({'id': row.id, 'name_key': key})
+        if merged_ids:
+            _merge(connection, merged_ids)
+        if keys:
+            connection.execute(text("UPDATE ingredients SET name_key = :name_key WHERE id = :id"),
+                               keys)
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_ingredients_name_key ON ingredients (name_key)"
+    ))
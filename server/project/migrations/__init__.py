@@ -0,0 +1,80 @@
+# migrations/__init__.py
+"""
+Versionierte Schema- und Datenmigrationen für bestehende MealMaster-Datenbanken.
+
+Jede Migration ist ein Modul NNNN_beschreibung.py mit einer Funktion
+upgrade(connection); die Nummer ist ihre Version. Welche Versionen schon
+gelaufen sind, steht in der Tabelle schema_migrations. run_all() führt nur
+die fehlenden aus, jede zusammen mit ihrem Eintrag in einer Transaktion:
+bricht eine Migration ab, bleibt die Datenbank auf dem alten Stand.
+
+Datenbanken aus der Zeit vor schema_migrations haben keine Einträge, dort
+laufen einmal alle Migrationen. Deshalb müssen Migrationen idempotent sein.
+
+Das Schema selbst legt 0000_initial_schema an; die App führt kein DDL aus.
+
+Aufruf aus server/project:  python -m migrations [--status]
+"""
+import importlib
+import os
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+
+_MODULE_PATTERN = re.compile(r'^(\d{4})_\w+\.py$')
+
+_CREATE_VERSION_TABLE_SQL = text("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        applied_at VARCHAR(30) NOT NULL
+    )
+""")
+_APPLIED_SQL = text("SELECT version FROM schema_migrations")
+_RECORD_SQL = text("""
+    INSERT INTO schema_migrations (version, name, applied_at)
+    VALUES (:version, :name, :applied_at)
+""")
+
+
+def discover():
+    """ Gibt die Modulnamen aller Migrationen sortiert zurück. """
+    folder = os.path.dirname(os.path.abspath(__file__))
+    names = [f[:-3] for f in os.listdir(folder) if _MODULE_PATTERN.match(f)]
+    return sorted(names)
+
+
+def version_of(name):
+    return int(name[:4])
+
+
+def applied_versions(engine):
+    """ Versionen, die in dieser Datenbank schon gelaufen sind. """
+    with engine.begin() as connection:
+        connection.execute(_CREATE_VERSION_TABLE_SQL)
+        return set(connection.execute(_APPLIED_SQL).scalars())
+
+
+def pending(engine):
+    """ Modulnamen der noch fehlenden Migrationen, sortiert. """
+    applied = applied_versions(engine)
+    return [name for name in discover() if version_of(name) not in applied]
+
+
+def run_all(engine):
+    """ Führt alle fehlenden Migrationen aus, jede in eigener Transaktion. """
+    names = pending(engine)
+    for name in names:
+        module = importlib.import_module(f"{__name__}.{name}")
+        with engine.begin() as connection:
+            module.upgrade(connection)
+            connection.execute(_RECORD_SQL, {
+                'version': version_of(name),
+                'name': name,
+                'applied_at': datetime.utcnow().isoformat(timespec='seconds'),
+            })
+        print(f"Migration {name} ausgeführt.")
+    if not names:
+        print("Datenbank ist aktuell.")
+    return names
@@ -0,0 +1,29 @@
+# migrations/__main__.py
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extensions import db  # noqa: E402
+from server import create_app  # noqa: E402
+
+from migrations import discover, pending, run_all  # noqa: E402
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m migrations")
+    parser.add_argument('--status', action='store_true',
+                        help="nur anzeigen, welche Migrationen noch fehlen")
+    args = parser.parse_args()
+
+    # Über die App, damit relative SQLite-Pfade wie dort im instance-Ordner landen
+    app = create_app()
+    if not app.config['SQLALCHEMY_DATABASE_URI']:
+        sys.exit("database_uri fehlt in config/settings.json")
+    with app.app_context():
+        if args.status:
+            missing = set(pending(db.engine))
+            for name in discover():
+                print(f"{'fehlt' if name in missing else 'ok':<6} {name}")
+        else:
+            run_all(db.engine)
@@ -0,0 +1,282 @@
+# models.py
+"""
+Datenbank-Models von MealMaster. Das Schema legt der Migrationsschritt
+an (python -m migrations), nicht der Import.
+"""
+from datetime import datetime
+
+from flask import current_app
+from flask_login import UserMixin
+
+from extensions import db, login_manager
+from ingredient_resolver import name_key
+
+# Abstand von RecipeIngredient.position zwischen Nachbarn beim Anlegen,
+# eine mitten eingefügte Zeile bekommt die Mitte der Lücke
+POSITION_STEP = 1024
+
+
+def _default_name_key(context):
+    # Auch für Bulk-Inserts, die nur name setzen
+    return name_key(context.get_current_parameters()['name'])
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    # Nur id und username, meist ohne Abfrage (user_cache.py)
+    return current_app.extensions['mealmaster'].user_cache.load(int(user_id))
+
+
+class User(db.Model, UserMixin):
+    __tablename__ = 'user'
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(20), nullable=False, unique=True)
+    password = db.Column(db.String(80), nullable=False)
+
+    # Weitere Felder, wie in deinem Projekt
+    register_date = db.Column(db.TEXT)
+    last_login = db.Column(db.TEXT)
+    ip_address = db.Column(db.TEXT)
+    # Wird bei jeder Änderung der Daten des Users hochgezählt (render_cache)
+    data_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    # Beziehung zurück auf Recipes
+    recipes = db.relationship('Recipe', back_populates='user')
+    shopping_list = db.relationship('ShoppingList', back_populates='user',
+                                    uselist=False,  # nur EIN Objekt
+                                    cascade='all, delete-orphan')
+
+    household_items = db.relationship('HouseholdItem', back_populates='user',
+                                      cascade='all, delete-orphan')
+    household_movements = db.relationship('HouseholdMovement', back_populates='user',
+                                          cascade='all, delete-orphan')
+    meal_plan_entries = db.relationship('MealPlanEntry', back_populates='user',
+                                        cascade='all, delete-orphan')
+    def __repr__(self):
+        return f"<User {self.username}>"
+
+class Ingredient(db.Model):
+    __tablename__ = 'ingredients'
+    id = db.Column(db.Integer, primary_key=True)
+    # Eindeutig, damit parallele Worker keine Duplikate anlegen
+    # (Bestandsdatenbanken: migrations/0001_dedupe_ingredients.py)
+    name = db.Column(db.String(100), nullable=False, unique=True, index=True)
+    # Vergleichsschlüssel ohne Groß-/Kleinschreibung (ingredient_resolver.name_key),
+    # name bleibt wie eingegeben (Bestandsdatenbanken: migrations/0012_ingredient_name_key.py)
+    name_key = db.Column(db.String(100), nullable=False, unique=True, index=True,
+                         default=_default_name_key)
+
+    # Beziehung zu RecipeIngredient
+    ingredient_in_recipes = db.relationship('RecipeIngredient', back_populates='ingredient',
+                                            cascade="all, delete-orphan")
+    # Nährwerte je 100 g, falls aus der Lebensmitteldatenbank geladen (nutrition.py)
+    nutrition = db.relationship('NutritionFacts', uselist=False, cascade='all, delete-orphan')
+
+
+
+class Recipe(db.Model):
+    __tablename__ = 'recipes'
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(30), nullable=False)
+    instructions = db.Column(db.String(400))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Portionen, für die die Mengen gelten (Skalierung im Essensplan)
+    servings = db.Column(db.Integer, default=1, server_default='1', nullable=False)
+
+    # Für die seitenweise Auflistung (Keyset-Pagination) je User
+    __table_args__ = (
+        db.Index('ix_recipes_user_id_id', 'user_id', 'id'),
+    )
+
+    # Das "Brückentable" verknüpft Rezepte und Zutaten
+    # in der Reihenfolge des Formulars (position, bei gleicher Position nach ID)
+    recipe_ingredients = db.relationship('RecipeIngredient', back_populates='recipe',
+                                         cascade="all, delete-orphan",
+                                         order_by='(RecipeIngredient.position, '
+                                                  'RecipeIngredient.id)')
+    user = db.relationship('User', back_populates='recipes')  # Nur falls du back_populates nutzt
+    meal_plan_entries = db.relationship('MealPlanEntry', back_populates='recipe',
+                                        cascade='all, delete-orphan')
+    # Summe der Nährwerte aller Zutaten, nachgeführt von nutrition.py
+    nutrition = db.relationship('RecipeNutrition', uselist=False, cascade='all, delete-orphan')
+
+
+class NutritionFacts(db.Model):
+    # Nährwerte einer Zutat je 100 g (nutrition.py, "flask nutrition import")
+    __tablename__ = 'nutrition_facts'
+    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.id'), primary_key=True)
+    kcal = db.Column(db.Float, nullable=False, default=0.0)
+    protein = db.Column(db.Float, nullable=False, default=0.0)  # g
+    fat = db.Column(db.Float, nullable=False, default=0.0)  # g
+    carbs = db.Column(db.Float, nullable=False, default=0.0)  # g
+    fiber = db.Column(db.Float, nullable=False, default=0.0)  # g
+    sugar = db.Column(db.Float, nullable=False, default=0.0)  # g
+    salt = db.Column(db.Float, nullable=False, default=0.0)  # g
+    density = db.Column(db.Float, nullable=True)  # g/ml, NULL = wie Wasser
+    piece_grams = db.Column(db.Float, nullable=True)  # Gewicht eines Stücks
+
+
+class RecipeNutrition(db.Model):
+    # Nährwerte eines ganzen Rezepts (alle Portionen), nachgeführt von nutrition.py
+    __tablename__ = 'recipe_nutrition'
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), primary_key=True)
+    kcal = db.Column(db.Float, nullable=False, default=0.0)
+    protein = db.Column(db.Float, nullable=False, default=0.0)
+    fat = db.Column(db.Float, nullable=False, default=0.0)
+    carbs = db.Column(db.Float, nullable=False, default=0.0)
+    fiber = db.Column(db.Float, nullable=False, default=0.0)
+    sugar = db.Column(db.Float, nullable=False, default=0.0)
+    salt = db.Column(db.Float, nullable=False, default=0.0)
+    # Zutatenzeilen ohne Nährwerte oder ohne umrechenbare Menge
+    missing = db.Column(db.Integer, nullable=False, default=0)
+
+
+class RecipeIngredient(db.Model):
+    __tablename__ = 'recipe_ingredients'
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False, index=True)
+    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.id'), nullable=False, index=True)
+    quantity = db.Column(db.String(50), nullable=True)  # z.B. "200 g"
+
+    # Beziehungen (ein RecipeIngredient gehört zu genau 1 Recipe und 1 Ingredient)
+    recipe = db.relationship('Recipe', back_populates='recipe_ingredients')
+    ingredient = db.relationship('Ingredient', back_populates='ingredient_in_recipes')
+
+
+    amount = db.Column(db.Float, nullable=True)  # oder db.Numeric(10, 2) für exakte Werte
+    unit = db.Column(db.String(20), nullable=True)  # z. B. "g", "ml", "Stk"
+    # Reihenfolge im Rezept, in Schritten von POSITION_STEP; muss nur aufsteigen
+    position = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    recipe = db.relationship('Recipe', back_populates='recipe_ingredients')
+    ingredient = db.relationship('Ingredient', back_populates='ingredient_in_recipes')
+
+class ShoppingList(db.Model):
+    __tablename__ = 'shopping_lists'
+    id = db.Column(db.Integer, primary_key=True)
+    # Eine Liste je User (Bestandsdatenbanken: migrations/0006_foreign_key_indexes.py)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    #
+    
+
+    # Beziehung: Eine Einkaufsliste hat viele Items
+    items = db.relationship('ShoppingListItem', back_populates='shopping_list',
+                            cascade='all, delete-orphan')
+
+    # Herkunft der Liste, für die inkrementelle Pflege (shopping_list_builder)
+    source_recipes = db.relationship('ShoppingListRecipe', cascade='all, delete-orphan')
+    needs = db.relationship('ShoppingListNeed', cascade='all, delete-orphan')
+
+    # User-Objekt, falls du beidseitig referenzieren willst
+    user = db.relationship('User', back_populates='shopping_list')
+
+
+class ShoppingListItem(db.Model):
+    __tablename__ = 'shopping_list_items'
+    id = db.Column(db.Integer, primary_key=True)
+    shopping_list_id = db.Column(db.Integer, db.ForeignKey('shopping_lists.id'), nullable=False, index=True)
+    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.id'), nullable=True)
+
+    amount = db.Column(db.Float, nullable=True)
+    unit = db.Column(db.String(20), nullable=True)
+
+    shopping_list = db.relationship('ShoppingList', back_populates='items')
+    ingredient = db.relationship('Ingredient')
+
+    # Neu für Non-Food:
+    custom_name = db.Column(db.String(100), nullable=True)  # z. B. "Toilettenpapier"
+
+    # Neu für Abhaken:
+    purchased = db.Column(db.Boolean, default=False, nullable=False)
+    # Wird bei jeder Änderung hochgezählt (optimistische Nebenläufigkeit)
+    version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
+    shopping_list = db.relationship('ShoppingList', back_populates='items')
+   
+
+
+class ShoppingListRecipe(db.Model):
+    # Rezepte, aus denen eine Einkaufsliste erzeugt wurde
+    __tablename__ = 'shopping_list_recipes'
+    shopping_list_id = db.Column(db.Integer, db.ForeignKey('shopping_lists.id'), primary_key=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), primary_key=True, index=True)
+    # Mengenfaktor, z.B. 2.0 für doppelt so viele Portionen (Essensplan)
+    factor = db.Column(db.Float, default=1.0, server_default='1', nullable=False)
+
+
+class ShoppingListNeed(db.Model):
+    # Bedarf einer Zutat auf der Liste, bevor der Bestand abgezogen wird
+    __tablename__ = 'shopping_list_needs'
+    shopping_list_id = db.Column(db.Integer, db.ForeignKey('shopping_lists.id'), primary_key=True)
+    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.id'), primary_key=True)
+    # Dimension (mass, volume, count), unbekannte Einheit oder '' für "ohne Menge"
+    dimension = db.Column(db.String(20), primary_key=True)
+    required = db.Column(db.Float, nullable=True)  # in Basiseinheit, NULL ohne Menge
+    row_count = db.Column(db.Integer, nullable=False)  # Anzahl Rezeptzeilen
+    first_id = db.Column(db.Integer, nullable=False)  # für die Reihenfolge auf der Liste
+    unit = db.Column(db.String(20), nullable=True)  # Original-Einheit, nur ohne Menge
+
+
+class MealPlanEntry(db.Model):
+    # Ein geplantes Rezept an einem Tag (meal_planner.py)
+    __tablename__ = 'meal_plan_entries'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False, index=True)
+    plan_date = db.Column(db.Date, nullable=False)
+    slot = db.Column(db.String(20), nullable=False)  # z.B. "lunch", siehe meal_planner.SLOTS
+    servings = db.Column(db.Integer, nullable=True)  # NULL = Portionen des Rezepts
+
+    # Plan je User und Zeitraum
+    __table_args__ = (
+        db.Index('ix_meal_plan_entries_user_id_plan_date', 'user_id', 'plan_date'),
+    )
+
+    user = db.relationship('User', back_populates='meal_plan_entries')
+    recipe = db.relationship('Recipe', back_populates='meal_plan_entries')
+
+
+class HouseholdItem(db.Model):
+    # Bestand einer Zutat je Dimension, Summe aller Bewegungen (inventory.py)
+    __tablename__ = 'household_items'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.id'), nullable=False)
+    # Dimension (mass, volume, count), unbekannte Einheit oder '' für "ohne Menge"
+    dimension = db.Column(db.String(20), nullable=False, default='', server_default='')
+    amount = db.Column(db.Float, nullable=True)  # in der Basiseinheit, NULL ohne Menge
+    unit = db.Column(db.String(20), nullable=True)  # Basiseinheit bzw. Original-Einheit
+    expires_on = db.Column(db.Date, nullable=True)  # frühestes Ablaufdatum
+
+    # Eine Zeile je Zutat und Dimension, auch für den Abgleich einzelner
+    # Zutaten; "läuft bald ab" je User
+    __table_args__ = (
+        db.Index('ix_household_items_user_id_ingredient_id_dimension',
+                 'user_id', 'ingredient_id', 'dimension', unique=True),
+        db.Index('ix_household_items_user_id_expires_on', 'user_id', 'expires_on'),
+    )
+
+    user = db.relationship('User', back_populates='household_items')
+    ingredient = db.relationship('Ingredient')
+
+
+class HouseholdMovement(db.Model):
+    # Bewegungsbuch des Bestands, wird nur angehängt (inventory.py)
+    __tablename__ = 'household_movements'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.id'), nullable=False)
+    dimension = db.Column(db.String(20), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)  # purchase, consume, discard
+    amount = db.Column(db.Float, nullable=True)  # mit Vorzeichen, Basiseinheit
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Verlauf je User und Zutat
+    __table_args__ = (
+        db.Index('ix_household_movements_user_id_ingredient_id', 'user_id', 'ingredient_id'),
+    )
+
+    user = db.relationship('User', back_populates='household_movements')
+    ingredient = db.relationship('Ingredient')
@@ -0,0 +1,365 @@
+# nutrition.py
+"""
+Nährwerte von Rezepten und Essensplan.
+
+Die Nährwerte je 100 g stehen in nutrition_facts, eine Zeile je Zutat. Sie
+kommen aus einer lokalen CSV-Lebensmitteldatenbank ("flask nutrition
+import"), Spalten:
+  name, kcal, protein, fat, carbs, fiber, sugar, salt, density, piece_grams
+Nur name ist Pflicht, fehlende Nährwerte gelten als 0. density (g/ml) rechnet
+Volumen in Gramm um (leer: wie Wasser), piece_grams das Gewicht eines Stücks
+(leer: Stückangaben zählen nicht). Dezimalkomma ist erlaubt. Unbekannte
+Namen werden als Zutaten angelegt, so greifen die Werte auch für Rezepte,
+die erst später geschrieben werden.
+
+Die Summen je Rezept (alle Portionen) stehen in recipe_nutrition und werden
+beim Anlegen, Ändern der Zutaten und Importieren von Rezepten nachgeführt
+(recompute). Listen und Essensplan lesen nur diese Summen. Gerechnet wird
+über Arrays: jede Zutatenzeile wird in Gramm umgerechnet, mit ihrer Zeile
+der Nährwert-Matrix (Zutat x Nährstoff) gewichtet und per bincount je
+Rezept summiert. Bei kleinen Mengen oder ohne NumPy rechnet eine Schleife
+dasselbe. Zeilen ohne Nährwerte oder ohne umrechenbare Menge zählen in
+"missing".
+
+Alle Methoden außer load_facts und recompute_all schreiben nur in die
+Session, committen muss der Aufrufer.
+"""
+import csv
+import itertools
+from operator import itemgetter
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import Date, bindparam, text
+
+import quantity
+from ingredient_resolver import normalize_name
+
+try:
+    import numpy as np
+except ImportError:  # Vektorisierter Pfad ist optional
+    np = None
+
+# Nährstoffe je 100 g bzw. je Rezept, in dieser Reihenfolge in der Matrix
+NUTRIENTS = ('kcal', 'protein', 'fat', 'carbs', 'fiber', 'sugar', 'salt')
+
+_COLUMNS = ', '.join(NUTRIENTS)
+_VALUES = ', '.join(f':{n}' for n in NUTRIENTS)
+
+_ROWS_SQL = text("""
+    SELECT recipe_id, ingredient_id, amount, unit_key(unit) AS unit_key
+    FROM recipe_ingredients
+    WHERE recipe_id IN :recipe_ids
+""").bindparams(bindparam('recipe_ids', expanding=True))
+
+# Für recompute_all: die IDs eines Blocks sind lückenlos alle Rezepte im Bereich
+_RANGE_ROWS_SQL = text("""
+    SELECT recipe_id, ingredient_id, amount, unit_key(unit) AS unit_key
+    FROM recipe_ingredients
+    WHERE recipe_id BETWEEN :first AND :last
+""")
+_RECIPE_IDS_SQL = text("SELECT id FROM recipes WHERE id > :after ORDER BY id LIMIT :limit")
+
+_FACTS_SQL = text(f"SELECT ingredient_id, {_COLUMNS}, density, piece_grams FROM nutrition_facts")
+_SOME_FACTS_SQL = text(f"""
+    SELECT ingredient_id, {_COLUMNS}, density, piece_grams FROM nutrition_facts
+    WHERE ingredient_id IN :ingredient_ids
+""").bindparams(bindparam('ingredient_ids', expanding=True))
+
+_UPSERT_FACTS_SQL = text(f"""
+    INSERT INTO nutrition_facts (ingredient_id, {_COLUMNS}, density, piece_grams)
+    VALUES (:ingredient_id, {_VALUES}, :density, :piece_grams)
+    ON CONFLICT (ingredient_id) DO UPDATE SET
+        {', '.join(f'{n} = excluded.{n}' for n in NUTRIENTS)},
+        density = excluded.density, piece_grams = excluded.piece_grams
+""")
+
+_UPSERT_TOTALS_SQL = text(f"""
+    INSERT INTO recipe_nutrition (recipe_id, {_COLUMNS}, missing)
+    VALUES (:recipe_id, {_VALUES}, :missing)
+    ON CONFLICT (recipe_id) DO UPDATE SET
+        {', '.join(f'{n} = excluded.{n}' for n in NUTRIENTS)}, missing = excluded.missing
+""")
+
+# Summen je Tag, skaliert wie die Einkaufsliste mit geplanten / Rezept-Portionen.
+# incomplete zählt Mahlzeiten, deren Rezept Zeilen ohne Nährwerte hat.
+_PLAN_SQL = text(f"""
+    SELECT mp.plan_date,
+           {', '.join(
+               f'SUM(coalesce(rn.{n}, 0) * coalesce(mp.servings, r.servings) / r.servings) AS {n}'
+               for n in NUTRIENTS)},
+           COUNT(*) AS meals,
+           SUM(rn.recipe_id IS NULL OR rn.missing > 0) AS incomplete
+    FROM meal_plan_entries mp
+    JOIN recipes r ON r.id = mp.recipe_id
+    LEFT JOIN recipe_nutrition rn ON rn.recipe_id = mp.recipe_id
+    WHERE mp.user_id = :user_id AND mp.plan_date BETWEEN :start AND :end
+    GROUP BY mp.plan_date
+    ORDER BY mp.plan_date
+""").bindparams(
+    bindparam('start', type_=Date), bindparam('end', type_=Date)
+).columns(plan_date=Date)
+
+# Dimension je Einheiten-Code für den Array-Pfad, letzter Eintrag: unbekannt
+_MASS, _VOLUME, _COUNT, _OTHER = range(4)
+if np is not None:
+    _DIMENSION_CODES = {quantity.MASS: _MASS, quantity.VOLUME: _VOLUME,
+                        quantity.COUNT: _COUNT}
+    _CODE_DIMENSIONS = np.array([_DIMENSION_CODES[d] for d in quantity.CODE_DIMENSIONS]
+                                + [_OTHER], dtype=np.intp)
+    _CODE_FACTORS = np.array(quantity.CODE_FACTORS + [np.nan], dtype=float)
+
+
+class NutritionError(ValueError):
+    def __init__(self, message, line=None):
+        super().__init__(message if line is None else f"Zeile {line}: {message}")
+        self.message = message
+        self.line = line
+
+
+def row_grams(amount, key, density=None, piece_grams=None):
+    """
+    Menge einer Zutatenzeile in Gramm (key wie in quantity normalisiert)
+    oder None, wenn sie sich nicht umrechnen lässt.
+    """
+    unit = quantity.lookup(key)
+    if amount is None or unit is None:
+        return None
+    value = amount * unit.factor
+    if unit.dimension == quantity.MASS:
+        return value
+    if unit.dimension == quantity.VOLUME:
+        return value * (density or 1.0)
+    return value * piece_grams if piece_grams else None
+
+
+def compute_totals(recipe_ids, rows, facts):
+    """
+    Summen je Rezept als Dicts für recipe_nutrition, in der Reihenfolge von
+    recipe_ids (aufsteigend sortiert, auch Rezepte ohne Zeilen). rows sind
+    (recipe_id, ingredient_id, amount, unit_key), facts {ingredient_id:
+    (Nährwerte je 100 g in NUTRIENTS-Reihenfolge..., density, piece_grams)}.
+    """
+    if np is None or len(rows) < quantity.VECTORIZE_THRESHOLD:
+        sums, missing = _sum_rows(recipe_ids, rows, facts)
+    else:
+        sums, missing = _sum_arrays(recipe_ids, rows, facts)
+    return [
+        dict(zip(NUTRIENTS, values), recipe_id=recipe_id, missing=int(count))
+        for recipe_id, values, count in zip(recipe_ids, sums, missing)
+    ]
+
+
+def _sum_rows(recipe_ids, rows, facts):
+    position = {recipe_id: i for i, recipe_id in enumerate(recipe_ids)}
+    sums = [[0.0] * len(NUTRIENTS) for _ in recipe_ids]
+    missing = [0] * len(recipe_ids)
+    for recipe_id, ingredient_id, amount, key in rows:
+        i = position[recipe_id]
+        fact = facts.get(ingredient_id)
+        grams = None if fact is None else row_grams(amount, key, fact[-2], fact[-1])
+        if grams is None:
+            missing[i] += 1
+            continue
+        share = grams / 100.0
+        target = sums[i]
+        for j in range(len(NUTRIENTS)):
+            target[j] += fact[j] * share
+    return [[round(value, 3) for value in values] for values in sums], missing
+
+
+def _sum_arrays(recipe_ids, rows, facts):
+    n, size = len(rows), len(recipe_ids)
+    # Nährwert-Matrix: eine Zeile je Zutat, die letzte (NaN) für Zutaten ohne Werte
+    unknown = len(facts)
+    matrix = np.array(list(facts.values()) + [(None,) * (len(NUTRIENTS) + 2)], dtype=float)
+    ingredients = np.fromiter(map(itemgetter(1), rows), dtype=np.intp, count=n)
+    fact_row = np.full(max(max(facts, default=0), int(ingredients.max())) + 1, unknown,
+                       dtype=np.intp)
+    fact_row[np.fromiter(facts, dtype=np.intp, count=unknown)] = np.arange(unknown)
+    ingredient_index = fact_row[ingredients]
+    recipe_index = np.searchsorted(np.array(recipe_ids),
+                                   np.fromiter(map(itemgetter(0), rows), dtype=np.intp, count=n))
+    amounts = np.array(list(map(itemgetter(2), rows)), dtype=float)  # None -> NaN
+    # Jede Schreibweise nur einmal nachschlagen
+    key_column = list(map(itemgetter(3), rows))
+    keys = list(set(key_column))
+    key_codes = dict(zip(keys, quantity.unit_codes(keys).tolist()))
+    codes = np.fromiter(map(key_codes.__getitem__, key_column), dtype=np.intp, count=n)
+
+    values = amounts * _CODE_FACTORS[codes]
+    dimensions = _CODE_DIMENSIONS[codes]
+    density = np.nan_to_num(matrix[ingredient_index, -2], nan=1.0)
+    grams = np.select(
+        [dimensions == _MASS, dimensions == _VOLUME, dimensions == _COUNT],
+        [values, values * density, values * matrix[ingredient_index, -1]],
+        default=np.nan,
+    )
+    valid = ~np.isnan(grams) & (ingredient_index != unknown)
+    shares = np.where(valid, grams, 0.0) / 100.0
+    # (Zeilen x Nährstoffe) gewichtet, dann je Rezept summiert
+    weighted = np.nan_to_num(matrix[ingredient_index, :len(NUTRIENTS)]) * shares[:, None]
+    sums = np.column_stack([
+        np.bincount(recipe_index, weights=weighted[:, j], minlength=size)
+        for j in range(len(NUTRIENTS))
+    ])
+    missing = np.bincount(recipe_index, weights=~valid, minlength=size)
+    return np.round(sums, 3).tolist(), missing.tolist()
+
+
+def _number(value, field, line):
+    if value is None or not value.strip():
+        return None
+    try:
+        number = float(value.strip().replace(',', '.'))
+    except ValueError:
+        raise NutritionError(f"ungültiger Wert {value!r} in Spalte {field}", line)
+    if number < 0:
+        raise NutritionError(f"negativer Wert in Spalte {field}", line)
+    return number
+
+
+def read_facts(lines, delimiter: str = ','):
+    """ Liest die CSV-Datei als Generator von (Name, Werte-Dict), Zeile für Zeile. """
+    reader = csv.DictReader(lines, delimiter=delimiter)
+    if not reader.fieldnames or 'name' not in reader.fieldnames:
+        raise NutritionError("Spalte 'name' fehlt")
+    for record in reader:
+        line = reader.line_num
+        name = normalize_name(record.get('name'))
+        if not name:
+            raise NutritionError("Name fehlt", line)
+        values = {n: _number(record.get(n), n, line) or 0.0 for n in NUTRIENTS}
+        values['density'] = _number(record.get('density'), 'density', line)
+        values['piece_grams'] = _number(record.get('piece_grams'), 'piece_grams', line)
+        yield name, values
+
+
+class NutritionEngine:
+    def __init__(self, db, ingredient_resolver, render_cache=None, chunk_size: int = 5000):
+        self.db = db
+        self.ingredient_resolver = ingredient_resolver
+        self.render_cache = render_cache
+        # Rezepte je Block in recompute_all, Lebensmittel je Statement in load_facts
+        self.chunk_size = chunk_size
+
+    def recompute(self, recipe_ids, facts=None):
+        """
+        Berechnet die Summen der Rezepte neu und schreibt sie mit einem
+        Upsert. Gibt die Anzahl der Rezepte zurück.
+        """
+        recipe_ids = sorted({int(r) for r in recipe_ids})
+        if not recipe_ids:
+            return 0
+        session = self.db.session
+        rows = session.execute(_ROWS_SQL, {'recipe_ids': recipe_ids}).all()
+        if facts is None:
+            facts = self.facts({row.ingredient_id for row in rows})
+        session.execute(_UPSERT_TOTALS_SQL, compute_totals(recipe_ids, rows, facts))
+        return len(recipe_ids)
+
+    def recompute_all(self):
+        """
+        Alle Rezepte, blockweise nach ID mit je einer Abfrage und einem
+        Upsert. Die Nährwerte werden einmal geladen. Committet je Block,
+        zum Schluss sind die gecachten Seiten aller User veraltet.
+        """
+        session = self.db.session
+        facts = self.facts()
+        after = count = 0
+        try:
+            while True:
+                recipe_ids = session.scalars(
+                    _RECIPE_IDS_SQL, {'after': after, 'limit': self.chunk_size}
+                ).all()
+                if not recipe_ids:
+                    if self.render_cache is not None:
+                        self.render_cache.bump_all_versions()
+                        session.commit()
+                    return count
+                rows = session.execute(_RANGE_ROWS_SQL, {'first': recipe_ids[0],
+                                                         'last': recipe_ids[-1]}).all()
+                session.execute(_UPSERT_TOTALS_SQL, compute_totals(recipe_ids, rows, facts))
+                session.commit()
+                count += len(recipe_ids)
+                after = recipe_ids[-1]
+        except Exception:
+            session.rollback()
+            raise
+
+    def facts(self, ingredient_ids=None):
+        """ {ingredient_id: (Nährwerte..., density, piece_grams)}, ohne IDs alle. """
+        if ingredient_ids is None:
+            result = self.db.session.execute(_FACTS_SQL)
+        elif not ingredient_ids:
+            return {}
+        else:
+            result = self.db.session.execute(
+                _SOME_FACTS_SQL, {'ingredient_ids': sorted(ingredient_ids)}
+            )
+        return {row[0]: tuple(row[1:]) for row in result}
+
+    def load_facts(self, lines, delimiter: str = ','):
+        """
+        Lädt die Nährwerte aus CSV-Zeilen (siehe Modulbeschreibung), je
+        chunk_size Lebensmittel ein Resolver-Aufruf und ein Upsert, alles in
+        einer Transaktion. Die Rezepte rechnet danach recompute_all neu.
+        Gibt die Anzahl der Lebensmittel zurück.
+        """
+        session = self.db.session
+        records = read_facts(lines, delimiter)
+        count = 0
+        try:
+            while True:
+                chunk = list(itertools.islice(records, self.chunk_size))
+                if not chunk:
+                    break
+                ingredient_ids = self.ingredient_resolver.resolve(name for name, _ in chunk)
+                session.execute(_UPSERT_FACTS_SQL, [
+                    dict(values, ingredient_id=ingredient_ids[name]) for name, values in chunk
+                ])
+                count += len(chunk)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return count
+
+    def plan_totals(self, user_id: int, start, end):
+        """
+        Nährwerte je geplantem Tag von start bis end: {date: row} mit den
+        NUTRIENTS, meals und incomplete (Mahlzeiten mit unvollständigen Werten).
+        """
+        rows = self.db.session.execute(
+            _PLAN_SQL, {'user_id': user_id, 'start': start, 'end': end}
+        ).all()
+        return {row.plan_date: row for row in rows}
+
+
+# --------------------------------
+# CLI
+# --------------------------------
+cli = AppGroup('nutrition', help="Nährwerte laden und Rezepte neu berechnen.")
+
+
+@cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--delimiter', default=',', help="Trennzeichen der CSV-Datei")
+def import_command(path, delimiter):
+    """ Nährwerte aus einer CSV-Datei laden und alle Rezepte neu berechnen. """
+    engine = current_app.extensions['mealmaster'].nutrition
+    with open(path, encoding='utf-8-sig', newline='') as lines:
+        try:
+            foods = engine.load_facts(lines, delimiter=delimiter)
+        except NutritionError as error:
+            raise click.ClickException(str(error))
+    recipes = engine.recompute_all()
+    click.echo(f"{foods} Lebensmittel geladen, {recipes} Rezepte berechnet.")
+
+
+@cli.command('recompute')
+def recompute_command():
+    """ Nährwerte aller Rezepte neu berechnen. """
+    recipes = current_app.extensions['mealmaster'].nutrition.recompute_all()
+    click.echo(f"{recipes} Rezepte berechnet.")
@@ -0,0 +1,97 @@
+# password_hasher.py
+"""
+bcrypt über einen eigenen, begrenzten Thread-Pool pro Worker.
+
+bcrypt gibt während des Hashens den GIL frei, ein Thread-Pool reicht also.
+Wichtiger ist die Obergrenze: Sind bereits max_pending Hashes in Arbeit
+oder in der Warteschlange, wird sofort HasherBusy geworfen und der Request
+abgewiesen, statt einen weiteren Worker-Thread an bcrypt zu binden. Mit
+max_pending kleiner als die Threads je uWSGI-Worker bleibt so immer ein
+Thread für andere Seiten frei, auch bei vielen Logins gleichzeitig.
+
+Der Work-Faktor kommt aus der Konfiguration (bcrypt_rounds). Hashes mit
+einem anderen Faktor erkennt needs_rehash(), login speichert dann einen
+neuen Hash.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class HasherBusy(Exception):
+    """ Zu viele Hash-Aufträge gleichzeitig, der Request wird abgewiesen. """
+
+
+class PasswordHasher:
+    def __init__(self, bcrypt, metrics=None, rounds: int = 12, workers: int = 1,
+                 max_pending: int = 1):
+        self.bcrypt = bcrypt
+        self.metrics = metrics
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+        self._pending = 0
+        self._stats = {'hashed': 0, 'checked': 0, 'rejected': 0}
+
+    def hash(self, password: str) -> str:
+        return self._run('hash', self.bcrypt.generate_password_hash, password,
+                         self.rounds).decode('utf-8')
+
+    def check(self, pw_hash: str, password: str) -> bool:
+        return self._run('check', self.bcrypt.check_password_hash, pw_hash, password)
+
+    def needs_rehash(self, pw_hash: str) -> bool:
+        # $2b$12$<salt+hash>
+        parts = pw_hash.split('$')
+        return len(parts) == 4 and parts[2].isdigit() and int(parts[2]) != self.rounds
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending=self._pending)
+
+    def metric_samples(self):
+        """ Zähler für metrics.Metrics.add_collector. """
+        stats = self.stats()
+        return [('mealmaster_password_hashes_total', {'result': result}, stats[result])
+                for result in ('hashed', 'checked', 'rejected')]
+
+    def _run(self, op, func, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats['rejected'] += 1
+                raise HasherBusy()
+            self._pending += 1
+        try:
+            future = self._executor().submit(self._timed, op, func, *args)
+        except BaseException:
+            self._release(op, done=False)
+            raise
+        try:
+            return future.result()
+        finally:
+            self._release(op, done=True)
+
+    def _timed(self, op, func, *args):
+        if self.metrics is None:
+            return func(*args)
+        with self.metrics.time_bcrypt(op):
+            return func(*args)
+
+    def _release(self, op, done):
+        with self._lock:
+            self._pending -= 1
+            if done:
+                self._stats['hashed' if op == 'hash' else 'checked'] += 1
+
+    def _executor(self):
+        # Threads überleben keinen fork, daher ein Pool pro Worker-Prozess
+        if self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool_pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='bcrypt')
+                    self._pool_pid = os.getpid()
+        return self._pool
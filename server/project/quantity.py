@@ -0,0 +1,140 @@
+# quantity.py
+"""
+Einheiten und Mengenumrechnung für MealMaster.
+
+Alle bekannten Einheiten werden beim Import einmal in Nachschlagetabellen
+übersetzt (Dict und Arrays über einen Integer-Code). Pro Zeile wird danach
+nur noch nachgeschlagen und multipliziert, es wird nichts mehr geparst.
+Die Schlüssel sind bereits kleingeschrieben und getrimmt, das erledigt
+unit_key(); die SQL-Abfragen rufen dieselbe Funktion als unit_key(unit)
+auf (database.py registriert sie bei SQLite). lower() in SQLite kennt nur
+ASCII, "STÜCK" wäre dort nicht "stück".
+"""
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # Vektorisierter Pfad ist optional
+    np = None
+
+
+MASS = 'mass'
+VOLUME = 'volume'
+COUNT = 'count'
+
+# Basiseinheit je Dimension, in dieser Einheit wird gerechnet
+BASE_UNITS = {
+    MASS: 'g',
+    VOLUME: 'ml',
+    COUNT: 'stk',
+}
+
+# (Dimension, Faktor zur Basiseinheit, Schreibweisen)
+_UNIT_DEFINITIONS = [
+    (MASS, 1.0, ('g', 'gr', 'gramm', 'gram', 'grams')),
+    (MASS, 1000.0, ('kg', 'kilo', 'kilogramm', 'kilogram')),
+    (MASS, 0.001, ('mg', 'milligramm', 'milligram')),
+    (MASS, 500.0, ('pfd', 'pfund')),
+    (VOLUME, 1.0, ('ml', 'milliliter')),
+    (VOLUME, 10.0, ('cl', 'zentiliter')),
+    (VOLUME, 100.0, ('dl', 'deziliter')),
+    (VOLUME, 1000.0, ('l', 'liter', 'ltr')),
+    (VOLUME, 15.0, ('el', 'essl', 'esslöffel', 'tbsp')),
+    (VOLUME, 5.0, ('tl', 'teel', 'teelöffel', 'tsp')),
+    (VOLUME, 250.0, ('tasse', 'tassen', 'cup', 'cups')),
+    (COUNT, 1.0, ('', 'stk', 'stk.', 'st', 'st.', 'stück', 'stueck', 'pcs', 'x')),
+]
+
+Unit = namedtuple('Unit', ['code', 'dimension', 'factor'])
+
+UNIT_TABLE = {}
+CODE_DIMENSIONS = []
+CODE_FACTORS = []
+for _dimension, _factor, _aliases in _UNIT_DEFINITIONS:
+    for _alias in _aliases:
+        UNIT_TABLE[_alias] = Unit(len(CODE_FACTORS), _dimension, _factor)
+        CODE_DIMENSIONS.append(_dimension)
+        CODE_FACTORS.append(_factor)
+
+# Code für unbekannte Einheiten im Array-Pfad
+UNKNOWN_CODE = len(CODE_FACTORS)
+
+if np is not None:
+    _FACTOR_ARRAY = np.array(CODE_FACTORS + [np.nan], dtype=float)
+
+# Ab dieser Anzahl Werte lohnt sich der NumPy-Pfad
+VECTORIZE_THRESHOLD = 256
+
+
+def unit_key(unit):
+    """
+    Normalisiert eine Einheit zum Schlüssel von UNIT_TABLE, für Eingaben und
+    in SQL als unit_key(unit). None wird zu '' (zählt als Stück).
+    """
+    return (unit or '').strip().lower()
+
+
+def lookup(key):
+    """ Gibt das Unit-Tupel zu einem normalisierten Schlüssel zurück oder None. """
+    return UNIT_TABLE.get(key)
+
+
+def dimension_key(key):
+    """
+    Schlüssel, unter dem Mengen zusammengefasst werden: die Dimension
+    bei bekannten Einheiten, sonst die Einheit selbst (z.B. "prise").
+    """
+    unit = UNIT_TABLE.get(key)
+    return unit.dimension if unit else key
+
+
+def display_unit(dim_key):
+    """ Einheit, mit der eine Summe auf der Einkaufsliste steht. """
+    return BASE_UNITS.get(dim_key, dim_key)
+
+
+def to_base(amount, key):
+    """
+    Rechnet eine Menge in die Basiseinheit ihrer Dimension um.
+    Gibt (dimension_key, menge) zurück, unbekannte Einheiten bleiben wie sie sind.
+    """
+    unit = UNIT_TABLE.get(key)
+    if unit is None:
+        return key, amount
+    return unit.dimension, amount * unit.factor
+
+
+def unit_codes(keys):
+    """
+    Codes der normalisierten Schlüssel als NumPy-Array, UNKNOWN_CODE für
+    unbekannte Einheiten. Nur mit NumPy aufrufen.
+    """
+    keys = list(keys)
+    return np.fromiter(
+        (UNIT_TABLE[k].code if k in UNIT_TABLE else UNKNOWN_CODE for k in keys),
+        dtype=np.intp, count=len(keys)
+    )
+
+
+def to_base_many(amounts, keys):
+    """
+    Wie to_base, aber für viele Werte auf einmal. Gibt zwei Listen
+    (dimension_keys, mengen) zurück. Bei großen Mengen und vorhandenem
+    NumPy wird über die Code-Arrays vektorisiert gerechnet.
+    """
+    if np is None or len(amounts) < VECTORIZE_THRESHOLD:
+        dims, values = [], []
+        for amount, key in zip(amounts, keys):
+            dim, value = to_base(amount, key)
+            dims.append(dim)
+            values.append(value)
+        return dims, values
+
+    codes = unit_codes(keys)
+    raw = np.asarray(amounts, dtype=float)
+    factors = _FACTOR_ARRAY[codes]
+    known = codes != UNKNOWN_CODE
+    values = np.where(known, raw * np.nan_to_num(factors, nan=1.0), raw)
+    dims = [CODE_DIMENSIONS[c] if c != UNKNOWN_CODE else k
+            for c, k in zip(codes.tolist(), keys)]
+    return dims, values.tolist()
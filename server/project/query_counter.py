@@ -0,0 +1,77 @@
+# query_counter.py
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """
+    Zählt die SQL-Statements pro Request und misst ihre Zeit (g.query_seconds,
+    für die Metriken).
+    Ist ein Budget gesetzt (Config "query_budget"), wird jede Überschreitung
+    geloggt; im Testmodus (app.testing) schlägt der Request mit einem
+    AssertionError fehl, damit N+1-Abfragen sofort auffallen.
+    """
+    def __init__(self, app=None, db=None, budget: int = None):
+        self.budget = budget
+        self._local = threading.local()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        with app.app_context():
+            # Alle Engines, also auch die Leseverbindung (database.py)
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._on_execute)
+                event.listen(engine, 'after_cursor_execute', self._on_executed)
+        app.before_request(self._reset)
+        app.after_request(self._check)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.query_count = g.get('query_count', 0) + 1
+            conn.info['query_start'] = time.perf_counter()
+        counters = getattr(self._local, 'counters', None)
+        if counters:
+            for counter in counters:
+                counter.append(statement)
+
+    def _on_executed(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop('query_start', None)
+        if start is not None and has_request_context():
+            g.query_seconds = g.get('query_seconds', 0.0) + time.perf_counter() - start
+
+    def _reset(self):
+        g.query_count = 0
+        g.query_seconds = 0.0
+
+    def _check(self, response):
+        count = g.get('query_count', 0)
+        response.headers['X-Query-Count'] = str(count)
+        if self.budget is not None and count > self.budget:
+            message = (f"{request.method} {request.path} hat {count} SQL-Statements "
+                       f"ausgeführt (Budget: {self.budget})")
+            if current_app.testing:
+                raise AssertionError(message)
+            current_app.logger.warning(message)
+        return response
+
+    @contextmanager
+    def count(self):
+        """
+        Sammelt alle Statements im aktuellen Thread, z.B. für Benchmarks:
+            with query_counter.count() as statements: ...
+            len(statements)
+        """
+        statements = []
+        counters = getattr(self._local, 'counters', None)
+        if counters is None:
+            counters = self._local.counters = []
+        counters.append(statements)
+        try:
+            yield statements
+        finally:
+            counters.remove(statements)
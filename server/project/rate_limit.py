@@ -0,0 +1,67 @@
+# rate_limit.py
+"""
+Token-Buckets für login und register, je IP und je Benutzername.
+
+Jeder Versuch kostet ein Token. Ein Bucket fasst burst Tokens und füllt
+sich mit per_minute Tokens pro Minute wieder auf. Die IP ist
+request.remote_addr, hinter nginx dank ProxyFix die echte Client-Adresse.
+
+Die Buckets liegen pro Worker im Speicher (höchstens max_keys Schlüssel,
+die ältesten fallen heraus). Über alle uWSGI-Worker verteilt erlaubt das
+bis zu workers-mal so viele Versuche, gebremst wird ein Angreifer trotzdem.
+per_minute = 0 schaltet die jeweilige Begrenzung ab.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBuckets:
+    def __init__(self, per_minute: float, burst: int, max_keys: int = 10000):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # Schlüssel -> (Tokens, Zeitpunkt der letzten Auffüllung)
+        self._buckets = OrderedDict()
+
+    def take(self, key) -> float:
+        """ Nimmt ein Token. 0 wenn erlaubt, sonst Sekunden bis zum nächsten Token. """
+        if self.rate <= 0 or key is None:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class LoginThrottle:
+    def __init__(self, ip_per_minute: float = 30, ip_burst: int = 10,
+                 user_per_minute: float = 6, user_burst: int = 5, metrics=None):
+        self.by_ip = TokenBuckets(ip_per_minute, ip_burst)
+        self.by_user = TokenBuckets(user_per_minute, user_burst)
+        self.metrics = metrics
+
+    def check(self, ip_address: str, username: str = None) -> float:
+        """ Sekunden, die der Client warten muss, 0 wenn der Versuch erlaubt ist. """
+        wait = self.by_ip.take(ip_address)
+        if wait:
+            self._count('ip')
+            return wait
+        wait = self.by_user.take(username)
+        if wait:
+            self._count('user')
+        return wait
+
+    def _count(self, limit):
+        if self.metrics is not None:
+            self.metrics.inc('mealmaster_login_throttled_total', limit=limit)
@@ -0,0 +1,302 @@
+# recipe_search.py
+"""
+Volltextsuche über Rezepttitel, Anleitung und Zutatennamen.
+
+Standardmäßig wird eine SQLite-FTS5-Tabelle (recipe_search) benutzt, deren
+rowid der Rezept-ID entspricht. Ist FTS5 nicht verfügbar, springt ein
+invertierter Index im Speicher ein. Der liegt pro Worker-Prozess vor und
+sieht deshalb nur Änderungen, die dieser Worker selbst gemacht hat, bis er
+neu gestartet wird -- für den Produktivbetrieb ist FTS5 gedacht.
+"""
+import bisect
+import re
+import threading
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import OperationalError
+
+_TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Ein Dokument je Rezept: Titel, Anleitung und alle Zutatennamen
+_DOCUMENT_SQL = """
+    SELECT r.id AS id,
+           r.user_id AS user_id,
+           r.title AS title,
+           coalesce(r.instructions, '') AS instructions,
+           coalesce(group_concat(i.name, ' '), '') AS ingredients
+    FROM recipes r
+    LEFT JOIN recipe_ingredients ri ON ri.recipe_id = r.id
+    LEFT JOIN ingredients i ON i.id = ri.ingredient_id
+    {where}
+    GROUP BY r.id
+"""
+
+_CREATE_FTS_SQL = text("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipe_search USING fts5(
+        title, instructions, ingredients,
+        user_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+""")
+
+# Rezepte, deren Zutaten alle im Haushalt des Users vorhanden sind: es darf
+# keine Zutatenzeile ohne Treffer im Bestand geben. Läuft über die Indizes
+# auf recipes (user_id), recipe_ingredients (recipe_id) und household_items
+# (user_id, ingredient_id) und bricht je Rezept bei der ersten Lücke ab.
+_COOKABLE_SQL = text("""
+    SELECT r.id AS id, r.title AS title
+    FROM recipes r
+    WHERE r.user_id = :user_id
+      AND EXISTS (SELECT 1 FROM recipe_ingredients ri WHERE ri.recipe_id = r.id)
+      AND NOT EXISTS (
+          SELECT 1 FROM recipe_ingredients ri
+          WHERE ri.recipe_id = r.id
+            AND NOT EXISTS (
+                SELECT 1 FROM household_items hi
+                WHERE hi.user_id = :user_id AND hi.ingredient_id = ri.ingredient_id
+            )
+      )
+    ORDER BY r.title
+    LIMIT :limit
+""")
+
+
+def tokenize(value: str):
+    return [t.lower() for t in _TOKEN_PATTERN.findall(value or '')]
+
+
+def create_index(connection):
+    """
+    Legt die FTS5-Tabelle an und befüllt sie, falls sie neu ist. Wird vom
+    Migrationsschritt aufgerufen. Gibt False zurück, wenn SQLite kein FTS5
+    kann; die Suche nutzt dann den Index im Speicher.
+    """
+    if connection.dialect.name != 'sqlite':
+        return False
+    exists = connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE name = 'recipe_search'"
+    )).first()
+    if exists:
+        return True
+    try:
+        connection.execute(_CREATE_FTS_SQL)
+    except OperationalError:
+        # SQLite ohne FTS5
+        return False
+    connection.execute(text(
+        "INSERT INTO recipe_search (rowid, user_id, title, instructions, ingredients) "
+        "SELECT id, user_id, title, instructions, ingredients "
+        f"FROM ({_DOCUMENT_SQL.format(where='')})"
+    ))
+    return True
+
+
+class RecipeSearch:
+    """
+    Suchindex für Rezepte. Wird aus den Routen create/edit/delete_recipe
+    inkrementell in derselben Transaktion aktualisiert. Die FTS5-Tabelle
+    legt der Migrationsschritt an (create_index).
+    """
+    def __init__(self, db, use_fts: bool = None):
+        self.db = db
+        self.use_fts = use_fts
+        self._memory = None
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _ensure_ready(self):
+        """
+        Beim ersten Zugriff im Worker: prüfen, ob die FTS5-Tabelle existiert
+        (angelegt per Migration), sonst den Index im Speicher aufbauen.
+        """
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            session = self.db.session
+            if self.use_fts is None:
+                self.use_fts = (
+                    session.get_bind().dialect.name == 'sqlite'
+                    and session.execute(text(
+                        "SELECT 1 FROM sqlite_master WHERE name = 'recipe_search'"
+                    )).first() is not None
+                )
+            if not self.use_fts:
+                self.rebuild()
+            self._ready = True
+
+    # ----------------------------
+    # Index pflegen
+    # ----------------------------
+    def rebuild(self):
+        """ Baut den kompletten Index aus der Datenbank neu auf. """
+        session = self.db.session
+        if self.use_fts:
+            session.execute(text("DELETE FROM recipe_search"))
+            session.execute(text(
+                "INSERT INTO recipe_search (rowid, user_id, title, instructions, ingredients) "
+                "SELECT id, user_id, title, instructions, ingredients "
+                f"FROM ({_DOCUMENT_SQL.format(where='')})"
+            ))
+        else:
+            if self._memory is None:
+                self._memory = InvertedIndex()
+            self._memory.clear()
+            for row in session.execute(text(_DOCUMENT_SQL.format(where=''))):
+                self._memory.add(row)
+        self._ready = self.use_fts is not None
+
+    def index_recipe(self, recipe_id: int):
+        """
+        Aktualisiert das Dokument eines Rezepts. Muss nach einem flush()
+        aufgerufen werden, damit Rezept und Zutaten in der DB stehen.
+        """
+        self._ensure_ready()
+        session = self.db.session
+        if self.use_fts:
+            session.execute(text("DELETE FROM recipe_search WHERE rowid = :id"), {'id': recipe_id})
+            session.execute(text(
+                "INSERT INTO recipe_search (rowid, user_id, title, instructions, ingredients) "
+                "SELECT id, user_id, title, instructions, ingredients "
+                f"FROM ({_DOCUMENT_SQL.format(where='WHERE r.id = :id')})"
+            ), {'id': recipe_id})
+        else:
+            row = session.execute(text(_DOCUMENT_SQL.format(where='WHERE r.id = :id')),
+                                  {'id': recipe_id}).first()
+            self._memory.remove(recipe_id)
+            if row:
+                self._memory.add(row)
+
+    def index_recipes(self, recipe_ids):
+        """ Wie index_recipe für viele Rezepte mit zwei Statements (z.B. Import). """
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        self._ensure_ready()
+        session = self.db.session
+        ids = bindparam('ids', expanding=True)
+        documents = _DOCUMENT_SQL.format(where='WHERE r.id IN :ids')
+        if self.use_fts:
+            session.execute(text("DELETE FROM recipe_search WHERE rowid IN :ids")
+                            .bindparams(ids), {'ids': recipe_ids})
+            session.execute(text(
+                "INSERT INTO recipe_search (rowid, user_id, title, instructions, ingredients) "
+                f"SELECT id, user_id, title, instructions, ingredients FROM ({documents})"
+            ).bindparams(ids), {'ids': recipe_ids})
+        else:
+            for recipe_id in recipe_ids:
+                self._memory.remove(recipe_id)
+            for row in session.execute(text(documents).bindparams(ids), {'ids': recipe_ids}):
+                self._memory.add(row)
+
+    def remove_recipe(self, recipe_id: int):
+        self._ensure_ready()
+        if self.use_fts:
+            self.db.session.execute(text("DELETE FROM recipe_search WHERE rowid = :id"),
+                                    {'id': recipe_id})
+        else:
+            self._memory.remove(recipe_id)
+
+    # ----------------------------
+    # Abfragen
+    # ----------------------------
+    def search(self, user_id: int, query: str, limit: int = 50):
+        """
+        Volltextsuche, alle Begriffe müssen (als Präfix) vorkommen.
+        Gibt eine Liste von (id, title) nach Relevanz zurück.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        self._ensure_ready()
+        if not self.use_fts:
+            return self._memory.search(user_id, terms, limit)
+        match = ' AND '.join(f'"{t}"*' for t in terms)
+        rows = self.db.session.execute(text("""
+            SELECT rowid AS id, title FROM recipe_search
+            WHERE recipe_search MATCH :match AND user_id = :user_id
+            ORDER BY rank
+            LIMIT :limit
+        """), {'match': match, 'user_id': user_id, 'limit': limit}).all()
+        return [(r.id, r.title) for r in rows]
+
+    def suggest(self, user_id: int, prefix: str, limit: int = 10):
+        """ Typeahead: Rezepttitel, deren Wörter mit den Eingaben beginnen. """
+        terms = tokenize(prefix)
+        if not terms:
+            return []
+        self._ensure_ready()
+        if not self.use_fts:
+            return self._memory.search(user_id, terms, limit, field='title')
+        match = 'title : (' + ' AND '.join(f'"{t}"*' for t in terms) + ')'
+        rows = self.db.session.execute(text("""
+            SELECT rowid AS id, title FROM recipe_search
+            WHERE recipe_search MATCH :match AND user_id = :user_id
+            ORDER BY rank
+            LIMIT :limit
+        """), {'match': match, 'user_id': user_id, 'limit': limit}).all()
+        return [(r.id, r.title) for r in rows]
+
+    def cookable(self, user_id: int, limit: int = 100):
+        """ Rezepte, für die alle Zutaten im Haushalt vorhanden sind. """
+        rows = self.db.session.execute(_COOKABLE_SQL,
+                                       {'user_id': user_id, 'limit': limit}).all()
+        return [(r.id, r.title) for r in rows]
+
+
+class InvertedIndex:
+    """
+    Einfacher invertierter Index im Speicher (Fallback ohne FTS5).
+    Token -> Menge von Rezept-IDs, getrennt nach Titel und Volltext.
+    Eine sortierte Token-Liste erlaubt Präfixsuche per bisect.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._postings = {'all': {}, 'title': {}}
+        self._sorted = {'all': [], 'title': []}
+        self._docs = {}
+
+    def add(self, row):
+        title_tokens = set(tokenize(row.title))
+        all_tokens = title_tokens | set(tokenize(row.instructions)) | set(tokenize(row.ingredients))
+        with self._lock:
+            self._docs[row.id] = (row.user_id, row.title, title_tokens, all_tokens)
+            for field, tokens in (('title', title_tokens), ('all', all_tokens)):
+                for token in tokens:
+                    postings = self._postings[field].get(token)
+                    if postings is None:
+                        self._postings[field][token] = postings = set()
+                        bisect.insort(self._sorted[field], token)
+                    postings.add(row.id)
+
+    def remove(self, recipe_id):
+        with self._lock:
+            doc = self._docs.pop(recipe_id, None)
+            if doc is None:
+                return
+            for field, tokens in (('title', doc[2]), ('all', doc[3])):
+                for token in tokens:
+                    self._postings[field][token].discard(recipe_id)
+
+    def search(self, user_id, terms, limit, field='all'):
+        with self._lock:
+            result = None
+            for term in terms:
+                matches = set()
+                tokens = self._sorted[field]
+                i = bisect.bisect_left(tokens, term)
+                while i < len(tokens) and tokens[i].startswith(term):
+                    matches |= self._postings[field][tokens[i]]
+                    i += 1
+                result = matches if result is None else result & matches
+                if not result:
+                    return []
+            hits = [(rid, self._docs[rid][1]) for rid in result
+                    if self._docs[rid][0] == user_id]
+        hits.sort(key=lambda hit: hit[1])
+        return hits[:limit]
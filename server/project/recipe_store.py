@@ -0,0 +1,270 @@
+# recipe_store.py
+"""
+Rezepte anlegen, ändern und löschen, gemeinsam für die Seiten und die API.
+
+Beim Ändern werden die Zutatenzeilen nicht gelöscht und neu angelegt,
+sondern mit den gespeicherten verglichen (difflib über Zutat, Menge und
+Einheit): gleiche Zeilen bleiben unberührt, geänderte behalten ihre ID und
+bekommen ein UPDATE nur der geänderten Spalten, nur wirklich neue bzw.
+entfernte Zeilen werden eingefügt bzw. gelöscht. Neue Zeilen landen, wie
+im Formular, hinter den bestehenden.
+
+Suchindex, Einkaufsliste, Nährwerte und Audit-Log werden nur nachgeführt,
+wenn sich dafür etwas geändert hat. Alles läuft in der Transaktion des
+Aufrufers, committen (bzw. bei einem Fehler zurückrollen) muss er selbst.
+Bis dahin steht in der Datenbank nie ein halb geändertes Rezept.
+"""
+import difflib
+
+from ingredient_resolver import normalize_name
+from meal_planner import PlanError, parse_servings
+from models import POSITION_STEP, Recipe, RecipeIngredient
+from shopping_list_builder import recipe_rows
+
+
+class RecipeError(ValueError):
+    def __init__(self, message, index=None):
+        super().__init__(message)
+        self.message = message
+        self.index = index
+
+
+def parse_amount(value, strict: bool = False):
+    """ Menge als float oder None; ungültige Werte sind None, mit strict ein RecipeError. """
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        if strict:
+            raise RecipeError(f"Ungültige Menge: {value!r}")
+        return None
+
+
+def parse_unit(value):
+    value = (value or '').strip()
+    return value or None
+
+
+def recipe_data(title=None, instructions=None, servings=None, ingredients=None):
+    """
+    Prüft die Felder eines Rezepts und gibt sie als Dict zurück. ingredients
+    ist eine Liste von (Name, Menge, Einheit); Zeilen ohne Namen fallen weg.
+    None heißt "nicht angegeben" (beim Ändern: bleibt wie es ist).
+    """
+    data = {}
+    if title is not None:
+        data['title'] = title.strip()
+        if not data['title']:
+            raise RecipeError("Titel fehlt")
+    if instructions is not None:
+        data['instructions'] = instructions
+    if servings is not None:
+        try:
+            data['servings'] = parse_servings(servings)
+        except PlanError as error:
+            raise RecipeError(error.message)
+    if ingredients is not None:
+        data['ingredients'] = [(normalize_name(name), amount, unit)
+                               for name, amount, unit in ingredients
+                               if normalize_name(name)]
+    return data
+
+
+def parse_form(form):
+    """ Rezept aus dem Formular von create_recipe und edit_recipe. """
+    rows = zip(form.getlist('ingredient_name[]'), form.getlist('ingredient_amount[]'),
+               form.getlist('ingredient_unit[]'))
+    try:
+        servings = parse_servings(form.get('servings'))
+    except PlanError:
+        servings = None  # ungültige Portionen ändern nichts
+    return recipe_data(
+        title=form.get('title', ''),
+        instructions=form.get('instructions'),
+        servings=servings,
+        ingredients=[(name, parse_amount(amount), parse_unit(unit))
+                     for name, amount, unit in rows],
+    )
+
+
+def _assign_positions(rows):
+    """
+    Vergibt position für neue Zeilen (position None) in rows, der Reihenfolge
+    im Rezept. Eine neue Zeile zwischen zwei bestehenden bekommt einen Wert in
+    deren Lücke, am Anfang oder Ende einen POSITION_STEP davor bzw. dahinter.
+    Nur wenn eine Lücke nicht reicht (oder alte Zeilen gleiche Positionen
+    haben), wird das ganze Rezept neu durchnummeriert.
+    """
+    if _fill_gaps(rows):
+        return
+    for k, ri in enumerate(rows):
+        if ri.position != k * POSITION_STEP:
+            ri.position = k * POSITION_STEP
+
+
+def _fill_gaps(rows):
+    """ Setzt die Positionen neuer Zeilen in die Lücken; False, wenn das nicht geht. """
+    previous = None
+    i = 0
+    while i < len(rows):
+        if rows[i].position is not None:
+            if previous is not None and rows[i].position <= previous:
+                return False
+            previous = rows[i].position
+            i += 1
+            continue
+        end = i
+        while end < len(rows) and rows[end].position is None:
+            end += 1
+        count = end - i
+        following = rows[end].position if end < len(rows) else None
+        if following is None:
+            low = previous if previous is not None else -POSITION_STEP
+            step = POSITION_STEP
+        elif previous is None:
+            low, step = following - (count + 1) * POSITION_STEP, POSITION_STEP
+        elif following - previous > count:
+            low, step = previous, (following - previous) / (count + 1)
+        else:
+            return False
+        for k, ri in enumerate(rows[i:end], start=1):
+            ri.position = low + int(k * step)
+        previous = rows[end - 1].position
+        i = end
+    return True
+
+
+class RecipeStore:
+    def __init__(self, db, ingredient_resolver, recipe_search, shopping_list_builder,
+                 nutrition=None, audit_log=None):
+        self.db = db
+        self.ingredient_resolver = ingredient_resolver
+        self.recipe_search = recipe_search
+        self.shopping_list_builder = shopping_list_builder
+        self.nutrition = nutrition
+        self.audit_log = audit_log
+
+    def resolve(self, recipes):
+        """ Zutaten-IDs für mehrere Rezepte (recipe_data) mit einem Resolver-Aufruf. """
+        return self.ingredient_resolver.resolve(
+            name for data in recipes for name, _, _ in data.get('ingredients') or ()
+        )
+
+    def create(self, user_id: int, data, ingredient_ids=None):
+        """ Legt das Rezept an (data aus recipe_data, mit Titel) und gibt es zurück. """
+        if not data.get('title'):
+            raise RecipeError("Titel fehlt")
+        if ingredient_ids is None:
+            ingredient_ids = self.resolve([data])
+        session = self.db.session
+        recipe = Recipe(title=data['title'], instructions=data.get('instructions'),
+                        servings=data.get('servings') or 1, user_id=user_id)
+        session.add(recipe)
+        for position, (name, amount, unit) in enumerate(data.get('ingredients') or ()):
+            session.add(RecipeIngredient(recipe=recipe, ingredient_id=ingredient_ids[name],
+                                         amount=amount, unit=unit,
+                                         position=position * POSITION_STEP))
+        session.flush()
+        self.recipe_search.index_recipe(recipe.id)
+        if self.nutrition is not None:
+            self.nutrition.recompute([recipe.id])
+        self._record('recipe.create', recipe)
+        return recipe
+
+    def update(self, recipe, data, ingredient_ids=None):
+        """
+        Überträgt data (recipe_data, fehlende Felder bleiben) auf das Rezept.
+        Gibt die Anzahl eingefügter, geänderter und gelöschter Zutatenzeilen
+        als Dict zurück.
+        """
+        changes = {'inserted': 0, 'updated': 0, 'deleted': 0}
+        searchable = modified = False
+        for field in ('title', 'instructions'):
+            if field in data and getattr(recipe, field) != data[field]:
+                setattr(recipe, field, data[field])
+                searchable = True
+        if data.get('servings') and recipe.servings != data['servings']:
+            recipe.servings = data['servings']
+            modified = True
+
+        old_rows = None
+        if 'ingredients' in data:
+            if ingredient_ids is None:
+                ingredient_ids = self.resolve([data])
+            wanted = [(ingredient_ids[name], amount, unit)
+                      for name, amount, unit in data['ingredients']]
+            old_rows = recipe_rows(recipe)
+            changes = self._apply_rows(recipe, wanted)
+            # Nur Mengen geändert: Suchdokument bleibt gleich
+            searchable = searchable or changes['names']
+            del changes['names']
+
+        self.db.session.flush()
+        if searchable:
+            self.recipe_search.index_recipe(recipe.id)
+        if old_rows is not None and any(changes.values()):
+            # Einkaufsliste nur um die geänderten Zutaten nachführen
+            self.shopping_list_builder.recipe_changed(
+                recipe.user_id, recipe.id, old_rows, recipe_rows(recipe)
+            )
+            if self.nutrition is not None:
+                self.nutrition.recompute([recipe.id])
+        if searchable or modified or any(changes.values()):
+            self._record('recipe.update', recipe)
+        return changes
+
+    def delete(self, recipe):
+        self.recipe_search.remove_recipe(recipe.id)
+        self.shopping_list_builder.recipe_changed(recipe.user_id, recipe.id,
+                                                  recipe_rows(recipe))
+        self._record('recipe.delete', recipe)
+        self.db.session.delete(recipe)
+
+    def _apply_rows(self, recipe, wanted):
+        """
+        Gleicht recipe.recipe_ingredients mit wanted (Liste von
+        (ingredient_id, amount, unit)) ab. Geänderte Zeilen werden in der
+        Reihenfolge des Rezepts wiederverwendet, so bleibt eine Zeile mit
+        geänderter Menge oder vertipptem Namen dieselbe Zeile.
+        Neue Zeilen bekommen eine Position in der Lücke zwischen ihren
+        Nachbarn (_assign_positions), die übrigen behalten ihre.
+        """
+        current = list(recipe.recipe_ingredients)
+        stored = [(ri.ingredient_id, ri.amount, ri.unit) for ri in current]
+        changes = {'inserted': 0, 'updated': 0, 'deleted': 0, 'names': False}
+        ordered = []
+        matcher = difflib.SequenceMatcher(None, stored, wanted, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                ordered.extend(current[i1:i2])
+                continue
+            reused = current[i1:i2]
+            for ri, (ingredient_id, amount, unit) in zip(reused, wanted[j1:j2]):
+                if ri.ingredient_id != ingredient_id:
+                    ri.ingredient_id = ingredient_id
+                    changes['names'] = True
+                if ri.amount != amount:
+                    ri.amount = amount
+                if ri.unit != unit:
+                    ri.unit = unit
+                changes['updated'] += 1
+                ordered.append(ri)
+            for ri in reused[j2 - j1:]:
+                recipe.recipe_ingredients.remove(ri)
+                changes['deleted'] += 1
+                changes['names'] = True
+            for ingredient_id, amount, unit in wanted[j1 + len(reused):j2]:
+                ri = RecipeIngredient(ingredient_id=ingredient_id, amount=amount, unit=unit)
+                recipe.recipe_ingredients.append(ri)
+                ordered.append(ri)
+                changes['inserted'] += 1
+                changes['names'] = True
+
+        _assign_positions(ordered)
+        return changes
+
+    def _record(self, action, recipe):
+        if self.audit_log is not None:
+            self.audit_log.record(action, recipe.user_id, recipe_id=recipe.id,
+                                  title=recipe.title)
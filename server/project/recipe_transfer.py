@@ -0,0 +1,378 @@
+# recipe_transfer.py
+"""
+Import und Export vieler Rezepte als JSON-Lines oder CSV.
+
+JSON-Lines: ein Rezept pro Zeile
+  {"title": ..., "instructions": ..., "servings": n (optional, sonst 1),
+   "ingredients": [{"name", "amount", "unit"}, ...]}
+CSV: eine Zeile pro Zutat, Spalten recipe, title, instructions, ingredient,
+amount, unit und servings (optional). Aufeinanderfolgende Zeilen mit gleichem "recipe" (beliebige
+Kennung, beim Export die Rezept-ID) bilden ein Rezept; ein Rezept ohne
+Zutaten ist eine Zeile mit leerer Spalte ingredient.
+
+Beide Richtungen laufen als Generatoren: der Import liest die Datei Zeile
+für Zeile und schreibt je chunk_size Rezepte eine Transaktion (Rezepte
+per INSERT ... RETURNING, Zutatenzeilen per executemany, Namen mit einem
+IngredientResolver-Aufruf je Block, Suchindex und Nährwerte je Block). Der Export liest die Rezepte des Users
+blockweise nach ID und gibt Zeile für Zeile weiter, im Speicher liegt also
+nie die ganze Datei.
+
+Ein Fehler (z.B. Zeile ohne Titel) bricht den Import ab; bereits
+geschriebene Blöcke bleiben, der laufende wird zurückgerollt.
+
+Aufrufbar als API (POST /api/v1/recipes/import, GET /api/v1/recipes/export)
+und per Flask-CLI:
+  flask --app server:create_app recipes import rezepte.jsonl --user anna
+  flask --app server:create_app recipes export --user anna --format csv -o rezepte.csv
+"""
+import csv
+import io
+import itertools
+import json
+
+import click
+from flask import current_app, has_request_context
+from flask.cli import AppGroup
+from sqlalchemy import insert, select
+
+from ingredient_resolver import normalize_name
+from meal_planner import PlanError, parse_servings
+from models import POSITION_STEP, Ingredient, Recipe, RecipeIngredient, User
+
+FORMATS = ('jsonl', 'csv')
+CSV_FIELDS = ('recipe', 'title', 'instructions', 'ingredient', 'amount', 'unit', 'servings')
+MIMETYPES = {'jsonl': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+class TransferError(Exception):
+    def __init__(self, message, line=None):
+        super().__init__(message if line is None else f"Zeile {line}: {message}")
+        self.line = line
+
+
+def detect_format(filename: str = None, mimetype: str = None, default: str = 'jsonl'):
+    """ Format aus Dateiendung oder Content-Type, sonst default. """
+    name = (filename or '').lower()
+    if name.endswith('.csv') or (mimetype or '').startswith('text/csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')) or 'ndjson' in (mimetype or ''):
+        return 'jsonl'
+    return default
+
+
+def text_stream(binary):
+    """ Byte-Stream (Upload, Datei) als Text lesen, ohne ihn ganz zu laden. """
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+
+# --------------------------------
+# Lesen
+# --------------------------------
+def _amount(value, line):
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise TransferError(f"ungültige Menge {value!r}", line)
+
+
+def _text(data, field, line, label):
+    """ Textfeld eines JSON-Objekts, fehlend oder null als None. """
+    value = data.get(field)
+    if value is not None and not isinstance(value, str):
+        raise TransferError(f"{label} muss Text sein", line)
+    return value
+
+
+def _unit(value):
+    value = (value or '').strip()
+    return value or None
+
+
+def _recipe(title, instructions, ingredients, line, servings=None):
+    title = (title or '').strip()
+    if not title:
+        raise TransferError("Titel fehlt", line)
+    try:
+        servings = parse_servings(servings) or 1
+    except PlanError as error:
+        raise TransferError(error.message, line)
+    return {'title': title, 'instructions': instructions or None, 'servings': servings,
+            'ingredients': ingredients, 'line': line}
+
+
+def parse_jsonl(lines):
+    """ Erzeugt Rezepte aus JSON-Lines (leere Zeilen werden übersprungen). """
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as error:
+            raise TransferError(f"kein gültiges JSON ({error.msg})", number)
+        if not isinstance(data, dict):
+            raise TransferError("Objekt erwartet", number)
+        entries = data.get('ingredients') or []
+        if not isinstance(entries, list):
+            raise TransferError("Zutaten müssen eine Liste sein", number)
+        ingredients = []
+        for entry in entries:
+            if not isinstance(entry, dict):
+                raise TransferError("Zutat muss ein Objekt sein", number)
+            name = normalize_name(_text(entry, 'name', number, "Zutatenname"))
+            if name:
+                ingredients.append((name, _amount(entry.get('amount'), number),
+                                    _unit(_text(entry, 'unit', number, "Einheit"))))
+        yield _recipe(_text(data, 'title', number, "Titel"),
+                      _text(data, 'instructions', number, "Anleitung"),
+                      ingredients, number, data.get('servings'))
+
+
+def parse_csv(lines):
+    """ Erzeugt Rezepte aus CSV, Zeilen mit gleichem "recipe" gehören zusammen. """
+    reader = csv.DictReader(lines)
+    missing = {'title', 'ingredient'} - set(reader.fieldnames or ())
+    if missing:
+        raise TransferError(f"Spalten fehlen: {', '.join(sorted(missing))}", 1)
+    # Ohne Spalte "recipe" trennt der Titel die Rezepte
+    key = 'recipe' if 'recipe' in reader.fieldnames else 'title'
+    for _, rows in itertools.groupby(reader, key=lambda row: row.get(key)):
+        first = None
+        ingredients = []
+        for row in rows:
+            if first is None:
+                first = row
+                line = reader.line_num
+            name = normalize_name(row.get('ingredient', ''))
+            if name:
+                ingredients.append((name, _amount(row.get('amount'), reader.line_num),
+                                    _unit(row.get('unit'))))
+        yield _recipe(first.get('title'), first.get('instructions'), ingredients, line,
+                      first.get('servings'))
+
+
+def parse(lines, fmt: str):
+    if fmt == 'csv':
+        return parse_csv(lines)
+    if fmt == 'jsonl':
+        return parse_jsonl(lines)
+    raise TransferError(f"unbekanntes Format {fmt!r}")
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# --------------------------------
+# Import
+# --------------------------------
+class RecipeImporter:
+    def __init__(self, db, ingredient_resolver, recipe_search, nutrition=None,
+                 render_cache=None, audit_log=None, chunk_size: int = 500):
+        self.db = db
+        self.ingredient_resolver = ingredient_resolver
+        self.recipe_search = recipe_search
+        self.nutrition = nutrition
+        self.render_cache = render_cache
+        self.audit_log = audit_log
+        self.chunk_size = chunk_size
+
+    def import_recipes(self, user_id: int, recipes, chunk_size: int = None):
+        """
+        Schreibt die Rezepte blockweise. Gibt {'recipes', 'ingredients', 'chunks'}
+        zurück; bei TransferError stehen die bis dahin geschriebenen Zahlen
+        in error.imported.
+        """
+        totals = {'recipes': 0, 'ingredients': 0, 'chunks': 0}
+        try:
+            for chunk in _chunks(recipes, chunk_size or self.chunk_size):
+                self._write_chunk(user_id, chunk, totals)
+        except TransferError as error:
+            self.db.session.rollback()
+            error.imported = totals
+            raise
+        return totals
+
+    def _write_chunk(self, user_id, chunk, totals):
+        session = self.db.session
+        try:
+            ingredient_ids = self.ingredient_resolver.resolve(
+                name for recipe in chunk for name, _, _ in recipe['ingredients']
+            )
+            recipe_ids = session.scalars(
+                insert(Recipe.__table__).returning(Recipe.__table__.c.id,
+                                                   sort_by_parameter_order=True),
+                [{'title': r['title'], 'instructions': r['instructions'],
+                  'servings': r['servings'], 'user_id': user_id}
+                 for r in chunk],
+            ).all()
+            rows = [
+                {'recipe_id': recipe_id, 'ingredient_id': ingredient_ids[name],
+                 'amount': amount, 'unit': unit,
+                 'position': position * POSITION_STEP}
+                for recipe_id, recipe in zip(recipe_ids, chunk)
+                for position, (name, amount, unit) in enumerate(recipe['ingredients'])
+            ]
+            if rows:
+                session.execute(insert(RecipeIngredient.__table__), rows)
+            self.recipe_search.index_recipes(recipe_ids)
+            if self.nutrition is not None:
+                self.nutrition.recompute(recipe_ids)
+            if self.render_cache is not None and not has_request_context():
+                # Ohne Request zählt der Commit-Listener die Version nicht hoch
+                self.render_cache.bump_version(user_id)
+            if self.audit_log is not None:
+                self.audit_log.record('recipe.import', user_id, count=len(recipe_ids),
+                                      first_id=recipe_ids[0], last_id=recipe_ids[-1])
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        totals['recipes'] += len(recipe_ids)
+        totals['ingredients'] += len(rows)
+        totals['chunks'] += 1
+
+
+# --------------------------------
+# Export
+# --------------------------------
+def iter_recipes(db, user_id: int, chunk_size: int = 500):
+    """
+    Erzeugt die Rezepte des Users als Dicts, blockweise nach ID gelesen
+    (eine Abfrage für die Rezepte, eine für deren Zutaten je Block).
+    """
+    session = db.session
+    last_id = 0
+    while True:
+        recipes = session.execute(
+            select(Recipe.id, Recipe.title, Recipe.instructions, Recipe.servings)
+            .where(Recipe.user_id == user_id, Recipe.id > last_id)
+            .order_by(Recipe.id)
+            .limit(chunk_size)
+        ).all()
+        if not recipes:
+            return
+        ingredients = {}
+        for row in session.execute(
+            select(RecipeIngredient.recipe_id, Ingredient.name, RecipeIngredient.amount,
+                   RecipeIngredient.unit)
+            .join(Ingredient, Ingredient.id == RecipeIngredient.ingredient_id)
+            .where(RecipeIngredient.recipe_id.in_([r.id for r in recipes]))
+            .order_by(RecipeIngredient.recipe_id, RecipeIngredient.position,
+                      RecipeIngredient.id)
+        ):
+            ingredients.setdefault(row.recipe_id, []).append(
+                {'name': row.name, 'amount': row.amount, 'unit': row.unit}
+            )
+        for recipe in recipes:
+            yield {'id': recipe.id, 'title': recipe.title,
+                   'instructions': recipe.instructions, 'servings': recipe.servings,
+                   'ingredients': ingredients.get(recipe.id, [])}
+        last_id = recipes[-1].id
+
+
+def format_jsonl(recipes):
+    for recipe in recipes:
+        data = {key: recipe[key] for key in ('title', 'instructions', 'servings', 'ingredients')}
+        yield json.dumps(data, ensure_ascii=False) + '\n'
+
+
+def format_csv(recipes):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    writer.writerow(CSV_FIELDS)
+    yield flush()
+    for recipe in recipes:
+        head = (recipe['id'], recipe['title'], recipe['instructions'] or '')
+        tail = (recipe['servings'],)
+        if not recipe['ingredients']:
+            writer.writerow(head + ('', '', '') + tail)
+        for entry in recipe['ingredients']:
+            amount = '' if entry['amount'] is None else str(entry['amount'])
+            writer.writerow(head + (entry['name'], amount, entry['unit'] or '') + tail)
+        yield flush()
+
+
+def _buffered(pieces, size=65536):
+    # Größere Blöcke für die HTTP-Antwort statt einer Zeile pro Schreibzugriff
+    buffer = []
+    length = 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def export_lines(db, user_id: int, fmt: str, chunk_size: int = 500):
+    """ Erzeugt die Exportdatei in Textblöcken von etwa 64 KiB. """
+    recipes = iter_recipes(db, user_id, chunk_size)
+    if fmt == 'csv':
+        return _buffered(format_csv(recipes))
+    if fmt == 'jsonl':
+        return _buffered(format_jsonl(recipes))
+    raise TransferError(f"unbekanntes Format {fmt!r}")
+
+
+# --------------------------------
+# Flask-CLI
+# --------------------------------
+cli = AppGroup('recipes', help="Rezepte importieren und exportieren.")
+
+
+def _user_id(username):
+    user_id = current_app.extensions['mealmaster'].db.session.execute(
+        select(User.id).where(User.username == username.lower())
+    ).scalar()
+    if user_id is None:
+        raise click.ClickException(f"Nutzer {username!r} existiert nicht")
+    return user_id
+
+
+@cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user', 'username', required=True, help="Besitzer der Rezepte")
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default=None,
+              help="Standard: aus der Dateiendung")
+@click.option('--chunk-size', type=int, default=None, help="Rezepte pro Transaktion")
+def import_command(path, username, fmt, chunk_size):
+    """ Rezepte aus einer JSON-Lines- oder CSV-Datei importieren. """
+    mm = current_app.extensions['mealmaster']
+    fmt = fmt or detect_format(path)
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        try:
+            totals = mm.recipe_importer.import_recipes(_user_id(username), parse(f, fmt),
+                                                       chunk_size)
+        except TransferError as error:
+            raise click.ClickException(
+                f"{error} ({error.imported['recipes']} Rezepte bereits importiert)"
+            )
+    click.echo(f"{totals['recipes']} Rezepte mit {totals['ingredients']} Zutaten "
+               f"in {totals['chunks']} Transaktionen importiert.")
+
+
+@cli.command('export')
+@click.option('--user', 'username', required=True)
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='jsonl')
+@click.option('-o', '--output', type=click.File('w', encoding='utf-8'), default='-')
+def export_command(username, fmt, output):
+    """ Rezepte eines Nutzers als JSON-Lines oder CSV ausgeben. """
+    db = current_app.extensions['mealmaster'].db
+    for chunk in export_lines(db, _user_id(username), fmt):
+        output.write(chunk)
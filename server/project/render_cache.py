@@ -0,0 +1,249 @@
+# render_cache.py
+"""
+Cache für fertig gerenderte Seiten (my_recipes, inventory, shopping_list).
+
+Der Schlüssel enthält User, Endpoint, Query-String und die Datenversion
+des Users (user.data_version), vorneweg den Namespace (die Version der
+statischen Dateien, assets.py). Jeder Commit in einem schreibenden Request
+(POST, PUT, PATCH, DELETE) eines eingeloggten Users zählt die Version in
+derselben Transaktion hoch. Danach passt kein alter Eintrag mehr, er
+fällt irgendwann aus dem LRU. Eine Seite wird nie gegen eine Version
+gecacht, die nicht zu ihren Daten passt: Version und Daten liest der
+Request im selben Snapshot. Die Version kommt deshalb per eigener Abfrage,
+nicht aus current_user (das kommt aus dem User-Cache, user_cache.py).
+
+Stufen:
+  1. LRU im Worker-Prozess (render_cache_size Einträge, 0 schaltet ab)
+  2. optional eine SQLite-Datei, die alle Worker teilen
+     (render_cache_shared_path), damit ein Worker Seiten der anderen nutzt
+
+Trefferzahlen liefert stats() (auch unter /metrics), jede Antwort trägt
+den Header X-Render-Cache (hit, shared, miss).
+"""
+import functools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_request_context, request
+from flask_login import current_user
+from sqlalchemy import event, text
+
+log = logging.getLogger(__name__)
+
+_WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+_BUMP_SQL = text('UPDATE "user" SET data_version = data_version + 1 WHERE id = :user_id')
+_BUMP_ALL_SQL = text('UPDATE "user" SET data_version = data_version + 1')
+_VERSION_SQL = text('SELECT data_version FROM "user" WHERE id = :user_id')
+
+_SHARED_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS render_cache (
+        key TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        version INTEGER NOT NULL,
+        body TEXT NOT NULL,
+        stored_at REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_render_cache_user_id ON render_cache (user_id, version)",
+)
+
+
+class RenderCache:
+    def __init__(self, app=None, db=None, max_entries: int = 256, shared_path: str = None,
+                 shared_max_entries: int = 10000, namespace: str = ''):
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self.shared_path = shared_path
+        self.shared_max_entries = shared_max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.db = db
+        self._stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.db = db
+        if self.shared_path and not os.path.isabs(self.shared_path):
+            self.shared_path = os.path.join(app.instance_path, self.shared_path)
+            os.makedirs(app.instance_path, exist_ok=True)
+        event.listen(db.session, 'before_commit', self._bump_version)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    # ----------------------------
+    # Invalidierung
+    # ----------------------------
+    def _bump_version(self, session):
+        # Der Listener hängt an der gemeinsamen Session, jede App zählt nur für sich
+        if not has_request_context() or request.method not in _WRITE_METHODS:
+            return
+        if current_app.extensions['mealmaster'].render_cache is not self:
+            return
+        if current_user.is_authenticated:
+            session.execute(_BUMP_SQL, {'user_id': current_user.id})
+
+    def bump_version(self, user_id: int):
+        """ Für Schreibzugriffe ohne Request (z.B. CLI-Import), vor dem Commit aufrufen. """
+        self.db.session.execute(_BUMP_SQL, {'user_id': user_id})
+
+    def bump_all_versions(self):
+        """ Wie bump_version, für Änderungen an den Daten aller User (z.B. Nährwerte). """
+        self.db.session.execute(_BUMP_ALL_SQL)
+
+    # ----------------------------
+    # Lesen und Schreiben
+    # ----------------------------
+    def version(self, user_id: int) -> int:
+        """ Aktuelle Datenversion des Users, in der Transaktion des Requests gelesen. """
+        return self.db.session.execute(_VERSION_SQL, {'user_id': user_id}).scalar_one()
+
+    def get(self, key):
+        """ Gibt (html, 'hit'|'shared') oder (None, 'miss') zurück. """
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return body, 'hit'
+        body = self._shared_get(key)
+        with self._lock:
+            if body is not None:
+                self._stats['shared_hits'] += 1
+                self._remember(key, body)
+                return body, 'shared'
+            self._stats['misses'] += 1
+        return None, 'miss'
+
+    def set(self, key, user_id: int, version: int, body: str):
+        with self._lock:
+            self._stats['stores'] += 1
+            self._remember(key, body)
+        self._shared_set(key, user_id, version, body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries))
+        lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['shared_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def metric_samples(self):
+        """ Zähler für metrics.Metrics.add_collector. """
+        stats = self.stats()
+        return [
+            ('mealmaster_render_cache_lookups_total', {'result': result}, stats[field])
+            for result, field in (('hit', 'hits'), ('shared', 'shared_hits'), ('miss', 'misses'))
+        ]
+
+    def _remember(self, key, body):
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    # ----------------------------
+    # Gemeinsame Stufe (SQLite-Datei)
+    # ----------------------------
+    def _shared_connection(self):
+        # Eine Verbindung je Thread; nach einem fork() neu öffnen
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        connection = sqlite3.connect(self.shared_path, timeout=0.1, isolation_level=None)
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = OFF")
+        for statement in _SHARED_SCHEMA:
+            connection.execute(statement)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def _shared_get(self, key):
+        if not self.shared_path:
+            return None
+        try:
+            row = self._shared_connection().execute(
+                "SELECT body FROM render_cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as error:
+            # Der Cache ist nur eine Abkürzung, Fehler zählen als Miss
+            log.debug("render_cache: Lesen fehlgeschlagen: %s", error)
+            return None
+        return row[0] if row else None
+
+    def _shared_set(self, key, user_id, version, body):
+        if not self.shared_path:
+            return
+        try:
+            connection = self._shared_connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "DELETE FROM render_cache WHERE user_id = ? AND version < ?",
+                    (user_id, version)
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO render_cache (key, user_id, version, body, stored_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, user_id, version, body, time.time())
+                )
+                if self._stats['stores'] % 100 == 0:
+                    connection.execute(
+                        "DELETE FROM render_cache WHERE key IN ("
+                        " SELECT key FROM render_cache ORDER BY stored_at DESC"
+                        " LIMIT -1 OFFSET ?)", (self.shared_max_entries,)
+                    )
+                connection.execute("COMMIT")
+            except sqlite3.Error:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as error:
+            log.debug("render_cache: Schreiben fehlgeschlagen: %s", error)
+
+
+def cached_view(view=None, *, vary=None):
+    """
+    Cacht die HTML-Antwort einer GET-Route je User und Datenversion.
+    Gehört unter @login_required. Hängt die Seite außerdem von etwas
+    anderem ab (z.B. dem Datum), liefert vary() einen Teil des Schlüssels:
+    @cached_view(vary=...).
+    """
+    if view is None:
+        return functools.partial(cached_view, vary=vary)
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = current_app.extensions['mealmaster'].render_cache
+        if request.method != 'GET' or not cache.enabled:
+            return view(*args, **kwargs)
+
+        user_id = current_user.id
+        version = cache.version(user_id)
+        key = f"{cache.namespace}:{user_id}:{version}:{request.endpoint}:{request.full_path}"
+        if vary is not None:
+            key = f"{key}:{vary()}"
+        body, source = cache.get(key)
+        if body is None:
+            result = view(*args, **kwargs)
+            # Nur fertige Seiten, keine Redirects
+            if not isinstance(result, str):
+                return result
+            cache.set(key, user_id, version, result)
+            body = result
+        response = current_app.make_response(body)
+        response.headers['X-Render-Cache'] = source
+        return response
+    return wrapper
@@ -0,0 +1,685 @@
+# routes.py
+"""
+Seiten von MealMaster. Die Routen werden beim Import nur gesammelt und erst
+in init_app() an eine App gebunden; die Endpunkt-Namen bleiben dabei die
+Funktionsnamen (url_for('login') usw.). Services kommen aus der App
+(app.extensions['mealmaster']), siehe create_app() in server.py.
+"""
+import hmac
+import math
+from datetime import date, datetime, timedelta
+
+from flask import (
+    Response, current_app, flash, jsonify, redirect, render_template, request, url_for
+)
+from flask_login import current_user, login_required, login_user, logout_user
+from sqlalchemy.orm import joinedload, selectinload
+from werkzeug.local import LocalProxy
+
+import shopping_list_delta
+from database import read_mostly
+from extensions import db
+from forms import LoginForm, RegisterForm
+from inventory import CONSUME, DISCARD, InventoryError, UnknownItem
+from meal_planner import SLOT_LABELS, SLOTS, PlanError, parse_date, week_start
+from models import Recipe, RecipeIngredient, ShoppingList, ShoppingListItem, User
+from recipe_store import RecipeError, parse_amount, parse_form, parse_unit
+from password_hasher import HasherBusy
+from render_cache import cached_view
+from shopping_list_builder import MODE_EXCLUDE
+from shopping_list_events import TooManyListeners
+
+_routes = []
+
+
+def route(rule, **options):
+    """ Wie app.route, merkt die Route aber nur für init_app() vor. """
+    def decorator(view):
+        _routes.append((rule, view, options))
+        return view
+    return decorator
+
+
+def init_app(app):
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+
+
+def _service(name):
+    return LocalProxy(lambda: getattr(current_app.extensions['mealmaster'], name))
+
+
+audit_log = _service('audit_log')
+# Name inventory ist schon die Route
+inventory_service = _service('inventory')
+login_throttle = _service('login_throttle')
+manager = _service('manager')
+meal_planner = _service('meal_planner')
+metrics = _service('metrics')
+nutrition = _service('nutrition')
+password_hasher = _service('password_hasher')
+recipe_search = _service('recipe_search')
+recipe_store = _service('recipe_store')
+shopping_list_builder = _service('shopping_list_builder')
+shopping_list_events = _service('shopping_list_events')
+user_cache = _service('user_cache')
+
+
+
+
+@route('/')
+@login_required
+def home():
+        return render_template('index.html')
+
+@route('/login', methods=['GET', 'POST'])
+@read_mostly
+def login():
+    form = LoginForm()
+    if form.validate_on_submit():
+        username = form.username.data.lower()
+        password = form.password.data
+        retry_after = login_throttle.check(request.remote_addr, username)
+        if retry_after:
+            return _throttled('login.html', form, retry_after)
+        user = User.query.filter_by(username=username).first()
+        if user:
+            # Passwortvergleich im bcrypt-Pool
+            try:
+                valid = password_hasher.check(user.password, password)
+            except HasherBusy:
+                return _hasher_busy('login.html', form)
+            if valid:
+                _rehash_password(user, password)
+                login_user(user_cache.remember(user.id, user.username))
+                # last_login und ip_address schreibt das Audit-Log gesammelt nach
+                audit_log.record_login(user.id, user.username, request.remote_addr)
+                manager.log_login(user.username)
+                return redirect(url_for('dashboard'))
+            else:
+                flash("Falsches Passwort!", "error")
+        else:
+            flash("Nutzer existiert nicht!", "error")
+    return render_template('login.html', form=form)
+
+def _rehash_password(user, password):
+    # Geänderter Work-Faktor (bcrypt_rounds): neuen Hash beim Login speichern
+    if not password_hasher.needs_rehash(user.password):
+        return
+    try:
+        user.password = password_hasher.hash(password)
+    except HasherBusy:
+        return  # beim nächsten Login
+    db.session.commit()
+
+def _throttled(template, form, retry_after):
+    flash("Zu viele Versuche, bitte warte kurz.", "error")
+    return render_template(template, form=form), 429, {'Retry-After': str(math.ceil(retry_after))}
+
+def _hasher_busy(template, form):
+    flash("Gerade sind sehr viele Anmeldungen unterwegs, bitte versuche es gleich noch einmal.",
+          "error")
+    return render_template(template, form=form), 503, {'Retry-After': '1'}
+
+@route('/logout')
+@login_required
+def logout():
+    user_cache.invalidate(current_user.id)
+    logout_user()
+    return redirect(url_for('login'))
+
+@route('/register', methods=['GET', 'POST'])
+def register():
+    form = RegisterForm()
+    if form.validate_on_submit():
+        username = form.username.data.lower()
+        retry_after = login_throttle.check(request.remote_addr)
+        if retry_after:
+            return _throttled('register.html', form, retry_after)
+        # Prüfen, ob der Nutzername existiert
+        existing_user = User.query.filter_by(username=username).first()
+        if existing_user:
+            flash("Dieser Benutzername ist bereits vergeben!", "error")
+            return redirect(url_for('register'))
+
+        # Passwort verschlüsseln
+        try:
+            hashed_pw = password_hasher.hash(form.password.data)
+        except HasherBusy:
+            return _hasher_busy('register.html', form)
+        new_user = User(
+            username=username,
+            password=hashed_pw,
+            register_date=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        )
+        db.session.add(new_user)
+        db.session.commit()
+        flash("Registrierung erfolgreich! Bitte melde dich an.", "success")
+        return redirect(url_for('login'))
+    return render_template('register.html', form=form)
+
+@route('/metrics')
+def prometheus_metrics():
+    # Für Prometheus; mit metrics_token nur mit "Authorization: Bearer <token>"
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''),
+                                         f"Bearer {token}"):
+        return Response("Forbidden\n", status=403, mimetype='text/plain')
+    return metrics.response()
+
+@route('/dashboard')
+@login_required
+def dashboard():
+    # Deine "index" bzw. Dashboard-Seite
+    # Nur für eingeloggte Nutzer zugänglich
+    return render_template('index.html')
+
+@route('/create-recipe', methods=['GET', 'POST'])
+@login_required
+def create_recipe():
+    if request.method == 'POST':
+        try:
+            # Rezept und alle Zutaten (Namen mit einer Abfrage aufgelöst)
+            recipe_store.create(current_user.id, parse_form(request.form))
+        except RecipeError as error:
+            db.session.rollback()
+            flash(error.message, "error")
+            return render_template('create_recipe.html')
+
+        # Ein einziger Commit für Rezept und Zutaten
+        db.session.commit()
+        flash("Rezept erstellt!", "success")
+        return redirect(url_for('my_recipes'))
+
+    # GET
+    return render_template('create_recipe.html')
+
+@route('/edit-recipe/<int:recipe_id>', methods=['GET', 'POST'])
+@login_required
+def edit_recipe(recipe_id):
+    recipe = Recipe.query.get_or_404(recipe_id)
+
+    # Nur Besitzer darf bearbeiten
+    if recipe.user_id != current_user.id:
+        flash("Du darfst nur deine eigenen Rezepte bearbeiten!", "error")
+        return redirect(url_for('my_recipes'))
+
+    if request.method == 'POST':
+        try:
+            # Nur geänderte Zutatenzeilen schreiben, alles in einer Transaktion
+            recipe_store.update(recipe, parse_form(request.form))
+        except RecipeError as error:
+            db.session.rollback()
+            flash(error.message, "error")
+            return render_template('edit_recipe.html', recipe=recipe)
+        db.session.commit()
+        flash("Rezept wurde aktualisiert!", "success")
+        return redirect(url_for('my_recipes'))
+
+    # GET: Formular anzeigen
+    return render_template('edit_recipe.html', recipe=recipe)
+
+
+def recipe_page(user_id, after_id=None, listing=False):
+    """
+    Keyset-Pagination über (user_id, id): liefert höchstens RECIPES_PAGE_SIZE
+    Rezepte mit id > after_id und die ID, ab der die nächste Seite beginnt
+    (oder None). Im listing-Modus werden nur id und title geladen.
+    """
+    if listing:
+        query = db.session.query(Recipe.id, Recipe.title)
+    else:
+        # Nährwerte sind vorberechnet (nutrition.py) und kommen per JOIN mit
+        query = Recipe.query.options(selectinload(Recipe.recipe_ingredients)
+                                     .joinedload(RecipeIngredient.ingredient),
+                                     joinedload(Recipe.nutrition))
+    query = query.filter(Recipe.user_id == user_id)
+    if after_id:
+        query = query.filter(Recipe.id > after_id)
+    page_size = current_app.config['RECIPES_PAGE_SIZE']
+    # Eine Zeile mehr laden, um zu wissen, ob es weitergeht
+    rows = query.order_by(Recipe.id).limit(page_size + 1).all()
+    next_after = rows[page_size - 1].id if len(rows) > page_size else None
+    return rows[:page_size], next_after
+
+
+@route('/my-recipes')
+@login_required
+@cached_view
+def my_recipes():
+    # Eine Seite der Rezepte des Users, weitere werden beim Scrollen nachgeladen
+    recipes, next_after = recipe_page(current_user.id, request.args.get('after', type=int))
+    if request.args.get('partial'):
+        return render_template('_recipe_items.html', recipes=recipes, next_after=next_after)
+    return render_template('my_recipes.html', recipes=recipes, next_after=next_after)
+
+
+@route('/delete-recipe/<int:recipe_id>', methods=['POST'])
+@login_required
+def delete_recipe(recipe_id):
+    recipe = Recipe.query.get_or_404(recipe_id)
+
+    # Nur der Eigentümer darf löschen
+    if recipe.user_id != current_user.id:
+        flash("Du darfst nur deine eigenen Rezepte löschen!", "error")
+        return redirect(url_for('my_recipes'))
+
+    # Rezept löschen, samt Suchindex und Einkaufsliste
+    recipe_store.delete(recipe)
+    db.session.commit()
+
+    flash("Rezept wurde erfolgreich gelöscht!", "success")
+    return redirect(url_for('my_recipes'))
+
+
+@route('/search')
+@login_required
+def search():
+    query = request.args.get('q', '').strip()
+    cookable = bool(request.args.get('cookable'))
+    if cookable:
+        results = recipe_search.cookable(current_user.id)
+    else:
+        results = recipe_search.search(current_user.id, query) if query else []
+    return render_template('search.html', query=query, cookable=cookable, results=results)
+
+
+@route('/search/suggest')
+@login_required
+def search_suggest():
+    # Typeahead: liefert passende Rezepttitel als JSON
+    prefix = request.args.get('q', '')
+    return jsonify([
+        {'id': recipe_id, 'title': title}
+        for recipe_id, title in recipe_search.suggest(current_user.id, prefix)
+    ])
+
+
+def load_shopping_list(user_id):
+    """ Einkaufsliste inkl. Items und Zutaten mit zwei Abfragen laden. """
+    return (ShoppingList.query
+            .options(selectinload(ShoppingList.items)
+                     .joinedload(ShoppingListItem.ingredient))
+            .filter_by(user_id=user_id)
+            .first())
+
+
+def publish_ticks(tick_results):
+    # Erfolgreiche Haken an alle verbundenen Geräte schicken
+    for result in tick_results:
+        if result.status == 'updated':
+            shopping_list_events.publish(current_user.id, 'check', {
+                'id': result.id, 'purchased': result.purchased, 'version': result.version,
+            })
+
+
+def publish_new_item(item):
+    db.session.flush()
+    shopping_list_events.publish(current_user.id, 'add', {
+        'id': item.id, 'name': item.custom_name, 'amount': item.amount, 'unit': item.unit,
+    }, item.shopping_list_id)
+
+
+def flash_tick_conflicts(tick_results):
+    conflicts = sum(1 for r in tick_results if r.status == 'conflict')
+    if conflicts:
+        flash(f"{conflicts} Artikel wurde(n) inzwischen von jemand anderem geändert.", "info")
+
+
+@route('/shopping-list/items/<int:item_id>/purchased', methods=['POST'])
+@login_required
+def toggle_shopping_item(item_id):
+    # Setzt den Haken eines einzelnen Artikels, erwartet JSON
+    # {"purchased": true|false, "version": n}
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload.get('version'), int):
+        return jsonify(error="'version' fehlt"), 400
+
+    result = shopping_list_delta.set_purchased(
+        db.session, current_user.id, item_id,
+        bool(payload.get('purchased')), payload['version']
+    )
+    if result.status == 'not_found':
+        db.session.rollback()
+        return jsonify(error="Artikel nicht gefunden"), 404
+    publish_ticks([result])
+    db.session.commit()
+    status = 409 if result.status == 'conflict' else 200
+    return jsonify(result._asdict()), status
+
+
+@route('/shopping-list', methods=['GET', 'POST'])
+@login_required
+@cached_view
+def shopping_list():
+    slist = load_shopping_list(current_user.id)
+
+    # Falls es keine Einkaufsliste gibt -> zum Rezepte-Auswählen
+    if not slist:
+        flash("Du hast aktuell keine Einkaufsliste. Bitte wähle Rezepte aus.", "error")
+        return redirect(url_for('select_recipes'))
+
+    if request.method == 'POST':
+        # Prüfen, ob "Liste löschen"-Button geklickt wurde
+        if 'delete_list' in request.form:
+            db.session.delete(slist)
+            shopping_list_events.publish(current_user.id, 'reset', {'shopping_list_id': None})
+            db.session.commit()
+            flash("Einkaufsliste gelöscht!", "info")
+            return redirect(url_for('select_recipes'))
+
+        # 1) Nur geänderte Haken schreiben, fremde Änderungen bleiben erhalten
+        tick_results = shopping_list_delta.apply_form_ticks(
+            db.session, current_user.id, request.form
+        )
+        publish_ticks(tick_results)
+
+        # 2) Neuen Artikel hinzufügen (falls angegeben)
+        new_name = request.form.get('new_item_name', '').strip()
+        new_amount_str = request.form.get('new_item_amount', '').strip()
+        new_unit_str = request.form.get('new_item_unit', '').strip()
+
+        if new_name:
+            # Für Non-Food / freie Artikel => ingredient_id=None
+            # oder du erlaubst dem User, eine Ingredient auszuwählen.
+            try:
+                new_amount = float(new_amount_str) if new_amount_str else None
+            except ValueError:
+                new_amount = None
+
+            new_item = ShoppingListItem(
+                shopping_list_id=slist.id,
+                custom_name=new_name,
+                amount=new_amount,
+                unit=new_unit_str or None,
+                purchased=False
+            )
+            db.session.add(new_item)
+            publish_new_item(new_item)
+
+        # 3) Abgehakte Artikel in den Bestand übernehmen (falls gewünscht)
+        stocked = 0
+        if 'stock_purchased' in request.form:
+            stocked = inventory_service.stock_purchased(current_user.id)
+
+        db.session.commit()
+        flash_tick_conflicts(tick_results)
+        if stocked:
+            flash(f"{stocked} Artikel in den Bestand übernommen.", "success")
+        flash("Änderungen gespeichert!", "success")
+        return redirect(url_for('shopping_list'))
+
+    # GET: Liste anzeigen
+    return render_template('shopping_list.html', slist=slist)
+
+
+@route('/shopping-list/events')
+@login_required
+def shopping_list_stream():
+    # Server-Sent Events: Änderungen an der Einkaufsliste in Echtzeit
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    try:
+        subscription = shopping_list_events.subscribe(current_user.id, last_event_id)
+    except TooManyListeners:
+        # Client fällt auf Polling zurück
+        return Response("Zu viele Verbindungen", status=503,
+                        headers={'Retry-After': '30'})
+    return Response(
+        shopping_list_events.stream(
+            subscription, timeout=current_app.config['SSE_STREAM_TIMEOUT']
+        ),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@route('/select_recipes', methods=['GET', 'POST'])
+@login_required
+def select_recipes():
+    if request.method == 'POST':
+        recipe_ids = request.form.getlist('recipe_ids[]')
+
+        # Summierung per SQL-Aggregat, Schreiben in einer Transaktion
+        shopping_list_builder.build(current_user.id, recipe_ids)
+
+        if shopping_list_builder.mode == MODE_EXCLUDE:
+            flash("Deine Einkaufsliste wurde aktualisiert! Zutaten aus dem Haushalt wurden ignoriert.", "success")
+        else:
+            flash("Deine Einkaufsliste wurde aktualisiert! Vorräte aus dem Haushalt wurden abgezogen.", "success")
+        return redirect(url_for('shopping_list'))
+
+    # GET
+    # Nur id und title laden, weitere Seiten kommen beim Scrollen
+    user_recipes, next_after = recipe_page(
+        current_user.id, request.args.get('after', type=int), listing=True
+    )
+    if request.args.get('partial'):
+        return render_template('_recipe_options.html', recipes=user_recipes,
+                               next_after=next_after)
+    return render_template('select_recipes.html', recipes=user_recipes,
+                           next_after=next_after)
+
+# Wie viele Wochen der Essensplan höchstens auf einmal zeigt
+MAX_PLAN_WEEKS = 8
+
+
+def _plan_week():
+    """ Angezeigter Zeitraum aus ?start= bzw. Formularfeld start und weeks. """
+    values = request.values
+    try:
+        start = week_start(parse_date(values.get('start') or date.today()))
+    except PlanError:
+        start = week_start(date.today())
+    weeks = min(max(values.get('weeks', 1, type=int), 1), MAX_PLAN_WEEKS)
+    return start, weeks
+
+
+def _plan_redirect():
+    start, weeks = _plan_week()
+    return redirect(url_for('meal_plan', start=start.isoformat(), weeks=weeks))
+
+
+@route('/meal-plan')
+@login_required
+def meal_plan():
+    # Eine oder mehrere Wochen ab Montag, ohne Angabe die aktuelle Woche
+    start, weeks = _plan_week()
+    days = [start + timedelta(days=i) for i in range(7 * weeks)]
+    by_day = {}
+    for entry in meal_planner.entries(current_user.id, days[0], days[-1]):
+        by_day.setdefault(entry.plan_date, []).append(entry)
+    totals = nutrition.plan_totals(current_user.id, days[0], days[-1])
+    # Nur id und title für die Auswahl beim Einplanen
+    recipes = (db.session.query(Recipe.id, Recipe.title)
+               .filter(Recipe.user_id == current_user.id)
+               .order_by(Recipe.id).all())
+    return render_template('meal_plan.html', days=days, by_day=by_day, totals=totals,
+                           recipes=recipes,
+                           start=start, weeks=weeks, slots=SLOTS, slot_labels=SLOT_LABELS,
+                           previous=start - timedelta(days=7 * weeks),
+                           following=start + timedelta(days=7 * weeks))
+
+
+@route('/meal-plan/entries', methods=['POST'])
+@login_required
+def add_meal_plan_entry():
+    try:
+        meal_planner.add(current_user.id, request.form.get('recipe_id'),
+                         request.form.get('date'), request.form.get('slot'),
+                         request.form.get('servings'))
+    except PlanError as error:
+        db.session.rollback()
+        flash(error.message, "error")
+    else:
+        db.session.commit()
+        flash("Rezept wurde eingeplant!", "success")
+    return _plan_redirect()
+
+
+@route('/meal-plan/entries/<int:entry_id>/delete', methods=['POST'])
+@login_required
+def delete_meal_plan_entry(entry_id):
+    if meal_planner.remove(current_user.id, [entry_id]):
+        db.session.commit()
+        flash("Mahlzeit wurde aus dem Plan entfernt.", "info")
+    else:
+        flash("Diese Mahlzeit gibt es nicht in deinem Plan.", "error")
+    return _plan_redirect()
+
+
+@route('/meal-plan/repeat', methods=['POST'])
+@login_required
+def repeat_meal_plan():
+    # Die angezeigten Wochen in die folgenden übernehmen
+    start, weeks = _plan_week()
+    times = request.form.get('times', 1, type=int)
+    try:
+        added = meal_planner.repeat(current_user.id, start, days=7 * weeks, times=times)
+    except PlanError as error:
+        db.session.rollback()
+        flash(error.message, "error")
+    else:
+        db.session.commit()
+        flash(f"Plan wurde {times}-mal wiederholt ({added} Mahlzeiten).", "success")
+    return _plan_redirect()
+
+
+@route('/meal-plan/shopping-list', methods=['POST'])
+@login_required
+def meal_plan_shopping_list():
+    # Eine aggregierte Abfrage für alle Mahlzeiten im Zeitraum (build_plan)
+    try:
+        first = parse_date(request.form.get('from'))
+        last = parse_date(request.form.get('to'))
+        meal_planner.build_shopping_list(current_user.id, first, last)
+    except PlanError as error:
+        flash(error.message, "error")
+        return _plan_redirect()
+    flash(f"Deine Einkaufsliste für {first:%d.%m.} bis {last:%d.%m.%Y} wurde erstellt!",
+          "success")
+    return redirect(url_for('shopping_list'))
+
+
+@route('/edit-shopping-list', methods=['GET', 'POST'])
+@login_required
+def edit_shopping_list():
+    # 1) Aktuelle Liste des Users laden
+    slist = load_shopping_list(current_user.id)
+    if not slist:
+        flash("Keine Einkaufsliste vorhanden.")
+        return redirect(url_for('select_recipes'))  # oder wo auch immer
+
+    if request.method == 'POST':
+        # 2) Checkboxen auswerten: "purchased_<ID>" ist angehakt, verglichen
+        #    wird mit dem angezeigten Stand, nur Änderungen werden geschrieben
+        tick_results = shopping_list_delta.apply_form_ticks(
+            db.session, current_user.id, request.form
+        )
+        publish_ticks(tick_results)
+
+        # 3) Neuen Artikel hinzufügen
+        custom_name = request.form.get('new_item_name', '').strip()
+        amount_str = request.form.get('new_item_amount', '')
+        unit_str = request.form.get('new_item_unit', '').strip()
+
+        if custom_name:
+            try:
+                amount_val = float(amount_str) if amount_str else None
+            except ValueError:
+                amount_val = None
+
+            new_item = ShoppingListItem(
+                shopping_list_id=slist.id,
+                custom_name=custom_name,
+                amount=amount_val,
+                unit=unit_str or None,
+                purchased=False  # neu angelegte Artikel sind standardmäßig nicht gekauft
+            )
+            db.session.add(new_item)
+            publish_new_item(new_item)
+
+        db.session.commit()
+        flash_tick_conflicts(tick_results)
+        flash("Einkaufsliste aktualisiert!", "success")
+        return redirect(url_for('edit_shopping_list'))
+
+    # GET => Seite anzeigen
+    return render_template('edit_shopping_list.html', slist=slist)
+
+
+
+@route('/delete-shopping-list', methods=['POST'])
+@login_required
+def delete_shopping_list():
+    slist = ShoppingList.query.filter_by(user_id=current_user.id).first()
+    if slist:
+        db.session.delete(slist)
+        shopping_list_events.publish(current_user.id, 'reset', {'shopping_list_id': None})
+        db.session.commit()
+        flash("Einkaufsliste gelöscht!", "info")
+    else:
+        flash("Keine Einkaufsliste vorhanden.", "error")
+    return redirect(url_for('select_recipes'))
+
+@route('/inventory')
+@login_required
+@cached_view(vary=lambda: date.today().isoformat())  # "läuft bald ab" hängt vom Tag ab
+def inventory():
+    # Bestand des Users, eine Zeile je Zutat und Dimension
+    return render_template('inventory.html', items=inventory_service.items(current_user.id),
+                           expiring=inventory_service.expiring(current_user.id),
+                           today=date.today())
+
+@route('/delete-inventory/<int:item_id>', methods=['POST'])
+@login_required
+def delete_inventory(item_id):
+    # Ganze Zeile als weggeworfen abbuchen
+    try:
+        inventory_service.take(current_user.id, item_id, kind=DISCARD)
+    except UnknownItem:
+        db.session.rollback()
+        flash("Du darfst nur deine eigenen Bestands-Items löschen!", "error")
+        return redirect(url_for('inventory'))
+    db.session.commit()
+    flash("Eintrag wurde aus dem Bestand gelöscht!", "info")
+
+    return redirect(url_for('inventory'))
+
+
+@route('/consume-inventory/<int:item_id>', methods=['POST'])
+@login_required
+def consume_inventory(item_id):
+    # Menge verbrauchen oder wegwerfen; ohne Menge die ganze Zeile
+    kind = DISCARD if request.form.get('kind') == DISCARD else CONSUME
+    try:
+        amount = parse_amount(request.form.get('amount'), strict=True)
+        inventory_service.take(current_user.id, item_id, amount,
+                               parse_unit(request.form.get('unit')), kind=kind)
+    except (InventoryError, RecipeError) as error:
+        db.session.rollback()
+        flash(error.message, "error")
+        return redirect(url_for('inventory'))
+    db.session.commit()
+    flash("Bestand aktualisiert!", "success")
+    return redirect(url_for('inventory'))
+
+
+@route('/add-inventory', methods=['POST'])
+@login_required
+def add_inventory():
+    # Kauf buchen; gleiche Zutat in gleicher Dimension wird aufaddiert
+    try:
+        inventory_service.purchase(current_user.id, [{
+            'name': request.form.get('ingredient_name', ''),
+            'amount': parse_amount(request.form.get('amount')),
+            'unit': parse_unit(request.form.get('unit')),
+            'expires_on': request.form.get('expires_on'),
+        }])
+    except InventoryError as error:
+        db.session.rollback()
+        flash(error.message, "error")
+        return redirect(url_for('inventory'))
+    db.session.commit()
+    flash("Lebensmittel zum Bestand hinzugefügt!", "success")
+
+    return redirect(url_for('inventory'))
@@ -1,650 +1,193 @@
 # server.py
-import mealmaster_mgr
-from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash
-from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
-from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField
-from wtforms.validators import InputRequired, Length, EqualTo
-from flask_login import (
-    LoginManager, UserMixin, login_user, logout_user,
-    current_user, login_required
-)
+"""
+App-Factory für MealMaster.
+
+create_app() liest die Konfiguration und bindet Erweiterungen, Services und
+Routen an eine neue App. Dabei wird weder eine Datenbankverbindung geöffnet
+noch DDL ausgeführt, das Schema legt der Migrationsschritt an
+(python -m migrations). uWSGI kann die App so im Master vorladen und die
+Worker per fork starten (siehe wsgi.py).
+"""
+from types import SimpleNamespace
+
+from flask import Flask
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-
-manager = mealmaster_mgr.Mealmaster_mgr(config_file="config/settings.json")
-
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = manager.get_config("database_uri")
-app.config['SECRET_KEY'] = manager.get_config("encryption_secret_key")
-
-db = SQLAlchemy(app)
-bcrypt = Bcrypt(app)
-with app.app_context():
-    db.create_all()
-
-# Flask-Login konfigurieren
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'   # Route-Name deiner Login-Funktion
-
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
-# --------------------------------
-# MODELS
-# --------------------------------
-class User(db.Model, UserMixin):
-    __tablename__ = 'user'
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(20), nullable=False, unique=True)
-    password = db.Column(db.String(80), nullable=False)
-
-    # Weitere Felder, wie in deinem Projekt
-    register_date = db.Column(db.TEXT)
-    last_login = db.Column(db.TEXT)
-    ip_address = db.Column(db.TEXT)
-    # Beziehung zurück auf Recipes
-    recipes = db.relationship('Recipe', back_populates='user')
-    shopping_list = db.relationship('ShoppingList', back_populates='user',
-                                    uselist=False,  # nur EIN Objekt
-                                    cascade='all, delete-orphan')
-
-    household_items = db.relationship('HouseholdItem', back_populates='user',
-                                      cascade='all, delete-orphan')
-    def __repr__(self):
-        return f"<User {self.username}>"
-
-class Ingredient(db.Model):
-    __tablename__ = 'ingredients'
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-
-    # Beziehung zu RecipeIngredient
-    ingredient_in_recipes = db.relationship('RecipeIngredient', back_populates='ingredient',
-                                            cascade="all, delete-orphan")
-
-
-
-class Recipe(db.Model):
-    __tablename__ = 'recipes'
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(30), nullable=False)
-    instructions = db.Column(db.String(400))
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-
-    # Das "Brückentable" verknüpft Rezepte und Zutaten
-    recipe_ingredients = db.relationship('RecipeIngredient', back_populates='recipe',
-                                         cascade="all, delete-orphan")
-    user = db.relationship('User', back_populates='recipes')  # Nur falls du back_populates nutzt
-
-
-class RecipeIngredient(db.Model):
-    __tablename__ = 'recipe_ingredients'
-
-    id = db.Column(db.Integer, primary_key=True)
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id'), nullable=False)
-    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.id'), nullable=False)
-    quantity = db.Column(db.String(50), nullable=True)  # z.B. "200 g"
-
-    # Beziehungen (ein RecipeIngredient gehört zu genau 1 Recipe und 1 Ingredient)
-    recipe = db.relationship('Recipe', back_populates='recipe_ingredients')
-    ingredient = db.relationship('Ingredient', back_populates='ingredient_in_recipes')
-
-
-    amount = db.Column(db.Float, nullable=True)  # oder db.Numeric(10, 2) für exakte Werte
-    unit = db.Column(db.String(20), nullable=True)  # z. B. "g", "ml", "Stk"
-
-    recipe = db.relationship('Recipe', back_populates='recipe_ingredients')
-    ingredient = db.relationship('Ingredient', back_populates='ingredient_in_recipes')
-
-class ShoppingList(db.Model):
-    __tablename__ = 'shopping_lists'
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    #
-    
-
-    # Beziehung: Eine Einkaufsliste hat viele Items
-    items = db.relationship('ShoppingListItem', back_populates='shopping_list',
-                            cascade='all, delete-orphan')
-
-    # User-Objekt, falls du beidseitig referenzieren willst
-    user = db.relationship('User', back_populates='shopping_list')
-
-
-class ShoppingListItem(db.Model):
-    __tablename__ = 'shopping_list_items'
-    id = db.Column(db.Integer, primary_key=True)
-    shopping_list_id = db.Column(db.Integer, db.ForeignKey('shopping_lists.id'), nullable=False)
-    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.id'), nullable=True)
-
-    amount = db.Column(db.Float, nullable=True)
-    unit = db.Column(db.String(20), nullable=True)
-
-    shopping_list = db.relationship('ShoppingList', back_populates='items')
-    ingredient = db.relationship('Ingredient')
-
-    # Neu für Non-Food:
-    custom_name = db.Column(db.String(100), nullable=True)  # z. B. "Toilettenpapier"
-
-    # Neu für Abhaken:
-    purchased = db.Column(db.Boolean, default=False, nullable=False)
-
-    shopping_list = db.relationship('ShoppingList', back_populates='items')
-   
-
-
-class HouseholdItem(db.Model):
-    __tablename__ = 'household_items'
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=True)
-    unit = db.Column(db.String(20), nullable=True)
-
-    user = db.relationship('User', back_populates='household_items')
-    ingredient = db.relationship('Ingredient')
-
-
-
-# Legt Datenbank und Tabellen an        
-with app.app_context():
-    db.create_all()
-# --------------------------------
-# FORMS
-# --------------------------------
-class RegisterForm(FlaskForm):
-    username = StringField(
-        validators=[InputRequired(), Length(min=3, max=20)],
-        render_kw={"placeholder": "Username"}
+import api
+import database
+import mealmaster_mgr
+import nutrition
+import recipe_transfer
+import models  # noqa: F401  (registriert die Models und den user_loader)
+import routes
+from assets import Assets
+from audit_log import AuditLog
+from extensions import bcrypt, db, login_manager
+from ingredient_resolver import IngredientResolver
+from inventory import Inventory
+from meal_planner import MealPlanner
+from metrics import Metrics
+from nutrition import NutritionEngine
+from password_hasher import PasswordHasher
+from query_counter import QueryCounter
+from rate_limit import LoginThrottle
+from recipe_search import RecipeSearch
+from recipe_store import RecipeStore
+from recipe_transfer import RecipeImporter
+from render_cache import RenderCache
+from shopping_list_builder import ShoppingListBuilder
+from shopping_list_events import ShoppingListEvents
+from user_cache import UserCache
+
+
+def create_app(config_file: str = "config/settings.json"):
+    manager = mealmaster_mgr.Mealmaster_mgr(config_file=config_file)
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = manager.get_config("database_uri")
+    app.config['SECRET_KEY'] = manager.get_config("encryption_secret_key")
+    app.config['RECIPES_PAGE_SIZE'] = manager.get_config("recipes_page_size", 50)
+    app.config['SSE_STREAM_TIMEOUT'] = manager.get_config("sse_stream_timeout", 55)
+    app.config['METRICS_TOKEN'] = manager.get_config("metrics_token")
+    app.config['BCRYPT_LOG_ROUNDS'] = manager.get_config("bcrypt_rounds", 12)
+
+    # Pools, SQLite-PRAGMAs und Lese-Routing
+    database.init_app(app, db, manager)
+    bcrypt.init_app(app)
+    login_manager.init_app(app)
+
+    # Latenz, SQL und bcrypt je Route für /metrics, optional mit Profiler
+    metrics = Metrics(
+        app,
+        directory=manager.get_config("metrics_dir"),
+        profiling=manager.get_config("profiling", "off"),
+        profile_dir=manager.get_config("profile_dir", "logs/profiles"),
     )
-    password = PasswordField(
-        validators=[InputRequired(), Length(min=8)],
-        render_kw={"placeholder": "Password"}
+    manager.metrics = metrics
+    # Logins, Rezept- und Listenänderungen, im Hintergrund nach logs/ geschrieben
+    audit_log = AuditLog(
+        db,
+        directory=manager.get_config("audit_log_dir", "logs"),
+        max_queue=manager.get_config("audit_queue_size", 10000),
+        batch_size=manager.get_config("audit_batch_size", 500),
+        flush_interval=manager.get_config("audit_flush_interval", 1.0),
+        retention_days=manager.get_config("audit_retention_days", 30),
     )
-    confirm_password = PasswordField(
-        validators=[InputRequired(), EqualTo('password', message='Passwords must match')],
-        render_kw={"placeholder": "Confirm Password"}
+    metrics.add_collector(audit_log.metric_samples)
+    # bcrypt in einem begrenzten Pool pro Worker, damit Logins nicht alle Threads belegen
+    password_hasher = PasswordHasher(
+        bcrypt, metrics,
+        rounds=app.config['BCRYPT_LOG_ROUNDS'],
+        workers=manager.get_config("bcrypt_workers", 1),
+        max_pending=manager.get_config("bcrypt_max_pending", 1),
     )
-    submit = SubmitField('Register')
-
-class LoginForm(FlaskForm):
-    username = StringField(
-        validators=[InputRequired(), Length(min=3, max=20)],
-        render_kw={"placeholder": "Username"}
+    metrics.add_collector(password_hasher.metric_samples)
+    # Eingeloggter User (id, username) pro Worker, ohne Abfrage je Request
+    user_cache = UserCache(
+        db, models.User,
+        max_entries=manager.get_config("user_cache_size", 1024),
+        ttl=manager.get_config("user_cache_ttl", 60),
     )
-    password = PasswordField(
-        validators=[InputRequired(), Length(min=8)],
-        render_kw={"placeholder": "Password"}
+    metrics.add_collector(user_cache.metric_samples)
+    # Versuche pro Minute je IP und je Benutzername für login und register
+    login_throttle = LoginThrottle(
+        ip_per_minute=manager.get_config("login_rate_ip_per_minute", 30),
+        ip_burst=manager.get_config("login_rate_ip_burst", 10),
+        user_per_minute=manager.get_config("login_rate_user_per_minute", 6),
+        user_burst=manager.get_config("login_rate_user_burst", 5),
+        metrics=metrics,
+    )
+    # Zählt SQL-Statements pro Request (Header X-Query-Count)
+    query_counter = QueryCounter(app, db, budget=manager.get_config("query_budget"))
+    # Live-Updates der Einkaufsliste (SSE), verteilt über die SQLite-Datei.
+    # Jeder Listener belegt einen Worker-Thread, daher begrenzt pro Worker.
+    shopping_list_events = ShoppingListEvents(
+        db,
+        poll_interval=manager.get_config("sse_poll_interval", 0.5),
+        max_listeners=manager.get_config("sse_max_listeners", 1),
+        audit=audit_log,
+    )
+    # "subtract" zieht den Haushaltsbestand ab, "exclude" ist die alte Logik
+    shopping_list_builder = ShoppingListBuilder(
+        db, mode=manager.get_config("household_mode", "subtract"),
+        events=shopping_list_events
+    )
+    # Essensplan, Einkaufsliste für einen Zeitraum über den ShoppingListBuilder
+    meal_planner = MealPlanner(
+        db, shopping_list_builder, max_days=manager.get_config("meal_plan_max_days", 366)
+    )
+    # Name -> ID Auflösung mit LRU-Cache pro Worker
+    ingredient_resolver = IngredientResolver(
+        db, models.Ingredient, cache_size=manager.get_config("ingredient_cache_size", 1024)
+    )
+    # Volltextsuche (FTS5, sonst Index im Speicher), prüft beim ersten Zugriff
+    recipe_search = RecipeSearch(db)
+    # asset_url() für CSS/JS mit Fingerprint aus static/dist (python -m assets)
+    assets = Assets(app)
+    # Gerenderte Seiten je User und Datenversion, optional über alle Worker.
+    # Die Asset-Version im Schlüssel verwirft Seiten mit URLs eines alten Builds.
+    render_cache = RenderCache(
+        app, db, namespace=assets.version,
+        max_entries=manager.get_config("render_cache_size", 256),
+        shared_path=manager.get_config("render_cache_shared_path"),
+        shared_max_entries=manager.get_config("render_cache_shared_max_entries", 10000),
+    )
+    metrics.add_collector(render_cache.metric_samples)
+    # Haushaltsbestand je Zutat mit Bewegungsbuch, führt die Einkaufsliste nach
+    inventory = Inventory(
+        db, ingredient_resolver, shopping_list_builder, events=shopping_list_events,
+        expiry_days=manager.get_config("inventory_expiry_days", 3),
+    )
+    # Nährwerte je Rezept (vorberechnet) und Essensplan, "flask nutrition import"
+    nutrition_engine = NutritionEngine(
+        db, ingredient_resolver, render_cache=render_cache,
+        chunk_size=manager.get_config("nutrition_chunk_size", 5000),
+    )
+    # Rezepte anlegen, ändern (nur geänderte Zutatenzeilen) und löschen
+    recipe_store = RecipeStore(
+        db, ingredient_resolver, recipe_search, shopping_list_builder,
+        nutrition=nutrition_engine, audit_log=audit_log,
+    )
+    # Import vieler Rezepte (API und "flask recipes import"), blockweise committet
+    recipe_importer = RecipeImporter(
+        db, ingredient_resolver, recipe_search, nutrition=nutrition_engine,
+        render_cache=render_cache,
+        audit_log=audit_log, chunk_size=manager.get_config("import_chunk_size", 500),
     )
-    submit = SubmitField('Login')
-
-# --------------------------------
-# ROUTES
-# --------------------------------
-
-
-@app.route('/')
-@login_required
-def home():
-        return render_template('index.html')
-
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    form = LoginForm()
-    if form.validate_on_submit():
-        username = form.username.data.lower()
-        password = form.password.data
-        user = User.query.filter_by(username=username).first()
-        if user:
-            # Passwortvergleich
-            if bcrypt.check_password_hash(user.password, password):
-                login_user(user)
-                user.last_login = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                db.session.commit()
-                # OPTIONAL: mealmaster_mgr Logik hier
-                # manager.log_login(user.username)
-                return redirect(url_for('dashboard'))
-            else:
-                flash("Falsches Passwort!", "error")
-        else:
-            flash("Nutzer existiert nicht!", "error")
-    return render_template('login.html', form=form)
-
-@app.route('/logout')
-@login_required
-def logout():
-    logout_user()
-    return redirect(url_for('login'))
-
-@app.route('/register', methods=['GET', 'POST'])
-def register():
-    form = RegisterForm()
-    if form.validate_on_submit():
-        username = form.username.data.lower()
-        # Prüfen, ob der Nutzername existiert
-        existing_user = User.query.filter_by(username=username).first()
-        if existing_user:
-            flash("Dieser Benutzername ist bereits vergeben!", "error")
-            return redirect(url_for('register'))
-
-        # Passwort verschlüsseln
-        hashed_pw = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
-        new_user = User(
-            username=username,
-            password=hashed_pw,
-            register_date=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        )
-        db.session.add(new_user)
-        db.session.commit()
-        flash("Registrierung erfolgreich! Bitte melde dich an.", "success")
-        return redirect(url_for('login'))
-    return render_template('register.html', form=form)
-
-@app.route('/dashboard')
-@login_required
-def dashboard():
-    # Deine "index" bzw. Dashboard-Seite
-    # Nur für eingeloggte Nutzer zugänglich
-    return render_template('index.html')
-
-@app.route('/create-recipe', methods=['GET', 'POST'])
-@login_required
-def create_recipe():
-    if request.method == 'POST':
-        title = request.form.get('title')
-        instructions = request.form.get('instructions')
-
-        # 1) Neues Rezept-Objekt
-        new_recipe = Recipe(
-            title=title,
-            instructions=instructions,
-            user_id=current_user.id
-        )
-        db.session.add(new_recipe)
-        db.session.commit()  # Damit new_recipe eine ID hat
-
-        # 2) Zutaten auslesen
-        # z.B. ingredient_name[] => Liste an Strings
-        #     ingredient_qty[] => Liste an Mengen
-        ingredient_names = request.form.getlist('ingredient_name[]')
-        ingredient_amounts = request.form.getlist('ingredient_amount[]')
-        ingredient_units = request.form.getlist('ingredient_unit[]')
-        
-        for name, amt_str, unt in zip(ingredient_names, ingredient_amounts, ingredient_units):
-            if not name.strip():
-                continue
-            # Ingredient
-            ingredient = Ingredient.query.filter_by(name=name.strip()).first()
-            if not ingredient:
-                ingredient = Ingredient(name=name.strip())
-                db.session.add(ingredient)
-                db.session.commit()
-        
-            # amount parsen
-            try:
-                amount_val = float(amt_str) if amt_str else None
-            except ValueError:
-                amount_val = None
-        
-            recipe_ing = RecipeIngredient(
-                recipe_id=new_recipe.id,
-                ingredient_id=ingredient.id,
-                amount=amount_val,
-                unit=unt.strip() if unt else None
-            )
-            db.session.add(recipe_ing)
-
-
-        db.session.commit()
-        flash("Rezept erstellt!", "success")
-        return redirect(url_for('my_recipes'))
-
-    # GET
-    return render_template('create_recipe.html')
-
-@app.route('/edit-recipe/<int:recipe_id>', methods=['GET', 'POST'])
-@login_required
-def edit_recipe(recipe_id):
-    recipe = Recipe.query.get_or_404(recipe_id)
-
-    # Nur Besitzer darf bearbeiten
-    if recipe.user_id != current_user.id:
-        flash("Du darfst nur deine eigenen Rezepte bearbeiten!", "error")
-        return redirect(url_for('my_recipes'))
-
-    if request.method == 'POST':
-        # 1) Rezeptdaten aktualisieren
-        recipe.title = request.form.get('title')
-        recipe.instructions = request.form.get('instructions')
-
-        # 2) Bisherige RecipeIngredients entfernen,
-        #    damit wir sie komplett neu anlegen können
-        recipe.recipe_ingredients.clear()
-        db.session.flush()  # entfernt alte Einträge aus der DB-Session
-
-        # 3) Neue Werte aus dem Formular einlesen
-        ingredient_names = request.form.getlist('ingredient_name[]')
-        ingredient_amounts = request.form.getlist('ingredient_amount[]')
-        ingredient_units = request.form.getlist('ingredient_unit[]')
-
-        for name, amt_str, unt in zip(ingredient_names, ingredient_amounts, ingredient_units):
-            name = name.strip()
-            if not name:
-                continue
-
-            # Ingredient holen oder anlegen
-            ingredient = Ingredient.query.filter_by(name=name).first()
-            if not ingredient:
-                ingredient = Ingredient(name=name)
-                db.session.add(ingredient)
-                db.session.commit()
-
-            # Menge parsen
-            try:
-                amount_val = float(amt_str) if amt_str else None
-            except ValueError:
-                amount_val = None
-
-            # RecipeIngredient erstellen
-            ri = RecipeIngredient(
-                recipe=recipe,
-                ingredient=ingredient,
-                amount=amount_val,
-                unit=unt.strip() if unt else None
-            )
-            db.session.add(ri)
-
-        db.session.commit()
-        flash("Rezept wurde aktualisiert!", "success")
-        return redirect(url_for('my_recipes'))
-
-    # GET: Formular anzeigen
-    return render_template('edit_recipe.html', recipe=recipe)
-
-
-@app.route('/my-recipes')
-@login_required
-def my_recipes():
-    # Hol alle Rezepte für den aktuell eingeloggten User
-    recipes = Recipe.query.filter_by(user_id=current_user.id).all()
-    return render_template('my_recipes.html', recipes=recipes)
-
-
-@app.route('/delete-recipe/<int:recipe_id>', methods=['POST'])
-@login_required
-def delete_recipe(recipe_id):
-    recipe = Recipe.query.get_or_404(recipe_id)
-
-    # Nur der Eigentümer darf löschen
-    if recipe.user_id != current_user.id:
-        flash("Du darfst nur deine eigenen Rezepte löschen!", "error")
-        return redirect(url_for('my_recipes'))
-
-    # Rezept löschen
-    db.session.delete(recipe)
-    db.session.commit()
-
-    flash("Rezept wurde erfolgreich gelöscht!", "success")
-    return redirect(url_for('my_recipes'))
-
-
-@app.route('/shopping-list', methods=['GET', 'POST'])
-@login_required
-def shopping_list():
-    slist = ShoppingList.query.filter_by(user_id=current_user.id).first()
-
-    # Falls es keine Einkaufsliste gibt -> zum Rezepte-Auswählen
-    if not slist:
-        flash("Du hast aktuell keine Einkaufsliste. Bitte wähle Rezepte aus.", "error")
-        return redirect(url_for('select_recipes'))
-
-    if request.method == 'POST':
-        # Prüfen, ob "Liste löschen"-Button geklickt wurde
-        if 'delete_list' in request.form:
-            db.session.delete(slist)
-            db.session.commit()
-            flash("Einkaufsliste gelöscht!", "info")
-            return redirect(url_for('select_recipes'))
-
-        # 1) Gekaufte Artikel abhaken oder zurücksetzen
-        for item in slist.items:
-            checkbox_name = f"purchased_{item.id}"
-            item.purchased = (checkbox_name in request.form)
-
-        # 2) Neuen Artikel hinzufügen (falls angegeben)
-        new_name = request.form.get('new_item_name', '').strip()
-        new_amount_str = request.form.get('new_item_amount', '').strip()
-        new_unit_str = request.form.get('new_item_unit', '').strip()
-
-        if new_name:
-            # Für Non-Food / freie Artikel => ingredient_id=None
-            # oder du erlaubst dem User, eine Ingredient auszuwählen.
-            try:
-                new_amount = float(new_amount_str) if new_amount_str else None
-            except ValueError:
-                new_amount = None
-
-            new_item = ShoppingListItem(
-                shopping_list_id=slist.id,
-                custom_name=new_name,
-                amount=new_amount,
-                unit=new_unit_str or None,
-                purchased=False
-            )
-            db.session.add(new_item)
-
-        db.session.commit()
-        flash("Änderungen gespeichert!", "success")
-        return redirect(url_for('shopping_list'))
-
-    # GET: Liste anzeigen
-    return render_template('shopping_list.html', slist=slist)
-
-
-@app.route('/select_recipes', methods=['GET', 'POST'])
-@login_required
-def select_recipes():
-    if request.method == 'POST':
-        recipe_ids = request.form.getlist('recipe_ids[]')
-        existing_list = ShoppingList.query.filter_by(user_id=current_user.id).first()
-        if existing_list:
-            db.session.delete(existing_list)
-            db.session.commit()
-
-        new_list = ShoppingList(user_id=current_user.id)
-        db.session.add(new_list)
-        db.session.commit()
-
-        # Haushalt: Zutaten dieses Users
-        household_items = HouseholdItem.query.filter_by(user_id=current_user.id).all()
-        household_ingredient_ids = {hi.ingredient_id for hi in household_items}
-
-        # Rezeptzutaten laden
-        recipe_ids = [int(x) for x in recipe_ids if x.isdigit()]
-        recipe_ings = RecipeIngredient.query.filter(
-            RecipeIngredient.recipe_id.in_(recipe_ids)
-        ).all()
-
-        # Summendict
-        from collections import defaultdict
-        sums_dict = defaultdict(float)
-        no_unit_entries = []
-
-        for ri in recipe_ings:
-            # Check if ingredient already in household
-            if ri.ingredient_id in household_ingredient_ids:
-                # => skip it entirely
-                continue
-
-            # Normal summation logic
-            if ri.amount is not None and ri.unit:
-                key = (ri.ingredient_id, ri.unit.lower())
-                sums_dict[key] += ri.amount
-            else:
-                no_unit_entries.append(ri)
-
-        # Summierte Einheiten -> ShoppingListItem
-        for (ing_id, unit_str), total_amt in sums_dict.items():
-            item = ShoppingListItem(
-                shopping_list_id=new_list.id,
-                ingredient_id=ing_id,
-                amount=total_amt,
-                unit=unit_str
-            )
-            db.session.add(item)
-
-        # no_unit_entries -> add if not in household
-        for ri in no_unit_entries:
-            # household check war oben, also hier kein check mehr nötig
-            item = ShoppingListItem(
-                shopping_list_id=new_list.id,
-                ingredient_id=ri.ingredient_id,
-                amount=ri.amount,
-                unit=ri.unit
-            )
-            db.session.add(item)
-
-        db.session.commit()
-        flash("Deine Einkaufsliste wurde aktualisiert! Zutaten aus dem Haushalt wurden ignoriert.", "success")
-        return redirect(url_for('shopping_list'))
-
-    # GET
-    user_recipes = Recipe.query.filter_by(user_id=current_user.id).all()
-    return render_template('select_recipes.html', recipes=user_recipes)
-
-@app.route('/edit-shopping-list', methods=['GET', 'POST'])
-@login_required
-def edit_shopping_list():
-    # 1) Aktuelle Liste des Users laden
-    slist = ShoppingList.query.filter_by(user_id=current_user.id).first()
-    if not slist:
-        flash("Keine Einkaufsliste vorhanden.")
-        return redirect(url_for('select_recipes'))  # oder wo auch immer
-
-    if request.method == 'POST':
-        # 2) Checkboxen für bestehende Items auswerten
-        for item in slist.items:
-            # Wir erwarten z.B. ein Feld "purchased_<ID>" 
-            # -> wenn es im request.form auftaucht, ist es angehakt
-            checkbox_name = f"purchased_{item.id}"
-            item.purchased = (checkbox_name in request.form)
-
-        # 3) Neuen Artikel hinzufügen
-        custom_name = request.form.get('new_item_name', '').strip()
-        amount_str = request.form.get('new_item_amount', '')
-        unit_str = request.form.get('new_item_unit', '').strip()
-
-        if custom_name:
-            try:
-                amount_val = float(amount_str) if amount_str else None
-            except ValueError:
-                amount_val = None
-
-            new_item = ShoppingListItem(
-                shopping_list_id=slist.id,
-                custom_name=custom_name,
-                amount=amount_val,
-                unit=unit_str or None,
-                purchased=False  # neu angelegte Artikel sind standardmäßig nicht gekauft
-            )
-            db.session.add(new_item)
-
-        db.session.commit()
-        flash("Einkaufsliste aktualisiert!", "success")
-        return redirect(url_for('edit_shopping_list'))
-
-    # GET => Seite anzeigen
-    return render_template('edit_shopping_list.html', slist=slist)
-
-
-
-@app.route('/delete-shopping-list', methods=['POST'])
-@login_required
-def delete_shopping_list():
-    slist = ShoppingList.query.filter_by(user_id=current_user.id).first()
-    if slist:
-        db.session.delete(slist)
-        db.session.commit()
-        flash("Einkaufsliste gelöscht!", "info")
-    else:
-        flash("Keine Einkaufsliste vorhanden.", "error")
-    return redirect(url_for('select_recipes'))
-
-@app.route('/inventory')
-@login_required
-def inventory():
-    # Alle Items, die zum aktuellen Benutzer gehören
-    items = HouseholdItem.query.filter_by(user_id=current_user.id).all()
-    return render_template('inventory.html', items=items)
-
-@app.route('/delete-inventory/<int:item_id>', methods=['POST'])
-@login_required
-def delete_inventory(item_id):
-    # 1) Item aus der DB holen
-    item = HouseholdItem.query.get_or_404(item_id)
-    
-    # 2) Prüfen, ob das Item zum aktuellen User gehört
-    if item.user_id != current_user.id:
-        flash("Du darfst nur deine eigenen Bestands-Items löschen!", "error")
-        return redirect(url_for('inventory'))
-
-    # 3) Löschen
-    db.session.delete(item)
-    db.session.commit()
-    flash("Eintrag wurde aus dem Bestand gelöscht!", "info")
-
-    return redirect(url_for('inventory'))
-
-
-@app.route('/add-inventory', methods=['POST'])
-@login_required
-def add_inventory():
-    ingredient_name = request.form.get('ingredient_name', '').strip()
-    amount_str = request.form.get('amount', '')
-    unit_str = request.form.get('unit', '').strip()
-
-    # Ingredient holen oder anlegen
-    if ingredient_name:
-        ingredient = Ingredient.query.filter_by(name=ingredient_name).first()
-        if not ingredient:
-            ingredient = Ingredient(name=ingredient_name)
-            db.session.add(ingredient)
-            db.session.commit()
-
-        # Menge parsen
-        try:
-            amount_val = float(amount_str) if amount_str else None
-        except ValueError:
-            amount_val = None
 
-        # HouseholdItem anlegen
-        item = HouseholdItem(
-            user_id=current_user.id,
-            ingredient_id=ingredient.id,
-            amount=amount_val,
-            unit=unit_str if unit_str else None
-        )
-        db.session.add(item)
-        db.session.commit()
-        flash("Lebensmittel zum Bestand hinzugefügt!", "success")
-    else:
-        flash("Bitte einen Namen für die Zutat angeben!", "error")
+    # Services für Routen und Blueprints (z.B. die JSON-API)
+    app.extensions['mealmaster'] = SimpleNamespace(
+        db=db,
+        manager=manager,
+        assets=assets,
+        metrics=metrics,
+        audit_log=audit_log,
+        password_hasher=password_hasher,
+        login_throttle=login_throttle,
+        user_cache=user_cache,
+        query_counter=query_counter,
+        ingredient_resolver=ingredient_resolver,
+        inventory=inventory,
+        recipe_search=recipe_search,
+        recipe_store=recipe_store,
+        render_cache=render_cache,
+        recipe_importer=recipe_importer,
+        shopping_list_builder=shopping_list_builder,
+        shopping_list_events=shopping_list_events,
+        meal_planner=meal_planner,
+        nutrition=nutrition_engine,
+    )
+    routes.init_app(app)
+    app.register_blueprint(api.bp)
+    app.cli.add_command(recipe_transfer.cli)
+    app.cli.add_command(nutrition.cli)
 
-    return redirect(url_for('inventory'))
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
+    return app
 
 
 # --------------------------------
 # MAIN
 # --------------------------------
 if __name__ == "__main__":
-
-  
-
-    app.run(debug=False)
+    create_app().run(debug=False)
@@ -0,0 +1,636 @@
+# shopping_list_builder.py
+"""
+Einkaufsliste aus Rezepten erzeugen und aktuell halten.
+
+build() berechnet die Liste für eine Auswahl von Rezepten, build_plan() für
+die geplanten Mahlzeiten eines Zeitraums (meal_planner.py), mit den Mengen
+nach Portionen skaliert. Dabei merkt sich die Liste, aus welchen Rezepten
+sie entstanden ist und mit welchem Faktor (shopping_list_recipes), und
+welchen Bedarf jede Zutat hat (shopping_list_needs). Ändert sich danach
+ein Rezept oder der Bestand, werden über recipe_changed() bzw.
+stock_changed() nur die betroffenen Zutaten nachgerechnet. Eigene Artikel
+und Haken bleiben dabei erhalten.
+"""
+from datetime import datetime
+
+from sqlalchemy import Date, DateTime, bindparam, text
+
+import quantity
+
+# Haushaltsbestand wird mengenmäßig abgezogen (Standard)
+MODE_SUBTRACT = 'subtract'
+# Alte Logik: Zutat fällt weg, sobald sie im Haushalt existiert
+MODE_EXCLUDE = 'exclude'
+MODES = (MODE_SUBTRACT, MODE_EXCLUDE)
+
+
+# Herkunft der Mengen als (recipe_id, factor); der Faktor skaliert die
+# Mengen eines Rezepts, z.B. 2.0 für doppelt so viele Portionen.
+# Rezept-IDs aus einer Auswahl, nur Rezepte des Users, je einmal
+_SOURCE_RECIPES = """
+    SELECT id AS recipe_id, 1.0 AS factor
+    FROM recipes
+    WHERE user_id = :user_id AND id IN :recipe_ids
+"""
+# Gespeicherte Herkunft einer Liste (beim Erzeugen schon auf den User geprüft)
+_SOURCE_LIST = """
+    SELECT recipe_id, factor
+    FROM shopping_list_recipes
+    WHERE shopping_list_id = :list_id
+"""
+# Essensplan von :start bis :end: jede geplante Mahlzeit zählt mit
+# geplanten / Rezept-Portionen, mehrfach geplante Rezepte werden summiert
+_SOURCE_PLAN = """
+    SELECT mp.recipe_id AS recipe_id,
+           SUM(coalesce(mp.servings, r.servings) * 1.0 / max(r.servings, 1)) AS factor
+    FROM meal_plan_entries mp
+    JOIN recipes r ON r.id = mp.recipe_id AND r.user_id = :user_id
+    WHERE mp.user_id = :user_id AND mp.plan_date BETWEEN :start AND :end
+    GROUP BY mp.recipe_id
+"""
+
+
+def _per_source(template):
+    """ Die Abfrage einmal je Herkunft: {'recipes': ..., 'list': ..., 'plan': ...}. """
+    return {
+        'recipes': text(template.format(sources=_SOURCE_RECIPES))
+        .bindparams(bindparam('recipe_ids', expanding=True)),
+        'list': text(template.format(sources=_SOURCE_LIST)),
+        'plan': text(template.format(sources=_SOURCE_PLAN))
+        .bindparams(bindparam('start', type_=Date), bindparam('end', type_=Date)),
+    }
+
+
+# MODE_EXCLUDE: Summiert alle Rezeptzutaten mit Menge und Einheit in SQL.
+# Zutaten, die im Haushalt des Users vorhanden sind, werden per
+# Anti-Join (NOT EXISTS) direkt in der Abfrage ausgeschlossen.
+# Zeilen ohne Menge oder Einheit werden wie bisher einzeln übernommen.
+# CROSS JOIN hält die Reihenfolge fest: erst die Quellen, dann ihre Zeilen
+# über den Index auf recipe_id.
+_EXCLUDE_SQL = _per_source("""
+    WITH src AS ({sources})
+    SELECT ri.ingredient_id           AS ingredient_id,
+           unit_key(ri.unit)          AS unit,
+           SUM(ri.amount * src.factor) AS amount,
+           MIN(ri.id)                 AS first_id
+    FROM src CROSS JOIN recipe_ingredients ri ON ri.recipe_id = src.recipe_id
+    WHERE ri.amount IS NOT NULL
+      AND ri.unit IS NOT NULL AND ri.unit != ''
+      AND NOT EXISTS (
+          SELECT 1 FROM household_items hi
+          WHERE hi.user_id = :user_id
+            AND hi.ingredient_id = ri.ingredient_id
+      )
+    GROUP BY ri.ingredient_id, unit_key(ri.unit)
+
+    UNION ALL
+
+    SELECT ri.ingredient_id, ri.unit, ri.amount * src.factor, ri.id
+    FROM src CROSS JOIN recipe_ingredients ri ON ri.recipe_id = src.recipe_id
+    WHERE (ri.amount IS NULL OR ri.unit IS NULL OR ri.unit = '')
+      AND NOT EXISTS (
+          SELECT 1 FROM household_items hi
+          WHERE hi.user_id = :user_id
+            AND hi.ingredient_id = ri.ingredient_id
+      )
+""")
+
+# MODE_SUBTRACT: Bedarf je (Zutat, normalisierte Einheit). Zeilen ohne
+# Einheit zählen als Stück, Zeilen ohne Menge werden je Zutat zusammengefasst
+# (dort steht in unit_key die Original-Einheit).
+_NEEDS_SQL = _per_source("""
+    WITH src AS ({sources})
+    SELECT ri.ingredient_id                   AS ingredient_id,
+           unit_key(ri.unit)                  AS unit_key,
+           SUM(ri.amount * src.factor)        AS amount,
+           MIN(ri.id)                         AS first_id,
+           COUNT(*)                           AS row_count
+    FROM src CROSS JOIN recipe_ingredients ri ON ri.recipe_id = src.recipe_id
+    WHERE ri.amount IS NOT NULL
+    GROUP BY ri.ingredient_id, unit_key(ri.unit)
+
+    UNION ALL
+
+    SELECT ri.ingredient_id, MIN(ri.unit), NULL, MIN(ri.id), COUNT(*)
+    FROM src CROSS JOIN recipe_ingredients ri ON ri.recipe_id = src.recipe_id
+    WHERE ri.amount IS NULL
+    GROUP BY ri.ingredient_id
+""")
+
+# Herkunft einer neu berechneten Liste, ohne die Rezepte erst zu laden
+_INSERT_SOURCES_SQL = _per_source("""
+    INSERT INTO shopping_list_recipes (shopping_list_id, recipe_id, factor)
+    SELECT :list_id, recipe_id, factor FROM ({sources})
+""")
+
+# Haushaltsbestand für die benötigten Zutaten, schon je Dimension in der
+# Basiseinheit summiert (inventory.py). Zeilen ohne Menge: die Zutat gilt
+# als vorhanden und fällt ganz weg.
+_STOCK_SQL = text("""
+    SELECT hi.ingredient_id, hi.dimension, hi.amount
+    FROM household_items hi
+    WHERE hi.user_id = :user_id
+      AND hi.ingredient_id IN :ingredient_ids
+""").bindparams(bindparam('ingredient_ids', expanding=True))
+
+# Höchstens eine Liste je User (Unique-Index, migrations/0006)
+_LIST_ID_SQL = text("SELECT id FROM shopping_lists WHERE user_id = :user_id")
+
+# Listen eines Users, die aus einem bestimmten Rezept entstanden sind
+_LISTS_WITH_RECIPE_SQL = text("""
+    SELECT slr.shopping_list_id, slr.factor
+    FROM shopping_list_recipes slr
+    JOIN shopping_lists sl ON sl.id = slr.shopping_list_id
+    WHERE slr.recipe_id = :recipe_id AND sl.user_id = :user_id
+""")
+
+_INSERT_LIST_SQL = text("""
+    INSERT INTO shopping_lists (user_id, created_at)
+    VALUES (:user_id, :created_at)
+""").bindparams(bindparam('created_at', type_=DateTime))
+
+_TOUCH_LIST_SQL = text("""
+    UPDATE shopping_lists SET created_at = :created_at WHERE id = :list_id
+""").bindparams(bindparam('created_at', type_=DateTime))
+
+# Überzählige Listen (die App geht von einer Liste pro User aus)
+_CLEAR_SOURCES_SQL = [
+    text("DELETE FROM shopping_list_recipes WHERE shopping_list_id = :list_id"),
+    text("DELETE FROM shopping_list_needs WHERE shopping_list_id = :list_id"),
+]
+
+_DELETE_SOURCE_SQL = text("""
+    DELETE FROM shopping_list_recipes
+    WHERE shopping_list_id = :list_id AND recipe_id = :recipe_id
+""")
+
+_NEEDS_OF_LIST_SQL = text("""
+    SELECT ingredient_id, dimension, required, row_count, first_id, unit
+    FROM shopping_list_needs
+    WHERE shopping_list_id = :list_id AND ingredient_id IN :ingredient_ids
+""").bindparams(bindparam('ingredient_ids', expanding=True))
+
+_INSERT_NEED_SQL = text("""
+    INSERT INTO shopping_list_needs
+        (shopping_list_id, ingredient_id, dimension, required, row_count, first_id, unit)
+    VALUES
+        (:list_id, :ingredient_id, :dimension, :required, :row_count, :first_id, :unit)
+""")
+
+_UPDATE_NEED_SQL = text("""
+    UPDATE shopping_list_needs
+    SET required = :required, row_count = :row_count, first_id = :first_id, unit = :unit
+    WHERE shopping_list_id = :list_id AND ingredient_id = :ingredient_id
+      AND dimension = :dimension
+""")
+
+_DELETE_NEED_SQL = text("""
+    DELETE FROM shopping_list_needs
+    WHERE shopping_list_id = :list_id AND ingredient_id = :ingredient_id
+      AND dimension = :dimension
+""")
+
+# Aus Rezepten erzeugte Artikel; eigene Artikel (custom_name) bleiben unberührt
+_GENERATED_ITEMS_SQL = """
+    SELECT id, ingredient_id, amount, unit
+    FROM shopping_list_items
+    WHERE shopping_list_id = :list_id
+      AND custom_name IS NULL AND ingredient_id IS NOT NULL
+      {where}
+    ORDER BY id
+"""
+
+_INSERT_ITEM_SQL = text("""
+    INSERT INTO shopping_list_items
+        (shopping_list_id, ingredient_id, amount, unit, custom_name, purchased, version)
+    VALUES
+        (:shopping_list_id, :ingredient_id, :amount, :unit, NULL, 0, 0)
+""")
+
+_UPDATE_ITEM_SQL = text("""
+    UPDATE shopping_list_items SET amount = :amount, version = version + 1
+    WHERE id = :id
+""")
+
+_DELETE_ITEMS_SQL = text(
+    "DELETE FROM shopping_list_items WHERE id IN :item_ids"
+).bindparams(bindparam('item_ids', expanding=True))
+
+# Dimension in shopping_list_needs für Zutaten ohne Mengenangabe
+WITHOUT_AMOUNT = ''
+
+
+class Need:
+    """ Bedarf einer Zutat in einer Dimension (Basiseinheit) oder ohne Menge. """
+    __slots__ = ('required', 'row_count', 'first_id', 'unit')
+
+    def __init__(self, required, row_count, first_id, unit=None):
+        self.required = required
+        self.row_count = row_count
+        self.first_id = first_id
+        self.unit = unit
+
+
+def recipe_rows(recipe):
+    """ Zutatenzeilen eines Rezepts als (id, ingredient_id, amount, unit). """
+    return [(ri.id, ri.ingredient_id, ri.amount, ri.unit) for ri in recipe.recipe_ingredients]
+
+
+def _row_needs(rows, sign, needs=None, factor=1.0):
+    """
+    Bedarf einzelner Zutatenzeilen (siehe recipe_rows), mit sign = -1 als
+    Abzug und den Mengen mal factor. Rechnet wie _NEEDS_SQL, nur ohne
+    Datenbank.
+    """
+    needs = {} if needs is None else needs
+    for row_id, ingredient_id, amount, unit in rows:
+        if amount is None:
+            key = (ingredient_id, WITHOUT_AMOUNT)
+            value = None
+        else:
+            dim, value = quantity.to_base(amount, quantity.unit_key(unit))
+            key = (ingredient_id, dim)
+            value *= sign * factor
+        need = needs.get(key)
+        if need is None:
+            needs[key] = Need(value, sign, row_id, unit if amount is None else None)
+            continue
+        if value is not None:
+            need.required += value
+        need.row_count += sign
+        need.first_id = min(need.first_id, row_id)
+    return needs
+
+
+def _recipe_ids(values):
+    """ Rezept-IDs aus Formular oder JSON, sortiert und ohne Duplikate. """
+    return sorted({int(x) for x in values if str(x).isdigit()})
+
+
+def _line_key(ingredient_id, amount, unit):
+    return ingredient_id, unit or '', amount is None
+
+
+def _same_amount(a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    return abs(a - b) < 1e-9
+
+
+class ShoppingListBuilder:
+    """
+    Erzeugt die Einkaufsliste eines Users aus einer Menge von Rezepten.
+    Gruppierung und Summierung laufen in SQL, alle Einträge werden
+    per executemany in einer Transaktion geschrieben.
+
+    Im Modus MODE_SUBTRACT werden Mengen in Basiseinheiten (g, ml, Stk)
+    umgerechnet und der Haushaltsbestand abgezogen, nur der Fehlbetrag
+    landet auf der Liste. MODE_EXCLUDE entspricht der alten Logik.
+
+    Die inkrementelle Pflege (recipe_changed, stock_changed) arbeitet im
+    Modus MODE_SUBTRACT mit dem gespeicherten Bedarf. Im Modus MODE_EXCLUDE
+    wird die Liste aus ihren Rezepten neu berechnet, Haken und eigene
+    Artikel bleiben aber auch dort erhalten.
+    """
+    def __init__(self, db, mode: str = MODE_SUBTRACT, events=None):
+        if mode not in MODES:
+            raise ValueError(f"Unbekannter Modus: {mode}")
+        self.db = db
+        self.mode = mode
+        # Optional: ShoppingListEvents, meldet den Neuaufbau an verbundene Clients
+        self.events = events
+
+    def aggregate(self, user_id: int, recipe_ids, mode: str = None):
+        """
+        Liefert die Zeilen der Einkaufsliste als Liste von Dicts
+        (ingredient_id, amount, unit), ohne etwas zu schreiben.
+        Es werden nur Rezepte berücksichtigt, die dem User gehören.
+        """
+        params = {'recipe_ids': _recipe_ids(recipe_ids)}
+        if not params['recipe_ids']:
+            return []
+        if (mode or self.mode) == MODE_EXCLUDE:
+            return self._aggregate_exclude(user_id, 'recipes', params)
+        return self._shortfall_lines(user_id, self._collect_needs(user_id, 'recipes', params))
+
+    def _aggregate_exclude(self, user_id: int, source: str, params):
+        rows = self.db.session.execute(
+            _EXCLUDE_SQL[source], dict(params, user_id=user_id)
+        ).all()
+        # Reihenfolge wie bisher: summierte Zeilen zuerst (in der Reihenfolge
+        # ihres ersten Auftretens), danach die Zeilen ohne Einheit.
+        summed = [r for r in rows if r.amount is not None and r.unit]
+        single = [r for r in rows if not (r.amount is not None and r.unit)]
+        summed.sort(key=lambda r: r.first_id)
+        single.sort(key=lambda r: r.first_id)
+        return [
+            {'ingredient_id': r.ingredient_id, 'amount': r.amount, 'unit': r.unit}
+            for r in summed + single
+        ]
+
+    def _collect_needs(self, user_id: int, source: str, params):
+        """
+        Bedarf je (Zutat, Dimension) für die Rezepte aus source (siehe
+        _per_source), skaliert und in Basiseinheiten.
+        """
+        rows = self.db.session.execute(
+            _NEEDS_SQL[source], dict(params, user_id=user_id)
+        ).all()
+        needs = {}
+        amounts = [r for r in rows if r.amount is not None]
+        dims, values = quantity.to_base_many(
+            [r.amount for r in amounts], [r.unit_key for r in amounts]
+        )
+        for r, dim, value in zip(amounts, dims, values):
+            key = (r.ingredient_id, dim)
+            if key in needs:
+                needs[key].required += value
+                needs[key].row_count += r.row_count
+                needs[key].first_id = min(needs[key].first_id, r.first_id)
+            else:
+                needs[key] = Need(value, r.row_count, r.first_id)
+        for r in rows:
+            if r.amount is None:
+                needs[(r.ingredient_id, WITHOUT_AMOUNT)] = Need(
+                    None, r.row_count, r.first_id, r.unit_key
+                )
+        return needs
+
+    def _shortfall_lines(self, user_id: int, needs):
+        """ Zieht den Haushaltsbestand vom Bedarf ab und liefert die Listenzeilen. """
+        if not needs:
+            return []
+        stock_rows = self.db.session.execute(_STOCK_SQL, {
+            'user_id': user_id,
+            'ingredient_ids': sorted({ingredient_id for ingredient_id, _ in needs}),
+        }).all()
+
+        # Bestand in Basiseinheiten je (Zutat, Dimension)
+        stock = {}
+        in_household = set()
+        unmeasured = set()
+        for r in stock_rows:
+            in_household.add(r.ingredient_id)
+            if r.amount is None:
+                unmeasured.add(r.ingredient_id)
+            else:
+                stock[(r.ingredient_id, r.dimension)] = r.amount
+
+        lines = []
+        without_amount = []
+        for (ingredient_id, dim), need in needs.items():
+            if dim == WITHOUT_AMOUNT:
+                if ingredient_id not in in_household:
+                    without_amount.append((need.first_id, {
+                        'ingredient_id': ingredient_id, 'amount': None, 'unit': need.unit,
+                    }))
+                continue
+            if ingredient_id in unmeasured:
+                continue
+            shortfall = round(need.required - stock.get((ingredient_id, dim), 0.0), 6)
+            if shortfall <= 0:
+                continue
+            lines.append((need.first_id, {
+                'ingredient_id': ingredient_id,
+                'amount': shortfall,
+                'unit': quantity.display_unit(dim),
+            }))
+        lines.sort(key=lambda line: line[0])
+        # Zutaten ohne Mengenangabe hinten anhängen, wie bisher
+        without_amount.sort(key=lambda line: line[0])
+        return [line for _, line in lines + without_amount]
+
+    def build(self, user_id: int, recipe_ids, mode: str = None):
+        """
+        Berechnet die Einkaufsliste des Users für die Rezepte neu.
+        Die Liste selbst, eigene Artikel und Haken bei unveränderten
+        Artikeln bleiben erhalten. Gibt (shopping_list_id, lines) zurück.
+        Alles passiert in einer Transaktion mit einem einzigen Commit.
+        """
+        return self._build(user_id, 'recipes', {'recipe_ids': _recipe_ids(recipe_ids)}, mode)
+
+    def build_plan(self, user_id: int, start, end, mode: str = None):
+        """
+        Wie build(), aber für alle geplanten Mahlzeiten von start bis end
+        (jeweils einschließlich, datetime.date). Mehrfach geplante Rezepte
+        werden zusammengefasst, die Mengen nach Portionen skaliert. Die
+        Zahl der Abfragen hängt nicht von der Größe des Plans ab.
+        """
+        return self._build(user_id, 'plan', {'start': start, 'end': end}, mode)
+
+    def _build(self, user_id: int, source: str, params, mode: str = None):
+        session = self.db.session
+        mode = mode or self.mode
+        if mode not in MODES:
+            raise ValueError(f"Unbekannter Modus: {mode}")
+        try:
+            list_id = self._reset_list(user_id)
+            # Herkunft direkt per INSERT ... SELECT, danach rechnen alle
+            # Abfragen mit der gespeicherten Herkunft der Liste
+            added = session.execute(
+                _INSERT_SOURCES_SQL[source], dict(params, user_id=user_id, list_id=list_id)
+            ).rowcount
+            sources = {'list_id': list_id}
+
+            needs = {}
+            if not added:
+                lines = []
+            elif mode == MODE_EXCLUDE:
+                lines = self._aggregate_exclude(user_id, 'list', sources)
+            else:
+                needs = self._collect_needs(user_id, 'list', sources)
+                lines = self._shortfall_lines(user_id, needs)
+
+            if needs:
+                session.execute(_INSERT_NEED_SQL, [
+                    self._need_params(list_id, key, need) for key, need in needs.items()
+                ])
+            self._reconcile(list_id, lines)
+            if self.events is not None:
+                self.events.publish(user_id, 'reset', {'shopping_list_id': list_id}, list_id)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        # Vorher geladene ORM-Objekte der Liste sind jetzt veraltet
+        session.expire_all()
+        return list_id, lines
+
+    def _reset_list(self, user_id: int):
+        """ Behält die Liste des Users (oder legt sie an) und leert ihre Herkunftsdaten. """
+        session = self.db.session
+        now = datetime.utcnow()
+        list_id = session.execute(_LIST_ID_SQL, {'user_id': user_id}).scalar()
+        if list_id is None:
+            result = session.execute(_INSERT_LIST_SQL, {'user_id': user_id, 'created_at': now})
+            return result.lastrowid
+        for statement in _CLEAR_SOURCES_SQL:
+            session.execute(statement, {'list_id': list_id})
+        session.execute(_TOUCH_LIST_SQL, {'list_id': list_id, 'created_at': now})
+        return list_id
+
+    # ----------------------------
+    # Inkrementelle Pflege
+    # ----------------------------
+    def recipe_changed(self, user_id: int, recipe_id: int, old_rows, new_rows=None):
+        """
+        Überträgt die Änderung eines Rezepts auf die Einkaufsliste, falls
+        sie aus diesem Rezept entstanden ist. old_rows und new_rows sind
+        Zutatenzeilen wie von recipe_rows(); new_rows=None heißt, das Rezept
+        wurde gelöscht. Muss nach einem flush() aufgerufen werden (neue
+        Zeilen brauchen ihre ID), committen muss der Aufrufer.
+        """
+        session = self.db.session
+        source = session.execute(_LISTS_WITH_RECIPE_SQL, {
+            'user_id': user_id, 'recipe_id': recipe_id,
+        }).first()
+        if source is None:
+            return
+        list_id = source.shopping_list_id
+        if new_rows is None:
+            session.execute(_DELETE_SOURCE_SQL, {'list_id': list_id, 'recipe_id': recipe_id})
+        if self.mode == MODE_EXCLUDE:
+            self._refresh_all(user_id, list_id)
+            return
+
+        if new_rows is not None:
+            # Unveränderte Zeilen (gleiche ID und Werte, siehe recipe_store.py) heben sich auf
+            unchanged = set(old_rows) & set(new_rows)
+            old_rows = [row for row in old_rows if row not in unchanged]
+            new_rows = [row for row in new_rows if row not in unchanged]
+
+        # Mit dem Faktor, mit dem das Rezept auf der Liste steht
+        delta = _row_needs(old_rows, -1, factor=source.factor)
+        _row_needs(new_rows or [], 1, delta, factor=source.factor)
+        ingredient_ids = sorted({ingredient_id for ingredient_id, _ in delta})
+        if not ingredient_ids:
+            return
+        self._apply_needs_delta(list_id, ingredient_ids, delta)
+        needs = self._load_needs(list_id, ingredient_ids)
+        self._refresh(user_id, list_id, self._shortfall_lines(user_id, needs), ingredient_ids)
+
+    def stock_changed(self, user_id: int, ingredient_ids):
+        """
+        Rechnet die Artikel der betroffenen Zutaten nach einer Änderung am
+        Haushaltsbestand neu. Committen muss der Aufrufer.
+        """
+        session = self.db.session
+        list_id = session.execute(_LIST_ID_SQL, {'user_id': user_id}).scalar()
+        ingredient_ids = sorted(set(ingredient_ids))
+        if list_id is None or not ingredient_ids:
+            return
+        if self.mode == MODE_EXCLUDE:
+            self._refresh_all(user_id, list_id)
+            return
+
+        needs = self._load_needs(list_id, ingredient_ids)
+        if not needs:
+            # Zutat steht in keinem der Rezepte der Liste
+            return
+        ingredient_ids = sorted({ingredient_id for ingredient_id, _ in needs})
+        self._refresh(user_id, list_id, self._shortfall_lines(user_id, needs), ingredient_ids)
+
+    def _refresh_all(self, user_id: int, list_id: int):
+        # MODE_EXCLUDE: ohne gespeicherten Bedarf die ganze Liste neu abgleichen
+        lines = self._aggregate_exclude(user_id, 'list', {'list_id': list_id})
+        self._refresh(user_id, list_id, lines)
+
+    def _load_needs(self, list_id: int, ingredient_ids):
+        rows = self.db.session.execute(_NEEDS_OF_LIST_SQL, {
+            'list_id': list_id, 'ingredient_ids': ingredient_ids,
+        }).all()
+        return {
+            (r.ingredient_id, r.dimension): Need(r.required, r.row_count, r.first_id, r.unit)
+            for r in rows
+        }
+
+    @staticmethod
+    def _need_params(list_id, key, need):
+        ingredient_id, dimension = key
+        return {
+            'list_id': list_id,
+            'ingredient_id': ingredient_id,
+            'dimension': dimension,
+            'required': need.required,
+            'row_count': need.row_count,
+            'first_id': need.first_id,
+            'unit': need.unit,
+        }
+
+    def _apply_needs_delta(self, list_id: int, ingredient_ids, delta):
+        """ Addiert delta auf den gespeicherten Bedarf, leere Einträge fallen weg. """
+        current = self._load_needs(list_id, ingredient_ids)
+        inserts, updates, deletes = [], [], []
+        for key, change in delta.items():
+            need = current.get(key)
+            if need is None:
+                if change.row_count > 0:
+                    inserts.append(self._need_params(list_id, key, change))
+                continue
+            need.row_count += change.row_count
+            if need.row_count <= 0:
+                deletes.append(self._need_params(list_id, key, need))
+                continue
+            if need.required is not None and change.required is not None:
+                need.required += change.required
+            need.unit = need.unit or change.unit
+            updates.append(self._need_params(list_id, key, need))
+
+        session = self.db.session
+        if deletes:
+            session.execute(_DELETE_NEED_SQL, deletes)
+        if updates:
+            session.execute(_UPDATE_NEED_SQL, updates)
+        if inserts:
+            session.execute(_INSERT_NEED_SQL, inserts)
+
+    def _refresh(self, user_id: int, list_id: int, lines, ingredient_ids=None):
+        """ Gleicht die Artikel ab und meldet Änderungen an verbundene Clients. """
+        inserted, updated, deleted = self._reconcile(list_id, lines, ingredient_ids)
+        if self.events is None:
+            return
+        self.events.publish_many(user_id, [('remove', {'id': item_id}) for item_id in deleted],
+                                 list_id)
+        if inserted or updated:
+            self.events.publish(user_id, 'update', {'shopping_list_id': list_id}, list_id)
+
+    def _reconcile(self, list_id: int, lines, ingredient_ids=None):
+        """
+        Bringt die aus Rezepten erzeugten Artikel der Liste auf den Stand
+        von lines, beschränkt auf ingredient_ids (None = alle). Passende
+        Artikel werden nur in der Menge angepasst und behalten ihren Haken.
+        Gibt (Anzahl neu, geänderte IDs, gelöschte IDs) zurück.
+        """
+        session = self.db.session
+        params = {'list_id': list_id}
+        if ingredient_ids is None:
+            query = text(_GENERATED_ITEMS_SQL.format(where=''))
+        else:
+            query = text(_GENERATED_ITEMS_SQL.format(
+                where='AND ingredient_id IN :ingredient_ids'
+            )).bindparams(bindparam('ingredient_ids', expanding=True))
+            params['ingredient_ids'] = ingredient_ids
+
+        existing = {}
+        for row in session.execute(query, params):
+            existing.setdefault(_line_key(row.ingredient_id, row.amount, row.unit), []).append(row)
+
+        inserts, updates = [], []
+        for line in lines:
+            matches = existing.get(_line_key(line['ingredient_id'], line['amount'], line['unit']))
+            if not matches:
+                inserts.append(dict(line, shopping_list_id=list_id))
+                continue
+            row = matches.pop(0)
+            if not _same_amount(row.amount, line['amount']):
+                updates.append({'id': row.id, 'amount': line['amount']})
+        deleted = [row.id for rows in existing.values() for row in rows]
+
+        if deleted:
+            session.execute(_DELETE_ITEMS_SQL, {'item_ids': deleted})
+        if updates:
+            session.execute(_UPDATE_ITEM_SQL, updates)
+        if inserts:
+            session.execute(_INSERT_ITEM_SQL, inserts)
+        return len(inserts), [u['id'] for u in updates], deleted
@@ -0,0 +1,75 @@
+# shopping_list_delta.py
+"""
+Abhaken einzelner Artikel der Einkaufsliste mit optimistischer Nebenläufigkeit.
+
+Jeder Artikel hat eine Versionsnummer. Ein Update greift nur, wenn der Client
+die aktuelle Version kennt; danach wird sie hochgezählt. Änderungen an
+verschiedenen Artikeln kommen sich so nie in die Quere. Ändern zwei Leute
+denselben Artikel, gewinnt der erste; der zweite bekommt einen Konflikt,
+außer er wollte ohnehin denselben Zustand setzen (dann wird zusammengeführt).
+"""
+from collections import namedtuple
+
+from sqlalchemy import text
+
+# status: "updated", "merged", "conflict" oder "not_found"
+ToggleResult = namedtuple('ToggleResult', ['status', 'id', 'purchased', 'version'])
+
+_UPDATE_SQL = text("""
+    UPDATE shopping_list_items
+    SET purchased = :purchased, version = version + 1
+    WHERE id = :item_id
+      AND version = :version
+      AND shopping_list_id IN (SELECT id FROM shopping_lists WHERE user_id = :user_id)
+""")
+
+_CURRENT_SQL = text("""
+    SELECT sli.id AS id, sli.purchased AS purchased, sli.version AS version
+    FROM shopping_list_items sli
+    JOIN shopping_lists sl ON sl.id = sli.shopping_list_id
+    WHERE sli.id = :item_id AND sl.user_id = :user_id
+""")
+
+
+def set_purchased(session, user_id: int, item_id: int, purchased: bool, version: int):
+    """
+    Setzt purchased für genau einen Artikel, sofern version noch aktuell ist.
+    Schreibt nur diese eine Zeile; committen muss der Aufrufer.
+    """
+    params = {'item_id': item_id, 'user_id': user_id}
+    result = session.execute(_UPDATE_SQL, dict(params, purchased=purchased, version=version))
+    if result.rowcount == 1:
+        return ToggleResult('updated', item_id, purchased, version + 1)
+
+    current = session.execute(_CURRENT_SQL, params).first()
+    if current is None:
+        return ToggleResult('not_found', item_id, None, None)
+    if bool(current.purchased) == purchased:
+        # Jemand anderes hat schon dasselbe gesetzt
+        return ToggleResult('merged', item_id, purchased, current.version)
+    return ToggleResult('conflict', item_id, bool(current.purchased), current.version)
+
+
+def apply_form_ticks(session, user_id: int, form):
+    """
+    Wertet die Checkboxen eines Formulars (ohne JavaScript) als Delta aus:
+    Nur Artikel, deren Haken sich gegenüber dem angezeigten Stand
+    (Hidden-Felder shown_<id> und version_<id>) geändert hat, werden
+    geschrieben. Gibt die Liste der Ergebnisse zurück.
+    """
+    results = []
+    for key, shown in form.items():
+        if not key.startswith('shown_'):
+            continue
+        item_id = key[len('shown_'):]
+        if not item_id.isdigit():
+            continue
+        wanted = f"purchased_{item_id}" in form
+        if wanted == (shown == '1'):
+            continue
+        try:
+            version = int(form.get(f"version_{item_id}", ''))
+        except ValueError:
+            continue
+        results.append(set_purchased(session, user_id, int(item_id), wanted, version))
+    return results
@@ -0,0 +1,242 @@
+# shopping_list_events.py
+"""
+Live-Synchronisation der Einkaufsliste per Server-Sent Events (SSE).
+
+Änderungen werden als Zeile in shopping_list_events geschrieben, und zwar in
+derselben Transaktion wie die Änderung selbst. Jeder uWSGI-Worker hat einen
+Hintergrund-Thread, der neue Zeilen aus der gemeinsamen SQLite-Datei liest
+und an die verbundenen Clients dieses Workers verteilt. So erreichen die
+Events alle Worker, ganz ohne externen Broker.
+
+Events werden pro User verteilt (jeder User hat genau eine Liste), damit
+Clients auch nach dem Neuaufbau der Liste verbunden bleiben.
+"""
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, bindparam, text
+
+import database
+
+_CREATE_SQL = text("""
+    CREATE TABLE IF NOT EXISTS shopping_list_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        shopping_list_id INTEGER,
+        kind VARCHAR(20) NOT NULL,
+        payload TEXT NOT NULL,
+        created_at DATETIME NOT NULL
+    )
+""")
+
+_INSERT_SQL = text("""
+    INSERT INTO shopping_list_events (user_id, shopping_list_id, kind, payload, created_at)
+    VALUES (:user_id, :shopping_list_id, :kind, :payload, :created_at)
+""").bindparams(bindparam('created_at', type_=DateTime))
+
+_SINCE_SQL = text("""
+    SELECT id, user_id, kind, payload FROM shopping_list_events
+    WHERE id > :last_id
+    ORDER BY id
+    LIMIT 500
+""")
+
+_REPLAY_SQL = text("""
+    SELECT id, user_id, kind, payload FROM shopping_list_events
+    WHERE user_id = :user_id AND id > :last_id AND id <= :until_id
+    ORDER BY id
+""")
+
+
+def create_table(connection):
+    """ Legt die Event-Tabelle an, wird vom Migrationsschritt aufgerufen. """
+    connection.execute(_CREATE_SQL)
+
+
+class TooManyListeners(Exception):
+    pass
+
+
+class Subscription:
+    __slots__ = ('user_id', 'queue', 'last_id')
+
+    def __init__(self, user_id, last_id):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=1000)
+        self.last_id = last_id
+
+    def deliver(self, event):
+        if event[0] <= self.last_id:
+            return
+        self.last_id = event[0]
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Client hängt hinterher; er holt beim Reconnect per Last-Event-ID nach
+            pass
+
+
+class ShoppingListEvents:
+    """
+    Schreibt Events in die Datenbank und verteilt sie an SSE-Clients.
+    Der Poll-Thread startet erst beim ersten Abonnenten, also im
+    Worker-Prozess nach dem Fork, und pausiert ohne Abonnenten.
+    """
+    def __init__(self, db, poll_interval: float = 0.5, max_listeners: int = 50,
+                 retention_minutes: int = 30, audit=None):
+        self.db = db
+        # Optional audit_log.AuditLog, bekommt jede Änderung nach dem Commit
+        self.audit = audit
+        self.poll_interval = poll_interval
+        self.max_listeners = max_listeners
+        self.retention = timedelta(minutes=retention_minutes)
+        self.engine = None
+        self.write_engine = None
+        self._subscribers = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._last_id = None
+
+    # ----------------------------
+    # Schreiben
+    # ----------------------------
+    def publish(self, user_id: int, kind: str, payload: dict, shopping_list_id: int = None):
+        """ Event in der laufenden Transaktion vormerken; committen muss der Aufrufer. """
+        self.publish_many(user_id, [(kind, payload)], shopping_list_id)
+
+    def publish_many(self, user_id: int, events, shopping_list_id: int = None):
+        """ Wie publish für mehrere (kind, payload), mit einem Statement. """
+        events = list(events)
+        if not events:
+            return
+        now = datetime.utcnow()
+        self.db.session.execute(_INSERT_SQL, [
+            {'user_id': user_id, 'shopping_list_id': shopping_list_id, 'kind': kind,
+             'payload': json.dumps(payload), 'created_at': now}
+            for kind, payload in events
+        ])
+        if self.audit is not None:
+            for kind, payload in events:
+                self.audit.record(f"shopping_list.{kind}", user_id,
+                                  shopping_list_id=shopping_list_id, payload=payload)
+
+    # ----------------------------
+    # Abonnieren
+    # ----------------------------
+    def subscribe(self, user_id: int, last_event_id: int = None):
+        """
+        Meldet einen Client an. Mit last_event_id werden verpasste Events
+        nachgeliefert; das passiert unter dem Lock, damit der Poll-Thread
+        nichts dazwischen schiebt und die Reihenfolge erhalten bleibt.
+        """
+        with self._lock:
+            if self._count >= self.max_listeners:
+                raise TooManyListeners()
+            if self.engine is None:
+                # Erst im Worker binden, der Poll-Thread läuft ohne App-Kontext.
+                # Gepollt wird über die Leseverbindung, nur _cleanup schreibt.
+                self.engine = database.read_engine(self.db)
+                self.write_engine = self.db.engine
+            self._ensure_thread()
+            subscription = Subscription(user_id, self._last_id)
+            if last_event_id and last_event_id < self._last_id:
+                with self.engine.connect() as connection:
+                    rows = connection.execute(_REPLAY_SQL, {
+                        'user_id': user_id,
+                        'last_id': last_event_id,
+                        'until_id': self._last_id,
+                    }).all()
+                for row in rows:
+                    try:
+                        subscription.queue.put_nowait(tuple(row))
+                    except queue.Full:
+                        break
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            self._count += 1
+            self._wakeup.notify()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            listeners = self._subscribers.get(subscription.user_id)
+            if listeners and subscription in listeners:
+                listeners.discard(subscription)
+                self._count -= 1
+                if not listeners:
+                    del self._subscribers[subscription.user_id]
+
+    def stream(self, subscription, timeout: float = 55.0, heartbeat: float = 15.0):
+        """
+        Generator für die SSE-Antwort. Endet nach timeout Sekunden, der
+        Browser verbindet sich dann mit Last-Event-ID neu. So bleibt kein
+        Worker-Thread dauerhaft blockiert.
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    event_id, _, kind, payload = subscription.queue.get(
+                        timeout=min(heartbeat, remaining)
+                    )
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                yield f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    # ----------------------------
+    # Verteilen (Poll-Thread)
+    # ----------------------------
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self.engine.connect() as connection:
+            self._last_id = connection.execute(
+                text("SELECT coalesce(MAX(id), 0) FROM shopping_list_events")
+            ).scalar()
+        self._thread = threading.Thread(target=self._run, name='shopping-list-events',
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        last_cleanup = time.monotonic()
+        while True:
+            with self._lock:
+                while not self._count:
+                    self._wakeup.wait()
+                last_id = self._last_id
+            try:
+                with self.engine.connect() as connection:
+                    rows = connection.execute(_SINCE_SQL, {'last_id': last_id}).all()
+                if time.monotonic() - last_cleanup > 60:
+                    self._cleanup()
+                    last_cleanup = time.monotonic()
+            except Exception:
+                # z.B. "database is locked": beim nächsten Durchlauf erneut versuchen
+                rows = []
+            if rows:
+                with self._lock:
+                    self._last_id = rows[-1].id
+                    for row in rows:
+                        for subscription in tuple(self._subscribers.get(row.user_id, ())):
+                            subscription.deliver(tuple(row))
+            if len(rows) < 500:
+                time.sleep(self.poll_interval)
+
+    def _cleanup(self):
+        with self.write_engine.begin() as connection:
+            connection.execute(
+                text("DELETE FROM shopping_list_events WHERE created_at < :cutoff")
+                .bindparams(bindparam('cutoff', type_=DateTime)),
+                {'cutoff': datetime.utcnow() - self.retention}
+            )
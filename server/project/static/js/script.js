@@ -3,4 +3,207 @@ function toggleMenu() {
     // Toggle die Klasse 'active'
     sidebar.classList.toggle("active");
   }
-  
\ No newline at end of file
+  
+// Infinite Scroll: lädt die nächste Seite, sobald der "Weitere laden"-Eintrag
+// sichtbar wird, und ersetzt ihn durch die nachgeladenen Einträge.
+function observeLoadMore(observer) {
+    document.querySelectorAll(".infinite-list .load-more").forEach(function (el) {
+      observer.observe(el);
+    });
+  }
+
+function loadNextPage(sentinel, observer) {
+    const url = sentinel.dataset.nextUrl;
+    if (!url || sentinel.dataset.loading) {
+      return;
+    }
+    sentinel.dataset.loading = "1";
+    fetch(url, { credentials: "same-origin" })
+      .then(function (response) {
+        if (!response.ok) {
+          throw new Error("HTTP " + response.status);
+        }
+        return response.text();
+      })
+      .then(function (html) {
+        observer.unobserve(sentinel);
+        sentinel.insertAdjacentHTML("beforebegin", html);
+        sentinel.remove();
+        observeLoadMore(observer);
+      })
+      .catch(function () {
+        // Link im Eintrag bleibt als Fallback nutzbar
+        delete sentinel.dataset.loading;
+      });
+  }
+
+document.addEventListener("DOMContentLoaded", function () {
+    if (!("IntersectionObserver" in window)) {
+      return;
+    }
+    const observer = new IntersectionObserver(function (entries) {
+      entries.forEach(function (entry) {
+        if (entry.isIntersecting) {
+          loadNextPage(entry.target, observer);
+        }
+      });
+    }, { rootMargin: "200px" });
+    observeLoadMore(observer);
+  });
+
+// Typeahead für die Rezeptsuche: füllt die Datalist mit passenden Titeln
+document.addEventListener("DOMContentLoaded", function () {
+    const input = document.querySelector("input[data-suggest-url]");
+    if (!input) {
+      return;
+    }
+    const datalist = document.getElementById(input.getAttribute("list"));
+    let timer = null;
+    input.addEventListener("input", function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        const value = input.value.trim();
+        if (value.length < 2) {
+          return;
+        }
+        fetch(input.dataset.suggestUrl + "?q=" + encodeURIComponent(value),
+              { credentials: "same-origin" })
+          .then(function (response) { return response.json(); })
+          .then(function (suggestions) {
+            datalist.innerHTML = "";
+            suggestions.forEach(function (suggestion) {
+              const option = document.createElement("option");
+              option.value = suggestion.title;
+              datalist.appendChild(option);
+            });
+          })
+          .catch(function () {});
+      }, 150);
+    });
+  });
+
+// Einkaufsliste: jeder Haken wird sofort einzeln gespeichert (ohne Reload).
+// Die Versionsnummer verhindert, dass fremde Änderungen überschrieben werden.
+function applyItemState(checkbox, purchased, version) {
+    checkbox.checked = purchased;
+    checkbox.dataset.version = version;
+    const row = checkbox.closest("tr");
+    row.classList.toggle("purchased", purchased);
+    // Hidden-Felder für das Formular ohne JavaScript aktuell halten
+    const id = checkbox.name.replace("purchased_", "");
+    const form = checkbox.form;
+    form.elements["shown_" + id].value = purchased ? "1" : "0";
+    form.elements["version_" + id].value = version;
+  }
+
+document.addEventListener("change", function (event) {
+    const checkbox = event.target;
+    if (!checkbox.matches || !checkbox.matches("input[data-toggle-url]")) {
+      return;
+    }
+    const wanted = checkbox.checked;
+    fetch(checkbox.dataset.toggleUrl, {
+      method: "POST",
+      credentials: "same-origin",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        purchased: wanted,
+        version: parseInt(checkbox.dataset.version, 10)
+      })
+    })
+      .then(function (response) {
+        return response.json().then(function (data) {
+          return { status: response.status, data: data };
+        });
+      })
+      .then(function (result) {
+        if (result.status === 200 || result.status === 409) {
+          // Bei Konflikt zeigt die Checkbox den Stand des Servers
+          applyItemState(checkbox, result.data.purchased, result.data.version);
+        } else {
+          checkbox.checked = !wanted;
+        }
+      })
+      .catch(function () {
+        checkbox.checked = !wanted;
+      });
+  });
+
+// Live-Sync: Änderungen von anderen Geräten kommen per Server-Sent Events.
+// Lehnt der Server ab (zu viele Verbindungen), wird stattdessen alle 10s
+// per ETag gepollt.
+function findItemCheckbox(form, id) {
+    return form.elements["purchased_" + id] || null;
+  }
+
+function applyRemoteItem(form, item) {
+    const checkbox = findItemCheckbox(form, item.id);
+    if (!checkbox) {
+      return false;
+    }
+    if (parseInt(checkbox.dataset.version, 10) < item.version) {
+      applyItemState(checkbox, item.purchased, item.version);
+    }
+    return true;
+  }
+
+function pollShoppingList(form) {
+    let etag = null;
+    setInterval(function () {
+      const headers = etag ? { "If-None-Match": etag } : {};
+      fetch(form.dataset.pollUrl, { credentials: "same-origin", headers: headers })
+        .then(function (response) {
+          if (response.status !== 200) {
+            return null;
+          }
+          etag = response.headers.get("ETag");
+          return response.json();
+        })
+        .then(function (data) {
+          if (!data) {
+            return;
+          }
+          const shown = form.querySelectorAll("input[data-toggle-url]").length;
+          const known = data.items.filter(function (item) {
+            return applyRemoteItem(form, item);
+          }).length;
+          if (known !== data.items.length || known !== shown) {
+            window.location.reload();
+          }
+        })
+        .catch(function () {});
+    }, 10000);
+  }
+
+document.addEventListener("DOMContentLoaded", function () {
+    const form = document.querySelector("form[data-events-url]");
+    if (!form) {
+      return;
+    }
+    if (!("EventSource" in window)) {
+      pollShoppingList(form);
+      return;
+    }
+    const source = new EventSource(form.dataset.eventsUrl);
+    source.addEventListener("check", function (event) {
+      applyRemoteItem(form, JSON.parse(event.data));
+    });
+    source.addEventListener("remove", function (event) {
+      const checkbox = findItemCheckbox(form, JSON.parse(event.data).id);
+      if (checkbox) {
+        checkbox.closest("tr").remove();
+      }
+    });
+    // Neue Artikel oder geänderte Mengen: Seite neu laden
+    ["add", "update", "reset"].forEach(function (kind) {
+      source.addEventListener(kind, function () {
+        window.location.reload();
+      });
+    });
+    source.onerror = function () {
+      // CLOSED heißt: Server hat mit Fehler (z.B. 503) geantwortet
+      if (source.readyState === EventSource.CLOSED) {
+        pollShoppingList(form);
+      }
+    };
+  });
@@ -0,0 +1,134 @@
+# user_cache.py
+"""
+Cache für den eingeloggten User (Flask-Login user_loader).
+
+Statt bei jedem Request die ganze User-Zeile samt Passwort-Hash zu laden,
+hält jeder Worker kleine Principal-Objekte (nur id und username) in einem
+LRU mit Ablaufzeit. Ein Treffer kostet keine Abfrage.
+
+Aus dem Cache fällt ein User
+  - beim Logout,
+  - nach dem Commit jeder Änderung oder Löschung über das User-Model
+    (z.B. Passwort neu gesetzt, Konto gelöscht),
+  - spätestens nach user_cache_ttl Sekunden. Das begrenzt, wie lange ein
+    anderer Worker noch einen alten Stand kennt.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import object_session
+
+
+class Principal:
+    """ Eingeloggter User ohne DB-Zeile, für current_user. """
+    __slots__ = ('id', 'username')
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id: int, username: str):
+        self.id = id
+        self.username = username
+
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, Principal) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"<Principal {self.username}>"
+
+
+class UserCache:
+    def __init__(self, db, user_model, max_entries: int = 1024, ttl: float = 60.0):
+        self.db = db
+        self.user_model = user_model
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # user_id -> (Principal, Ablaufzeit)
+        self._entries = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        self._pending_key = f"user_cache_pending_{id(self)}"
+        event.listen(user_model, 'after_update', self._changed)
+        event.listen(user_model, 'after_delete', self._changed)
+        event.listen(db.session, 'after_commit', self._after_commit)
+        event.listen(db.session, 'after_soft_rollback', self._after_rollback)
+
+    def load(self, user_id: int):
+        """ Principal für user_loader, None wenn es den User nicht gibt. """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self._stats['hits'] += 1
+                return entry[0]
+            self._stats['misses'] += 1
+        model = self.user_model
+        row = self.db.session.execute(
+            select(model.id, model.username).where(model.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        return self.remember(row.id, row.username)
+
+    def remember(self, user_id: int, username: str):
+        """ Legt den Principal ab (z.B. direkt nach dem Login) und gibt ihn zurück. """
+        principal = Principal(user_id, username)
+        if self.max_entries <= 0:
+            return principal
+        with self._lock:
+            self._entries[user_id] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self._stats['invalidations'] += 1
+
+    def __contains__(self, user_id):
+        with self._lock:
+            return user_id in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+    def metric_samples(self):
+        """ Zähler für metrics.Metrics.add_collector. """
+        stats = self.stats()
+        return [('mealmaster_user_cache_lookups_total', {'result': result}, stats[field])
+                for result, field in (('hit', 'hits'), ('miss', 'misses'))]
+
+    # ----------------------------
+    # Invalidierung nach Commit
+    # ----------------------------
+    def _changed(self, mapper, connection, target):
+        # Erst nach dem Commit entfernen, sonst könnte ein anderer Thread den
+        # alten Stand gleich wieder laden
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault(self._pending_key, set()).add(target.id)
+
+    def _after_commit(self, session):
+        for user_id in session.info.pop(self._pending_key, ()):
+            self.invalidate(user_id)
+
+    def _after_rollback(self, session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(self._pending_key, None)
@@ -1,4 +1,41 @@
-from server import app
+# wsgi.py
+"""
+Einstiegspunkt für uWSGI (-w wsgi:app).
+
+Ohne --lazy-apps lädt uWSGI dieses Modul einmal im Master und forkt dann
+die Worker. Die geladenen Module und die App teilen sich die Worker per
+Copy-on-Write; create_app() öffnet dafür vorab keine DB-Verbindung.
+"""
+import gc
+import os
+import tempfile
+
+from extensions import db
+from server import create_app
+
+app = create_app()
+
+# /metrics summiert die Zahlen aller Worker über Dateien in diesem Verzeichnis
+_metrics = app.extensions['mealmaster'].metrics
+_metrics.enable_multiprocess(
+    _metrics.directory or os.path.join(tempfile.gettempdir(), 'mealmaster-metrics')
+)
+
+try:
+    from uwsgidecorators import postfork
+except ImportError:  # nicht unter uWSGI gestartet
+    postfork = None
+
+if postfork is not None:
+    @postfork
+    def _reset_connections():
+        # Verbindungen aus dem Master dürfen nicht in den Worker mitgenommen werden
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+# Alles bisher Geladene aus der Garbage Collection nehmen: sonst schreibt der
+# erste GC-Lauf im Worker in jedes Objekt und die geteilten Seiten werden kopiert.
+gc.freeze()
 
 if __name__ == "__main__":
     app.run()